@@ -17,6 +17,14 @@ python manage.py makemigrations
 python manage.py migrate
 echo "🗄️ Migraciones completadas"
 
+# Reconstruir métricas precalculadas del dashboard
+python manage.py reconstruir_metricas_dashboard
+echo "📊 Métricas del dashboard reconstruidas"
+
+# Poner al día el estado de las cuotas vencidas (el cron nocturno lo mantiene)
+python manage.py actualizar_cuotas_vencidas
+echo "📅 Estados de cuotas actualizados"
+
 # Verificar estado de la base de datos
 python check_db.py
 echo "🔍 Verificación de BD completada"
@@ -194,6 +194,31 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# Cache
+# -----------------------------------------------------------------------------
+# 'respuestas' guarda las respuestas del dashboard y del resumen de comisiones (ver
+# gestion_inmobiliaria/cache_respuestas.py). En memoria por defecto; con varios workers usar
+# RESPUESTAS_CACHE_BACKEND=file para que todos compartan la cache y sus invalidaciones.
+RESPUESTAS_CACHE_ALIAS = 'respuestas'
+if os.environ.get('RESPUESTAS_CACHE_BACKEND', 'locmem').lower() == 'file':
+    _cache_respuestas = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RESPUESTAS_CACHE_DIR', str(BASE_DIR / 'cache_respuestas')),
+    }
+else:
+    _cache_respuestas = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jcc-respuestas',
+    }
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'jcc-default',
+    },
+    # Sin vencimiento por defecto: los contadores de generación no deben expirar
+    RESPUESTAS_CACHE_ALIAS: {**_cache_respuestas, 'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': 5000}},
+}
+
 # --- CONFIGURACIÓN DE INTEGRACIÓN CON CRM ---
 # Token de autenticación para recibir webhooks del CRM (debe coincidir con COMERCIAL_WEBHOOK_TOKEN en el CRM)
 CRM_WEBHOOK_TOKEN = os.environ.get('CRM_WEBHOOK_TOKEN', 'jcc-webhook-secret-token-2024')
@@ -0,0 +1,100 @@
+# gestion_inmobiliaria/actividad.py
+"""
+Contador de presencias de ActividadDiaria (presencias_generadas).
+
+Una presencia realizada cuenta una vez por día (fecha local) para cada asesor que participó en
+ella (captación, call, liner o closer), aunque ocupe varios roles.
+
+Las señales de Presencia llaman a aplicar_cambio_presencia, que compara los pares (asesor, día)
+que la presencia aportaba al cargarse con los que aporta ahora y suma o resta 1 con un UPDATE
+F() por cada par que cambió; guardar una presencia sin cambios de fecha, status ni asesores no
+escribe nada. reconstruir_actividad_diaria recalcula un rango de fechas en una sola consulta
+agrupada y escribe solo las filas que cambian, para cargas masivas y reparaciones donde no
+corren las señales (comando reconstruir_actividad_diaria).
+"""
+from django.db import connection, transaction
+from django.db.models import DateField, F, Subquery
+from django.db.models.functions import TruncDate
+
+from .metricas import ROLES_PRESENCIA, filtro_fechas, filtro_presencias, fecha_local
+from .models import ActividadDiaria, Presencia, reservar_bloque_ids
+
+CAMPOS_PRESENCIA = ['fecha_hora_presencia', 'status_presencia', *ROLES_PRESENCIA]
+
+
+def _pares(fecha_hora, status, *asesores):
+    """{(asesor_id, fecha)} que cuenta una presencia con esos valores."""
+    if not fecha_hora or status != Presencia.STATUS_PRESENCIA_REALIZADA:
+        return set()
+    fecha = fecha_local(fecha_hora)
+    return {(asesor_id, fecha) for asesor_id in asesores if asesor_id}
+
+
+def _sumar(asesor_id, fecha, delta):
+    # Con filas repetidas de asesor y día el contador va en la primera, igual que en la reconstrucción
+    primera = ActividadDiaria.objects.filter(asesor_id=asesor_id, fecha_actividad=fecha).order_by('id_actividad').values('pk')[:1]
+    filas = ActividadDiaria.objects.filter(pk=Subquery(primera))
+    if delta < 0:
+        filas = filas.filter(presencias_generadas__gte=-delta)
+    if not filas.update(presencias_generadas=F('presencias_generadas') + delta) and delta > 0:
+        ActividadDiaria.objects.create(asesor_id=asesor_id, fecha_actividad=fecha, presencias_generadas=delta)
+
+
+def aplicar_cambio_presencia(presencia, eliminada=False):
+    """Ajusta presencias_generadas por el alta, cambio o baja de la presencia."""
+    actuales = set() if eliminada else _pares(*(getattr(presencia, campo) for campo in CAMPOS_PRESENCIA))
+    # Una presencia eliminada resta lo que aportaba; una nueva no tiene valores cargados y no resta nada
+    anteriores = _pares(*(getattr(presencia, campo) if eliminada else presencia.valor_cargado(campo) for campo in CAMPOS_PRESENCIA))
+    for asesor_id, fecha in actuales - anteriores:
+        _sumar(asesor_id, fecha, 1)
+    for asesor_id, fecha in anteriores - actuales:
+        _sumar(asesor_id, fecha, -1)
+
+
+def contar_presencias_por_asesor(fecha_desde=None, fecha_hasta=None):
+    """
+    {(asesor_id, fecha): presencias realizadas} del rango. Los cuatro roles se unen con UNION ALL y
+    se agrupan por asesor y día en la BD; COUNT(DISTINCT) cuenta una vez al asesor que ocupa varios roles.
+    """
+    presencias = Presencia.objects.filter(
+        filtro_presencias(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta), status_presencia=Presencia.STATUS_PRESENCIA_REALIZADA,
+    ).order_by()
+    partes = [
+        presencias.filter(**{f'{campo}__isnull': False}).values(
+            presencia_ref=F('id_presencia'), asesor_ref=F(campo), fecha_ref=TruncDate('fecha_hora_presencia'),
+        )
+        for campo in ROLES_PRESENCIA
+    ]
+    sql_union, params_union = partes[0].union(*partes[1:], all=True).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT t.asesor_ref, t.fecha_ref, COUNT(DISTINCT t.presencia_ref) FROM ({sql_union}) t GROUP BY t.asesor_ref, t.fecha_ref",
+            params_union,
+        )
+        # Sin el ORM la fecha llega como la devuelve el driver (texto en SQLite)
+        return {(asesor_id, DateField().to_python(fecha)): cantidad for asesor_id, fecha, cantidad in cursor.fetchall()}
+
+
+def reconstruir_actividad_diaria(fecha_desde=None, fecha_hasta=None):
+    """Deja presencias_generadas igual al conteo real en el rango. Devuelve las filas creadas o modificadas."""
+    conteo = contar_presencias_por_asesor(fecha_desde, fecha_hasta)
+    with transaction.atomic():
+        existentes = ActividadDiaria.objects.filter(**filtro_fechas('fecha_actividad', fecha_desde=fecha_desde, fecha_hasta=fecha_hasta))
+        modificadas, vistas = [], set()
+        for actividad in existentes.order_by('id_actividad').only('id_actividad', 'asesor_id', 'fecha_actividad', 'presencias_generadas'):
+            clave = (actividad.asesor_id, actividad.fecha_actividad)
+            if clave in vistas:
+                continue  # Filas repetidas de asesor y día: el contador va en la primera
+            vistas.add(clave)
+            if actividad.presencias_generadas != conteo.get(clave, 0):
+                actividad.presencias_generadas = conteo.get(clave, 0)
+                modificadas.append(actividad)
+        ActividadDiaria.objects.bulk_update(modificadas, ['presencias_generadas'], batch_size=1000)
+
+        nuevas = [clave for clave in conteo if clave not in vistas]
+        ids = reservar_bloque_ids(ActividadDiaria, 'ACT', len(nuevas), 5)
+        ActividadDiaria.objects.bulk_create([
+            ActividadDiaria(id_actividad=pk, asesor_id=asesor_id, fecha_actividad=fecha, presencias_generadas=conteo[(asesor_id, fecha)])
+            for pk, (asesor_id, fecha) in zip(ids, nuevas)
+        ], batch_size=1000)
+    return len(modificadas) + len(nuevas)
@@ -6,18 +6,26 @@ from .models import (
     Lote, Cliente, Asesor, Venta, ActividadDiaria, 
     DefinicionMetaComision, TablaComisionDirecta, ConfigGeneral, LogAuditoriaCambio,
     RegistroPago, Presencia,
-    PlanPagoVenta, CuotaPlanPago, ComisionVentaAsesor, CierreComisionMensual, DetalleComisionCerrada, GestionCobranza
+    PlanPagoVenta, CuotaPlanPago, ComisionVentaAsesor, CierreComisionMensual, DetalleComisionCerrada, GestionCobranza,
+    SecuenciaCorrelativa, Proyecto, MetricaDashboardDiaria
 )
+from .pagos_agrupados import agrupar_pagos
+
+@admin.register(Proyecto)
+class ProyectoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'moneda', 'precio_lista_defecto', 'precio_credito_12_meses_defecto', 'precio_credito_24_meses_defecto', 'precio_credito_36_meses_defecto', 'ultima_modificacion')
+    list_filter = ('moneda',)
+    search_fields = ('nombre',)
 
 @admin.register(Lote)
 class LoteAdmin(admin.ModelAdmin):
     list_display = ('id_lote', 'ubicacion_proyecto', 'manzana', 'etapa', 'numero_lote', 'estado_lote', 'area_m2', 'precio_lista_soles', 'precio_credito_12_meses_soles', 'precio_credito_24_meses_soles', 'precio_credito_36_meses_soles', 'precio_lista_dolares', 'precio_credito_12_meses_dolares', 'precio_credito_24_meses_dolares', 'precio_credito_36_meses_dolares', 'ultima_modificacion')
-    list_filter = ('estado_lote', 'etapa', 'ubicacion_proyecto', 'manzana')
+    list_filter = ('estado_lote', 'etapa', 'proyecto', 'ubicacion_proyecto', 'manzana')
     search_fields = ('id_lote', 'ubicacion_proyecto', 'manzana', 'numero_lote', 'partida_registral')
     list_per_page = 25
     fieldsets = (
         (None, {
-            'fields': ('id_lote', 'ubicacion_proyecto', 'manzana', 'numero_lote', 'estado_lote', 'etapa')
+            'fields': ('id_lote', 'ubicacion_proyecto', 'proyecto', 'manzana', 'numero_lote', 'estado_lote', 'etapa')
         }),
         ('Detalles del Lote', {
             'fields': ('area_m2', 'colindancias', 'partida_registral')
@@ -153,7 +161,8 @@ class VentaAdmin(admin.ModelAdmin):
         obj.actualizar_status_y_monto_pagado(save_instance=True) # Llamar explícitamente con save_instance
 
     def save_related(self, request, form, formsets, change):
-        super().save_related(request, form, formsets, change)
+        with agrupar_pagos():  # Los pagos del inline recalculan la venta una sola vez
+            super().save_related(request, form, formsets, change)
         form.instance.actualizar_status_y_monto_pagado(save_instance=True) # Llamar explícitamente con save_instance
 
 class CuotaPlanPagoInline(admin.TabularInline):
@@ -215,6 +224,11 @@ class ActividadDiariaAdmin(admin.ModelAdmin):
 admin.site.register(DefinicionMetaComision)
 admin.site.register(ConfigGeneral)
 
+@admin.register(SecuenciaCorrelativa)
+class SecuenciaCorrelativaAdmin(admin.ModelAdmin):
+    list_display = ('prefijo', 'ultimo_numero', 'ultima_modificacion')
+    readonly_fields = ('ultima_modificacion',)
+
 @admin.register(TablaComisionDirecta)
 class TablaComisionDirectaAdmin(admin.ModelAdmin):
     list_display = ('rol', 'tipo_venta', 'porcentaje_comision')
@@ -322,4 +336,10 @@ class DetalleComisionCerradaAdmin(admin.ModelAdmin):
 class GestionCobranzaAdmin(admin.ModelAdmin):
     list_display = ('cuota', 'responsable', 'fecha_gestion', 'tipo_contacto', 'resultado', 'proximo_seguimiento')
     search_fields = ('resultado', 'responsable__username', 'cuota__plan_pago_venta__venta__cliente__nombres_completos_razon_social')
-    list_filter = ('tipo_contacto', 'fecha_gestion')
\ No newline at end of file
+    list_filter = ('tipo_contacto', 'fecha_gestion')
+
+@admin.register(MetricaDashboardDiaria)
+class MetricaDashboardDiariaAdmin(admin.ModelAdmin):
+    list_display = ('fecha', 'fuente', 'asesor', 'proyecto', 'tipo_venta', 'medio_captacion', 'status', 'tipo_tour', 'cantidad', 'monto')
+    list_filter = ('fuente', 'proyecto', 'tipo_venta', 'medio_captacion', 'status')
+    date_hierarchy = 'fecha'
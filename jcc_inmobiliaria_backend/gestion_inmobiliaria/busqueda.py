@@ -0,0 +1,75 @@
+# gestion_inmobiliaria/busqueda.py
+"""
+Búsqueda de clientes para los desplegables, el autocompletado y el filtro 'q' del listado.
+
+Un término numérico (DNI, RUC, teléfono) se busca por prefijo sobre el documento y el teléfono,
+que usa los índices btree de la migración 0007. Un término de texto exige cada palabra en el
+nombre, en cualquier orden. En PostgreSQL el nombre se compara sin tildes ni mayúsculas sobre la
+expresión upper(f_unaccent(nombre)), cubierta por un índice GIN de trigramas, y los resultados se
+ordenan por similitud; en SQLite (tests) se usa icontains y orden alfabético.
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import F, Func, Q, TextField
+from django.db.models.functions import Upper
+
+RE_NUMERICO = re.compile(r'\+?[\d\s-]+')
+
+
+def normalizar(texto):
+    """Mayúsculas y sin tildes, igual que upper(f_unaccent(...)) en PostgreSQL."""
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).upper()
+
+
+def es_numerico(termino):
+    return bool(RE_NUMERICO.fullmatch(termino)) and any(c.isdigit() for c in termino)
+
+
+class BusquedaClientes:
+    """Implementación portable; los motores con algo mejor redefinen filtrar_nombre."""
+
+    def filtrar(self, queryset, termino):
+        termino = (termino or '').strip()
+        if not termino:
+            return queryset
+        if es_numerico(termino):
+            prefijo = re.sub(r'[\s-]', '', termino)
+            return queryset.filter(
+                Q(numero_documento__startswith=prefijo) | Q(telefono_principal__startswith=prefijo)
+            ).order_by('nombres_completos_razon_social', 'id_cliente')
+        # Pasaportes y carnés de extranjería son alfanuméricos: también se buscan por prefijo
+        return self.filtrar_nombre(queryset, termino, Q(numero_documento__startswith=termino.upper()))
+
+    def filtrar_nombre(self, queryset, termino, por_documento):
+        por_nombre = Q()
+        for palabra in termino.split():
+            por_nombre &= Q(nombres_completos_razon_social__icontains=palabra)
+        return queryset.filter(por_nombre | por_documento).order_by('nombres_completos_razon_social', 'id_cliente')
+
+
+class BusquedaClientesPostgres(BusquedaClientes):
+    def filtrar_nombre(self, queryset, termino, por_documento):
+        from django.contrib.postgres.search import TrigramWordSimilarity
+
+        normalizado = normalizar(termino)
+        queryset = queryset.annotate(
+            nombre_busqueda=Upper(Func(F('nombres_completos_razon_social'), function='f_unaccent', output_field=TextField()))
+        )
+        por_nombre = Q()
+        for palabra in normalizado.split():
+            por_nombre &= Q(nombre_busqueda__contains=palabra)
+        return queryset.filter(por_nombre | por_documento).annotate(
+            similitud=TrigramWordSimilarity(normalizado, 'nombre_busqueda')
+        ).order_by('-similitud', 'nombres_completos_razon_social', 'id_cliente')
+
+
+BACKENDS = {'postgresql': BusquedaClientesPostgres}
+
+
+def buscar_clientes(queryset, termino):
+    """Filtra el queryset de clientes por el término y lo ordena por relevancia."""
+    backend = BACKENDS.get(connections[queryset.db].vendor, BusquedaClientes)
+    return backend().filtrar(queryset, termino)
@@ -0,0 +1,151 @@
+# gestion_inmobiliaria/cache_respuestas.py
+"""
+Cache de respuestas para las vistas de solo lectura más consultadas (dashboard y resumen de comisiones).
+
+La clave de cada respuesta combina la vista, los query params normalizados y el contador de
+generación de cada ámbito del que depende (un mes 'mes:2025-03', 'lotes', 'asesores' o 'global').
+Invalidar un ámbito es incrementar su contador al confirmar la transacción: las claves viejas
+dejan de usarse y vencen solas. 'global' se incrementa con cualquier cambio y lo usan las
+consultas sin rango de fechas acotado.
+"""
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+ALIAS_CACHE = getattr(settings, 'RESPUESTAS_CACHE_ALIAS', 'respuestas')
+TTL_RESPUESTAS_SEGUNDOS = 60 * 60
+MAX_MESES_POR_CLAVE = 36  # Rangos más largos dependen de 'global'
+
+AMBITO_GLOBAL = 'global'
+AMBITO_LOTES = 'lotes'
+AMBITO_ASESORES = 'asesores'
+AMBITO_CLIENTES = 'clientes'
+
+
+def _cache():
+    return caches[ALIAS_CACHE]
+
+
+def ambito_mes(fecha):
+    return f'mes:{fecha:%Y-%m}'
+
+
+def ambitos_rango(fecha_desde, fecha_hasta):
+    """Meses cubiertos por el rango, o ['global'] si el rango es abierto o demasiado largo."""
+    if not fecha_desde or not fecha_hasta or fecha_desde > fecha_hasta:
+        return [AMBITO_GLOBAL]
+    meses = (fecha_hasta.year - fecha_desde.year) * 12 + fecha_hasta.month - fecha_desde.month + 1
+    if meses > MAX_MESES_POR_CLAVE:
+        return [AMBITO_GLOBAL]
+    return [ambito_mes(date(fecha_desde.year + (fecha_desde.month - 1 + i) // 12, (fecha_desde.month - 1 + i) % 12 + 1, 1)) for i in range(meses)]
+
+
+def _clave_generacion(ambito):
+    return f'gen:{ambito}'
+
+
+def generaciones(ambitos):
+    """Contador actual de cada ámbito. Uno inexistente (o desalojado) arranca en un valor nuevo, nunca en 0."""
+    cache = _cache()
+    claves = [_clave_generacion(a) for a in ambitos]
+    valores = cache.get_many(claves)
+    for clave in claves:
+        if clave not in valores:
+            cache.add(clave, time.time_ns())
+            valores[clave] = cache.get(clave)
+    return [valores[clave] for clave in claves]
+
+
+def _incrementar(ambitos):
+    cache = _cache()
+    for ambito in ambitos:
+        try:
+            cache.incr(_clave_generacion(ambito))
+        except ValueError:
+            cache.add(_clave_generacion(ambito), time.time_ns())
+
+
+def invalidar_respuestas(*ambitos):
+    """Invalida los ámbitos (y 'global') al confirmar la transacción en curso."""
+    ambitos = set(ambitos) | {AMBITO_GLOBAL}
+    transaction.on_commit(lambda: _incrementar(ambitos))
+
+
+def invalidar_meses(fechas):
+    invalidar_respuestas(*{ambito_mes(f) for f in fechas if f})
+
+
+def invalidar_todo():
+    transaction.on_commit(lambda: _cache().clear())
+
+
+def clave_respuesta(vista, params, ambitos):
+    normalizados = sorted((k, v) for k in params for v in params.getlist(k) if v not in ('', None))
+    contenido = repr((vista, normalizados, list(zip(ambitos, generaciones(ambitos)))))
+    return f'respuesta:{vista}:{hashlib.sha1(contenido.encode()).hexdigest()}'
+
+
+def valor_cacheado(nombre, ambitos, calcular):
+    """Valor derivado (p. ej. un total para un desplegable) guardado con la generación de sus ámbitos."""
+    clave = f'valor:{nombre}:' + ':'.join(str(g) for g in generaciones(ambitos))
+    valor = _cache().get(clave)
+    if valor is None:
+        valor = calcular()
+        _cache().set(clave, valor, TTL_RESPUESTAS_SEGUNDOS)
+    return valor
+
+
+# --- Contadores de aciertos ---
+def _registrar(vista, resultado):
+    clave = f'stats:{vista}:{resultado}'
+    try:
+        _cache().incr(clave)
+    except ValueError:
+        _cache().add(clave, 1)
+
+
+def estadisticas(vistas):
+    cache = _cache()
+    resultado = {}
+    for vista in vistas:
+        hits = cache.get(f'stats:{vista}:hits', 0)
+        misses = cache.get(f'stats:{vista}:misses', 0)
+        total = hits + misses
+        resultado[vista] = {'hits': hits, 'misses': misses, 'hit_ratio': round(hits / total, 4) if total else None}
+    return resultado
+
+
+VISTAS_CACHEADAS = []
+
+
+def cachear_respuesta(vista, ambitos_de):
+    """
+    Decorador para el get() de un APIView. ambitos_de(request) devuelve los ámbitos de los que depende
+    la respuesta. Solo se guardan respuestas 200; la cabecera X-Cache indica HIT o MISS.
+    """
+    VISTAS_CACHEADAS.append(vista)
+
+    def decorador(get):
+        @wraps(get)
+        def envoltura(self, request, *args, **kwargs):
+            clave = clave_respuesta(vista, request.query_params, ambitos_de(request))
+            datos = _cache().get(clave)
+            if datos is not None:
+                _registrar(vista, 'hits')
+                response = Response(datos)
+                response['X-Cache'] = 'HIT'
+                return response
+            _registrar(vista, 'misses')
+            response = get(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                _cache().set(clave, response.data, TTL_RESPUESTAS_SEGUNDOS)
+            response['X-Cache'] = 'MISS'
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,209 @@
+# gestion_inmobiliaria/cobranza.py
+"""
+Lista de trabajo de cobranzas: cuotas pendientes agrupadas por venta.
+
+Cada cuota sale de una sola consulta anotada (cliente y lote por select_related, última gestión
+por Subquery, cantidad de gestiones y días vencidos calculados en la BD). Las ventas se paginan
+por keyset sobre (vencimiento más antiguo, id_venta): el cursor es la última venta de la página,
+así que pedir la página siguiente no recorre las anteriores.
+
+El reporte de antigüedad de cartera agrupa el saldo vencido en tramos de días con una sola
+consulta agregada, separando lo programado en dólares de lo programado en soles.
+"""
+import base64
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Case, Count, DecimalField, DurationField, ExpressionWrapper, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import CuotaPlanPago, GestionCobranza, Proyecto
+
+ESTADOS_COBRANZA = ['pendiente', 'atrasada', 'vencida_no_pagada']
+TAMANO_PAGINA = 20
+TAMANO_PAGINA_MAXIMO = 100
+
+# Estados con saldo: las vencidas se reconocen por fecha, así que una cuota que el barrido nocturno
+# todavía no pasó a vencida igual entra en su tramo
+ESTADOS_CON_SALDO = ['pendiente', 'parcialmente_pagada', 'atrasada', 'vencida_no_pagada']
+TRAMOS_ANTIGUEDAD = [('0-30', 0, 30), ('31-60', 31, 60), ('61-90', 61, 90), ('90+', 91, None)]
+DIMENSIONES_ANTIGUEDAD = {
+    'proyecto': ('proyecto_ref', F('plan_pago_venta__venta__lote__proyecto__nombre')),
+    'asesor': ('asesor_ref', F('plan_pago_venta__venta__vendedor_principal__nombre_asesor')),
+    'mes': ('mes_venta_ref', TruncMonth('plan_pago_venta__venta__fecha_venta')),
+}
+
+DECIMAL = DecimalField(max_digits=14, decimal_places=2)
+CERO = Value(Decimal('0.00'), output_field=DECIMAL)
+EN_DOLARES = Q(plan_pago_venta__venta__lote__proyecto__moneda=Proyecto.MONEDA_DOLARES)
+# monto_pagado está en la moneda del plan: dólares en proyectos en dólares
+SALDO_DOLARES = Coalesce('monto_programado_dolares', CERO) - F('monto_pagado')
+SALDO_SOLES = F('monto_programado') - F('monto_pagado')
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class DimensionInvalida(ValueError):
+    pass
+
+
+def codificar_cursor(fecha, venta_id):
+    return base64.urlsafe_b64encode(f'{fecha.isoformat()}|{venta_id}'.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    try:
+        fecha, venta_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+        return date.fromisoformat(fecha), venta_id
+    except (ValueError, UnicodeError) as e:
+        raise CursorInvalido(f"Cursor inválido: {cursor}") from e
+
+
+def cuotas_pendientes(params, hoy=None):
+    """Cuotas pendientes de cobranza filtradas por los query params, con todo lo que muestra la lista anotado."""
+    hoy = hoy or timezone.now().date()
+    qs = CuotaPlanPago.objects.filter(estado_cuota__in=ESTADOS_COBRANZA)
+    if params.get('proyecto'):
+        qs = qs.filter(plan_pago_venta__venta__lote__ubicacion_proyecto__icontains=params['proyecto'])
+    if params.get('cliente'):
+        qs = qs.filter(plan_pago_venta__venta__cliente__nombres_completos_razon_social__icontains=params['cliente'])
+    if params.get('fecha_desde'):
+        qs = qs.filter(fecha_vencimiento__gte=params['fecha_desde'])
+    if params.get('fecha_hasta'):
+        qs = qs.filter(fecha_vencimiento__lte=params['fecha_hasta'])
+    if params.get('dias_vencidos_min'):
+        qs = qs.filter(fecha_vencimiento__lte=hoy - timedelta(days=int(params['dias_vencidos_min'])))
+
+    gestiones = GestionCobranza.objects.filter(cuota=OuterRef('pk'))
+    ultima = gestiones.order_by('-fecha_gestion', '-id')
+    return qs.select_related(
+        'plan_pago_venta__venta__cliente', 'plan_pago_venta__venta__lote'
+    ).annotate(
+        venta_ref=F('plan_pago_venta__venta_id'),
+        atraso=ExpressionWrapper(Value(hoy) - F('fecha_vencimiento'), output_field=DurationField()),
+        num_gestiones=Coalesce(Subquery(
+            gestiones.order_by().values('cuota').annotate(n=Count('id')).values('n'), output_field=IntegerField()
+        ), 0),
+        ultima_gestion_fecha=Subquery(ultima.values('fecha_gestion')[:1]),
+        ultima_gestion_tipo=Subquery(ultima.values('tipo_contacto')[:1]),
+        ultima_gestion_resultado=Subquery(ultima.values('resultado')[:1]),
+    )
+
+
+def _fila_cuota(cuota):
+    venta = cuota.plan_pago_venta.venta
+    return {
+        'id_cuota': cuota.id_cuota,
+        'id_venta': venta.id_venta,
+        'cliente': str(venta.cliente),
+        'lote': str(venta.lote),
+        'numero_cuota': cuota.numero_cuota,
+        'fecha_vencimiento': cuota.fecha_vencimiento,
+        'monto_programado': cuota.monto_programado,
+        'monto_pagado': cuota.monto_pagado,
+        'dias_vencidos': max(cuota.atraso.days, 0) if cuota.atraso is not None else 0,
+        'estado_cuota': cuota.estado_cuota,
+        'ultima_gestion': {
+            'fecha_gestion': cuota.ultima_gestion_fecha,
+            'tipo_contacto': cuota.ultima_gestion_tipo,
+            'resultado': cuota.ultima_gestion_resultado,
+        } if cuota.ultima_gestion_fecha else None,
+        'num_gestiones': cuota.num_gestiones,
+    }
+
+
+def pagina_por_venta(cuotas, cursor=None, tamano=TAMANO_PAGINA):
+    """
+    Agrupa las cuotas por venta y devuelve una página de ventas ordenadas por su vencimiento más
+    antiguo: {'total_ventas', 'next_cursor', 'results': [{venta, totales, cuotas}, ...]}.
+    monto_pendiente va en la moneda del plan de la venta (moneda: PEN o USD).
+    """
+    ventas = cuotas.order_by().annotate(
+        moneda=Case(When(EN_DOLARES, then=Value(Proyecto.MONEDA_DOLARES)), default=Value(Proyecto.MONEDA_SOLES)),
+    ).values('venta_ref', 'moneda').annotate(
+        primer_vencimiento=Min('fecha_vencimiento'),
+        cuotas_pendientes=Count('id_cuota'),
+        monto_pendiente=Sum(Case(When(EN_DOLARES, then=SALDO_DOLARES), default=SALDO_SOLES, output_field=DECIMAL)),
+    )
+    total_ventas = ventas.count()
+    if cursor:
+        fecha, venta_id = decodificar_cursor(cursor)
+        ventas = ventas.filter(Q(primer_vencimiento__gt=fecha) | Q(primer_vencimiento=fecha, venta_ref__gt=venta_id))
+    pagina = list(ventas.order_by('primer_vencimiento', 'venta_ref')[:tamano + 1])
+    hay_mas = len(pagina) > tamano
+    pagina = pagina[:tamano]
+
+    por_venta = {}
+    for cuota in cuotas.filter(plan_pago_venta__venta_id__in=[v['venta_ref'] for v in pagina]).order_by('fecha_vencimiento', 'numero_cuota'):
+        por_venta.setdefault(cuota.venta_ref, []).append(_fila_cuota(cuota))
+
+    resultados = []
+    for v in pagina:
+        filas = por_venta.get(v['venta_ref'], [])
+        resultados.append({
+            'id_venta': v['venta_ref'],
+            'cliente': filas[0]['cliente'] if filas else None,
+            'lote': filas[0]['lote'] if filas else None,
+            'cuotas_pendientes': v['cuotas_pendientes'],
+            'moneda': v['moneda'],
+            'monto_pendiente': v['monto_pendiente'],
+            'primer_vencimiento': v['primer_vencimiento'],
+            'max_dias_vencidos': max((f['dias_vencidos'] for f in filas), default=0),
+            'cuotas': filas,
+        })
+    ultima = pagina[-1] if pagina else None
+    return {
+        'total_ventas': total_ventas,
+        'next_cursor': codificar_cursor(ultima['primer_vencimiento'], ultima['venta_ref']) if hay_mas else None,
+        'results': resultados,
+    }
+
+
+def reporte_antiguedad(hoy=None, agrupar_por=None, proyecto_id=None, asesor_id=None):
+    """
+    Saldo vencido por tramo de días (0-30, 31-60, 61-90, 90+), en soles y en dólares, agrupado por
+    las dimensiones pedidas (proyecto, asesor, mes de la venta; todas si no se pide ninguna). Una
+    sola consulta agregada. Lanza DimensionInvalida si alguna dimensión no existe.
+    Devuelve {'fecha_corte', 'agrupado_por', 'filas': [...], 'totales': {...}}.
+    """
+    hoy = hoy or timezone.now().date()
+    agrupar_por = [d.strip() for d in (agrupar_por or []) if d.strip()]
+    desconocidas = [d for d in agrupar_por if d not in DIMENSIONES_ANTIGUEDAD]
+    if desconocidas:
+        raise DimensionInvalida(f"Dimensiones desconocidas: {', '.join(desconocidas)}. Use: {', '.join(DIMENSIONES_ANTIGUEDAD)}")
+    agrupar_por = list(dict.fromkeys(agrupar_por)) or list(DIMENSIONES_ANTIGUEDAD)
+    cuotas = CuotaPlanPago.objects.filter(estado_cuota__in=ESTADOS_CON_SALDO, fecha_vencimiento__lt=hoy)
+    if proyecto_id:
+        cuotas = cuotas.filter(plan_pago_venta__venta__lote__proyecto_id=proyecto_id)
+    if asesor_id:
+        cuotas = cuotas.filter(plan_pago_venta__venta__vendedor_principal_id=asesor_id)
+
+    saldo = {
+        'soles': Case(When(EN_DOLARES, then=CERO), default=SALDO_SOLES, output_field=DECIMAL),
+        'dolares': Case(When(EN_DOLARES, then=SALDO_DOLARES), default=CERO, output_field=DECIMAL),
+    }
+    agregados = {}
+    for tramo, desde, hasta in TRAMOS_ANTIGUEDAD:
+        en_tramo = Q(fecha_vencimiento__lte=hoy - timedelta(days=desde))
+        if hasta is not None:
+            en_tramo &= Q(fecha_vencimiento__gte=hoy - timedelta(days=hasta))
+        agregados[f'cuotas__{tramo}'] = Count('id_cuota', filter=en_tramo)
+        for moneda, expresion in saldo.items():
+            agregados[f'{moneda}__{tramo}'] = Coalesce(Sum(Case(When(en_tramo, then=expresion), default=CERO, output_field=DECIMAL)), CERO)
+
+    columnas = dict(DIMENSIONES_ANTIGUEDAD[d] for d in agrupar_por)
+    filas_bd = cuotas.annotate(**columnas).values(*columnas).annotate(**agregados).order_by(*columnas)
+
+    totales = {'cuotas': {t: 0 for t, _, _ in TRAMOS_ANTIGUEDAD}, 'soles': {t: Decimal('0.00') for t, _, _ in TRAMOS_ANTIGUEDAD}, 'dolares': {t: Decimal('0.00') for t, _, _ in TRAMOS_ANTIGUEDAD}}
+    filas = []
+    for f in filas_bd:
+        fila = {d: f[DIMENSIONES_ANTIGUEDAD[d][0]] for d in agrupar_por}
+        for medida in ('cuotas', 'soles', 'dolares'):
+            fila[medida] = {t: f[f'{medida}__{t}'] for t, _, _ in TRAMOS_ANTIGUEDAD}
+            for t in fila[medida]:
+                totales[medida][t] += fila[medida][t]
+        filas.append(fila)
+    return {'fecha_corte': hoy, 'agrupado_por': agrupar_por, 'filas': filas, 'totales': totales}
@@ -0,0 +1,94 @@
+# gestion_inmobiliaria/duplicados_lotes.py
+"""
+Detección y depuración de lotes duplicados.
+
+Dos lotes identificados (con manzana y número) son duplicados si coinciden en la clave normalizada
+de models.CLAVE_LOTE: proyecto, manzana y número en minúsculas y sin espacios en los extremos, más
+la etapa. Una sola consulta trae los lotes de los grupos repetidos (ventana COUNT por clave) con su
+cantidad de ventas. De cada grupo se conserva el lote con más ventas (a igualdad, el más antiguo);
+los demás sin ventas se borran con un DELETE en bloque y sus presencias pasan al lote conservado.
+Los que tienen ventas se informan para resolverlos a mano. La restricción lote_ubicacion_unica
+impide que se vuelvan a crear; si al migrar quedaban duplicados vendidos, la migración 0008 no la
+crea y lo hace crear_restriccion_unica (check_integrity --depurar-lotes-duplicados) cuando ya no
+queda ninguno.
+"""
+from django.apps import apps as apps_globales
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce
+
+from .models import CLAVE_LOTE, LOTE_IDENTIFICADO, Lote
+
+MAX_DETALLES = 50
+
+
+def _modelos(apps):
+    apps = apps or apps_globales
+    return [apps.get_model('gestion_inmobiliaria', nombre) for nombre in ('Lote', 'Venta', 'Presencia')]
+
+
+def lotes_en_grupos_duplicados(apps=None):
+    """Lotes de los grupos con clave repetida, ordenados por grupo y con el lote a conservar primero."""
+    Lote, Venta, _ = _modelos(apps)
+    ventas = Venta.objects.filter(lote=OuterRef('pk')).order_by().values('lote').annotate(n=Count('pk')).values('n')
+    return Lote.objects.filter(LOTE_IDENTIFICADO).annotate(
+        **CLAVE_LOTE,
+        num_ventas=Coalesce(Subquery(ventas, output_field=IntegerField()), 0),
+        tamano_grupo=Window(Count('pk'), partition_by=list(CLAVE_LOTE.values())),
+    ).filter(tamano_grupo__gt=1).order_by(*CLAVE_LOTE, '-num_ventas', 'fecha_creacion', 'pk')
+
+
+def depurar_lotes_duplicados(aplicar=False, apps=None):
+    """
+    Calcula (y con aplicar=True ejecuta) la depuración de duplicados. Devuelve
+    {'aplicado', 'grupos', 'total_duplicados_detectados', 'total_eliminados', 'con_ventas', 'detalles'}.
+    apps permite usarla desde una migración con los modelos históricos.
+    """
+    Lote, _, Presencia = _modelos(apps)
+    conservar_de = {}  # id del duplicado a borrar -> id del lote conservado
+    con_ventas, detalles = [], []
+    grupos = 0
+    clave_actual = conservado = None
+    for lote in lotes_en_grupos_duplicados(apps):
+        clave = tuple(getattr(lote, c) for c in CLAVE_LOTE)
+        if clave != clave_actual:
+            clave_actual, conservado = clave, lote
+            grupos += 1
+            continue
+        if lote.num_ventas:
+            con_ventas.append(lote.pk)
+            detalles.append(f"No se eliminó {lote.pk} porque tiene ventas asociadas (duplicado de {conservado.pk}).")
+            continue
+        conservar_de[lote.pk] = conservado.pk
+        detalles.append(f"Eliminado: {lote.pk} ({lote.ubicacion_proyecto} Mz:{lote.manzana} Lt:{lote.numero_lote} Etapa:{lote.etapa}), se conserva {conservado.pk}")
+
+    eliminados = 0
+    if aplicar and conservar_de:
+        with transaction.atomic():
+            Presencia.objects.filter(lote_interes_inicial__in=list(conservar_de)).update(lote_interes_inicial=Case(
+                *[When(lote_interes_inicial=duplicado, then=Value(conservado_id)) for duplicado, conservado_id in conservar_de.items()]
+            ))
+            # Las ventas se vuelven a excluir por si alguna se registró entre la lectura y el borrado
+            _, por_modelo = Lote.objects.filter(pk__in=list(conservar_de), ventas_lote__isnull=True).delete()
+            eliminados = por_modelo.get(Lote._meta.label, 0)
+    return {
+        'aplicado': aplicar,
+        'grupos': grupos,
+        'total_duplicados_detectados': len(conservar_de) + len(con_ventas),
+        'total_eliminados': eliminados if aplicar else len(conservar_de),
+        'con_ventas': con_ventas,
+        'detalles': detalles[:MAX_DETALLES],
+    }
+
+
+def crear_restriccion_unica():
+    """Crea lote_ubicacion_unica si falta y ya no hay duplicados. Devuelve True si la restricción queda creada."""
+    restriccion = next(c for c in Lote._meta.constraints if c.name == 'lote_ubicacion_unica')
+    with connection.cursor() as cursor:
+        if restriccion.name in connection.introspection.get_constraints(cursor, Lote._meta.db_table):
+            return True
+    if lotes_en_grupos_duplicados().exists():
+        return False
+    with connection.schema_editor() as editor:
+        editor.add_constraint(Lote, restriccion)
+    return True
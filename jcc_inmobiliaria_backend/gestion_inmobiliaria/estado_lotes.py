@@ -0,0 +1,65 @@
+# gestion_inmobiliaria/estado_lotes.py
+"""
+Estado de los lotes derivado de sus ventas.
+
+Vendido: alguna venta firmada en estado procesable o completada. Reservado: alguna venta
+procesable sin firmar. Disponible: ninguna de las anteriores.
+
+actualizar_estado_lote resuelve un lote con un solo agregado condicional sobre sus ventas; lo
+usan las señales de Venta, que además lo saltan si la venta no cambió ninguno de CAMPOS_VENTA.
+recalcular_estado_lotes aplica la misma regla a un conjunto de lotes con un solo UPDATE, para
+importaciones y reparaciones donde no corren las señales.
+"""
+from django.db import transaction
+from django.db.models import Case, CharField, Count, Exists, F, OuterRef, Q, Value, When
+
+from .models import Lote, Venta
+
+VENDIDO, RESERVADO, DISPONIBLE = 'Vendido', 'Reservado', 'Disponible'
+
+# Campos de Venta de los que depende el estado de su lote
+CAMPOS_VENTA = ['status_venta', 'cliente_firmo_contrato', 'lote']
+
+FILTRO_VENDIDA = Q(cliente_firmo_contrato=True, status_venta__in=[Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_COMPLETADA])
+FILTRO_RESERVADA = Q(status_venta=Venta.STATUS_VENTA_PROCESABLE)
+
+
+def resolver_estado(vendidas, reservadas):
+    return VENDIDO if vendidas else RESERVADO if reservadas else DISPONIBLE
+
+
+def estado_segun_ventas(lote_id):
+    conteos = Venta.objects.filter(lote_id=lote_id).aggregate(
+        vendidas=Count('pk', filter=FILTRO_VENDIDA), reservadas=Count('pk', filter=FILTRO_RESERVADA),
+    )
+    return resolver_estado(**conteos)
+
+
+def actualizar_estado_lote(lote_id):
+    """Bloquea el lote y guarda su estado si cambió (con las señales de Lote). Devuelve True si cambió."""
+    with transaction.atomic():
+        lote = Lote.objects.select_for_update().filter(pk=lote_id).first()
+        if lote is None:
+            return False
+        estado = estado_segun_ventas(lote_id)
+        if lote.estado_lote == estado:
+            return False
+        print(f"[Estado Lote] Lote {lote.id_lote}: '{lote.estado_lote}' -> '{estado}'")
+        lote.estado_lote = estado
+        lote.save(update_fields=['estado_lote'])
+        return True
+
+
+def estado_calculado():
+    ventas = Venta.objects.filter(lote=OuterRef('pk'))
+    return Case(
+        When(Exists(ventas.filter(FILTRO_VENDIDA)), then=Value(VENDIDO)),
+        When(Exists(ventas.filter(FILTRO_RESERVADA)), then=Value(RESERVADO)),
+        default=Value(DISPONIBLE), output_field=CharField(),
+    )
+
+
+def recalcular_estado_lotes(lote_ids=None):
+    """Corrige el estado de los lotes indicados (None: todos). Devuelve cuántos cambiaron."""
+    lotes = Lote.objects.all() if lote_ids is None else Lote.objects.filter(pk__in=list(lote_ids))
+    return lotes.annotate(estado_nuevo=estado_calculado()).exclude(estado_lote=F('estado_nuevo')).update(estado_lote=estado_calculado())
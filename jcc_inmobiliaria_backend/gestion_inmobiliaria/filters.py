@@ -2,6 +2,7 @@
 import django_filters
 from django.db.models import Q 
 from .models import Lote, Cliente, Asesor, Venta, ActividadDiaria, Presencia # <--- Asegúrate de importar Presencia
+from .busqueda import buscar_clientes
 
 class LoteFilter(django_filters.FilterSet):
     # Filtro general 'q' se mantiene, pero se puede complementar con filtros específicos
@@ -66,7 +67,7 @@ class LoteFilter(django_filters.FilterSet):
         return queryset
 
 class ClienteFilter(django_filters.FilterSet):
-    q = django_filters.CharFilter(method='general_search_filter', label="Búsqueda (Nombre/Razón Social, N° Documento)")
+    q = django_filters.CharFilter(method='general_search_filter', label="Búsqueda (Nombre/Razón Social, N° Documento, Teléfono)")
     tipo_documento = django_filters.ChoiceFilter(choices=Cliente.TIPO_DOCUMENTO_CHOICES, label="Tipo de Documento")
 
     class Meta:
@@ -75,10 +76,7 @@ class ClienteFilter(django_filters.FilterSet):
 
     def general_search_filter(self, queryset, name, value):
         if value:
-            return queryset.filter(
-                Q(nombres_completos_razon_social__icontains=value) | 
-                Q(numero_documento__icontains=value)
-            )
+            return buscar_clientes(queryset, value)
         return queryset
 
 class AsesorFilter(django_filters.FilterSet):
@@ -0,0 +1,317 @@
+# gestion_inmobiliaria/importacion.py
+"""
+Importación masiva de lotes, clientes y asesores desde CSV (comando import_csv).
+
+El archivo se lee fila a fila. Antes de empezar se cargan los registros existentes en diccionarios
+por clave natural, así que encontrar el registro de una fila no consulta la BD. Las altas y los
+cambios se acumulan y se escriben con bulk_create/bulk_update cada `tamano_lote` filas, con los IDs
+correlativos reservados en bloque (reservar_bloque_ids), todo dentro de una sola transacción.
+Las filas con errores no detienen la importación: se informan con su número de fila y columna.
+
+bulk_create/bulk_update no disparan señales, así que al final se invalidan a mano la cache de
+respuestas y el índice de autocompletado de la entidad.
+"""
+import csv
+from abc import ABC, abstractmethod
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import models, transaction
+from django.utils.dateparse import parse_date
+
+from .cache_respuestas import invalidar_respuestas, AMBITO_LOTES, AMBITO_CLIENTES, AMBITO_ASESORES
+from .models import Lote, Cliente, Asesor, Proyecto, reservar_bloque_ids
+
+TAMANO_LOTE = 500
+ENCODING_POR_DEFECTO = 'utf-8-sig'
+DELIMITADOR_POR_DEFECTO = ';'
+
+
+class ErrorFila(Exception):
+    def __init__(self, columna, mensaje, valor=None):
+        super().__init__(mensaje)
+        self.columna, self.mensaje, self.valor = columna, mensaje, valor
+
+
+def texto(fila, columna):
+    return (fila.get(columna) or '').strip()
+
+
+def decimal_csv(fila, columna):
+    """Montos con formato local ('17.000,50', 'S/ 96,37'); vacío es 0.00."""
+    valor = texto(fila, columna)
+    if not valor:
+        return Decimal('0.00')
+    limpio = valor.replace('S/', '').replace('s/', '').replace(' ', '').replace('.', '').replace(',', '.')
+    try:
+        return Decimal(limpio)
+    except InvalidOperation:
+        raise ErrorFila(columna, 'Monto inválido', valor)
+
+
+def fecha_csv(fila, columna):
+    """Fechas dd/mm/aaaa o ISO; vacío es None."""
+    valor = texto(fila, columna)
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%d/%m/%Y').date()
+    except ValueError:
+        fecha = parse_date(valor) if len(valor) == 10 else None
+        if fecha is None:
+            raise ErrorFila(columna, 'Fecha inválida', valor)
+        return fecha
+
+
+def entero_csv(fila, columna, default=None):
+    valor = texto(fila, columna)
+    if not valor:
+        return default
+    if not valor.isdigit():
+        raise ErrorFila(columna, 'Número entero inválido', valor)
+    return int(valor)
+
+
+class Importador(ABC):
+    modelo = None
+    prefijo_id = None
+    longitud_id = 4
+    ambito_cache = None
+    entidad_typeahead = None
+    campos_actualizables = []
+    columnas_de_campo = {}  # campo del modelo -> columna del CSV, para los errores de validación
+
+    def __init__(self, tamano_lote=TAMANO_LOTE):
+        self.tamano_lote = tamano_lote
+        self.indice = {}
+        self.por_crear = []
+        self.por_actualizar = {}
+        self.resultado = {'entidad': self.entidad_typeahead, 'leidas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'errores': []}
+
+    # --- Lo que define cada entidad ---
+    @abstractmethod
+    def parsear(self, fila):
+        """Campos del modelo a partir de la fila; lanza ErrorFila si algún valor no sirve."""
+
+    @abstractmethod
+    def claves(self, datos):
+        """
+        Claves naturales del registro, la principal primero. Una fila se busca solo por su clave principal
+        (el documento si lo trae, si no el nombre), así dos homónimos con distinto documento no se mezclan.
+        """
+
+    def existentes(self):
+        return self.modelo.objects.all()
+
+    def datos_de(self, instancia):
+        return {campo: getattr(instancia, campo) for campo in self.campos_actualizables}
+
+    # --- Flujo común ---
+    def _validar(self, datos):
+        for nombre, valor in datos.items():
+            campo = self.modelo._meta.get_field(nombre)
+            columna = self.columnas_de_campo.get(nombre, nombre)
+            if isinstance(campo, models.CharField) and valor and len(valor) > campo.max_length:
+                raise ErrorFila(columna, f'Supera los {campo.max_length} caracteres', valor)
+            if campo.choices and valor not in (None, '') and valor not in dict(campo.flatchoices):
+                raise ErrorFila(columna, 'Valor no permitido', valor)
+            if valor is None and not campo.null and not campo.has_default():
+                raise ErrorFila(columna, 'Valor requerido')
+
+    def _registrar(self, datos, instancia):
+        for clave in self.claves(datos):
+            self.indice.setdefault(clave, instancia)
+
+    def cargar_existentes(self):
+        for instancia in self.existentes():
+            self._registrar(self.datos_de(instancia), instancia)
+
+    def procesar(self, numero_fila, fila):
+        self.resultado['leidas'] += 1
+        try:
+            datos = self.parsear(fila)
+            self._validar(datos)
+        except ErrorFila as e:
+            self.resultado['errores'].append({'fila': numero_fila, 'columna': e.columna, 'valor': e.valor, 'mensaje': e.mensaje})
+            return
+        instancia = self.indice.get(self.claves(datos)[0])
+        if instancia is None:
+            instancia = self.modelo(**datos)
+            self.por_crear.append(instancia)
+        else:
+            cambios = {c: v for c, v in datos.items() if c in self.campos_actualizables and getattr(instancia, c) != v}
+            for campo, valor in cambios.items():
+                setattr(instancia, campo, valor)
+            if instancia.pk and cambios:
+                self.por_actualizar[instancia.pk] = instancia
+            elif instancia.pk:
+                self.resultado['sin_cambios'] += 1
+        self._registrar(datos, instancia)
+        if len(self.por_crear) + len(self.por_actualizar) >= self.tamano_lote:
+            self.escribir()
+
+    def escribir(self):
+        if self.por_crear:
+            for instancia, pk in zip(self.por_crear, reservar_bloque_ids(self.modelo, self.prefijo_id, len(self.por_crear), self.longitud_id)):
+                instancia.pk = pk
+            self.modelo.objects.bulk_create(self.por_crear, batch_size=self.tamano_lote)
+            self.resultado['creados'] += len(self.por_crear)
+        if self.por_actualizar:
+            self.modelo.objects.bulk_update(list(self.por_actualizar.values()), self.campos_actualizables, batch_size=self.tamano_lote)
+            self.resultado['actualizados'] += len(self.por_actualizar)
+        self.por_crear, self.por_actualizar = [], {}
+
+    def importar(self, filas, dry_run=False):
+        """filas: iterable de dicts (csv.DictReader). Devuelve el resultado con los errores por fila."""
+        with transaction.atomic():
+            self.cargar_existentes()
+            for numero_fila, fila in enumerate(filas, start=2):  # La fila 1 es la cabecera
+                self.procesar(numero_fila, fila)
+            self.escribir()
+            if dry_run:
+                transaction.set_rollback(True)
+            else:
+                invalidar_respuestas(self.ambito_cache)
+                transaction.on_commit(self._invalidar_typeahead)
+        self.resultado['dry_run'] = dry_run
+        return self.resultado
+
+    def _invalidar_typeahead(self):
+        from .typeahead import INDICES
+        INDICES[self.entidad_typeahead].invalidar()
+
+
+class ImportadorLotes(Importador):
+    modelo, prefijo_id, ambito_cache, entidad_typeahead = Lote, 'L', AMBITO_LOTES, 'lotes'
+    # El estado no se toca al actualizar: un lote vendido sigue vendido aunque se reimporte el tarifario
+    campos_actualizables = [
+        'area_m2', 'precio_lista_soles', 'precio_lista_dolares', 'precio_credito_12_meses_soles', 'precio_credito_24_meses_soles',
+        'precio_credito_12_meses_dolares', 'precio_credito_24_meses_dolares',
+    ]
+    columnas_de_campo = {'ubicacion_proyecto': 'PROYECTO', 'manzana': 'MANZANA', 'numero_lote': 'LOTE', 'etapa': 'ETAPA'}
+    PRECIOS = [
+        ('precio_lista_soles', 'PRECIO_CONTADO_SOLES', Proyecto.MONEDA_SOLES), ('precio_lista_dolares', 'PRECIO_CONTADO_DOLARES', Proyecto.MONEDA_DOLARES),
+        ('precio_credito_12_meses_soles', '12_MESES_SOLES', Proyecto.MONEDA_SOLES), ('precio_credito_24_meses_soles', '24_MESES_SOLES', Proyecto.MONEDA_SOLES),
+        ('precio_credito_12_meses_dolares', '12_MESES_DOLARES', Proyecto.MONEDA_DOLARES), ('precio_credito_24_meses_dolares', '24_MESES_DOLARES', Proyecto.MONEDA_DOLARES),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.proyectos = {}
+
+    def parsear(self, fila):
+        proyecto = texto(fila, 'PROYECTO')
+        if not proyecto:
+            raise ErrorFila('PROYECTO', 'Valor requerido')
+        etapa = entero_csv(fila, 'ETAPA')
+        if proyecto not in self.proyectos:
+            # bulk_create no pasa por Lote.save, que es quien asigna el proyecto
+            self.proyectos[proyecto] = Proyecto.obtener_o_crear_por_nombre(proyecto)
+        moneda = Proyecto.moneda_de(self.proyectos[proyecto], proyecto)
+        datos = {
+            'ubicacion_proyecto': proyecto, 'proyecto_id': self.proyectos[proyecto],
+            'etapa': etapa,
+            'manzana': texto(fila, 'MANZANA'), 'numero_lote': texto(fila, 'LOTE'),
+            'area_m2': decimal_csv(fila, 'AREA_m2'),
+        }
+        for campo, columna, moneda_precio in self.PRECIOS:
+            # Solo se guardan los precios de la moneda del proyecto
+            datos[campo] = decimal_csv(fila, columna) if moneda_precio == moneda else Decimal('0.00')
+        return datos
+
+    def importar(self, filas, dry_run=False):
+        resultado = super().importar(filas, dry_run=dry_run)
+        if dry_run:
+            Proyecto.invalidar_cache()  # Los proyectos creados durante la simulación se revirtieron
+        return resultado
+
+    def claves(self, datos):
+        return [(
+            datos['ubicacion_proyecto'].strip().lower(), (datos['manzana'] or '').strip().lower(),
+            (datos['numero_lote'] or '').strip().lower(), datos['etapa'] or 0,
+        )]
+
+    def datos_de(self, instancia):
+        return {campo: getattr(instancia, campo) for campo in ['ubicacion_proyecto', 'manzana', 'numero_lote', 'etapa', *self.campos_actualizables]}
+
+
+class ImportadorClientes(Importador):
+    modelo, prefijo_id, ambito_cache, entidad_typeahead = Cliente, 'CLI', AMBITO_CLIENTES, 'clientes'
+    campos_actualizables = [
+        'tipo_documento', 'numero_documento', 'fecha_nacimiento_constitucion', 'direccion', 'distrito', 'provincia', 'departamento',
+        'telefono_principal', 'telefono_secundario', 'email_principal', 'email_secundario', 'estado_civil', 'profesion_ocupacion',
+    ]
+    COLUMNAS = {
+        'tipo_documento': 'TIPO_DOCUMENTO', 'numero_documento': 'NUMERO_DOCUMENTO', 'direccion': 'DIRECCION', 'distrito': 'DISTRITO',
+        'provincia': 'PROVINCIA', 'departamento': 'DEPARTAMENTO', 'telefono_principal': 'TELEFONO_PRINCIPAL',
+        'telefono_secundario': 'TELEFONO_SECUNDARIO', 'email_principal': 'EMAIL_PRINCIPAL', 'email_secundario': 'EMAIL_SECUNDARIO',
+        'estado_civil': 'ESTADO_CIVIL', 'profesion_ocupacion': 'PROFESION',
+    }
+    columnas_de_campo = {**COLUMNAS, 'nombres_completos_razon_social': 'NOMBRES', 'fecha_nacimiento_constitucion': 'FECHA_NACIMIENTO'}
+
+    def parsear(self, fila):
+        nombre = texto(fila, 'NOMBRES')
+        if not nombre:
+            raise ErrorFila('NOMBRES', 'Valor requerido')
+        datos = {campo: texto(fila, columna) or None for campo, columna in self.COLUMNAS.items()}
+        datos['nombres_completos_razon_social'] = nombre
+        datos['fecha_nacimiento_constitucion'] = fecha_csv(fila, 'FECHA_NACIMIENTO')
+        if not datos['tipo_documento']:
+            documento = datos['numero_documento'] or ''
+            datos['tipo_documento'] = 'DNI' if len(documento) == 8 and documento.isdigit() else 'RUC' if len(documento) == 11 and documento.isdigit() else 'Otro'
+        return datos
+
+    def claves(self, datos):
+        claves = [('documento', datos['numero_documento'])] if datos['numero_documento'] else []
+        return claves + [('nombre', ' '.join(datos['nombres_completos_razon_social'].upper().split()))]
+
+    def datos_de(self, instancia):
+        return {'numero_documento': instancia.numero_documento, 'nombres_completos_razon_social': instancia.nombres_completos_razon_social}
+
+
+class ImportadorAsesores(Importador):
+    modelo, prefijo_id, ambito_cache, entidad_typeahead = Asesor, 'A', AMBITO_ASESORES, 'asesores'
+    campos_actualizables = [
+        'nombre_asesor', 'fecha_nacimiento', 'estado_civil', 'numero_hijos', 'direccion', 'distrito', 'telefono_personal', 'email_personal',
+        'banco', 'numero_cuenta_bancaria', 'cci_cuenta_bancaria', 'fecha_ingreso', 'fecha_cambio_socio', 'observaciones_asesor',
+    ]
+    COLUMNAS = {
+        'dni': 'DNI', 'estado_civil': 'ESTADO_CIVIL', 'direccion': 'DIRECCION', 'distrito': 'DISTRITO', 'telefono_personal': 'TELEFONO',
+        'email_personal': 'EMAIL', 'banco': 'BANCO', 'numero_cuenta_bancaria': 'CUENTA_BANCARIA', 'cci_cuenta_bancaria': 'CCI',
+        'observaciones_asesor': 'OBSERVACIONES',
+    }
+    columnas_de_campo = {
+        **COLUMNAS, 'nombre_asesor': 'NOMBRE', 'fecha_nacimiento': 'FECHA_NACIMIENTO', 'numero_hijos': 'NUMERO_HIJOS',
+        'fecha_ingreso': 'FECHA_INGRESO', 'fecha_cambio_socio': 'FECHA_CAMBIO_SOCIO',
+    }
+
+    def parsear(self, fila):
+        nombre = texto(fila, 'NOMBRE')
+        if not nombre:
+            raise ErrorFila('NOMBRE', 'Valor requerido')
+        datos = {campo: texto(fila, columna) or None for campo, columna in self.COLUMNAS.items()}
+        datos.update({
+            'nombre_asesor': nombre,
+            'fecha_nacimiento': fecha_csv(fila, 'FECHA_NACIMIENTO'),
+            'numero_hijos': entero_csv(fila, 'NUMERO_HIJOS', default=0),
+            'fecha_ingreso': fecha_csv(fila, 'FECHA_INGRESO'),
+            'fecha_cambio_socio': fecha_csv(fila, 'FECHA_CAMBIO_SOCIO'),
+        })
+        return datos
+
+    def claves(self, datos):
+        claves = [('dni', datos['dni'])] if datos['dni'] else []
+        return claves + [('nombre', ' '.join(datos['nombre_asesor'].upper().split()))]
+
+    def datos_de(self, instancia):
+        return {'dni': instancia.dni, 'nombre_asesor': instancia.nombre_asesor}
+
+
+IMPORTADORES = {'lotes': ImportadorLotes, 'clientes': ImportadorClientes, 'asesores': ImportadorAsesores}
+
+
+def importar_csv(entidad, archivo, tamano_lote=TAMANO_LOTE, delimitador=DELIMITADOR_POR_DEFECTO, dry_run=False):
+    """Importa un archivo abierto en modo texto (o cualquier iterable de líneas) para la entidad dada."""
+    lector = csv.DictReader(archivo, delimiter=delimitador)
+    lector.fieldnames = [c.lstrip('﻿').strip() for c in (lector.fieldnames or [])]
+    return IMPORTADORES[entidad](tamano_lote).importar(lector, dry_run=dry_run)
@@ -0,0 +1,530 @@
+# gestion_inmobiliaria/importacion_historica.py
+"""
+Importación del historial de presencias y ventas (formato de README_IMPORTACION_CSV.md).
+
+En ese archivo una misma atención aparece varias veces: una separación de noviembre vuelve en
+diciembre como procesable y después como completada, con el mismo ID_LEAD. La importación va por
+etapas:
+
+1. Se lee y normaliza todo el archivo. Las filas con valores inválidos se informan y se descartan.
+2. Las filas se agrupan por ID_LEAD (sin lead: documento, celular o nombre + fecha de presencia +
+   proyecto). Cada grupo es una presencia y, si alguna fila tiene status de venta, una venta con
+   el status más avanzado. Cada aumento de COBRANZA entre filas es un pago.
+3. Clientes (por ID_LEAD, DNI, celular o nombre), asesores (por nombre) y lotes se resuelven contra
+   índices en memoria cargados una sola vez. Lo que no existe se crea. El archivo no trae la etapa,
+   así que un lote se busca por proyecto, manzana y número: si existe en una sola etapa se usa ese;
+   si existe en varias se informa un aviso y la fila queda sin lote.
+4. Los grupos se escriben en bloques, cada uno en su propia transacción, con bulk_create y
+   bulk_update. Así no corren las señales de Venta, Presencia ni RegistroPago. Al cerrar cada
+   bloque las ventas a crédito sin plan reciben su PlanPagoVenta y sus cuotas (bulk_create, con el
+   plazo de --plazo-credito), los pagos de las ventas a crédito del bloque se reaplican a sus
+   cuotas venta por venta, y se recalculan con consultas en conjunto los totales pagados de sus
+   ventas (totales_pagos.py) y el estado de sus lotes. Después se guarda un punto de control con los grupos confirmados. Si la importación se
+   corta, la siguiente ejecución sobre el mismo archivo sigue desde ahí.
+5. Al terminar se reconstruyen las métricas del dashboard y los contadores de ActividadDiaria del
+   rango importado.
+
+Reimportar el mismo archivo no duplica nada: las ventas se reconocen por cliente y lote, las
+presencias por cliente, día y proyecto, y los pagos por venta, fecha y monto.
+"""
+import csv
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import transaction
+
+from .actividad import reconstruir_actividad_diaria
+from .busqueda import normalizar
+from .cache_respuestas import invalidar_respuestas, AMBITO_LOTES, AMBITO_CLIENTES, AMBITO_ASESORES
+from .estado_lotes import recalcular_estado_lotes
+from .importacion import ErrorFila, texto, decimal_csv, fecha_csv, ENCODING_POR_DEFECTO, DELIMITADOR_POR_DEFECTO
+from .metricas import inicio_dia, fecha_local, reconstruir_metricas
+from .models import (
+    Asesor, Cliente, CuotaPlanPago, Lote, PlanPagoVenta, Presencia, Proyecto, RegistroPago, Venta, aplicar_pagos_a_cuotas_del_plan,
+    reservar_bloque_ids,
+)
+from .pagos import calcular_plan_inicial
+from .totales_pagos import verificar_totales
+
+GRUPOS_POR_BLOQUE = 200
+PLAZO_CREDITO_POR_DEFECTO = 12  # El CSV no trae el plazo; una venta a crédito sin plazo no pasa Venta.clean()
+
+ESTADOS_VENTA = {
+    'SEPARACION': Venta.STATUS_VENTA_SEPARACION,
+    'PROCESABLE': Venta.STATUS_VENTA_PROCESABLE,
+    'COMPLETADA': Venta.STATUS_VENTA_COMPLETADA,
+}
+ORDEN_ESTADO_VENTA = {Venta.STATUS_VENTA_SEPARACION: 0, Venta.STATUS_VENTA_PROCESABLE: 1, Venta.STATUS_VENTA_COMPLETADA: 2}
+ROLES_CSV = {'OPC': 'asesor_captacion_opc', 'TMK': 'asesor_call_agenda', 'LINER': 'asesor_liner', 'CLOSER': 'asesor_closer'}
+NOTA_PAGO = 'Importación histórica'
+
+
+def clave_nombre(valor):
+    return ' '.join(normalizar(valor or '').split())
+
+
+def solo_digitos(valor):
+    return ''.join(c for c in (valor or '') if c.isdigit())
+
+
+# --- Mapeos de los textos del CSV a las opciones de los modelos ---
+def mapear_medio_captacion(fuente):
+    fuente = clave_nombre(fuente)
+    for palabras, medio in (
+        (('INSTAGRAM',), 'redes_instagram'), (('TIKTOK', 'TIK TOK'), 'redes_tiktok'), (('FACEBOOK', 'REDES'), 'redes_facebook'),
+        (('OPC', 'CAMPO'), 'campo_opc'), (('REFERID',), 'referido'), (('WEB', 'PAGINA'), 'web'),
+    ):
+        if any(p in fuente for p in palabras):
+            return medio
+    return 'otro'
+
+
+def mapear_metodo_pago(medio):
+    medio = clave_nombre(medio)
+    if not medio:
+        return None
+    for palabras, metodo in (
+        (('EFECTIVO',), 'efectivo'), (('TRANSF', 'DEPOSITO'), 'transferencia'), (('YAPE', 'PLIN'), 'yape_plin'),
+        (('DEBITO',), 'tarjeta_debito'), (('TARJETA', 'CREDITO'), 'tarjeta_credito'),
+    ):
+        if any(p in medio for p in palabras):
+            return metodo
+    return 'otro'
+
+
+def mapear_status_presencia(status):
+    for palabra, estado in (('CAIDA', 'caida_proceso'), ('NO ASISTIO', 'no_asistio'), ('REPROGRAM', 'reprogramada'), ('CANCEL', 'cancelada_cliente'), ('AGENDAD', 'agendada')):
+        if palabra in status:
+            return estado
+    return Presencia.STATUS_PRESENCIA_REALIZADA
+
+
+def mapear_resultado(status, status_venta):
+    if status_venta == Venta.STATUS_VENTA_SEPARACION:
+        return 'interesado_separacion'
+    if status_venta:
+        return 'interesado_venta_directa'
+    return 'no_interesado_otro' if 'NO INTERES' in status else None
+
+
+@dataclass
+class FilaHistorica:
+    numero: int
+    id_lead: str
+    fecha_mes: object  # FECHA: mes en que se procesa la venta
+    fecha_presencia: object  # FECHA.1: día de la presencia
+    tipo_tour: str
+    nombre: str
+    dni: str
+    celular: str
+    visita: str
+    distrito: str
+    fuente: str
+    asesores: dict  # columna (OPC, TMK, LINER, CLOSER) -> nombre
+    costo_lote: Decimal
+    numero_lote: str
+    manzana: str
+    cuota: Decimal
+    cobranza: Decimal
+    recaudo: Decimal
+    status: str
+    status_venta: str
+    observacion: str
+    medio_pago: str
+    proyecto: str
+    tipo_venta: str
+
+
+def parsear_fila(numero, fila):
+    nombre = texto(fila, 'INVITADO')
+    if not nombre:
+        raise ErrorFila('INVITADO', 'Valor requerido')
+    proyecto = ' '.join(texto(fila, 'PROYECTO').split())
+    if not proyecto:
+        raise ErrorFila('PROYECTO', 'Valor requerido')
+    fecha_mes = fecha_csv(fila, 'FECHA')
+    fecha_presencia = fecha_csv(fila, 'FECHA.1') or fecha_mes
+    if fecha_presencia is None:
+        raise ErrorFila('FECHA.1', 'Valor requerido')
+    status = clave_nombre(texto(fila, 'STATUS'))
+    return FilaHistorica(
+        numero=numero, id_lead=texto(fila, 'ID_LEAD'), fecha_mes=fecha_mes or fecha_presencia, fecha_presencia=fecha_presencia,
+        tipo_tour='no_tour' if 'NO' in clave_nombre(texto(fila, 'TOUR')).split() else 'tour',
+        nombre=' '.join(nombre.split()), dni=solo_digitos(texto(fila, 'DNI')), celular=solo_digitos(texto(fila, 'CELULAR')),
+        visita=texto(fila, 'VISITA'), distrito=texto(fila, 'DISTRITO'), fuente=texto(fila, 'FUENTE'),
+        asesores={columna: ' '.join(texto(fila, columna).split()) for columna in ROLES_CSV if texto(fila, columna)},
+        costo_lote=decimal_csv(fila, 'COSTO LOTE'), numero_lote=texto(fila, 'LOTE'), manzana=texto(fila, 'MZ'),
+        cuota=decimal_csv(fila, 'CUOTA'), cobranza=decimal_csv(fila, 'COBRANZA'), recaudo=decimal_csv(fila, 'RECAUDO'),
+        status=status, status_venta=ESTADOS_VENTA.get(status), observacion=texto(fila, 'OBSERVACION'),
+        medio_pago=texto(fila, 'MEDIO PAGO'), proyecto=proyecto,
+        tipo_venta=Venta.TIPO_VENTA_CREDITO if clave_nombre(texto(fila, 'CONTADO/CREDITO')).startswith('CRED') else Venta.TIPO_VENTA_CONTADO,
+    )
+
+
+def clave_grupo(fila):
+    if fila.id_lead:
+        return f'lead:{fila.id_lead}'
+    persona = fila.dni or fila.celular or clave_nombre(fila.nombre)
+    return f'persona:{persona}|{fila.fecha_presencia.isoformat()}|{clave_nombre(fila.proyecto)}'
+
+
+def leer_grupos(archivo, delimitador=DELIMITADOR_POR_DEFECTO):
+    """Etapas 1 y 2: (grupos en orden de primera aparición, errores, filas leídas)."""
+    lector = csv.DictReader(archivo, delimiter=delimitador)
+    lector.fieldnames = [c.lstrip('﻿').strip() for c in (lector.fieldnames or [])]
+    grupos, errores, leidas = {}, [], 0
+    for numero, fila in enumerate(lector, start=2):
+        leidas += 1
+        try:
+            parseada = parsear_fila(numero, fila)
+        except ErrorFila as e:
+            errores.append({'fila': numero, 'columna': e.columna, 'valor': e.valor, 'mensaje': e.mensaje})
+            continue
+        grupos.setdefault(clave_grupo(parseada), []).append(parseada)
+    return list(grupos.values()), errores, leidas
+
+
+def pk_de(instancia):
+    return instancia.pk if instancia is not None else None
+
+
+def huella_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+class ImportacionHistorica:
+    CONTADORES = [
+        'clientes_creados', 'asesores_creados', 'lotes_creados', 'ventas_creadas', 'ventas_actualizadas',
+        'presencias_creadas', 'presencias_actualizadas', 'pagos_creados', 'planes_creados',
+    ]
+
+    def __init__(self, grupos_por_bloque=GRUPOS_POR_BLOQUE, plazo_credito=PLAZO_CREDITO_POR_DEFECTO):
+        self.grupos_por_bloque = grupos_por_bloque
+        self.plazo_credito = plazo_credito
+        self.contadores = dict.fromkeys(self.CONTADORES, 0)
+        self.avisos = []
+        self.proyectos = {}
+
+    # --- Índices en memoria ---
+    def cargar_indices(self):
+        self.clientes = {}  # ('lead'|'dni'|'tel'|'nombre', valor) -> Cliente
+        for cliente in Cliente.objects.only('id_cliente', 'id_lead', 'numero_documento', 'telefono_principal', 'nombres_completos_razon_social'):
+            self._indexar_cliente(cliente)
+        self.asesores = {clave_nombre(a.nombre_asesor): a for a in Asesor.objects.only('id_asesor', 'nombre_asesor')}
+        self.lotes = {}  # (proyecto, manzana, número) sin etapa -> {etapa: Lote}
+        for lote in Lote.objects.only('id_lote', 'ubicacion_proyecto', 'proyecto', 'manzana', 'numero_lote', 'etapa'):
+            self.lotes.setdefault(self._clave_lote(lote.ubicacion_proyecto, lote.manzana, lote.numero_lote), {}).setdefault(lote.etapa or 0, lote)
+        self.ventas = {(v.cliente_id, v.lote_id): v for v in Venta.objects.only(*self.CAMPOS_VENTA, 'cliente', 'lote', 'precio_dolares', 'tipo_cambio')}
+        self.presencias, self.presencia_de_venta = {}, {}
+        for p in Presencia.objects.only('id_presencia', 'cliente', 'fecha_hora_presencia', *self.CAMPOS_PRESENCIA):
+            self.presencias.setdefault((p.cliente_id, fecha_local(p.fecha_hora_presencia), clave_nombre(p.proyecto_interes)), p)
+            if p.venta_asociada_id:
+                self.presencia_de_venta[p.venta_asociada_id] = p
+        self.pagos = set(RegistroPago.objects.values_list('venta_id', 'fecha_pago', 'monto_pago'))
+
+    def _indexar_cliente(self, cliente):
+        for clave in (('lead', cliente.id_lead), ('dni', solo_digitos(cliente.numero_documento)),
+                      ('tel', solo_digitos(cliente.telefono_principal)), ('nombre', clave_nombre(cliente.nombres_completos_razon_social))):
+            if clave[1]:
+                self.clientes.setdefault(clave, cliente)
+
+    @staticmethod
+    def _clave_lote(proyecto, manzana, numero):
+        # Misma normalización que models.CLAVE_LOTE, sin la etapa (el archivo no la trae)
+        return ((proyecto or '').strip().lower(), (manzana or '').strip().lower(), (numero or '').strip().lower())
+
+    # --- Resolución de entidades (clientes, asesores, lotes) ---
+    def _cliente(self, filas, nuevos):
+        fila = filas[-1]
+        for clave in (('lead', next((f.id_lead for f in filas if f.id_lead), '')), ('dni', fila.dni), ('tel', fila.celular), ('nombre', clave_nombre(fila.nombre))):
+            if clave[1] and clave in self.clientes:
+                cliente = self.clientes[clave]
+                if clave[0] != 'lead' and fila.id_lead and not cliente.id_lead:
+                    cliente.id_lead = fila.id_lead  # Se vincula con el CRM
+                    if cliente.pk:
+                        self.clientes_con_lead.append(cliente)
+                    self._indexar_cliente(cliente)
+                return cliente
+        tipo = 'DNI' if len(fila.dni) == 8 else 'RUC' if len(fila.dni) == 11 else 'Otro'
+        cliente = Cliente(
+            tipo_documento=tipo, numero_documento=fila.dni or None, nombres_completos_razon_social=fila.nombre[:255],
+            telefono_principal=fila.celular[:20] or None, distrito=fila.distrito[:100] or None, id_lead=fila.id_lead or None,
+        )
+        nuevos.append(cliente)
+        self._indexar_cliente(cliente)
+        return cliente
+
+    def _asesor(self, nombre, fecha, nuevos):
+        clave = clave_nombre(nombre)
+        if clave not in self.asesores:
+            self.asesores[clave] = Asesor(nombre_asesor=nombre[:255], fecha_ingreso=fecha)
+            nuevos.append(self.asesores[clave])
+        return self.asesores[clave]
+
+    def _lote(self, fila, nuevos):
+        if not (fila.manzana and fila.numero_lote):
+            return None
+        clave = self._clave_lote(fila.proyecto, fila.manzana, fila.numero_lote)
+        por_etapa = self.lotes.get(clave)
+        if por_etapa and len(por_etapa) > 1:
+            self.avisos.append({
+                'fila': fila.numero, 'columna': 'LOTE', 'valor': f'{fila.manzana}-{fila.numero_lote}',
+                'mensaje': f"El lote existe en las etapas {', '.join(str(e) for e in sorted(por_etapa))}: no se asigna lote a la fila",
+            })
+            return None
+        if por_etapa:
+            return next(iter(por_etapa.values()))
+        if fila.proyecto not in self.proyectos:
+            self.proyectos[fila.proyecto] = Proyecto.obtener_o_crear_por_nombre(fila.proyecto)
+        lote = Lote(
+            ubicacion_proyecto=fila.proyecto, proyecto_id=self.proyectos[fila.proyecto], manzana=fila.manzana[:50], numero_lote=fila.numero_lote[:50],
+            area_m2=Decimal('0.00'), precio_lista_soles=fila.costo_lote, observaciones_lote=NOTA_PAGO,
+        )
+        self.lotes[clave] = {0: lote}
+        nuevos.append(lote)
+        return lote
+
+    # --- Escritura de un bloque de grupos ---
+    CAMPOS_VENTA = ['fecha_venta', 'valor_lote_venta', 'tipo_venta', 'plazo_meses_credito', 'vendedor_principal', 'status_venta', 'cuota_inicial_requerida']
+    CAMPOS_PRESENCIA = [
+        'proyecto_interes', 'lote_interes_inicial', 'asesor_captacion_opc', 'asesor_call_agenda', 'asesor_liner', 'asesor_closer',
+        'medio_captacion', 'modalidad', 'status_presencia', 'resultado_interaccion', 'tipo_tour', 'venta_asociada', 'lugar_visita',
+    ]
+
+    @staticmethod
+    def _crear(modelo, instancias, prefijo, longitud):
+        for instancia, pk in zip(instancias, reservar_bloque_ids(modelo, prefijo, len(instancias), longitud)):
+            instancia.pk = pk
+        modelo.objects.bulk_create(instancias, batch_size=1000)
+
+    @staticmethod
+    def _asignar(instancia, campos):
+        """Asigna los campos (las relaciones por su *_id, sin cargarlas) y devuelve True si alguno cambió."""
+        cambio = False
+        for campo, valor in campos.items():
+            if getattr(instancia, campo) != valor:
+                setattr(instancia, campo, valor)
+                cambio = True
+        return cambio
+
+    def escribir_bloque(self, grupos):
+        self.clientes_con_lead = []
+        clientes, asesores, lotes = [], [], []
+        resueltos = []
+        for filas in grupos:
+            final = max(filas, key=lambda f: (ORDEN_ESTADO_VENTA.get(f.status_venta, -1), f.fecha_mes, f.numero))
+            roles = {campo: self._asesor(final.asesores[col], filas[0].fecha_presencia, asesores) for col, campo in ROLES_CSV.items() if col in final.asesores}
+            resueltos.append((filas, final, self._cliente(filas, clientes), roles, self._lote(final, lotes)))
+        self._crear(Asesor, asesores, 'A', 4)
+        self._crear(Cliente, clientes, 'CLI', 4)
+        self._crear(Lote, lotes, 'L', 4)
+        if self.clientes_con_lead:
+            Cliente.objects.bulk_update(self.clientes_con_lead, ['id_lead'])
+        self.contadores['asesores_creados'] += len(asesores)
+        self.contadores['clientes_creados'] += len(clientes)
+        self.contadores['lotes_creados'] += len(lotes)
+
+        ventas_nuevas, ventas_cambiadas, con_venta = [], {}, []
+        for filas, final, cliente, roles, lote in resueltos:
+            venta = None
+            if final.status_venta and lote is None and not (final.manzana and final.numero_lote):
+                self.avisos.append({'fila': final.numero, 'columna': 'LOTE', 'valor': f'{final.manzana}-{final.numero_lote}', 'mensaje': 'Venta sin manzana o lote: se importa solo la presencia'})
+            elif final.status_venta and lote is not None:
+                campos = {
+                    'fecha_venta': final.fecha_mes, 'valor_lote_venta': final.costo_lote, 'tipo_venta': final.tipo_venta,
+                    'plazo_meses_credito': self.plazo_credito if final.tipo_venta == Venta.TIPO_VENTA_CREDITO else 0,
+                    'vendedor_principal_id': pk_de(roles.get('asesor_closer')), 'status_venta': final.status_venta, 'cuota_inicial_requerida': final.cuota,
+                }
+                venta = self.ventas.get((cliente.pk, lote.pk))
+                if venta is None:
+                    venta = self.ventas[(cliente.pk, lote.pk)] = Venta(cliente=cliente, lote=lote, notas=final.observacion or None, **campos)
+                    ventas_nuevas.append(venta)
+                elif self._asignar(venta, campos):
+                    ventas_cambiadas[venta.pk] = venta
+            con_venta.append(venta)
+        self._crear(Venta, ventas_nuevas, 'V', 5)
+        Venta.objects.bulk_update(list(ventas_cambiadas.values()), self.CAMPOS_VENTA, batch_size=1000)
+        self.contadores['ventas_creadas'] += len(ventas_nuevas)
+        self.contadores['ventas_actualizadas'] += len(ventas_cambiadas)
+
+        presencias_nuevas, presencias_cambiadas, pagos = [], {}, []
+        for (filas, final, cliente, roles, lote), venta in zip(resueltos, con_venta):
+            inicial = filas[0]
+            clave = (cliente.pk, inicial.fecha_presencia, clave_nombre(final.proyecto))
+            presencia = self.presencias.get(clave)
+            asociada = venta
+            if venta is not None and self.presencia_de_venta.get(venta.pk, presencia) is not presencia:
+                asociada = None  # venta_asociada es uno a uno y la venta ya tiene su presencia
+            campos = {
+                'proyecto_interes': final.proyecto, 'lote_interes_inicial_id': pk_de(lote), 'medio_captacion': mapear_medio_captacion(inicial.fuente),
+                'modalidad': 'virtual' if 'VIRTUAL' in clave_nombre(inicial.visita) else 'presencial',
+                'status_presencia': mapear_status_presencia(final.status), 'resultado_interaccion': mapear_resultado(final.status, final.status_venta),
+                'tipo_tour': inicial.tipo_tour, 'venta_asociada_id': pk_de(asociada), 'lugar_visita': inicial.visita[:255] or None,
+                **{f'{campo}_id': pk_de(roles.get(campo)) for campo in ROLES_CSV.values()},
+            }
+            if presencia is None:
+                presencia = self.presencias[clave] = Presencia(
+                    cliente=cliente, fecha_hora_presencia=inicio_dia(inicial.fecha_presencia),
+                    observaciones='\n'.join(dict.fromkeys(f.observacion for f in filas if f.observacion)) or None, **campos,
+                )
+                presencias_nuevas.append(presencia)
+            elif self._asignar(presencia, campos):
+                presencias_cambiadas[presencia.pk] = presencia
+            if asociada is not None:
+                self.presencia_de_venta[venta.pk] = presencia
+            if venta is not None:
+                pagos.extend(self._pagos(filas, venta))
+        self._crear(Presencia, presencias_nuevas, 'PRS', 5)
+        Presencia.objects.bulk_update(list(presencias_cambiadas.values()), self.CAMPOS_PRESENCIA, batch_size=1000)
+        RegistroPago.objects.bulk_create(pagos, batch_size=1000)
+        self.contadores['presencias_creadas'] += len(presencias_nuevas)
+        self.contadores['presencias_actualizadas'] += len(presencias_cambiadas)
+        self.contadores['pagos_creados'] += len(pagos)
+
+        # Estado derivado del bloque, en conjunto: lo que harían las señales venta por venta
+        self._planes_credito([v for v in con_venta if v is not None], {p.venta_id for p in pagos})
+        verificar_totales(reparar=True, venta_ids={v.pk for v in con_venta if v is not None})
+        recalcular_estado_lotes({v.lote_id for v in con_venta if v is not None})
+
+    def _planes_credito(self, ventas, con_pagos_nuevos):
+        """
+        Crea en bloque el plan y las cuotas de las ventas a crédito que no lo tienen y reaplica los
+        pagos a las cuotas de las que tienen plan nuevo o pagos nuevos (un recálculo por venta).
+        """
+        credito = {v.pk: v for v in ventas if v.tipo_venta == Venta.TIPO_VENTA_CREDITO}
+        if not credito:
+            return
+        planes = {p.venta_id: p for p in PlanPagoVenta.objects.filter(venta_id__in=list(credito))}
+        nuevos, cuotas = [], []
+        for venta in credito.values():
+            if venta.pk in planes:
+                continue
+            monto_a_financiar = venta.valor_lote_venta - venta.cuota_inicial_requerida
+            cronograma = calcular_plan_inicial(monto_a_financiar, venta.plazo_meses_credito, venta.fecha_venta, venta.lote.es_proyecto_dolares)
+            if cronograma is None:
+                continue
+            plan = planes[venta.pk] = PlanPagoVenta(
+                venta=venta, monto_total_credito=monto_a_financiar, numero_cuotas=cronograma.numero_cuotas,
+                monto_cuota_regular_original=cronograma.monto_cuota_regular_original, fecha_inicio_pago_cuotas=cronograma.cuotas[0].fecha_vencimiento,
+            )
+            nuevos.append((plan, cronograma))
+        PlanPagoVenta.objects.bulk_create([plan for plan, _ in nuevos], batch_size=1000)
+        for plan, cronograma in nuevos:
+            cuotas.extend(
+                CuotaPlanPago(
+                    plan_pago_venta=plan, numero_cuota=c.numero_cuota, fecha_vencimiento=c.fecha_vencimiento,
+                    monto_programado=c.monto_programado, monto_programado_dolares=c.monto_programado_dolares,
+                )
+                for c in cronograma.cuotas
+            )
+        CuotaPlanPago.objects.bulk_create(cuotas, batch_size=1000)
+        self.contadores['planes_creados'] += len(nuevos)
+
+        por_aplicar = {plan.venta_id for plan, _ in nuevos} | (con_pagos_nuevos & set(planes))
+        pagos_por_venta = {}
+        for pago in RegistroPago.objects.filter(venta_id__in=list(por_aplicar)).order_by('venta', 'fecha_pago', 'id_pago'):
+            pagos_por_venta.setdefault(pago.venta_id, []).append(pago)
+        for venta_id in por_aplicar:
+            plan = planes[venta_id]
+            plan.venta = credito[venta_id]  # Sin volver a consultar la venta
+            if pagos_por_venta.get(venta_id):
+                aplicar_pagos_a_cuotas_del_plan(plan, plan.venta, pagos=pagos_por_venta[venta_id])
+
+    def _pagos(self, filas, venta):
+        """Un pago por cada aumento de COBRANZA (o por RECAUDO si la fila no trae cobranza acumulada)."""
+        pagos, acumulado = [], Decimal('0.00')
+        for fila in sorted((f for f in filas if f.status_venta), key=lambda f: (f.fecha_mes, f.numero)):
+            if fila.cobranza > 0:
+                monto, acumulado = fila.cobranza - acumulado, max(acumulado, fila.cobranza)
+            else:
+                monto, acumulado = fila.recaudo, acumulado + fila.recaudo
+            if monto > 0 and (venta.pk, fila.fecha_mes, monto) not in self.pagos:
+                self.pagos.add((venta.pk, fila.fecha_mes, monto))
+                pagos.append(RegistroPago(
+                    id_pago=f'PG-{uuid4().hex[:12].upper()}', venta=venta, fecha_pago=fila.fecha_mes, monto_pago=monto,
+                    metodo_pago=mapear_metodo_pago(fila.medio_pago), notas_pago=NOTA_PAGO,
+                ))
+        return pagos
+
+    # --- Ejecución completa ---
+    def ejecutar(self, grupos, desde=0, al_confirmar_bloque=None):
+        """Escribe los grupos a partir del índice `desde`; al_confirmar_bloque(n) recibe los grupos confirmados."""
+        self.cargar_indices()
+        for inicio in range(desde, len(grupos), self.grupos_por_bloque):
+            with transaction.atomic():
+                self.escribir_bloque(grupos[inicio:inicio + self.grupos_por_bloque])
+            if al_confirmar_bloque:
+                al_confirmar_bloque(min(inicio + self.grupos_por_bloque, len(grupos)))
+
+    @staticmethod
+    def rango_fechas(grupos):
+        fechas = [f for filas in grupos for fila in filas for f in (fila.fecha_mes, fila.fecha_presencia)]
+        return (min(fechas), max(fechas)) if fechas else (None, None)
+
+
+def _guardar_checkpoint(ruta, datos):
+    temporal = f'{ruta}.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(temporal, ruta)  # Atómico: un corte nunca deja el punto de control a medias
+
+
+def importar_historico(ruta, checkpoint=None, grupos_por_bloque=GRUPOS_POR_BLOQUE, plazo_credito=PLAZO_CREDITO_POR_DEFECTO,
+                       encoding=ENCODING_POR_DEFECTO, delimitador=DELIMITADOR_POR_DEFECTO, dry_run=False):
+    """
+    Importa el CSV de presencias y ventas de `ruta`. Con checkpoint (ruta de un JSON), cada bloque
+    confirmado queda registrado y una nueva ejecución sobre el mismo archivo retoma desde ahí; el
+    punto de control se borra al terminar. Devuelve los contadores, los errores por fila y los avisos.
+    """
+    with open(ruta, encoding=encoding, newline='') as archivo:
+        grupos, errores, leidas = leer_grupos(archivo, delimitador)
+    importacion = ImportacionHistorica(grupos_por_bloque, plazo_credito)
+    huella = huella_archivo(ruta)
+    desde = 0
+    if checkpoint and not dry_run and os.path.exists(checkpoint):
+        with open(checkpoint, encoding='utf-8') as f:
+            anterior = json.load(f)
+        if anterior['huella'] != huella:
+            raise ValueError(f'El punto de control {checkpoint} corresponde a otro archivo; bórrelo para empezar de nuevo.')
+        desde = anterior['grupos_confirmados']
+        importacion.contadores.update(anterior['contadores'])
+        importacion.avisos = anterior['avisos']
+
+    def registrar(confirmados):
+        if checkpoint:
+            _guardar_checkpoint(checkpoint, {
+                'archivo': os.path.abspath(ruta), 'huella': huella, 'grupos_confirmados': confirmados,
+                'contadores': importacion.contadores, 'avisos': importacion.avisos,
+            })
+
+    fecha_desde, fecha_hasta = importacion.rango_fechas(grupos)
+    if dry_run:
+        with transaction.atomic():
+            importacion.ejecutar(grupos)
+            transaction.set_rollback(True)
+        Proyecto.invalidar_cache()
+    else:
+        # Cada bloque se confirma por separado: el punto de control solo registra bloques ya guardados
+        importacion.ejecutar(grupos, desde, registrar)
+    if not dry_run and fecha_desde:
+        reconstruir_metricas(fecha_desde=fecha_desde, fecha_hasta=fecha_hasta)
+        reconstruir_actividad_diaria(fecha_desde, fecha_hasta)
+        invalidar_respuestas(AMBITO_LOTES, AMBITO_CLIENTES, AMBITO_ASESORES)
+        from .typeahead import INDICES
+        for indice in INDICES.values():
+            indice.invalidar()
+    if checkpoint and not dry_run and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        'leidas': leidas, 'grupos': len(grupos), 'filas_fusionadas': leidas - len(errores) - len(grupos),
+        'grupos_reanudados': desde, **importacion.contadores,
+        'errores': errores, 'avisos': importacion.avisos, 'dry_run': dry_run,
+    }
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from gestion_inmobiliaria.models import CuotaPlanPago
+
+class Command(BaseCommand):
+    help = 'Actualiza el estado de las cuotas según su fecha de vencimiento (pensado para correr cada noche).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de referencia (YYYY-MM-DD); por defecto, hoy.')
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options.get('fecha'):
+            hoy = parse_date(options['fecha'])
+            if hoy is None:
+                raise CommandError(f"Fecha inválida para --fecha: {options['fecha']}")
+        self.stdout.write(self.style.NOTICE(f"Actualizando cuotas vencidas al {hoy or 'día de hoy'}..."))
+        conteos = CuotaPlanPago.barrer_vencimientos(hoy)
+        for transicion, cantidad in conteos.items():
+            self.stdout.write(f'  {transicion}: {cantidad}')
+        self.stdout.write(self.style.SUCCESS(f'Cuotas actualizadas: {sum(conteos.values())}.'))
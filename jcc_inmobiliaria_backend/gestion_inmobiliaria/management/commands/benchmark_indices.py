@@ -0,0 +1,153 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from gestion_inmobiliaria.metricas import filtro_presencias, inicio_dia
+from gestion_inmobiliaria.models import (
+    Asesor, Cliente, Lote, Venta, RegistroPago, PlanPagoVenta, CuotaPlanPago, Presencia, ActividadDiaria
+)
+
+# Índices de las rutas calientes (migraciones 0005 y 0006)
+INDICES = [
+    (Venta, 'venta_fecha_status_idx'),
+    (Venta, 'venta_lote_status_idx'),
+    (RegistroPago, 'pago_venta_fecha_idx'),
+    (RegistroPago, 'pago_fecha_idx'),
+    (CuotaPlanPago, 'cuota_estado_venc_idx'),
+    (Presencia, 'presencia_fecha_tour_idx'),
+    (ActividadDiaria, 'actividad_asesor_fecha_idx'),
+]
+
+FECHA_INICIO = date(2022, 1, 1)
+DIAS_HISTORIA = 3 * 365
+PREFIJO = 'BENCH'
+
+
+class Command(BaseCommand):
+    help = ('Genera un dataset sintético dentro de una transacción, mide las consultas de las rutas calientes '
+            'sin y con los índices (EXPLAIN y tiempos) y revierte todo al terminar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ventas', type=int, default=100000, help='Cantidad de ventas sintéticas (por defecto 100000).')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Ejecuciones por consulta; se informa la mediana.')
+        parser.add_argument('--semilla', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['semilla'])
+        with transaction.atomic():
+            self.stdout.write(self.style.NOTICE(f"Generando dataset sintético de {options['ventas']} ventas..."))
+            muestra = self._generar_datos(rng, options['ventas'])
+            self._analizar()
+            indices = [(modelo, next(i for i in modelo._meta.indexes if i.name == nombre)) for modelo, nombre in INDICES]
+
+            self._ejecutar_ddl(f'DROP INDEX {connection.ops.quote_name(index.name)}' for _, index in indices)
+            self._analizar()
+            antes = self._medir(muestra, options['repeticiones'])
+
+            editor = connection.schema_editor()
+            self._ejecutar_ddl(index.create_sql(modelo, editor) for modelo, index in indices)
+            self._analizar()
+            despues = self._medir(muestra, options['repeticiones'])
+            transaction.set_rollback(True)
+
+        for nombre in antes:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n== {nombre} =='))
+            self.stdout.write(f"Sin índices: {antes[nombre]['ms']:.2f} ms\n{antes[nombre]['plan']}")
+            self.stdout.write(f"Con índices: {despues[nombre]['ms']:.2f} ms\n{despues[nombre]['plan']}")
+        self.stdout.write(self.style.SUCCESS('\nBenchmark terminado; el dataset sintético se revirtió.'))
+
+    def _ejecutar_ddl(self, sentencias):
+        with connection.cursor() as cursor:
+            for sql in sentencias:
+                cursor.execute(str(sql))
+
+    def _analizar(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _consultas(self, m):
+        desde, hasta = m['mes'], m['mes'] + timedelta(days=30)
+        return {
+            'Listado de ventas del mes por status': Venta.objects.filter(fecha_venta__gte=desde, fecha_venta__lte=hasta, status_venta=Venta.STATUS_VENTA_PROCESABLE).order_by('-fecha_venta')[:20],
+            'Estado del lote (señal de Venta)': Venta.objects.filter(lote_id=m['lote'], cliente_firmo_contrato=True, status_venta__in=[Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_COMPLETADA])[:1],
+            'Pagos de una venta': RegistroPago.objects.filter(venta_id=m['venta']).order_by('fecha_pago', 'id_pago'),
+            'Recaudo de un día (métricas)': RegistroPago.objects.filter(fecha_pago=m['dia']).values('venta__status_venta').annotate(monto=Sum('monto_pago')).order_by(),
+            'Cuotas vencidas (cobranza)': CuotaPlanPago.objects.filter(estado_cuota__in=['vencida_no_pagada', 'atrasada'], fecha_vencimiento__lt=m['dia']).values('estado_cuota').annotate(n=Count('id_cuota')).order_by(),
+            'Presencias de un día (métricas)': Presencia.objects.filter(filtro_presencias(fechas=[m['dia']])).values('tipo_tour', 'status_presencia').annotate(n=Count('id_presencia')).order_by(),
+            'Actividad diaria de un asesor': ActividadDiaria.objects.filter(asesor_id=m['asesor'], fecha_actividad=m['dia']),
+        }
+
+    def _medir(self, muestra, repeticiones):
+        resultados = {}
+        for nombre, qs in self._consultas(muestra).items():
+            tiempos = []
+            for _ in range(max(repeticiones, 1)):
+                inicio = time.perf_counter()
+                list(qs.all())
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            resultados[nombre] = {'ms': statistics.median(tiempos), 'plan': qs.explain()}
+        return resultados
+
+    def _generar_datos(self, rng, n_ventas):
+        lote_size = 2000
+        dia = lambda: FECHA_INICIO + timedelta(days=rng.randrange(DIAS_HISTORIA))
+        asesores = Asesor.objects.bulk_create([
+            Asesor(id_asesor=f'{PREFIJO}A{i:04d}', nombre_asesor=f'Asesor Benchmark {i}', fecha_ingreso=FECHA_INICIO) for i in range(50)
+        ])
+        n_lotes = max(n_ventas // 2, 1)
+        Lote.objects.bulk_create([
+            Lote(id_lote=f'{PREFIJO}L{i:07d}', ubicacion_proyecto='Benchmark', area_m2=Decimal('120.00')) for i in range(n_lotes)
+        ], batch_size=lote_size)
+        Cliente.objects.bulk_create([
+            Cliente(id_cliente=f'{PREFIJO}C{i:07d}', tipo_documento='DNI', nombres_completos_razon_social=f'Cliente Benchmark {i}') for i in range(n_lotes)
+        ], batch_size=lote_size)
+
+        estados = [s for s, _ in Venta.STATUS_VENTA_CHOICES]
+        ventas = [
+            Venta(
+                id_venta=f'{PREFIJO}V{i:07d}', fecha_venta=dia(), lote_id=f'{PREFIJO}L{rng.randrange(n_lotes):07d}',
+                cliente_id=f'{PREFIJO}C{rng.randrange(n_lotes):07d}', valor_lote_venta=Decimal('20000.00'),
+                tipo_venta=Venta.TIPO_VENTA_CREDITO if i % 5 < 2 else Venta.TIPO_VENTA_CONTADO,
+                status_venta=rng.choice(estados), cliente_firmo_contrato=rng.random() < 0.5,
+                vendedor_principal_id=rng.choice(asesores).pk,
+            ) for i in range(n_ventas)
+        ]
+        Venta.objects.bulk_create(ventas, batch_size=lote_size)
+        RegistroPago.objects.bulk_create([
+            RegistroPago(id_pago=f'{PREFIJO}P{i:08d}', venta_id=ventas[i // 2].pk, fecha_pago=ventas[i // 2].fecha_venta + timedelta(days=rng.randrange(365)), monto_pago=Decimal('500.00'))
+            for i in range(n_ventas * 2)
+        ], batch_size=lote_size)
+
+        planes = PlanPagoVenta.objects.bulk_create([
+            PlanPagoVenta(venta_id=v.pk, monto_total_credito=Decimal('12000.00'), numero_cuotas=6, monto_cuota_regular_original=Decimal('2000.00'), fecha_inicio_pago_cuotas=v.fecha_venta + timedelta(days=30))
+            for v in ventas if v.tipo_venta == Venta.TIPO_VENTA_CREDITO
+        ], batch_size=lote_size)
+        estados_cuota = ['pendiente', 'pagada', 'parcialmente_pagada', 'atrasada', 'vencida_no_pagada']
+        CuotaPlanPago.objects.bulk_create([
+            CuotaPlanPago(plan_pago_venta=plan, numero_cuota=k, fecha_vencimiento=plan.fecha_inicio_pago_cuotas + timedelta(days=30 * (k - 1)), monto_programado=Decimal('2000.00'), estado_cuota=rng.choice(estados_cuota))
+            for plan in planes for k in range(1, 7)
+        ], batch_size=lote_size)
+
+        estados_presencia = [s for s, _ in Presencia.STATUS_PRESENCIA_CHOICES]
+        Presencia.objects.bulk_create([
+            Presencia(
+                id_presencia=f'{PREFIJO}R{i:07d}', cliente_id=f'{PREFIJO}C{rng.randrange(n_lotes):07d}', proyecto_interes='Benchmark',
+                fecha_hora_presencia=inicio_dia(FECHA_INICIO) + timedelta(days=rng.randrange(DIAS_HISTORIA), hours=rng.randrange(24)),
+                medio_captacion='web', modalidad='presencial', tipo_tour=rng.choice(['tour', 'no_tour']), status_presencia=rng.choice(estados_presencia),
+            ) for i in range(n_ventas)
+        ], batch_size=lote_size)
+        ActividadDiaria.objects.bulk_create([
+            ActividadDiaria(id_actividad=f'{PREFIJO}D{a.pk}{d:04d}', asesor=a, fecha_actividad=FECHA_INICIO + timedelta(days=d))
+            for a in asesores for d in range(DIAS_HISTORIA)
+        ], batch_size=lote_size)
+
+        muestra_venta = ventas[len(ventas) // 2]
+        return {
+            'mes': date(2023, 6, 1), 'dia': date(2023, 6, 15), 'lote': muestra_venta.lote_id,
+            'venta': muestra_venta.pk, 'asesor': asesores[0].pk,
+        }
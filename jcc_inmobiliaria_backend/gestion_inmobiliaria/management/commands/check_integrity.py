@@ -1,11 +1,37 @@
 from django.core.management.base import BaseCommand
 from gestion_inmobiliaria.models import Lote, Venta, ComisionVentaAsesor, Cliente, Presencia
+from gestion_inmobiliaria.cache_respuestas import invalidar_respuestas, AMBITO_LOTES
+from gestion_inmobiliaria.estado_lotes import recalcular_estado_lotes
+from gestion_inmobiliaria.duplicados_lotes import depurar_lotes_duplicados, crear_restriccion_unica
+from gestion_inmobiliaria.typeahead import INDICES as INDICES_TYPEAHEAD
 from collections import Counter
 
 class Command(BaseCommand):
     help = 'Chequea integridad de datos críticos del sistema.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar-estado-lotes', action='store_true', help='Antes de chequear, recalcula el estado de todos los lotes según sus ventas.')
+        parser.add_argument('--depurar-lotes-duplicados', action='store_true', help='Antes de chequear, elimina los lotes duplicados sin ventas y crea la restricción de unicidad si ya no quedan duplicados.')
+
     def handle(self, *args, **options):
+        if options['depurar_lotes_duplicados']:
+            resultado = depurar_lotes_duplicados(aplicar=True)
+            if resultado['total_eliminados']:
+                invalidar_respuestas(AMBITO_LOTES)
+                INDICES_TYPEAHEAD['lotes'].invalidar()
+            self.stdout.write(self.style.SUCCESS(f"Lotes duplicados eliminados: {resultado['total_eliminados']}."))
+            if resultado['con_ventas']:
+                self.stdout.write(self.style.ERROR(f"Lotes duplicados con ventas (reasigne sus ventas a mano): {', '.join(resultado['con_ventas'])}"))
+            if crear_restriccion_unica():
+                self.stdout.write(self.style.SUCCESS('Restricción lote_ubicacion_unica activa.'))
+            else:
+                self.stdout.write(self.style.WARNING('Restricción lote_ubicacion_unica pendiente: quedan lotes duplicados.'))
+        if options['reparar_estado_lotes']:
+            corregidos = recalcular_estado_lotes()
+            # El UPDATE en bloque no dispara las señales de Lote
+            invalidar_respuestas(AMBITO_LOTES)
+            INDICES_TYPEAHEAD['lotes'].invalidar()
+            self.stdout.write(self.style.SUCCESS(f'Estado de lotes recalculado: {corregidos} lote(s) corregido(s).'))
         self.stdout.write(self.style.NOTICE('Chequeando integridad de datos...'))
         errores = 0
 
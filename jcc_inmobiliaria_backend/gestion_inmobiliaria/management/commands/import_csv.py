@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from gestion_inmobiliaria.importacion import (
+    IMPORTADORES, TAMANO_LOTE, ENCODING_POR_DEFECTO, DELIMITADOR_POR_DEFECTO, importar_csv
+)
+
+MAX_ERRORES_EN_PANTALLA = 20
+
+
+class Command(BaseCommand):
+    help = ('Importa lotes, clientes o asesores desde un CSV en bloques (bulk_create/bulk_update) dentro de una '
+            'transacción. Los registros existentes se actualizan; las filas con errores se informan y se omiten.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('entidad', choices=sorted(IMPORTADORES))
+        parser.add_argument('archivo', help='Ruta del CSV.')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f'Filas por escritura en bloque (por defecto {TAMANO_LOTE}).')
+        parser.add_argument('--encoding', default=ENCODING_POR_DEFECTO, help=f'Codificación del archivo (por defecto {ENCODING_POR_DEFECTO}).')
+        parser.add_argument('--delimitador', default=DELIMITADOR_POR_DEFECTO, help=f"Separador de columnas (por defecto '{DELIMITADOR_POR_DEFECTO}').")
+        parser.add_argument('--dry-run', action='store_true', help='Valida e informa sin guardar nada.')
+        parser.add_argument('--reporte', help='Ruta donde guardar el resultado completo en JSON.')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser mayor que 0.')
+        modo = ' (simulación)' if options['dry_run'] else ''
+        self.stdout.write(self.style.NOTICE(f"Importando {options['entidad']} desde {options['archivo']}{modo}..."))
+        try:
+            with open(options['archivo'], encoding=options['encoding'], newline='') as archivo:
+                resultado = importar_csv(
+                    options['entidad'], archivo, tamano_lote=options['lote'],
+                    delimitador=options['delimitador'], dry_run=options['dry_run'],
+                )
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f"No se pudo leer {options['archivo']}: {e}")
+
+        for error in resultado['errores'][:MAX_ERRORES_EN_PANTALLA]:
+            self.stdout.write(self.style.WARNING(f"Fila {error['fila']} [{error['columna']}]: {error['mensaje']} ({error['valor']!r})"))
+        if len(resultado['errores']) > MAX_ERRORES_EN_PANTALLA:
+            self.stdout.write(self.style.WARNING(f"... y {len(resultado['errores']) - MAX_ERRORES_EN_PANTALLA} errores más."))
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8') as salida:
+                json.dump(resultado, salida, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas leídas: {resultado['leidas']}. Creados: {resultado['creados']}, actualizados: {resultado['actualizados']}, "
+            f"sin cambios: {resultado['sin_cambios']}, con errores: {len(resultado['errores'])}{modo}."
+        ))
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from gestion_inmobiliaria.importacion import ENCODING_POR_DEFECTO, DELIMITADOR_POR_DEFECTO
+from gestion_inmobiliaria.importacion_historica import GRUPOS_POR_BLOQUE, PLAZO_CREDITO_POR_DEFECTO, importar_historico
+
+MAX_ERRORES_EN_PANTALLA = 20
+
+
+class Command(BaseCommand):
+    help = ('Importa el historial de presencias y ventas (formato de README_IMPORTACION_CSV.md): agrupa las filas que '
+            'evolucionan por ID_LEAD, escribe por bloques sin señales y recalcula el estado derivado al final. '
+            'Si se interrumpe, volver a ejecutarlo retoma desde el último bloque confirmado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del CSV de presencias y ventas.')
+        parser.add_argument('--checkpoint', help='Ruta del punto de control (por defecto <archivo>.checkpoint.json).')
+        parser.add_argument('--sin-checkpoint', action='store_true', help='No guarda ni retoma puntos de control.')
+        parser.add_argument('--bloque', type=int, default=GRUPOS_POR_BLOQUE, help=f'Grupos (presencias) por transacción (por defecto {GRUPOS_POR_BLOQUE}).')
+        parser.add_argument('--plazo-credito', type=int, default=PLAZO_CREDITO_POR_DEFECTO, choices=[12, 24, 36], help='Plazo asignado a las ventas a crédito.')
+        parser.add_argument('--encoding', default=ENCODING_POR_DEFECTO)
+        parser.add_argument('--delimitador', default=DELIMITADOR_POR_DEFECTO)
+        parser.add_argument('--dry-run', action='store_true', help='Procesa todo y revierte al final.')
+        parser.add_argument('--reporte', help='Ruta donde guardar el resultado completo en JSON.')
+
+    def handle(self, *args, **options):
+        if options['bloque'] < 1:
+            raise CommandError('--bloque debe ser mayor que 0.')
+        checkpoint = None if options['sin_checkpoint'] else (options['checkpoint'] or f"{options['archivo']}.checkpoint.json")
+        modo = ' (simulación)' if options['dry_run'] else ''
+        self.stdout.write(self.style.NOTICE(f"Importando historial desde {options['archivo']}{modo}..."))
+        try:
+            resultado = importar_historico(
+                options['archivo'], checkpoint=checkpoint, grupos_por_bloque=options['bloque'], plazo_credito=options['plazo_credito'],
+                encoding=options['encoding'], delimitador=options['delimitador'], dry_run=options['dry_run'],
+            )
+        except (OSError, UnicodeDecodeError, ValueError) as e:
+            raise CommandError(str(e))
+
+        if resultado['grupos_reanudados']:
+            self.stdout.write(self.style.WARNING(f"Retomado desde el punto de control: {resultado['grupos_reanudados']} grupos ya estaban importados."))
+        incidencias = resultado['errores'] + resultado['avisos']
+        for error in incidencias[:MAX_ERRORES_EN_PANTALLA]:
+            self.stdout.write(self.style.WARNING(f"Fila {error['fila']} [{error['columna']}]: {error['mensaje']} ({error['valor']!r})"))
+        if len(incidencias) > MAX_ERRORES_EN_PANTALLA:
+            self.stdout.write(self.style.WARNING(f"... y {len(incidencias) - MAX_ERRORES_EN_PANTALLA} más."))
+        if options['reporte']:
+            with open(options['reporte'], 'w', encoding='utf-8') as salida:
+                json.dump(resultado, salida, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f"Filas leídas: {resultado['leidas']} ({resultado['filas_fusionadas']} fusionadas en {resultado['grupos']} grupos). "
+            f"Clientes creados: {resultado['clientes_creados']}, asesores: {resultado['asesores_creados']}, lotes: {resultado['lotes_creados']}. "
+            f"Presencias: {resultado['presencias_creadas']} creadas, {resultado['presencias_actualizadas']} actualizadas. "
+            f"Ventas: {resultado['ventas_creadas']} creadas, {resultado['ventas_actualizadas']} actualizadas. "
+            f"Pagos: {resultado['pagos_creados']}. Planes de pago: {resultado['planes_creados']}. Errores: {len(resultado['errores'])}{modo}."
+        ))
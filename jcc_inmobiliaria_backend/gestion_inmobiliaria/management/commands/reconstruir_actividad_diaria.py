@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from gestion_inmobiliaria.actividad import reconstruir_actividad_diaria
+
+class Command(BaseCommand):
+    help = 'Recalcula presencias_generadas de ActividadDiaria desde las presencias realizadas para un rango de fechas (por defecto, todo el historial).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Fecha inicial (YYYY-MM-DD), inclusive.')
+        parser.add_argument('--hasta', help='Fecha final (YYYY-MM-DD), inclusive.')
+
+    def handle(self, *args, **options):
+        fechas = {}
+        for opcion, clave in (('desde', 'fecha_desde'), ('hasta', 'fecha_hasta')):
+            if options.get(opcion):
+                fechas[clave] = parse_date(options[opcion])
+                if fechas[clave] is None:
+                    raise CommandError(f'Fecha inválida para --{opcion}: {options[opcion]}')
+        rango = f"{fechas.get('fecha_desde') or 'inicio'} a {fechas.get('fecha_hasta') or 'hoy'}"
+        self.stdout.write(self.style.NOTICE(f'Reconstruyendo actividad diaria ({rango})...'))
+        filas = reconstruir_actividad_diaria(**fechas)
+        self.stdout.write(self.style.SUCCESS(f'Actividad diaria reconstruida: {filas} filas creadas o corregidas.'))
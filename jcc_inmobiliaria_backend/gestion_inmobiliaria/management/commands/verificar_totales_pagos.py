@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from gestion_inmobiliaria.totales_pagos import verificar_totales
+
+class Command(BaseCommand):
+    help = 'Verifica los totales de pagos guardados en ventas y planes de pago contra sus pagos y cuotas; con --reparar corrige las diferencias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reparar', action='store_true', help='Guarda los valores recalculados donde haya diferencias.')
+        parser.add_argument('--venta', action='append', dest='ventas', metavar='ID_VENTA', help='Limita la verificación a esta venta (se puede repetir).')
+
+    def handle(self, *args, **options):
+        resultado = verificar_totales(reparar=options['reparar'], venta_ids=options['ventas'])
+        self.stdout.write(f"Ventas revisadas: {resultado['ventas_revisadas']}, con diferencias: {resultado['ventas_con_diferencias']}")
+        self.stdout.write(f"Planes revisados: {resultado['planes_revisados']}, con diferencias: {resultado['planes_con_diferencias']}")
+        for detalle in resultado['detalles']:
+            self.stdout.write(f"  {detalle}")
+        if not (resultado['ventas_con_diferencias'] or resultado['planes_con_diferencias']):
+            self.stdout.write(self.style.SUCCESS('Los totales están al día.'))
+        elif resultado['reparado']:
+            self.stdout.write(self.style.SUCCESS('Diferencias corregidas.'))
+        else:
+            self.stdout.write(self.style.WARNING('Hay diferencias. Ejecute con --reparar para corregirlas.'))
@@ -0,0 +1,211 @@
+# gestion_inmobiliaria/metricas.py
+"""
+Mantenimiento de la tabla de hechos del dashboard (MetricaDashboardDiaria).
+
+Cada día se reconstruye completo desde las ventas, pagos y presencias de ese día, así que
+recalcular un día es idempotente. Las señales de Venta, RegistroPago y Presencia marcan los días
+afectados y se recalculan una sola vez al confirmar la transacción. El comando
+reconstruir_metricas_dashboard rehace un rango o todo el historial.
+"""
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import MetricaDashboardDiaria, Venta, RegistroPago, Presencia
+from .cache_respuestas import invalidar_respuestas, invalidar_meses, invalidar_todo, ambitos_rango, AMBITO_GLOBAL
+
+ROLES_PRESENCIA = ['asesor_captacion_opc_id', 'asesor_call_agenda_id', 'asesor_liner_id', 'asesor_closer_id']
+
+# Campos que cambian alguna fila de la tabla de hechos
+CAMPOS_VENTA = ['fecha_venta', 'status_venta', 'tipo_venta', 'vendedor_principal', 'lote', 'valor_lote_venta']
+CAMPOS_VENTA_EN_PAGOS = {'status_venta', 'tipo_venta', 'vendedor_principal', 'lote'}
+CAMPOS_PAGO = ['fecha_pago', 'monto_pago', 'venta']
+CAMPOS_PRESENCIA = ['fecha_hora_presencia', 'medio_captacion', 'tipo_tour', 'status_presencia', 'asesor_captacion_opc', 'asesor_call_agenda', 'asesor_liner', 'asesor_closer', 'venta_asociada']
+CAMPOS_PRESENCIA_EN_VENTAS = {'medio_captacion', 'venta_asociada'}
+
+_pendientes = threading.local()
+
+
+def fecha_local(valor):
+    """Fecha (zona horaria local) de un date o datetime, igual que TruncDate/__date en la BD."""
+    if isinstance(valor, datetime):
+        return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+    return valor
+
+
+def filtro_fechas(campo, fechas=None, fecha_desde=None, fecha_hasta=None):
+    """Filtro (kwargs) de un campo de fecha por lista de días y/o rango."""
+    filtro = {}
+    if fechas is not None:
+        filtro[f'{campo}__in'] = list(fechas)
+    if fecha_desde:
+        filtro[f'{campo}__gte'] = fecha_desde
+    if fecha_hasta:
+        filtro[f'{campo}__lte'] = fecha_hasta
+    return filtro
+
+
+def inicio_dia(fecha):
+    """Medianoche local del día, con zona horaria si USE_TZ."""
+    inicio = datetime.combine(fecha, time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def filtro_presencias(fechas=None, fecha_desde=None, fecha_hasta=None):
+    """Igual que filtro_fechas sobre fecha_hora_presencia__date, pero con rangos de datetime que usan el índice."""
+    filtro = Q()
+    if fechas is not None:
+        dias = Q(pk__in=[])
+        for fecha in fechas:
+            dias |= Q(fecha_hora_presencia__gte=inicio_dia(fecha), fecha_hora_presencia__lt=inicio_dia(fecha + timedelta(days=1)))
+        filtro &= dias
+    if fecha_desde:
+        filtro &= Q(fecha_hora_presencia__gte=inicio_dia(fecha_desde))
+    if fecha_hasta:
+        filtro &= Q(fecha_hora_presencia__lt=inicio_dia(fecha_hasta + timedelta(days=1)))
+    return filtro
+
+
+def _filas_ventas(**rango):
+    filas = Venta.objects.filter(**filtro_fechas('fecha_venta', **rango)).values(
+        'fecha_venta', 'vendedor_principal_id', 'lote__proyecto_id', 'tipo_venta', 'presencia_que_origino__medio_captacion', 'status_venta'
+    ).annotate(cantidad=Count('id_venta'), monto=Sum('valor_lote_venta')).order_by()
+    for f in filas:
+        yield MetricaDashboardDiaria(
+            fecha=f['fecha_venta'], fuente=MetricaDashboardDiaria.FUENTE_VENTA, asesor_id=f['vendedor_principal_id'],
+            proyecto_id=f['lote__proyecto_id'], tipo_venta=f['tipo_venta'], medio_captacion=f['presencia_que_origino__medio_captacion'],
+            status=f['status_venta'], cantidad=f['cantidad'], monto=f['monto'] or Decimal('0.00'),
+        )
+
+
+def _filas_pagos(**rango):
+    filas = RegistroPago.objects.filter(**filtro_fechas('fecha_pago', **rango)).values(
+        'fecha_pago', 'venta__vendedor_principal_id', 'venta__lote__proyecto_id', 'venta__tipo_venta',
+        'venta__presencia_que_origino__medio_captacion', 'venta__status_venta'
+    ).annotate(cantidad=Count('id_pago'), monto=Sum('monto_pago')).order_by()
+    for f in filas:
+        yield MetricaDashboardDiaria(
+            fecha=f['fecha_pago'], fuente=MetricaDashboardDiaria.FUENTE_PAGO, asesor_id=f['venta__vendedor_principal_id'],
+            proyecto_id=f['venta__lote__proyecto_id'], tipo_venta=f['venta__tipo_venta'], medio_captacion=f['venta__presencia_que_origino__medio_captacion'],
+            status=f['venta__status_venta'], cantidad=f['cantidad'], monto=f['monto'] or Decimal('0.00'),
+        )
+
+
+def _filas_presencias(**rango):
+    presencias = Presencia.objects.filter(filtro_presencias(**rango)).annotate(fecha=TruncDate('fecha_hora_presencia'))
+    for f in presencias.values('fecha', 'medio_captacion', 'tipo_tour', 'status_presencia').annotate(cantidad=Count('id_presencia')).order_by():
+        yield MetricaDashboardDiaria(
+            fecha=f['fecha'], fuente=MetricaDashboardDiaria.FUENTE_PRESENCIA, medio_captacion=f['medio_captacion'],
+            tipo_tour=f['tipo_tour'], status=f['status_presencia'], cantidad=f['cantidad'],
+        )
+
+    # Una presencia cuenta una sola vez por asesor aunque ocupe varios roles
+    por_asesor = Counter()
+    for fecha, medio, tipo_tour, status, *asesores in presencias.values_list('fecha', 'medio_captacion', 'tipo_tour', 'status_presencia', *ROLES_PRESENCIA).order_by():
+        for asesor_id in set(filter(None, asesores)):
+            por_asesor[(fecha, asesor_id, medio, tipo_tour, status)] += 1
+    for (fecha, asesor_id, medio, tipo_tour, status), cantidad in por_asesor.items():
+        yield MetricaDashboardDiaria(
+            fecha=fecha, fuente=MetricaDashboardDiaria.FUENTE_PRESENCIA_ASESOR, asesor_id=asesor_id,
+            medio_captacion=medio, tipo_tour=tipo_tour, status=status, cantidad=cantidad,
+        )
+
+
+def reconstruir_metricas(fechas=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Reemplaza las filas de los días indicados (lista de fechas o rango; sin argumentos, todo el
+    historial) por las calculadas desde las tablas de origen. Devuelve las filas creadas.
+    """
+    rango = {'fechas': fechas, 'fecha_desde': fecha_desde, 'fecha_hasta': fecha_hasta}
+    with transaction.atomic():
+        MetricaDashboardDiaria.objects.filter(**filtro_fechas('fecha', **rango)).delete()
+        filas = [*_filas_ventas(**rango), *_filas_pagos(**rango), *_filas_presencias(**rango)]
+        MetricaDashboardDiaria.objects.bulk_create(filas, batch_size=1000)
+    # Las respuestas cacheadas de esos meses dejan de valer
+    if fechas is not None:
+        invalidar_meses(fechas)
+    elif ambitos_rango(fecha_desde, fecha_hasta) != [AMBITO_GLOBAL]:
+        invalidar_respuestas(*ambitos_rango(fecha_desde, fecha_hasta))
+    else:
+        invalidar_todo()
+    return len(filas)
+
+
+# --- Refresco incremental ---
+def marcar_dias(*fechas):
+    """
+    Marca días para recalcular al confirmar la transacción en curso (o de inmediato en autocommit).
+    Cada transacción acumula sus días en un solo refresco registrado con on_commit: si se revierte,
+    Django descarta el callback y sus días con él, y la siguiente transacción empieza uno nuevo.
+    """
+    fechas = {fecha_local(f) for f in fechas if f}
+    if not fechas:
+        return
+    conexion = transaction.get_connection()
+    if not conexion.in_atomic_block:
+        reconstruir_metricas(fechas=sorted(fechas))
+        return
+    refresco = getattr(_pendientes, 'refresco', None)
+    # El refresco anterior ya no está registrado si su transacción (o savepoint) terminó o se revirtió
+    if refresco is None or not any(func is refresco for _, func, _ in conexion.run_on_commit):
+        refresco = _pendientes.refresco = _nuevo_refresco()
+        transaction.on_commit(refresco)
+    refresco.fechas.update(fechas)
+
+
+def _nuevo_refresco():
+    def refresco():
+        if getattr(_pendientes, 'refresco', None) is refresco:
+            _pendientes.refresco = None
+        reconstruir_metricas(fechas=sorted(refresco.fechas))
+    refresco.fechas = set()
+    return refresco
+
+
+def descartar_dias_pendientes():
+    """Olvida el refresco de la transacción en curso (tests: TestCase nunca confirma)."""
+    _pendientes.refresco = None
+
+
+def _fechas_de_venta(venta_id):
+    fechas = set(RegistroPago.objects.filter(venta_id=venta_id).values_list('fecha_pago', flat=True).distinct())
+    fechas.update(Venta.objects.filter(pk=venta_id).values_list('fecha_venta', flat=True))
+    return fechas
+
+
+def marcar_venta(venta, eliminada=False):
+    modificados = set(CAMPOS_VENTA) if eliminada else set(venta.campos_modificados(CAMPOS_VENTA))
+    if not modificados:
+        return
+    fechas = {venta.fecha_venta, venta.valor_cargado('fecha_venta')}
+    # Los pagos se agregan con las dimensiones de su venta (al eliminarla, sus pagos marcan sus propios días)
+    if not eliminada and venta.valor_cargado('status_venta') is not None and modificados & CAMPOS_VENTA_EN_PAGOS:
+        fechas.update(RegistroPago.objects.filter(venta_id=venta.pk).values_list('fecha_pago', flat=True).distinct())
+    marcar_dias(*fechas)
+
+
+def marcar_pago(pago, eliminado=False):
+    if eliminado or pago.campos_modificados(CAMPOS_PAGO):
+        marcar_dias(pago.fecha_pago, pago.valor_cargado('fecha_pago'))
+
+
+def marcar_presencia(presencia, eliminada=False):
+    modificados = set(CAMPOS_PRESENCIA) if eliminada else set(presencia.campos_modificados(CAMPOS_PRESENCIA))
+    if not modificados:
+        return
+    fechas = {presencia.fecha_hora_presencia, presencia.valor_cargado('fecha_hora_presencia')}
+    # El medio de captación de la presencia es una dimensión de su venta y de los pagos de esa venta
+    ventas_ids = {presencia.venta_asociada_id, presencia.valor_cargado('venta_asociada')} - {None}
+    if modificados & CAMPOS_PRESENCIA_EN_VENTAS:
+        for venta_id in ventas_ids:
+            fechas.update(_fechas_de_venta(venta_id))
+    elif ventas_ids:
+        # Los roles de la presencia no están en la tabla de hechos, pero sí en el ranking del mes de la venta
+        invalidar_meses(Venta.objects.filter(pk__in=ventas_ids).values_list('fecha_venta', flat=True))
+    marcar_dias(*fechas)
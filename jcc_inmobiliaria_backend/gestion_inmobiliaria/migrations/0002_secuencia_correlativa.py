@@ -0,0 +1,54 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:17
+
+import re
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import Cast, Substr
+
+
+SECUENCIAS = [
+    ('Lote', 'L'),
+    ('Cliente', 'CLI'),
+    ('Asesor', 'A'),
+    ('Venta', 'V'),
+    ('ActividadDiaria', 'ACT'),
+    ('Presencia', 'PRS'),
+]
+
+
+def maximo_numero(modelo, prefijo):
+    """Mayor parte numérica de los PKs con el prefijo (0 si no hay ninguno), calculada en la BD."""
+    numero = Cast(Substr('pk', len(prefijo) + 1), models.IntegerField())
+    con_prefijo = modelo.objects.filter(pk__regex=rf'^{re.escape(prefijo)}[0-9]+$')
+    return con_prefijo.aggregate(maximo=Max(numero))['maximo'] or 0
+
+
+def sembrar_secuencias(apps, schema_editor):
+    SecuenciaCorrelativa = apps.get_model('gestion_inmobiliaria', 'SecuenciaCorrelativa')
+    for nombre_modelo, prefijo in SECUENCIAS:
+        modelo = apps.get_model('gestion_inmobiliaria', nombre_modelo)
+        SecuenciaCorrelativa.objects.update_or_create(prefijo=prefijo, defaults={'ultimo_numero': maximo_numero(modelo, prefijo)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCorrelativa',
+            fields=[
+                ('prefijo', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='Prefijo')),
+                ('ultimo_numero', models.PositiveIntegerField(default=0, verbose_name='Último Número Asignado')),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Secuencia Correlativa',
+                'verbose_name_plural': 'Secuencias Correlativas',
+            },
+        ),
+        migrations.RunPython(sembrar_secuencias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:22
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+
+PALABRAS_PROYECTO_DOLARES = ('aucallama', 'oasis 2')
+
+
+def registrar_proyectos_existentes(apps, schema_editor):
+    """Crea un Proyecto por cada ubicacion_proyecto distinta y lo asigna a sus lotes."""
+    Proyecto = apps.get_model('gestion_inmobiliaria', 'Proyecto')
+    Lote = apps.get_model('gestion_inmobiliaria', 'Lote')
+    proyectos = {}
+    for ubicacion in Lote.objects.exclude(ubicacion_proyecto='').values_list('ubicacion_proyecto', flat=True).distinct():
+        nombre = ' '.join(ubicacion.split())
+        clave = nombre.lower()
+        if clave not in proyectos:
+            moneda = 'USD' if any(p in clave for p in PALABRAS_PROYECTO_DOLARES) else 'PEN'
+            proyectos[clave], _ = Proyecto.objects.get_or_create(nombre=nombre, defaults={'moneda': moneda})
+        Lote.objects.filter(ubicacion_proyecto=ubicacion).update(proyecto=proyectos[clave])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0002_secuencia_correlativa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Proyecto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=255, unique=True, verbose_name='Nombre del Proyecto')),
+                ('moneda', models.CharField(choices=[('PEN', 'Soles (S/.)'), ('USD', 'Dólares ($)')], default='PEN', max_length=3, verbose_name='Moneda')),
+                ('precio_lista_defecto', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Precio Contado por Defecto')),
+                ('precio_credito_12_meses_defecto', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Precio Crédito 12 Meses por Defecto')),
+                ('precio_credito_24_meses_defecto', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Precio Crédito 24 Meses por Defecto')),
+                ('precio_credito_36_meses_defecto', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Precio Crédito 36 Meses por Defecto')),
+                ('fecha_creacion', models.DateTimeField(default=django.utils.timezone.now, editable=False)),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Proyecto',
+                'verbose_name_plural': 'Proyectos',
+                'ordering': ['nombre'],
+            },
+        ),
+        migrations.AddField(
+            model_name='lote',
+            name='proyecto',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='lotes', to='gestion_inmobiliaria.proyecto', verbose_name='Proyecto'),
+        ),
+        migrations.RunPython(registrar_proyectos_existentes, migrations.RunPython.noop),
+    ]
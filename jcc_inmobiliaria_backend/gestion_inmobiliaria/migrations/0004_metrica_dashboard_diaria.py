@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:27
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0003_proyecto'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDashboardDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('fuente', models.CharField(choices=[('venta', 'Ventas'), ('pago', 'Pagos'), ('presencia', 'Presencias'), ('presencia_asesor', 'Presencias por Asesor')], max_length=20, verbose_name='Fuente')),
+                ('tipo_venta', models.CharField(blank=True, max_length=10, null=True, verbose_name='Tipo de Venta')),
+                ('medio_captacion', models.CharField(blank=True, max_length=50, null=True, verbose_name='Medio de Captación')),
+                ('status', models.CharField(blank=True, help_text='Status de la venta (ventas y pagos) o de la presencia.', max_length=30, null=True, verbose_name='Status')),
+                ('tipo_tour', models.CharField(blank=True, max_length=10, null=True, verbose_name='Tipo de Presencia')),
+                ('cantidad', models.PositiveIntegerField(default=0, verbose_name='Cantidad')),
+                ('monto', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14, verbose_name='Monto (S/.)')),
+                ('asesor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inmobiliaria.asesor', verbose_name='Asesor')),
+                ('proyecto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='gestion_inmobiliaria.proyecto', verbose_name='Proyecto')),
+            ],
+            options={
+                'verbose_name': 'Métrica Diaria del Dashboard',
+                'verbose_name_plural': 'Métricas Diarias del Dashboard',
+                'ordering': ['-fecha', 'fuente'],
+                'indexes': [models.Index(fields=['fuente', 'fecha'], name='metrica_fuente_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0004_metrica_dashboard_diaria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cuotaplanpago',
+            index=models.Index(fields=['estado_cuota', 'fecha_vencimiento'], name='cuota_estado_venc_idx'),
+        ),
+    ]
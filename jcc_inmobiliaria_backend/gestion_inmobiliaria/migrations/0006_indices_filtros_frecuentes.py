@@ -0,0 +1,37 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0005_cuota_estado_vencimiento_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='actividaddiaria',
+            index=models.Index(fields=['asesor', 'fecha_actividad'], name='actividad_asesor_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='presencia',
+            index=models.Index(fields=['fecha_hora_presencia', 'tipo_tour', 'status_presencia'], name='presencia_fecha_tour_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registropago',
+            index=models.Index(fields=['venta', 'fecha_pago'], name='pago_venta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registropago',
+            index=models.Index(fields=['fecha_pago'], name='pago_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['fecha_venta', 'status_venta'], name='venta_fecha_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(fields=['lote', 'status_venta'], name='venta_lote_status_idx'),
+        ),
+    ]
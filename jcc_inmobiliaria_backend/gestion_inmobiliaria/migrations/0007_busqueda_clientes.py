@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:43
+
+from django.db import migrations, models
+
+# f_unaccent envuelve unaccent (que no es IMMUTABLE) para poder indexar la expresión que usa busqueda.py
+SQL_TRIGRAMAS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+    "AS $$ SELECT public.unaccent('public.unaccent'::regdictionary, $1) $$",
+    "CREATE INDEX IF NOT EXISTS cliente_nombre_trgm_idx ON gestion_inmobiliaria_cliente "
+    "USING gin (upper(f_unaccent(nombres_completos_razon_social)) gin_trgm_ops)",
+]
+SQL_TRIGRAMAS_REVERSA = [
+    "DROP INDEX IF EXISTS cliente_nombre_trgm_idx",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def _ejecutar_en_postgres(sentencias):
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0006_indices_filtros_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['numero_documento'], name='cliente_documento_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['telefono_principal'], name='cliente_telefono_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(_ejecutar_en_postgres(SQL_TRIGRAMAS), _ejecutar_en_postgres(SQL_TRIGRAMAS_REVERSA)),
+    ]
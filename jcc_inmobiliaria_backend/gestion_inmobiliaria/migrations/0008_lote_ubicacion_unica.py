@@ -0,0 +1,94 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:47
+
+import logging
+
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, OuterRef, Subquery, Value, When, Window
+from django.db.models.functions import Coalesce, Lower, Trim
+
+logger = logging.getLogger(__name__)
+
+# Copia congelada de models.CLAVE_LOTE y LOTE_IDENTIFICADO: la migración no depende del código actual
+CLAVE_LOTE = {
+    'clave_proyecto': Lower(Trim('ubicacion_proyecto')),
+    'clave_manzana': Lower(Trim('manzana')),
+    'clave_numero': Lower(Trim('numero_lote')),
+    'clave_etapa': Coalesce('etapa', Value(0)),
+}
+LOTE_IDENTIFICADO = models.Q(manzana__isnull=False, numero_lote__isnull=False) & ~models.Q(manzana='') & ~models.Q(numero_lote='')
+
+RESTRICCION = models.UniqueConstraint(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('ubicacion_proyecto')), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('manzana')), django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('numero_lote')), django.db.models.functions.comparison.Coalesce('etapa', models.Value(0)), condition=models.Q(('manzana__isnull', False), ('numero_lote__isnull', False), models.Q(('manzana', ''), _negated=True), models.Q(('numero_lote', ''), _negated=True)), name='lote_ubicacion_unica', violation_error_message='Ya existe un lote con el mismo proyecto, etapa, manzana y número.')
+
+
+def modelos(apps):
+    return [apps.get_model('gestion_inmobiliaria', nombre) for nombre in ('Lote', 'Venta', 'Presencia')]
+
+
+def lotes_duplicados(Lote, Venta):
+    """Lotes de grupos con clave repetida, por grupo y con el lote a conservar (más ventas, más antiguo) primero."""
+    ventas = Venta.objects.filter(lote=OuterRef('pk')).order_by().values('lote').annotate(n=Count('pk')).values('n')
+    return Lote.objects.filter(LOTE_IDENTIFICADO).annotate(
+        **CLAVE_LOTE,
+        num_ventas=Coalesce(Subquery(ventas, output_field=IntegerField()), 0),
+        tamano_grupo=Window(Count('pk'), partition_by=list(CLAVE_LOTE.values())),
+    ).filter(tamano_grupo__gt=1).order_by(*CLAVE_LOTE, '-num_ventas', 'fecha_creacion', 'pk')
+
+
+def depurar_duplicados(apps, schema_editor):
+    """Borra los duplicados sin ventas (sus presencias pasan al lote conservado); los vendidos se informan."""
+    Lote, Venta, Presencia = modelos(apps)
+    conservar_de, con_ventas = {}, []
+    clave_actual = conservado = None
+    for lote in lotes_duplicados(Lote, Venta):
+        clave = tuple(getattr(lote, c) for c in CLAVE_LOTE)
+        if clave != clave_actual:
+            clave_actual, conservado = clave, lote
+        elif lote.num_ventas:
+            con_ventas.append(lote.pk)
+        else:
+            conservar_de[lote.pk] = conservado.pk
+    if conservar_de:
+        Presencia.objects.filter(lote_interes_inicial__in=list(conservar_de)).update(lote_interes_inicial=Case(
+            *[When(lote_interes_inicial=duplicado, then=Value(conservado_id)) for duplicado, conservado_id in conservar_de.items()]
+        ))
+        Lote.objects.filter(pk__in=list(conservar_de), ventas_lote__isnull=True).delete()
+    if con_ventas:
+        logger.warning('Lotes duplicados con ventas, se dejan para revisar a mano: %s', ', '.join(con_ventas))
+
+
+def crear_restriccion(apps, schema_editor):
+    """
+    Crea el índice único solo si ya no quedan duplicados. Si quedan (vendidos), la migración sigue
+    y el índice lo crea `manage.py check_integrity --depurar-lotes-duplicados` una vez resueltos.
+    """
+    Lote, Venta, _ = modelos(apps)
+    if lotes_duplicados(Lote, Venta).exists():
+        logger.warning('No se crea la restricción lote_ubicacion_unica: quedan lotes duplicados con ventas. '
+                       'Reasigne sus ventas y ejecute manage.py check_integrity --depurar-lotes-duplicados.')
+        return
+    schema_editor.add_constraint(Lote, RESTRICCION)
+
+
+def quitar_restriccion(apps, schema_editor):
+    Lote = apps.get_model('gestion_inmobiliaria', 'Lote')
+    with schema_editor.connection.cursor() as cursor:
+        existentes = schema_editor.connection.introspection.get_constraints(cursor, Lote._meta.db_table)
+    if RESTRICCION.name in existentes:
+        schema_editor.remove_constraint(Lote, RESTRICCION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0007_busqueda_clientes'),
+    ]
+
+    operations = [
+        migrations.RunPython(depurar_duplicados, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[migrations.AddConstraint(model_name='lote', constraint=RESTRICCION)],
+            database_operations=[migrations.RunPython(crear_restriccion, quitar_restriccion)],
+        ),
+    ]
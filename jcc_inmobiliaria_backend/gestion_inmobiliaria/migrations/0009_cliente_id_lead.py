@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0008_lote_ubicacion_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='id_lead',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True, verbose_name='ID Lead (CRM)'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:03
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# Copias congeladas (pagos.ESTADOS_CUOTA_PAGADA, Proyecto.PALABRAS_PROYECTO_DOLARES) al momento de esta migración
+ESTADOS_CUOTA_PAGADA = ('pagada', 'cancelada_con_excedente')
+PALABRAS_PROYECTO_DOLARES = ('aucallama', 'oasis 2')
+
+
+def calcular_totales(apps, schema_editor):
+    """Llena solo las columnas nuevas, con UPDATE en conjunto; monto_pagado_actual no se toca."""
+    Venta = apps.get_model('gestion_inmobiliaria', 'Venta')
+    RegistroPago = apps.get_model('gestion_inmobiliaria', 'RegistroPago')
+    PlanPagoVenta = apps.get_model('gestion_inmobiliaria', 'PlanPagoVenta')
+    CuotaPlanPago = apps.get_model('gestion_inmobiliaria', 'CuotaPlanPago')
+    cero = Value(Decimal('0.00'))
+
+    pagado_dolares = RegistroPago.objects.filter(venta=OuterRef('pk')).order_by().values('venta').annotate(total=Sum('monto_pago_dolares')).values('total')
+    Venta.objects.update(
+        monto_pagado_dolares=Coalesce(Subquery(pagado_dolares, output_field=DecimalField(max_digits=12, decimal_places=2)), cero),
+        saldo_soles=Coalesce('valor_lote_venta', cero) - Coalesce('monto_pagado_actual', cero),
+    )
+    # El saldo en dólares solo existe en proyectos en dólares con precio en dólares
+    sin_proyecto_en_dolares = Q()
+    for palabra in PALABRAS_PROYECTO_DOLARES:
+        sin_proyecto_en_dolares |= Q(lote__ubicacion_proyecto__icontains=palabra)
+    Venta.objects.filter(
+        Q(lote__proyecto__moneda='USD') | (Q(lote__proyecto__isnull=True) & sin_proyecto_en_dolares), precio_dolares__gt=0,
+    ).update(saldo_dolares=F('precio_dolares') - F('monto_pagado_dolares'))
+
+    cuotas = CuotaPlanPago.objects.filter(plan_pago_venta=OuterRef('pk')).order_by().values('plan_pago_venta')
+    PlanPagoVenta.objects.update(
+        cuotas_pagadas=Coalesce(Subquery(
+            cuotas.filter(estado_cuota__in=ESTADOS_CUOTA_PAGADA).annotate(n=Count('pk')).values('n'), output_field=IntegerField(),
+        ), 0),
+        proxima_cuota_vencimiento=Subquery(
+            cuotas.exclude(estado_cuota__in=ESTADOS_CUOTA_PAGADA).annotate(proxima=Min('fecha_vencimiento')).values('proxima'),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_inmobiliaria', '0009_cliente_id_lead'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planpagoventa',
+            name='cuotas_pagadas',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Cuotas Pagadas'),
+        ),
+        migrations.AddField(
+            model_name='planpagoventa',
+            name='proxima_cuota_vencimiento',
+            field=models.DateField(blank=True, null=True, verbose_name='Vencimiento de la Próxima Cuota'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='monto_pagado_dolares',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Monto Pagado Actual ($)'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='saldo_dolares',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Saldo Pendiente ($)'),
+        ),
+        migrations.AddField(
+            model_name='venta',
+            name='saldo_soles',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12, verbose_name='Saldo Pendiente (S/.)'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 # gestion_inmobiliaria/models.py
-from django.db import models, transaction
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.db.models import Sum, Q, Value
+from django.db.models.functions import Coalesce, Lower, Trim
 from decimal import Decimal, ROUND_HALF_UP
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db.models.signals import post_save, post_delete
@@ -10,49 +11,208 @@ from dateutil.relativedelta import relativedelta
 from uuid import uuid4
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from .cache_respuestas import invalidar_respuestas, invalidar_meses, AMBITO_LOTES, AMBITO_ASESORES, AMBITO_CLIENTES
+from .pagos import (
+    SaldoCuota, PagoAplicable, CuotaObjetivo, calcular_estado_cuota, agregar_pago, quitar_pago, reconstruir_asignacion,
+    calcular_monto_financiado, calcular_cronograma_objetivo, calcular_saldos_venta, resumen_cuotas,
+)
 User = get_user_model()
 
-# --- Función Auxiliar para generar IDs Correlativos ---
+# --- Asignación de IDs Correlativos ---
+class SecuenciaCorrelativa(models.Model):
+    """
+    Contador por prefijo (L, CLI, A, V, ACT, PRS) usado para asignar IDs correlativos.
+    La fila se bloquea con select_for_update, así que dos workers nunca reciben el mismo número.
+    """
+    prefijo = models.CharField(max_length=10, primary_key=True, verbose_name="Prefijo")
+    ultimo_numero = models.PositiveIntegerField(default=0, verbose_name="Último Número Asignado")
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+    def __str__(self): return f"{self.prefijo}: {self.ultimo_numero}"
+    class Meta: verbose_name = "Secuencia Correlativa"; verbose_name_plural = "Secuencias Correlativas"
+
+def obtener_maximo_numero_correlativo(pks, prefijo):
+    """Mayor parte numérica entre los PKs que tienen el prefijo dado (0 si no hay ninguno)."""
+    max_num = 0
+    for pk in pks:
+        pk_str = str(pk)
+        if pk_str.startswith(prefijo) and pk_str[len(prefijo):].isdigit():
+            max_num = max(max_num, int(pk_str[len(prefijo):]))
+    return max_num
+
+def _maximo_numero_en_tabla(modelo, prefijo):
+    pks = modelo.objects.filter(pk__startswith=prefijo).values_list('pk', flat=True).iterator()
+    return obtener_maximo_numero_correlativo(pks, prefijo)
+
+def _bloquear_secuencia(modelo, prefijo):
+    """Devuelve la secuencia del prefijo bloqueada; si no existe la crea a partir de los datos actuales."""
+    secuencia = SecuenciaCorrelativa.objects.select_for_update().filter(prefijo=prefijo).first()
+    if secuencia is None:
+        try:
+            with transaction.atomic():
+                SecuenciaCorrelativa.objects.create(prefijo=prefijo, ultimo_numero=_maximo_numero_en_tabla(modelo, prefijo))
+        except IntegrityError:
+            pass # Otro worker la creó en paralelo
+        secuencia = SecuenciaCorrelativa.objects.select_for_update().get(prefijo=prefijo)
+    return secuencia
+
+def reservar_bloque_ids(modelo, prefijo, cantidad, longitud_numero=4):
+    """
+    Reserva `cantidad` IDs consecutivos con un solo bloqueo de la secuencia.
+    Pensado para inserciones masivas (bulk_create), donde save() no se ejecuta.
+    """
+    if cantidad <= 0:
+        return []
+    with transaction.atomic():
+        secuencia = _bloquear_secuencia(modelo, prefijo)
+        inicio = secuencia.ultimo_numero + 1
+        ids = [f"{prefijo}{str(n).zfill(longitud_numero)}" for n in range(inicio, inicio + cantidad)]
+        if modelo.objects.filter(pk__in=ids).exists():
+            # Hay IDs asignados a mano por encima del contador: se resincroniza con la tabla.
+            inicio = max(secuencia.ultimo_numero, _maximo_numero_en_tabla(modelo, prefijo)) + 1
+            ids = [f"{prefijo}{str(n).zfill(longitud_numero)}" for n in range(inicio, inicio + cantidad)]
+        secuencia.ultimo_numero = inicio + cantidad - 1
+        secuencia.save(update_fields=['ultimo_numero', 'ultima_modificacion'])
+    return ids
+
 def generar_siguiente_id(modelo, prefijo, longitud_numero=4):
-    ultimo_objeto = modelo.objects.all().order_by('pk').last()
-    if not ultimo_objeto:
-        return f"{prefijo}{'1'.zfill(longitud_numero)}"
-    
-    ultimo_id_str = str(ultimo_objeto.pk) 
-    
-    parte_numerica_str = ""
-    if ultimo_id_str.startswith(prefijo):
-        parte_numerica_str = ultimo_id_str[len(prefijo):]
-    elif prefijo and ultimo_id_str.replace(prefijo, "").isdigit():
-        parte_numerica_str = ultimo_id_str.replace(prefijo, "")
-    elif ultimo_id_str.isdigit():
-        parte_numerica_str = ultimo_id_str
-    else:
-        max_num = 0
-        for obj_pk_str in modelo.objects.values_list('pk', flat=True).order_by('pk'):
-            current_num_str = str(obj_pk_str)
-            if current_num_str.startswith(prefijo):
-                current_num_part = current_num_str[len(prefijo):]
-                if current_num_part.isdigit():
-                    max_num = max(max_num, int(current_num_part))
-        siguiente_numero = max_num + 1
-        if siguiente_numero == 1 and modelo.objects.filter(pk__startswith=prefijo).exists():
-             siguiente_numero = modelo.objects.filter(pk__startswith=prefijo).count() + 1
-        return f"{prefijo}{str(siguiente_numero).zfill(longitud_numero)}"
-
-    try:
-        ultimo_numero = int(parte_numerica_str)
-        siguiente_numero = ultimo_numero + 1
-    except ValueError:
-        siguiente_numero = modelo.objects.count() + 1
-        
-    return f"{prefijo}{str(siguiente_numero).zfill(longitud_numero)}"
+    return reservar_bloque_ids(modelo, prefijo, 1, longitud_numero)[0]
+
+# --- Seguimiento de campos modificados ---
+class SnapshotCamposMixin:
+    """
+    Guarda los valores de los campos tal como se cargaron de la BD (o se guardaron por última vez),
+    para saber qué cambió sin volver a consultar la fila.
+    """
+    def _valores_actuales(self, campos=None):
+        return {
+            f.attname: self.__dict__[f.attname]
+            for f in self._meta.concrete_fields
+            if f.attname in self.__dict__ and (campos is None or f.name in campos or f.attname in campos)
+        }
+
+    def tomar_snapshot(self, campos=None):
+        snapshot = dict(getattr(self, '_valores_cargados', {}))
+        snapshot.update(self._valores_actuales(campos))
+        self._valores_cargados = snapshot
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.tomar_snapshot()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.tomar_snapshot(kwargs.get('fields'))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.tomar_snapshot(kwargs.get('update_fields'))
+
+    def valor_cargado(self, campo, default=None):
+        campo = self._meta.get_field(campo).attname
+        return getattr(self, '_valores_cargados', {}).get(campo, default)
+
+    def campos_modificados(self, campos=None):
+        """Nombres de campos cuyo valor difiere del cargado. Sin snapshot (instancia nueva) cuentan todos."""
+        cargados = getattr(self, '_valores_cargados', {})
+        return [
+            f.name for f in self._meta.concrete_fields
+            if (campos is None or f.name in campos) and not f.primary_key
+            and (f.attname not in cargados or cargados[f.attname] != self.__dict__.get(f.attname))
+        ]
 
 # --- MODELOS PRINCIPALES ---
+# Cache local del proceso con la moneda de cada proyecto. Se invalida con las señales de Proyecto
+# y, para otros workers, al vencer el TTL.
+CACHE_PROYECTOS_TTL_SEGUNDOS = 300
+_cache_proyectos = {'cargado_en': None, 'por_id': {}, 'por_nombre': {}}
+
+def normalizar_nombre_proyecto(nombre):
+    return ' '.join((nombre or '').split()).lower()
+
+class Proyecto(models.Model):
+    MONEDA_SOLES = 'PEN'; MONEDA_DOLARES = 'USD'
+    MONEDA_CHOICES = [(MONEDA_SOLES, 'Soles (S/.)'), (MONEDA_DOLARES, 'Dólares ($)')]
+    # Solo se usan para sugerir la moneda de un proyecto nuevo; después manda el campo moneda.
+    PALABRAS_PROYECTO_DOLARES = ('aucallama', 'oasis 2')
+
+    nombre = models.CharField(max_length=255, unique=True, verbose_name="Nombre del Proyecto")
+    moneda = models.CharField(max_length=3, choices=MONEDA_CHOICES, default=MONEDA_SOLES, verbose_name="Moneda")
+    precio_lista_defecto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Precio Contado por Defecto")
+    precio_credito_12_meses_defecto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Precio Crédito 12 Meses por Defecto")
+    precio_credito_24_meses_defecto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Precio Crédito 24 Meses por Defecto")
+    precio_credito_36_meses_defecto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Precio Crédito 36 Meses por Defecto")
+    fecha_creacion = models.DateTimeField(default=timezone.now, editable=False)
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+
+    @property
+    def es_dolares(self): return self.moneda == self.MONEDA_DOLARES
+
+    @classmethod
+    def moneda_sugerida(cls, nombre):
+        nombre_normalizado = normalizar_nombre_proyecto(nombre)
+        return cls.MONEDA_DOLARES if any(p in nombre_normalizado for p in cls.PALABRAS_PROYECTO_DOLARES) else cls.MONEDA_SOLES
+
+    @classmethod
+    def invalidar_cache(cls):
+        _cache_proyectos['cargado_en'] = None
+
+    @classmethod
+    def _cache(cls):
+        ahora = timezone.now()
+        cargado_en = _cache_proyectos['cargado_en']
+        if cargado_en is None or (ahora - cargado_en).total_seconds() > CACHE_PROYECTOS_TTL_SEGUNDOS:
+            por_id, por_nombre = {}, {}
+            for pk, nombre, moneda in cls.objects.values_list('pk', 'nombre', 'moneda'):
+                por_id[pk] = (normalizar_nombre_proyecto(nombre), moneda)
+                por_nombre[normalizar_nombre_proyecto(nombre)] = (pk, moneda)
+            _cache_proyectos.update({'cargado_en': ahora, 'por_id': por_id, 'por_nombre': por_nombre})
+        return _cache_proyectos
+
+    @classmethod
+    def moneda_de(cls, proyecto_id=None, nombre=None):
+        """Moneda del proyecto por id o por nombre, desde la cache. Un nombre sin registrar usa la moneda sugerida."""
+        cache = cls._cache()
+        if proyecto_id in cache['por_id']:
+            return cache['por_id'][proyecto_id][1]
+        registrado = cache['por_nombre'].get(normalizar_nombre_proyecto(nombre))
+        return registrado[1] if registrado else cls.moneda_sugerida(nombre)
+
+    @classmethod
+    def nombre_normalizado_de(cls, proyecto_id):
+        registrado = cls._cache()['por_id'].get(proyecto_id)
+        return registrado[0] if registrado else None
+
+    @classmethod
+    def obtener_o_crear_por_nombre(cls, nombre):
+        nombre = ' '.join((nombre or '').split())
+        proyecto = cls.objects.filter(nombre__iexact=nombre).first()
+        if proyecto is None:
+            try:
+                with transaction.atomic():
+                    proyecto = cls.objects.create(nombre=nombre, moneda=cls.moneda_sugerida(nombre))
+            except IntegrityError:
+                proyecto = cls.objects.get(nombre__iexact=nombre) # Creado en paralelo por otro worker
+        return proyecto.pk
+
+    def __str__(self): return f"{self.nombre} ({self.moneda})"
+    class Meta: verbose_name = "Proyecto"; verbose_name_plural = "Proyectos"; ordering = ['nombre']
+
+# Clave normalizada de un lote: la usan la restricción de unicidad y la depuración de duplicados
+CLAVE_LOTE = {
+    'clave_proyecto': Lower(Trim('ubicacion_proyecto')),
+    'clave_manzana': Lower(Trim('manzana')),
+    'clave_numero': Lower(Trim('numero_lote')),
+    'clave_etapa': Coalesce('etapa', Value(0)),
+}
+LOTE_IDENTIFICADO = Q(manzana__isnull=False, numero_lote__isnull=False) & ~Q(manzana='') & ~Q(numero_lote='')
+
 class Lote(models.Model):
     ESTADO_LOTE_CHOICES = [('Disponible', 'Disponible'), ('Reservado', 'Reservado'), ('Vendido', 'Vendido')]
     id_lote = models.CharField(max_length=50, unique=True, primary_key=True, verbose_name="ID Lote", editable=False)
     ubicacion_proyecto = models.CharField(max_length=255, verbose_name="Ubicación del Proyecto")
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.PROTECT, null=True, blank=True, related_name='lotes', verbose_name="Proyecto")
     manzana = models.CharField(max_length=50, blank=True, null=True, verbose_name="Manzana")
     numero_lote = models.CharField(max_length=50, blank=True, null=True, verbose_name="Número de Lote")
     etapa = models.PositiveSmallIntegerField(verbose_name="Etapa del Lote (Número)", blank=True, null=True, help_text="Número de la etapa del lote dentro del proyecto (ej: 1, 2, 3)")
@@ -74,11 +234,26 @@ class Lote(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.id_lote: self.id_lote = generar_siguiente_id(Lote, 'L', 4)
+        if self.ubicacion_proyecto and (not self.proyecto_id or Proyecto.nombre_normalizado_de(self.proyecto_id) != normalizar_nombre_proyecto(self.ubicacion_proyecto)):
+            self.proyecto_id = Proyecto.obtener_o_crear_por_nombre(self.ubicacion_proyecto)
+            if kwargs.get('update_fields') is not None and 'proyecto' not in kwargs['update_fields']:
+                kwargs['update_fields'] = list(kwargs['update_fields']) + ['proyecto']
         super().save(*args, **kwargs)
+    @property
+    def es_proyecto_dolares(self):
+        return Proyecto.moneda_de(self.proyecto_id, self.ubicacion_proyecto) == Proyecto.MONEDA_DOLARES
     def __str__(self):
         etapa_str = f" - Etapa: {self.etapa}" if self.etapa is not None else ""
         return f"{self.id_lote} ({self.ubicacion_proyecto}{etapa_str} - Mz: {self.manzana or 'S/M'} Lt: {self.numero_lote or 'S/N'})"
-    class Meta: verbose_name = "Lote"; verbose_name_plural = "Lotes"; ordering = ['ubicacion_proyecto', 'etapa', 'manzana', 'numero_lote']
+    class Meta:
+        verbose_name = "Lote"; verbose_name_plural = "Lotes"; ordering = ['ubicacion_proyecto', 'etapa', 'manzana', 'numero_lote']
+        constraints = [
+            # Un lote identificado (con manzana y número) no se repite dentro de su proyecto y etapa (ver duplicados_lotes.py)
+            models.UniqueConstraint(
+                *CLAVE_LOTE.values(), name='lote_ubicacion_unica', condition=LOTE_IDENTIFICADO,
+                violation_error_message="Ya existe un lote con el mismo proyecto, etapa, manzana y número.",
+            ),
+        ]
 
 class Cliente(models.Model):
     TIPO_DOCUMENTO_CHOICES = [('DNI', 'DNI'), ('RUC', 'RUC'), ('CE', 'Carnet de Extranjería'), ('Pasaporte', 'Pasaporte'), ('Otro', 'Otro')]
@@ -98,13 +273,20 @@ class Cliente(models.Model):
     email_secundario = models.EmailField(max_length=255, blank=True, null=True, verbose_name="Email Secundario")
     estado_civil = models.CharField(max_length=20, choices=ESTADO_CIVIL_CHOICES, blank=True, null=True, verbose_name="Estado Civil")
     profesion_ocupacion = models.CharField(max_length=100, blank=True, null=True, verbose_name="Profesión/Ocupación")
+    id_lead = models.CharField(max_length=50, blank=True, null=True, db_index=True, verbose_name="ID Lead (CRM)")
     fecha_registro = models.DateTimeField(default=timezone.now, editable=False)
     ultima_modificacion = models.DateTimeField(auto_now=True)
     def save(self, *args, **kwargs):
         if not self.id_cliente: self.id_cliente = generar_siguiente_id(Cliente, 'CLI', 4)
         super().save(*args, **kwargs)
     def __str__(self): return f"{self.nombres_completos_razon_social} ({self.id_cliente})"
-    class Meta: verbose_name = "Cliente"; verbose_name_plural = "Clientes"; ordering = ['nombres_completos_razon_social']
+    class Meta:
+        verbose_name = "Cliente"; verbose_name_plural = "Clientes"; ordering = ['nombres_completos_razon_social']
+        indexes = [
+            # Búsqueda por prefijo de DNI/teléfono (LIKE 'x%'); el índice de trigramas del nombre es solo de PostgreSQL (migración 0007)
+            models.Index(fields=['numero_documento'], name='cliente_documento_prefijo_idx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['telefono_principal'], name='cliente_telefono_prefijo_idx', opclasses=['varchar_pattern_ops']),
+        ]
 
 class Asesor(models.Model):
     # Eliminar TIPO_ASESOR_CHOICES y tipo_asesor_actual
@@ -169,7 +351,7 @@ class Asesor(models.Model):
     def __str__(self): return f"{self.nombre_asesor} ({self.id_asesor})"
     class Meta: verbose_name = "Asesor"; verbose_name_plural = "Asesores"; ordering = ['nombre_asesor']
 
-class Venta(models.Model):
+class Venta(SnapshotCamposMixin, models.Model):
     TIPO_VENTA_CONTADO = 'contado'
     TIPO_VENTA_CREDITO = 'credito'
     TIPO_VENTA_CHOICES = [(TIPO_VENTA_CONTADO, 'Contado'), (TIPO_VENTA_CREDITO, 'Crédito')]
@@ -206,17 +388,42 @@ class Venta(models.Model):
     precio_dolares = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Precio Venta ($)")
     tipo_cambio = models.DecimalField(max_digits=8, decimal_places=3, null=True, blank=True, verbose_name="Tipo de Cambio (S/ por $)")
 
+    # Totales mantenidos por procesar_pagos_de_venta; totales_pagos.verificar_totales detecta y corrige desvíos
+    monto_pagado_dolares = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Monto Pagado Actual ($)")
+    saldo_soles = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), verbose_name="Saldo Pendiente (S/.)")
+    saldo_dolares = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True, verbose_name="Saldo Pendiente ($)")
+    CAMPOS_TOTALES = ['monto_pagado_actual', 'monto_pagado_dolares', 'saldo_soles', 'saldo_dolares']
+
     @property
     def saldo_pendiente(self):
         valor_venta = self.valor_lote_venta if self.valor_lote_venta is not None else Decimal('0.00')
         monto_pagado = self.monto_pagado_actual if self.monto_pagado_actual is not None else Decimal('0.00')
         return valor_venta - monto_pagado
     
-    def actualizar_status_y_monto_pagado(self, save_instance=False):
-        total_pagado_registros = self.registros_pago.aggregate(total=Sum('monto_pago'))['total'] or Decimal('0.00')
-        monto_pagado_previo = self.monto_pagado_actual
+    def calcular_saldos(self):
+        """Actualiza saldo_soles y saldo_dolares en memoria desde el valor de venta y los montos pagados."""
+        es_proyecto_dolares = bool(self.lote_id and self.lote.es_proyecto_dolares)
+        self.saldo_soles, self.saldo_dolares = calcular_saldos_venta(
+            self.valor_lote_venta, self.monto_pagado_actual, self.precio_dolares, self.monto_pagado_dolares, es_proyecto_dolares,
+        )
+
+    def actualizar_status_y_monto_pagado(self, save_instance=False, pagos=None):
+        """
+        Recalcula los totales pagados, los saldos y status_venta; con save_instance los guarda en un solo
+        UPDATE si cambiaron. pagos: registros de pago ya cargados de la venta, para sumarlos en memoria.
+        """
+        if pagos is None:
+            totales = self.registros_pago.aggregate(soles=Sum('monto_pago'), dolares=Sum('monto_pago_dolares'))
+            total_pagado_registros = totales['soles'] or Decimal('0.00')
+            total_pagado_dolares = totales['dolares'] or Decimal('0.00')
+        else:
+            total_pagado_registros = sum((p.monto_pago or Decimal('0.00') for p in pagos), Decimal('0.00'))
+            total_pagado_dolares = sum((p.monto_pago_dolares or Decimal('0.00') for p in pagos), Decimal('0.00'))
+        totales_previos = [getattr(self, campo) for campo in self.CAMPOS_TOTALES]
         status_previo = self.status_venta
         self.monto_pagado_actual = total_pagado_registros
+        self.monto_pagado_dolares = total_pagado_dolares
+        self.calcular_saldos()
         
         # Actualizar status_venta basado en pagos y tipo de venta
         if self.status_venta not in [self.STATUS_VENTA_ANULADO, self.STATUS_VENTA_COMPLETADA]:
@@ -234,9 +441,9 @@ class Venta(models.Model):
         # La lógica de actualizar estado del lote se moverá a una señal post_save de Venta.
         # self._actualizar_estado_lote_asociado() # Ya no se llama aquí directamente
 
-        if save_instance and (self.monto_pagado_actual != monto_pagado_previo or self.status_venta != status_previo):
+        if save_instance and ([getattr(self, campo) for campo in self.CAMPOS_TOTALES] != totales_previos or self.status_venta != status_previo):
             print(f"[Venta {self.id_venta}] Método actualizar_status_y_monto_pagado llamando a super().save con update_fields: monto_pagado={self.monto_pagado_actual}, status={self.status_venta}")
-            super(Venta, self).save(update_fields=['monto_pagado_actual', 'status_venta'])
+            super(Venta, self).save(update_fields=[*self.CAMPOS_TOTALES, 'status_venta'])
             # Crear comisiones automáticamente si la venta está completada y firmada
             if self.status_venta == self.STATUS_VENTA_COMPLETADA and self.cliente_firmo_contrato:
                 self.crear_comisiones_automaticas()
@@ -324,8 +531,7 @@ class Venta(models.Model):
         recalculate_valor_lote = not self.pk or any(field in kwargs.get('update_fields', []) for field in ['lote', 'tipo_venta', 'plazo_meses_credito'])
 
         if recalculate_valor_lote and self.lote:
-            proyecto = self.lote.ubicacion_proyecto.strip().lower() if self.lote.ubicacion_proyecto else ''
-            if ('aucallama' in proyecto) or ('oasis 2' in proyecto):
+            if self.lote.es_proyecto_dolares:
                 if self.precio_dolares and self.tipo_cambio:
                     self.valor_lote_venta = (self.precio_dolares * self.tipo_cambio).quantize(Decimal('0.01'))
                 else:
@@ -344,6 +550,11 @@ class Venta(models.Model):
                         self.valor_lote_venta = precio_seleccionado
                     elif not self.valor_lote_venta or self.valor_lote_venta == Decimal('0.00'):
                         self.valor_lote_venta = self.lote.precio_lista_soles 
+
+        # Los saldos dependen del valor y del precio en dólares: se guardan junto con cualquier cambio
+        self.calcular_saldos()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'saldo_soles', 'saldo_dolares'}
         
         super().save(*args, **kwargs)
         
@@ -352,7 +563,12 @@ class Venta(models.Model):
             self.crear_comisiones_automaticas()
 
     def __str__(self): return f"Venta {self.id_venta} - Lote {self.lote.id_lote if self.lote else 'N/A'} ({self.get_status_venta_display()})"
-    class Meta: verbose_name = "Venta"; verbose_name_plural = "Ventas"; ordering = ['-fecha_venta']
+    class Meta:
+        verbose_name = "Venta"; verbose_name_plural = "Ventas"; ordering = ['-fecha_venta']
+        indexes = [
+            models.Index(fields=['fecha_venta', 'status_venta'], name='venta_fecha_status_idx'),  # Listado, dashboard, ranking, comisiones del mes
+            models.Index(fields=['lote', 'status_venta'], name='venta_lote_status_idx'),  # Estado del lote en las señales de Venta
+        ]
 
 
 
@@ -364,6 +580,9 @@ class PlanPagoVenta(models.Model):
     numero_cuotas = models.PositiveSmallIntegerField(verbose_name="Número de Cuotas")
     monto_cuota_regular_original = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Monto de Cuota Regular Original")
     fecha_inicio_pago_cuotas = models.DateField(verbose_name="Fecha de Vencimiento de Primera Cuota")
+    # Resumen del cronograma mantenido por recalcular_cuotas_pendientes (ver totales_pagos.py)
+    cuotas_pagadas = models.PositiveSmallIntegerField(default=0, verbose_name="Cuotas Pagadas")
+    proxima_cuota_vencimiento = models.DateField(null=True, blank=True, verbose_name="Vencimiento de la Próxima Cuota")
     observaciones = models.TextField(blank=True, null=True)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     ultima_modificacion = models.DateTimeField(auto_now=True)
@@ -383,192 +602,75 @@ class PlanPagoVenta(models.Model):
     
     def __str__(self): return f"Plan de Pago para Venta {self.venta.id_venta} - {self.numero_cuotas} cuotas"
     @transaction.atomic
-    def recalcular_cuotas_pendientes(self, save_cuotas=True):
-        print(f"\n[PlanPagoVenta ID {self.id_plan_pago}] >>> INICIO recalcular_cuotas_pendientes para Venta ID: {self.venta.id_venta}")
-        
-        # Determinar si es proyecto en dólares (Aucallama/Oasis 2)
-        es_proyecto_dolares = (
-            self.venta and self.venta.lote and (
-                'aucallama' in self.venta.lote.ubicacion_proyecto.lower() or
-                'oasis 2' in self.venta.lote.ubicacion_proyecto.lower()
-            )
-        )
-        
-        # Verificar si hay pagos registrados
-        if es_proyecto_dolares:
-            monto_total_pagado = sum(p.monto_pago_dolares or Decimal('0.00') for p in self.venta.registros_pago.all())
-        else:
-            monto_total_pagado = self.venta.monto_pagado_actual or Decimal('0.00')
-        
-        print(f"  Monto total pagado: {monto_total_pagado}")
-        
-        # Si no hay pagos, restaurar el plan a su estado inicial original
-        if monto_total_pagado <= Decimal('0.00'):
-            print(f"  No hay pagos registrados. Restaurando plan a estado inicial original...")
-            
-            # Eliminar todas las cuotas actuales
-            cuotas_actuales = self.cuotas.all()
-            if cuotas_actuales.exists():
-                print(f"  Eliminando {cuotas_actuales.count()} cuotas actuales...")
-                cuotas_actuales.delete()
-            
-            # Calcular el número de cuotas original basándose en el plazo de crédito de la venta
-            numero_cuotas_original = self.venta.plazo_meses_credito
-            if numero_cuotas_original == 0:
-                # Si no hay plazo definido, usar 24 cuotas como valor por defecto
-                numero_cuotas_original = 24
-                print(f"  No se encontró plazo de crédito, usando 24 cuotas por defecto")
-            
-            print(f"  Número de cuotas original: {numero_cuotas_original}")
-            
-            # Calcular el monto de cuota regular original
-            if es_proyecto_dolares:
-                precio_dolares = self.venta.precio_dolares or Decimal('0.00')
-                cuota_inicial_dolares = Decimal('0.00')
-                if self.venta.cuota_inicial_requerida and self.venta.cuota_inicial_requerida > Decimal('0.00'):
-                    if self.venta.tipo_cambio and self.venta.tipo_cambio > Decimal('0.00'):
-                        cuota_inicial_dolares = (self.venta.cuota_inicial_requerida / self.venta.tipo_cambio).quantize(Decimal('0.01'))
-                monto_financiado = precio_dolares - cuota_inicial_dolares
-            else:
-                monto_financiado = self.monto_total_credito
-            
-            numero_cuotas = self.numero_cuotas or 1
-            monto_cuota_original = (monto_financiado / Decimal(numero_cuotas)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            # Restaurar el monto_cuota_regular_original
-            self.monto_cuota_regular_original = monto_cuota_original
-            print(f"  Monto cuota regular restaurado a: {monto_cuota_original}")
-            
-            # Recrear las cuotas originales
-            from datetime import date
-            from dateutil.relativedelta import relativedelta
-            fecha_inicio = self.fecha_inicio_pago_cuotas
-            for i in range(1, numero_cuotas_original + 1):
-                fecha_vencimiento = fecha_inicio + relativedelta(months=i-1)
-                cuota = CuotaPlanPago(
-                    plan_pago_venta=self,
-                    numero_cuota=i,
-                    fecha_vencimiento=fecha_vencimiento,
-                    monto_programado=monto_cuota_original,
-                    monto_pagado=Decimal('0.00'),
-                    estado_cuota='pendiente',
-                    fecha_pago_efectivo=None
-                )
-                if es_proyecto_dolares:
-                    cuota.monto_programado_dolares = monto_cuota_original
-                cuota.save()
-                print(f"    Cuota N°{i} recreada: monto={monto_cuota_original}, vencimiento={fecha_vencimiento}")
-            
-            # Actualizar el plan
-            self.numero_cuotas = numero_cuotas_original
-            self.ultima_modificacion = timezone.now()
-            self.save(update_fields=['ultima_modificacion', 'numero_cuotas', 'monto_cuota_regular_original'])
-            
-            print(f"  Plan restaurado a estado inicial: {numero_cuotas_original} cuotas de {monto_cuota_original}")
-            print(f"[PlanPagoVenta ID {self.id_plan_pago}] <<< FIN recalcular_cuotas_pendientes (RESTAURADO)")
-            return
-        
-        # Si hay pagos, continuar con la lógica normal de recálculo
-        if es_proyecto_dolares:
-            # Para proyectos en dólares, calcular el monto financiado en dólares
-            precio_dolares = self.venta.precio_dolares or Decimal('0.00')
-            cuota_inicial_dolares = Decimal('0.00')
-            
-            # Si hay cuota inicial, convertirla de soles a dólares usando el tipo de cambio
-            if self.venta.cuota_inicial_requerida and self.venta.cuota_inicial_requerida > Decimal('0.00'):
-                if self.venta.tipo_cambio and self.venta.tipo_cambio > Decimal('0.00'):
-                    cuota_inicial_dolares = (self.venta.cuota_inicial_requerida / self.venta.tipo_cambio).quantize(Decimal('0.01'))
-            
-            monto_original_a_financiar_por_plan = precio_dolares - cuota_inicial_dolares
-            print(f"  [DÓLARES] Monto original a financiar (precio_dolares - cuota_inicial_dolares): {monto_original_a_financiar_por_plan}")
-            
-            # Calcular monto total pagado en dólares
-            monto_total_pagado_en_dolares = sum(p.monto_pago_dolares or Decimal('0.00') for p in self.venta.registros_pago.all())
-            print(f"  [DÓLARES] Monto total pagado en dólares: {monto_total_pagado_en_dolares}")
-            
-            saldo_capital_a_redistribuir = monto_original_a_financiar_por_plan - monto_total_pagado_en_dolares
-            print(f"  [DÓLARES] Saldo de capital del plan a redistribuir: {saldo_capital_a_redistribuir}")
-        else:
-            # Para proyectos en soles, usar la lógica original
-            monto_original_a_financiar_por_plan = self.monto_total_credito
-            monto_total_pagado = self.venta.monto_pagado_actual or Decimal('0.00')
-            print(f"  [SOLES] Monto original a financiar (del plan): {monto_original_a_financiar_por_plan}")
-            print(f"  [SOLES] Monto total pagado: {monto_total_pagado}")
-            
-            saldo_capital_a_redistribuir = monto_original_a_financiar_por_plan - monto_total_pagado
-            print(f"  [SOLES] Saldo de capital del plan a redistribuir: {saldo_capital_a_redistribuir}")
-        
-        if saldo_capital_a_redistribuir < Decimal('0.00'):
-            print(f"  Advertencia: Saldo a redistribuir calculado como {saldo_capital_a_redistribuir}, ajustando a 0.")
-            saldo_capital_a_redistribuir = Decimal('0.00')
+    def recalcular_cuotas_pendientes(self, save_cuotas=True, monto_total_pagado=None):
+        """
+        Calcula en memoria el cronograma objetivo (pagos.calcular_cronograma_objetivo) y lo aplica
+        contra la BD con un delete, un bulk_update y un bulk_create como máximo.
+        monto_total_pagado (en la moneda del plan) evita volver a sumar los pagos si ya se conoce.
+        """
+        venta = self.venta
+        print(f"\n[PlanPagoVenta ID {self.id_plan_pago}] >>> INICIO recalcular_cuotas_pendientes para Venta ID: {venta.id_venta}")
         
-        # NUEVA LÓGICA: No eliminar cuotas pagadas ni ninguna cuota existente
-        # Solo actualizar el estado y montos de las cuotas existentes, y crear nuevas si faltan
-        cuotas_existentes = list(self.cuotas.all().order_by('numero_cuota'))
-        num_cuotas_existentes = len(cuotas_existentes)
-        cuotas_necesarias = self.numero_cuotas
-        if num_cuotas_existentes < cuotas_necesarias:
-            # Definir SIEMPRE monto_cuota_original antes de crear cuotas
-            if es_proyecto_dolares:
-                precio_dolares = self.venta.precio_dolares or Decimal('0.00')
-                cuota_inicial_dolares = Decimal('0.00')
-                if self.venta.cuota_inicial_requerida and self.venta.cuota_inicial_requerida > Decimal('0.00'):
-                    if self.venta.tipo_cambio and self.venta.tipo_cambio > Decimal('0.00'):
-                        cuota_inicial_dolares = (self.venta.cuota_inicial_requerida / self.venta.tipo_cambio).quantize(Decimal('0.01'))
-                monto_financiado = precio_dolares - cuota_inicial_dolares
-                monto_cuota_original = (monto_financiado / Decimal(cuotas_necesarias)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            else:
-                monto_financiado = self.monto_total_credito
-                monto_cuota_original = (monto_financiado / Decimal(cuotas_necesarias)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            from datetime import timedelta
-            fecha_inicio = self.fecha_inicio_pago_cuotas
-            for i in range(num_cuotas_existentes + 1, cuotas_necesarias + 1):
-                fecha_vencimiento = fecha_inicio + timedelta(days=30 * (i - 1))
-                cuota = CuotaPlanPago(
-                    plan_pago_venta=self,
-                    numero_cuota=i,
-                    fecha_vencimiento=fecha_vencimiento,
-                    monto_programado=monto_cuota_original,
-                    monto_pagado=Decimal('0.00'),
-                    estado_cuota='pendiente',
-                    fecha_pago_efectivo=None
-                )
-                if es_proyecto_dolares:
-                    cuota.monto_programado_dolares = monto_cuota_original
-                cuota.save()
-        # --- Antes de actualizar cuotas existentes ---
-        if es_proyecto_dolares:
-            precio_dolares = self.venta.precio_dolares or Decimal('0.00')
-            cuota_inicial_dolares = Decimal('0.00')
-            if self.venta.cuota_inicial_requerida and self.venta.cuota_inicial_requerida > Decimal('0.00'):
-                if self.venta.tipo_cambio and self.venta.tipo_cambio > Decimal('0.00'):
-                    cuota_inicial_dolares = (self.venta.cuota_inicial_requerida / self.venta.tipo_cambio).quantize(Decimal('0.01'))
-            monto_financiado = precio_dolares - cuota_inicial_dolares
-            monto_cuota_original = (monto_financiado / Decimal(cuotas_necesarias)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        else:
-            monto_financiado = self.monto_total_credito
-            monto_cuota_original = (monto_financiado / Decimal(cuotas_necesarias)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        for cuota in cuotas_existentes:
-            if es_proyecto_dolares:
-                cuota.monto_programado_dolares = monto_cuota_original
-            else:
-                cuota.monto_programado = monto_cuota_original
-            if cuota.estado_cuota == 'pagada':
-                cuota.save(update_fields=['monto_programado', 'monto_programado_dolares'])
-                continue  # No modificar estado ni fecha de pago
-            cuota.estado_cuota = 'pendiente'
-            cuota.fecha_pago_efectivo = None
-            cuota.save(update_fields=['monto_programado', 'monto_programado_dolares', 'estado_cuota', 'fecha_pago_efectivo'])
+        es_proyecto_dolares = bool(venta and venta.lote and venta.lote.es_proyecto_dolares)
         
+        if monto_total_pagado is None:
+            monto_total_pagado = (venta.monto_pagado_dolares if es_proyecto_dolares else venta.monto_pagado_actual) or Decimal('0.00')
+        monto_financiado = calcular_monto_financiado(
+            es_proyecto_dolares, self.monto_total_credito,
+            precio_dolares=venta.precio_dolares, cuota_inicial_requerida=venta.cuota_inicial_requerida, tipo_cambio=venta.tipo_cambio,
+        )
+        print(f"  Monto total pagado: {monto_total_pagado}, monto financiado: {monto_financiado} ({'USD' if es_proyecto_dolares else 'S/'})")
+
+        cuotas_actuales = list(self.cuotas.all().order_by('numero_cuota'))
+        campos_cuota = ['fecha_vencimiento', 'monto_programado', 'monto_programado_dolares', 'monto_pagado', 'estado_cuota', 'fecha_pago_efectivo']
+        cronograma = calcular_cronograma_objetivo(
+            [CuotaObjetivo(numero_cuota=c.numero_cuota, **{campo: getattr(c, campo) for campo in campos_cuota}) for c in cuotas_actuales],
+            monto_financiado=monto_financiado,
+            monto_total_pagado=monto_total_pagado,
+            numero_cuotas_plan=self.numero_cuotas,
+            plazo_meses_credito=venta.plazo_meses_credito,
+            fecha_inicio=self.fecha_inicio_pago_cuotas,
+            es_proyecto_dolares=es_proyecto_dolares,
+            monto_cuota_regular_actual=self.monto_cuota_regular_original,
+        )
+
+        # Diff contra la BD: se reutilizan las cuotas existentes por numero_cuota
+        cuotas_por_numero = {c.numero_cuota: c for c in cuotas_actuales}
+        numeros_objetivo = {c.numero_cuota for c in cronograma.cuotas}
+        ids_a_eliminar = [c.id_cuota for c in cuotas_actuales if c.numero_cuota not in numeros_objetivo]
+        cuotas_a_actualizar, cuotas_a_crear, campos_modificados = [], [], set()
+        for objetivo in cronograma.cuotas:
+            cuota = cuotas_por_numero.get(objetivo.numero_cuota)
+            if cuota is None:
+                cuotas_a_crear.append(CuotaPlanPago(plan_pago_venta=self, numero_cuota=objetivo.numero_cuota, **{campo: getattr(objetivo, campo) for campo in campos_cuota}))
+                continue
+            cambios = [campo for campo in campos_cuota if getattr(cuota, campo) != getattr(objetivo, campo)]
+            if cambios:
+                for campo in cambios:
+                    setattr(cuota, campo, getattr(objetivo, campo))
+                campos_modificados.update(cambios)
+                cuotas_a_actualizar.append(cuota)
+
+        if ids_a_eliminar:
+            CuotaPlanPago.objects.filter(pk__in=ids_a_eliminar).delete()
+        if cuotas_a_actualizar:
+            CuotaPlanPago.objects.bulk_update(cuotas_a_actualizar, sorted(campos_modificados))
+        if cuotas_a_crear:
+            CuotaPlanPago.objects.bulk_create(cuotas_a_crear)
+        print(f"  Cuotas: {len(cuotas_a_crear)} creadas, {len(cuotas_a_actualizar)} actualizadas, {len(ids_a_eliminar)} eliminadas")
+
+        self.numero_cuotas = cronograma.numero_cuotas
+        self.monto_cuota_regular_original = cronograma.monto_cuota_regular_original
+        self.cuotas_pagadas, self.proxima_cuota_vencimiento = resumen_cuotas((c.estado_cuota, c.fecha_vencimiento) for c in cronograma.cuotas)
         self.ultima_modificacion = timezone.now()
-        self.save(update_fields=['ultima_modificacion', 'numero_cuotas', 'monto_cuota_regular_original']) 
-        print(f"  PlanPagoVenta ID {self.id_plan_pago} fecha de modificación actualizada.")
-        print(f"[PlanPagoVenta ID {self.id_plan_pago}] <<< FIN recalcular_cuotas_pendientes")
+        self.save(update_fields=['ultima_modificacion', 'numero_cuotas', 'monto_cuota_regular_original', 'cuotas_pagadas', 'proxima_cuota_vencimiento'])
+        print(f"[PlanPagoVenta ID {self.id_plan_pago}] <<< FIN recalcular_cuotas_pendientes{' (RESTAURADO)' if cronograma.restaurado else ''}")
     class Meta: verbose_name = "Plan de Pago de Venta"; verbose_name_plural = "Planes de Pago de Ventas"; ordering = ['-fecha_creacion']
 
 
-class CuotaPlanPago(models.Model):
+class CuotaPlanPago(SnapshotCamposMixin, models.Model):
     # ... (como estaba, incluyendo el método actualizar_estado) ...
+    CAMPOS_ESTADO = ['estado_cuota', 'fecha_pago_efectivo', 'monto_pagado', 'monto_programado']
     ESTADO_CUOTA_CHOICES = [ ('pendiente', 'Pendiente'), ('pagada', 'Pagada'), ('parcialmente_pagada', 'Parcialmente Pagada'), ('atrasada', 'Atrasada'), ('vencida_no_pagada', 'Vencida No Pagada'), ('cancelada_con_excedente', 'Cancelada con Excedente') ]
     id_cuota = models.AutoField(primary_key=True)
     plan_pago_venta = models.ForeignKey(PlanPagoVenta, on_delete=models.CASCADE, related_name='cuotas', verbose_name="Plan de Pago Asociado")
@@ -581,76 +683,98 @@ class CuotaPlanPago(models.Model):
     monto_programado_dolares = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Monto Programado de Cuota ($)")
     @property
     def saldo_cuota(self):
-        if self.plan_pago_venta and self.plan_pago_venta.venta and (
-            'aucallama' in self.plan_pago_venta.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in self.plan_pago_venta.venta.lote.ubicacion_proyecto.lower()
-        ):
-            return (self.monto_programado_dolares or 0) - sum(
-                p.monto_pago_dolares or 0 for p in self.pagos_que_la_cubren.all()
-            )
+        # monto_pagado está en la moneda del plan: dólares en proyectos en dólares
+        if self.plan_pago_venta and self.plan_pago_venta.venta and self.es_proyecto_dolares:
+            return (self.monto_programado_dolares or 0) - self.monto_pagado
         else:
             return self.monto_programado - self.monto_pagado
-    def actualizar_estado(self, save_instance=True):
-        original_estado = self.estado_cuota
-        original_fecha_pago = self.fecha_pago_efectivo
-        original_monto_pagado_instancia = self.monto_pagado 
-        original_monto_programado_instancia = self.monto_programado
-        
-        # Determinar si es proyecto en dólares (Aucallama/Oasis 2)
-        es_proyecto_dolares = (
-            self.plan_pago_venta and self.plan_pago_venta.venta and (
-                'aucallama' in self.plan_pago_venta.venta.lote.ubicacion_proyecto.lower() or
-                'oasis 2' in self.plan_pago_venta.venta.lote.ubicacion_proyecto.lower()
-            )
-        )
-        
-        # Para proyectos en dólares, usar monto_programado_dolares y calcular monto_pagado en dólares
+    @property
+    def es_proyecto_dolares(self):
+        return self.plan_pago_venta.venta.lote.es_proyecto_dolares
+
+    def _calcular_estado_en_memoria(self, es_proyecto_dolares, monto_pagado_dolares=None, hoy=None):
+        """Recalcula estado_cuota y fecha_pago_efectivo sin tocar la BD."""
+        hoy = hoy or timezone.now().date()
+        # Para proyectos en dólares, monto_pagado ya está en dólares (moneda del plan)
         if es_proyecto_dolares:
             monto_programado = self.monto_programado_dolares or Decimal('0.00')
-            monto_pagado = sum(p.monto_pago_dolares or Decimal('0.00') for p in self.pagos_que_la_cubren.all())
+            monto_pagado = monto_pagado_dolares if monto_pagado_dolares is not None else self.monto_pagado
         else:
             monto_programado = self.monto_programado
             monto_pagado = self.monto_pagado
-        
-        if monto_programado <= Decimal('0.00'): 
-            self.estado_cuota = 'pagada'
-            if not self.fecha_pago_efectivo : self.fecha_pago_efectivo = timezone.now().date()
-        elif monto_pagado >= monto_programado:
-            self.estado_cuota = 'pagada' 
-            if not self.fecha_pago_efectivo: self.fecha_pago_efectivo = timezone.now().date()
-        elif monto_pagado > Decimal('0.00'):
-            self.estado_cuota = 'parcialmente_pagada'
-            self.fecha_pago_efectivo = None
-        else: 
-            self.estado_cuota = 'pendiente'
-            self.fecha_pago_efectivo = None
-        if self.estado_cuota not in ['pagada', 'cancelada_con_excedente'] and self.fecha_vencimiento < timezone.now().date():
-            if self.estado_cuota == 'pendiente': self.estado_cuota = 'vencida_no_pagada'
-            elif self.estado_cuota == 'parcialmente_pagada': self.estado_cuota = 'atrasada'
-        campos_a_actualizar = []
-        current_db_instance = None
-        if not self._state.adding and self.pk:
-            try: current_db_instance = self.__class__.objects.get(pk=self.pk)
-            except self.__class__.DoesNotExist: pass
-        if current_db_instance:
-            if self.estado_cuota != current_db_instance.estado_cuota: campos_a_actualizar.append('estado_cuota')
-            if self.fecha_pago_efectivo != current_db_instance.fecha_pago_efectivo: campos_a_actualizar.append('fecha_pago_efectivo')
-            if self.monto_pagado != current_db_instance.monto_pagado: campos_a_actualizar.append('monto_pagado')
-            if self.monto_programado != current_db_instance.monto_programado: campos_a_actualizar.append('monto_programado')
+        self.estado_cuota = calcular_estado_cuota(monto_programado, monto_pagado, self.fecha_vencimiento, hoy)
+        if self.estado_cuota == 'pagada':
+            if not self.fecha_pago_efectivo: self.fecha_pago_efectivo = hoy
         else:
-            if self.estado_cuota != original_estado: campos_a_actualizar.append('estado_cuota')
-            if self.fecha_pago_efectivo != original_fecha_pago: campos_a_actualizar.append('fecha_pago_efectivo')
-            if self.monto_pagado != original_monto_pagado_instancia : campos_a_actualizar.append('monto_pagado')
-            if hasattr(self, '_monto_programado_changed_in_recalc') and self._monto_programado_changed_in_recalc:
-                if 'monto_programado' not in campos_a_actualizar: campos_a_actualizar.append('monto_programado')
-                delattr(self, '_monto_programado_changed_in_recalc')
+            self.fecha_pago_efectivo = None
+
+    def actualizar_estado(self, save_instance=True, es_proyecto_dolares=None, monto_pagado_dolares=None):
+        """
+        Recalcula el estado de la cuota. El llamador puede pasar la moneda del proyecto y el monto
+        pagado en dólares para evitar recorrer plan -> venta -> lote. Los campos modificados se
+        detectan contra los valores cargados de la BD (SnapshotCamposMixin), sin volver a consultarla.
+        """
+        if es_proyecto_dolares is None:
+            es_proyecto_dolares = self.es_proyecto_dolares
+        self._calcular_estado_en_memoria(es_proyecto_dolares, monto_pagado_dolares)
+        campos_a_actualizar = self.campos_modificados(self.CAMPOS_ESTADO)
         if save_instance and campos_a_actualizar and self.pk:
-            print(f"    [Cuota ID {self.pk}] Guardando cambios en cuota. Campos: {list(set(campos_a_actualizar))}. Valores: E={self.estado_cuota}, FP={self.fecha_pago_efectivo}, MP={self.monto_pagado}, MProg={self.monto_programado}")
-            super(CuotaPlanPago, self).save(update_fields=list(set(campos_a_actualizar)))
+            print(f"    [Cuota ID {self.pk}] Guardando cambios en cuota. Campos: {campos_a_actualizar}. Valores: E={self.estado_cuota}, FP={self.fecha_pago_efectivo}, MP={self.monto_pagado}, MProg={self.monto_programado}")
+            super(CuotaPlanPago, self).save(update_fields=campos_a_actualizar)
         elif save_instance and not campos_a_actualizar and self.pk:
             print(f"    [Cuota ID {self.pk}] No hubo cambios detectados para guardar en cuota.")
+
+    @classmethod
+    def actualizar_estados(cls, cuotas, es_proyecto_dolares=None, montos_pagados_dolares=None, hoy=None):
+        """
+        Versión por lotes de actualizar_estado: recalcula en memoria y guarda todas las cuotas
+        modificadas con un solo bulk_update. montos_pagados_dolares es un dict opcional id_cuota -> monto.
+        Devuelve la lista de cuotas que cambiaron.
+        """
+        cuotas = list(cuotas)
+        if not cuotas:
+            return []
+        if es_proyecto_dolares is None:
+            es_proyecto_dolares = cuotas[0].es_proyecto_dolares
+        montos_pagados_dolares = montos_pagados_dolares or {}
+        hoy = hoy or timezone.now().date()
+        modificadas, campos = [], set()
+        for cuota in cuotas:
+            cuota._calcular_estado_en_memoria(es_proyecto_dolares, montos_pagados_dolares.get(cuota.pk), hoy)
+            cambios = cuota.campos_modificados(cls.CAMPOS_ESTADO)
+            if cambios:
+                modificadas.append(cuota)
+                campos.update(cambios)
+        if modificadas:
+            cls.objects.bulk_update(modificadas, sorted(campos))
+            for cuota in modificadas:
+                cuota.tomar_snapshot(campos)
+        return modificadas
+
+    # Cambios de estado que dependen solo de la fecha (los montos no cambian): (estado actual, nuevo estado, ¿vencida?)
+    TRANSICIONES_VENCIMIENTO = [
+        ('pendiente', 'vencida_no_pagada', True),
+        ('parcialmente_pagada', 'atrasada', True),
+        ('vencida_no_pagada', 'pendiente', False),
+        ('atrasada', 'parcialmente_pagada', False),
+    ]
+
+    @classmethod
+    def barrer_vencimientos(cls, hoy=None):
+        """
+        Pasa a su estado vencido las cuotas cuya fecha de vencimiento ya pasó (y revierte las que dejaron
+        de estar vencidas) con un UPDATE por transición, igual que calcular_estado_cuota.
+        Devuelve {'origen->destino': cantidad}.
+        """
+        hoy = hoy or timezone.now().date()
+        conteos = {}
+        with transaction.atomic():
+            for origen, destino, vencida in cls.TRANSICIONES_VENCIMIENTO:
+                filtro = {'fecha_vencimiento__lt': hoy} if vencida else {'fecha_vencimiento__gte': hoy}
+                conteos[f'{origen}->{destino}'] = cls.objects.filter(estado_cuota=origen, **filtro).update(estado_cuota=destino)
+        return conteos
     def __str__(self): return f"Cuota {self.numero_cuota} - Venta {self.plan_pago_venta.venta.id_venta} - Vence: {self.fecha_vencimiento}"
-    class Meta: verbose_name = "Cuota de Plan de Pago"; verbose_name_plural = "Cuotas de Planes de Pago"; ordering = ['plan_pago_venta', 'numero_cuota']; unique_together = ('plan_pago_venta', 'numero_cuota')
+    class Meta: verbose_name = "Cuota de Plan de Pago"; verbose_name_plural = "Cuotas de Planes de Pago"; ordering = ['plan_pago_venta', 'numero_cuota']; unique_together = ('plan_pago_venta', 'numero_cuota'); indexes = [models.Index(fields=['estado_cuota', 'fecha_vencimiento'], name='cuota_estado_venc_idx')]
 
 class ActividadDiaria(models.Model):
     # Cambiar id_actividad de AutoField a CharField y añadir lógica de generación
@@ -675,11 +799,12 @@ class ActividadDiaria(models.Model):
         verbose_name = "Actividad Diaria"
         verbose_name_plural = "Actividades Diarias"
         ordering = ['-fecha_actividad', 'asesor']
+        indexes = [models.Index(fields=['asesor', 'fecha_actividad'], name='actividad_asesor_fecha_idx')]  # get_or_create de las señales de Presencia
         # unique_together ya no es necesario si id_actividad es el PK. 
         # Si quieres mantener la unicidad de fecha y asesor, puedes añadirla de nuevo si id_actividad no fuera el PK.
         # unique_together = ('fecha_actividad', 'asesor') # Comentado si id_actividad es PK único
 
-class Presencia(models.Model):
+class Presencia(SnapshotCamposMixin, models.Model):
     MEDIO_CAPTACION_CHOICES = [('campo_opc', 'Campo OPC'), ('redes_facebook', 'Redes Facebook'),('redes_instagram', 'Redes Instagram'), ('redes_tiktok', 'Redes TikTok'),('referido', 'Referido'), ('web', 'Página Web'), ('otro', 'Otro'),]
     MODALIDAD_PRESENCIA_CHOICES = [('presencial', 'Presencial'), ('virtual', 'Virtual')]
     STATUS_PRESENCIA_REALIZADA = 'realizada'
@@ -730,8 +855,9 @@ class Presencia(models.Model):
         verbose_name = "Presencia de Cliente"
         verbose_name_plural = "Presencias de Clientes"
         ordering = ['-fecha_hora_presencia']
+        indexes = [models.Index(fields=['fecha_hora_presencia', 'tipo_tour', 'status_presencia'], name='presencia_fecha_tour_idx')]  # Listado y métricas por día
 # --- MODELO REGISTROPAGO ---
-class RegistroPago(models.Model):
+class RegistroPago(SnapshotCamposMixin, models.Model):
     METODO_PAGO_CHOICES = [('efectivo', 'Efectivo'),('transferencia', 'Transferencia Bancaria'),('tarjeta_credito', 'Tarjeta de Crédito'),('tarjeta_debito', 'Tarjeta de Débito'),('yape_plin', 'Yape/Plin'),('otro', 'Otro'),]
     
     # Cambiar id_pago de AutoField a CharField
@@ -765,103 +891,107 @@ class RegistroPago(models.Model):
         verbose_name = "Registro de Pago"
         verbose_name_plural = "Registros de Pagos"
         ordering = ['-fecha_pago']
+        indexes = [
+            models.Index(fields=['venta', 'fecha_pago'], name='pago_venta_fecha_idx'),  # Pagos de una venta en orden de aplicación
+            models.Index(fields=['fecha_pago'], name='pago_fecha_idx'),  # Métricas y recaudo por día
+        ]
+
+# --- MÉTRICAS DEL DASHBOARD ---
+class MetricaDashboardDiaria(models.Model):
+    """
+    Tabla de hechos del dashboard: una fila por día y combinación de dimensiones, con la cantidad
+    y el monto agregados. Se reconstruye por día desde metricas.py; no se edita a mano.
+    - venta: fecha_venta, vendedor principal, status de la venta; monto = valor_lote_venta.
+    - pago: fecha_pago y dimensiones de la venta del pago; monto = monto_pago.
+    - presencia: fecha de la presencia sin asesor (conteo global).
+    - presencia_asesor: la misma presencia una vez por cada asesor distinto que participó.
+    """
+    FUENTE_VENTA = 'venta'; FUENTE_PAGO = 'pago'; FUENTE_PRESENCIA = 'presencia'; FUENTE_PRESENCIA_ASESOR = 'presencia_asesor'
+    FUENTE_CHOICES = [(FUENTE_VENTA, 'Ventas'), (FUENTE_PAGO, 'Pagos'), (FUENTE_PRESENCIA, 'Presencias'), (FUENTE_PRESENCIA_ASESOR, 'Presencias por Asesor')]
+
+    fecha = models.DateField(verbose_name="Fecha")
+    fuente = models.CharField(max_length=20, choices=FUENTE_CHOICES, verbose_name="Fuente")
+    asesor = models.ForeignKey(Asesor, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name="Asesor")
+    proyecto = models.ForeignKey(Proyecto, on_delete=models.CASCADE, null=True, blank=True, related_name='+', verbose_name="Proyecto")
+    tipo_venta = models.CharField(max_length=10, blank=True, null=True, verbose_name="Tipo de Venta")
+    medio_captacion = models.CharField(max_length=50, blank=True, null=True, verbose_name="Medio de Captación")
+    status = models.CharField(max_length=30, blank=True, null=True, verbose_name="Status", help_text="Status de la venta (ventas y pagos) o de la presencia.")
+    tipo_tour = models.CharField(max_length=10, blank=True, null=True, verbose_name="Tipo de Presencia")
+    cantidad = models.PositiveIntegerField(default=0, verbose_name="Cantidad")
+    monto = models.DecimalField(max_digits=14, decimal_places=2, default=Decimal('0.00'), verbose_name="Monto (S/.)")
+
+    def __str__(self): return f"{self.get_fuente_display()} {self.fecha}: {self.cantidad} / S/. {self.monto}"
+    class Meta: verbose_name = "Métrica Diaria del Dashboard"; verbose_name_plural = "Métricas Diarias del Dashboard"; ordering = ['-fecha', 'fuente']; indexes = [models.Index(fields=['fuente', 'fecha'], name='metrica_fuente_fecha_idx')]
 
 # --- FUNCIÓN AUXILIAR PARA APLICAR PAGOS (DEBE ESTAR ANTES DE LAS SEÑALES QUE LA USAN) ---
-def aplicar_pagos_a_cuotas_del_plan(plan: PlanPagoVenta, venta_obj: Venta):
+def aplicar_pagos_a_cuotas_del_plan(plan: PlanPagoVenta, venta_obj: Venta, pago_agregado=None, pago_eliminado=None, pagos=None):
+    """
+    Aplica los pagos de la venta a las cuotas del plan (ver reglas en pagos.py).
+    - pago_agregado: aplica solo ese pago sobre los saldos actuales.
+    - pago_eliminado: revierte solo ese pago.
+    - ninguno: reconciliación completa, reaplicando todo el historial.
+    El modo incremental cae a la reconciliación completa si el pago no es el último en orden o si
+    los saldos guardados no son consistentes. Los cambios se guardan con bulk_update.
+    pagos: registros de la venta ya cargados en orden (fecha_pago, id_pago); si no, se consultan.
+    """
     print(f"--- [Helper Function] Iniciando aplicar_pagos_a_cuotas_del_plan para Plan ID {plan.id_plan_pago} de Venta ID {venta_obj.id_venta} ---")
     
-    # Determinar si es proyecto en dólares (Aucallama/Oasis 2)
-    es_proyecto_dolares = (
-        'aucallama' in venta_obj.lote.ubicacion_proyecto.lower() or
-        'oasis 2' in venta_obj.lote.ubicacion_proyecto.lower()
-    )
-    print(f"  Proyecto en dólares: {es_proyecto_dolares}")
-    
-    cuotas_del_plan_qs = plan.cuotas.all().order_by('numero_cuota')
-
-    # Resetear montos pagados de todas las cuotas del plan y desvincular RegistroPagos
-    for cuota_reset in cuotas_del_plan_qs:
-        if cuota_reset.monto_pagado != Decimal('0.00') or cuota_reset.fecha_pago_efectivo is not None or cuota_reset.estado_cuota != 'pendiente':
-            cuota_reset.monto_pagado = Decimal('0.00')
-            cuota_reset.fecha_pago_efectivo = None
-            cuota_reset.actualizar_estado(save_instance=True)
-
-    # Desvincular todos los RegistroPago de esta venta que podrían estar vinculados a cuotas de ESTE plan
-    RegistroPago.objects.filter(venta=venta_obj, cuota_plan_pago_cubierta__plan_pago_venta=plan).update(cuota_plan_pago_cubierta=None)
-    print(f"    Montos pagados de cuotas del Plan {plan.id_plan_pago} reseteados y pagos desvinculados.")
-
-    cuotas_del_plan_actualizadas = list(plan.cuotas.all().order_by('numero_cuota'))
-    todos_los_pagos_de_la_venta = venta_obj.registros_pago.all().order_by('fecha_pago', 'id_pago')
-
-    for pago_individual in todos_los_pagos_de_la_venta:
-        # Para proyectos en dólares, usar monto_pago_dolares; para otros, usar monto_pago
-        if es_proyecto_dolares:
-            monto_restante_del_pago = pago_individual.monto_pago_dolares or Decimal('0.00')
-            print(f"  Procesando Pago ID {pago_individual.id_pago}, Monto original del pago (USD): {monto_restante_del_pago}")
-        else:
-            monto_restante_del_pago = pago_individual.monto_pago
-            print(f"  Procesando Pago ID {pago_individual.id_pago}, Monto original del pago (S/): {monto_restante_del_pago}")
-
-        # Si el pago ya tiene cuota_plan_pago_cubierta asignada, aplícalo SOLO a esa cuota
-        if pago_individual.cuota_plan_pago_cubierta:
-            cuota = pago_individual.cuota_plan_pago_cubierta
-            # Para proyectos en dólares, usar monto_programado_dolares; para otros, usar monto_programado
-            if es_proyecto_dolares:
-                monto_programado_cuota = cuota.monto_programado_dolares or Decimal('0.00')
-                monto_pagado_cuota = sum(p.monto_pago_dolares or Decimal('0.00') for p in cuota.pagos_que_la_cubren.all())
-            else:
-                monto_programado_cuota = cuota.monto_programado
-                monto_pagado_cuota = cuota.monto_pagado
-            
-            pago_aplicado = min(monto_restante_del_pago, monto_programado_cuota - monto_pagado_cuota)
-            if pago_aplicado > Decimal('0.00'):
-                if es_proyecto_dolares:
-                    # Para proyectos en dólares, actualizar monto_pagado basado en dólares
-                    cuota.monto_pagado = monto_pagado_cuota + pago_aplicado
-                else:
-                    cuota.monto_pagado += pago_aplicado
-                cuota.actualizar_estado(save_instance=True)
-                print(f"    Pago ID {pago_individual.id_pago} aplicado SOLO a cuota N°{cuota.numero_cuota} (seleccionada por el usuario). Monto aplicado: {pago_aplicado}")
-            continue  # No aplicar a otras cuotas
-
-        # Si no tiene cuota específica, aplicar secuencialmente
-        pago_vinculado_a_cuota_en_este_pago = False
-        for cuota_iter in cuotas_del_plan_actualizadas:
-            if monto_restante_del_pago <= Decimal('0.00'):
-                break
-                
-            # Para proyectos en dólares, usar monto_programado_dolares; para otros, usar monto_programado
-            if es_proyecto_dolares:
-                monto_programado_cuota = cuota_iter.monto_programado_dolares or Decimal('0.00')
-                monto_pagado_cuota = sum(p.monto_pago_dolares or Decimal('0.00') for p in cuota_iter.pagos_que_la_cubren.all())
-            else:
-                monto_programado_cuota = cuota_iter.monto_programado
-                monto_pagado_cuota = cuota_iter.monto_pagado
-            
-            saldo_de_esta_cuota = monto_programado_cuota - monto_pagado_cuota
-            if saldo_de_esta_cuota <= Decimal('0.00'):
-                continue
-            pago_aplicado_a_esta_cuota = min(monto_restante_del_pago, saldo_de_esta_cuota)
-            if pago_aplicado_a_esta_cuota > Decimal('0.00'):
-                if es_proyecto_dolares:
-                    # Para proyectos en dólares, actualizar monto_pagado basado en dólares
-                    cuota_iter.monto_pagado = monto_pagado_cuota + pago_aplicado_a_esta_cuota
-                else:
-                    cuota_iter.monto_pagado += pago_aplicado_a_esta_cuota
-                    
-                if not pago_vinculado_a_cuota_en_este_pago:
-                    RegistroPago.objects.filter(pk=pago_individual.pk).update(cuota_plan_pago_cubierta=cuota_iter)
-                    pago_individual.cuota_plan_pago_cubierta = cuota_iter
-                    pago_vinculado_a_cuota_en_este_pago = True
-                    print(f"      Pago ID {pago_individual.id_pago} vinculado a cuota N°{cuota_iter.numero_cuota}")
-                monto_restante_del_pago -= pago_aplicado_a_esta_cuota
-                cuota_iter.actualizar_estado(save_instance=True)
-        if monto_restante_del_pago > Decimal('0.00'):
-            print(f"  ADVERTENCIA: Del Pago ID {pago_individual.id_pago}, quedó un excedente de {monto_restante_del_pago} después de aplicar a todas las cuotas disponibles.")
+    es_proyecto_dolares = venta_obj.lote.es_proyecto_dolares
+    hoy = timezone.now().date()
+
+    def monto_en_moneda_del_plan(pago):
+        monto = pago.monto_pago_dolares if es_proyecto_dolares else pago.monto_pago
+        return monto or Decimal('0.00')
+
+    cuotas = list(plan.cuotas.all().order_by('numero_cuota'))
+    if pagos is None:
+        pagos = list(venta_obj.registros_pago.all().order_by('fecha_pago', 'id_pago'))
+    saldos = [
+        SaldoCuota(
+            id_cuota=c.id_cuota, numero_cuota=c.numero_cuota, fecha_vencimiento=c.fecha_vencimiento,
+            monto_programado=(c.monto_programado_dolares or Decimal('0.00')) if es_proyecto_dolares else c.monto_programado,
+            monto_pagado=c.monto_pagado, fecha_pago_efectivo=c.fecha_pago_efectivo, estado_cuota=c.estado_cuota,
+        )
+        for c in cuotas
+    ]
+    pagos_aplicables = [PagoAplicable(p.id_pago, p.fecha_pago, monto_en_moneda_del_plan(p)) for p in pagos]
+
+    if pago_agregado is not None:
+        nuevo = PagoAplicable(pago_agregado.id_pago, pago_agregado.fecha_pago, monto_en_moneda_del_plan(pago_agregado))
+        resultado = agregar_pago(saldos, pagos_aplicables, nuevo, hoy)
+    elif pago_eliminado is not None:
+        eliminado = PagoAplicable(pago_eliminado.id_pago, pago_eliminado.fecha_pago, monto_en_moneda_del_plan(pago_eliminado))
+        resultado = quitar_pago(saldos, pagos_aplicables, eliminado, hoy)
+    else:
+        resultado = reconstruir_asignacion(saldos, pagos_aplicables, hoy)
+    print(f"  Modo de aplicación: {resultado.modo} (proyecto en dólares: {es_proyecto_dolares})")
+
+    cuotas_por_id = {c.id_cuota: c for c in cuotas}
+    cuotas_modificadas = []
+    for saldo in resultado.cuotas:
+        cuota = cuotas_por_id[saldo.id_cuota]
+        if (cuota.monto_pagado, cuota.estado_cuota, cuota.fecha_pago_efectivo) != (saldo.monto_pagado, saldo.estado_cuota, saldo.fecha_pago_efectivo):
+            cuota.monto_pagado = saldo.monto_pagado
+            cuota.estado_cuota = saldo.estado_cuota
+            cuota.fecha_pago_efectivo = saldo.fecha_pago_efectivo
+            cuotas_modificadas.append(cuota)
+    if cuotas_modificadas:
+        CuotaPlanPago.objects.bulk_update(cuotas_modificadas, ['monto_pagado', 'estado_cuota', 'fecha_pago_efectivo'])
+
+    pagos_modificados = []
+    for pago in pagos:
+        if pago.id_pago in resultado.vinculos and pago.cuota_plan_pago_cubierta_id != resultado.vinculos[pago.id_pago]:
+            pago.cuota_plan_pago_cubierta_id = resultado.vinculos[pago.id_pago]
+            pagos_modificados.append(pago)
+    if pagos_modificados:
+        RegistroPago.objects.bulk_update(pagos_modificados, ['cuota_plan_pago_cubierta'])
+    print(f"  Cuotas actualizadas: {len(cuotas_modificadas)}, pagos revinculados: {len(pagos_modificados)}")
+    if resultado.excedente > Decimal('0.00'):
+        print(f"  ADVERTENCIA: quedó un excedente de {resultado.excedente} después de aplicar a todas las cuotas disponibles.")
     
     # NUEVA LÓGICA: Llamar a recalcular_cuotas_pendientes para eliminar cuotas completamente pagadas y renumérandolas
     print(f"  Llamando a recalcular_cuotas_pendientes para eliminar cuotas completamente pagadas y renumérandolas...")
-    plan.recalcular_cuotas_pendientes(save_cuotas=True)
+    plan.recalcular_cuotas_pendientes(save_cuotas=True, monto_total_pagado=sum((p.monto for p in pagos_aplicables), Decimal('0.00')))
     
     print(f"--- [Helper Function] FIN aplicar_pagos_a_cuotas_del_plan para Plan ID {plan.id_plan_pago} ---")
 
@@ -869,205 +999,100 @@ def aplicar_pagos_a_cuotas_del_plan(plan: PlanPagoVenta, venta_obj: Venta):
 # --- SEÑALES ---
 # --- SEÑALES ---
 # --- INICIO: SEÑALES PARA ACTUALIZAR ESTADO DEL LOTE BASADO EN VENTA ---
+# La regla está en estado_lotes.py. Una venta guardada sin cambios en status, firma o lote (lo
+# habitual al registrar pagos) no toca el lote; si cambió de lote se revisan el anterior y el nuevo.
 @receiver(post_save, sender=Venta)
 def actualizar_estado_lote_por_venta_guardada(sender, instance: Venta, created, **kwargs):
-    if not instance.lote:
+    from .estado_lotes import CAMPOS_VENTA, actualizar_estado_lote
+    if not created and not instance.campos_modificados(CAMPOS_VENTA):
         return
-
-    with transaction.atomic():
-        lote_obj = Lote.objects.select_for_update().get(pk=instance.lote.pk)
-        current_lote_estado_db = lote_obj.estado_lote
-        
-        print(f"\n[Signal Venta Save/Update - Venta ID: {instance.id_venta} (creada: {created}), Lote ID: {lote_obj.id_lote}]")
-        print(f"  Venta actual (instance): status='{instance.status_venta}', firma='{instance.cliente_firmo_contrato}'")
-        print(f"  Lote (DB antes del cambio): estado='{current_lote_estado_db}'")
-
-        nuevo_estado_propuesto = 'Disponible' # Por defecto, el lote tiende a estar disponible
-
-        # Condición para VENDIDO:
-        # ¿Existe alguna venta para este lote que esté (Procesable Y Firmada) O (Completada Y Firmada), y NO Anulada?
-        es_vendido_por_alguna_venta = Venta.objects.filter(
-            lote=lote_obj,
-            cliente_firmo_contrato=True,
-            status_venta__in=[Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_COMPLETADA]
-        ).exclude(status_venta=Venta.STATUS_VENTA_ANULADO).exists()
-        
-        print(f"  Checkeo para 'Vendido': ¿Existe alguna venta P&F o C&F para el lote? -> {es_vendido_por_alguna_venta}")
-
-        if es_vendido_por_alguna_venta:
-            nuevo_estado_propuesto = 'Vendido'
-        else:
-            # Condición para RESERVADO:
-            # Si no está Vendido, ¿Existe alguna venta para este lote que esté PROCESABLE (sin importar firma) y NO Anulada?
-            es_reservado_por_alguna_venta_procesable = Venta.objects.filter(
-                lote=lote_obj, 
-                status_venta=Venta.STATUS_VENTA_PROCESABLE
-            ).exclude(status_venta=Venta.STATUS_VENTA_ANULADO).exists()
-            
-            print(f"  Checkeo para 'Reservado': ¿Existe alguna venta Procesable (y no vendida por firma) para el lote? -> {es_reservado_por_alguna_venta_procesable}")
-            if es_reservado_por_alguna_venta_procesable:
-                nuevo_estado_propuesto = 'Reservado'
-            # Else: Si no es Vendido ni Reservado por ninguna venta, se queda como 'Disponible' (el default)
-        
-        print(f"  Estado Lote Determinado por la señal: '{nuevo_estado_propuesto}'")
-
-        if current_lote_estado_db != nuevo_estado_propuesto:
-            lote_obj.estado_lote = nuevo_estado_propuesto
-            lote_obj.save(update_fields=['estado_lote'])
-            print(f"  Lote {lote_obj.id_lote} estado CAMBIADO a '{nuevo_estado_propuesto}'")
-        else:
-            print(f"  Lote {lote_obj.id_lote} ya está en estado '{current_lote_estado_db}'. No se realizaron cambios en el lote.")
+    for lote_id in {instance.lote_id, instance.valor_cargado('lote')} - {None}:
+        actualizar_estado_lote(lote_id)
 
 @receiver(post_delete, sender=Venta)
 def actualizar_estado_lote_por_venta_eliminada(sender, instance: Venta, **kwargs):
-    """
-    Actualiza el estado del Lote asociado cuando una Venta se elimina.
-    La lógica es la misma que cuando se guarda, ya que se reevalúa el estado del lote
-    basado en las ventas restantes.
-    """
-    if not instance.lote: # instance.lote aún debería ser accesible en post_delete
-        return
-        
-    # Para simular el estado de 'created=False' y que la lógica de la señal post_save se aplique correctamente
-    # al reevaluar, podemos llamar a la función directamente.
-    # No es necesario pasar 'created' si la lógica interna no depende de ello explícitamente para el lote.
-    print(f"[Signal Venta Delete] Venta ID {instance.id_venta} eliminada. Reevaluando estado de Lote {instance.lote.id_lote}.")
-    # Llamamos a la misma lógica de la señal post_save, pasándole la instancia de Venta eliminada.
-    # La función buscará otras ventas para determinar el estado del lote.
-    # No es ideal llamar a otra señal directamente, pero si la lógica es idéntica y está encapsulada:
-    # En lugar de llamar a la señal, podríamos extraer la lógica a una función helper y llamarla desde ambas señales.
-    # Por ahora, para simplicidad, si la lógica es la misma, podemos re-llamarla o duplicarla.
-    # Vamos a asumir que la lógica de actualizar_estado_lote_por_venta_guardada es la que debe ejecutarse.
-    # Para ello, necesitamos una instancia de Venta (que es 'instance' aquí).
-    # El 'created' no es relevante para esta re-evaluación.
-    
-    # Re-evaluamos el estado del lote basado en las ventas restantes
-    # Copiamos la lógica de la señal post_save aquí, ya que la instancia actual ya fue eliminada.
-    # No podemos llamar a actualizar_estado_lote_por_venta_guardada(sender, instance, created=False, **kwargs)
-    # porque la instancia de Venta ya no existe para ser "guardada".
-    # Necesitamos operar sobre el lote_id que tenía la venta.
-
-    lote_a_revisar = instance.lote # El objeto Lote sigue existiendo
-    
-    with transaction.atomic():
-        lote_obj = Lote.objects.select_for_update().get(pk=lote_a_revisar.pk)
-        current_lote_estado_db = lote_obj.estado_lote
-        nuevo_estado_propuesto = 'Disponible'
-
-        if Venta.objects.filter(
-            lote=lote_obj, 
-            cliente_firmo_contrato=True,
-            status_venta__in=[Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_COMPLETADA]
-        ).exclude(status_venta=Venta.STATUS_VENTA_ANULADO).exists(): # Excluir la Venta que se está eliminando (ya no existe en este query)
-            nuevo_estado_propuesto = 'Vendido'
-        else:
-            if Venta.objects.filter(
-                lote=lote_obj, 
-                status_venta=Venta.STATUS_VENTA_PROCESABLE
-            ).exclude(status_venta=Venta.STATUS_VENTA_ANULADO).exists():
-                nuevo_estado_propuesto = 'Reservado'
-
-        if current_lote_estado_db != nuevo_estado_propuesto:
-            lote_obj.estado_lote = nuevo_estado_propuesto
-            lote_obj.save(update_fields=['estado_lote'])
-            print(f"[Signal Venta Delete] Lote {lote_obj.id_lote} estado actualizado a '{nuevo_estado_propuesto}' tras eliminación de Venta {instance.id_venta}.")
-        else:
-            print(f"[Signal Venta Delete] Lote {lote_obj.id_lote} ya está en estado '{current_lote_estado_db}', no se requieren cambios tras eliminación de Venta {instance.id_venta}.")
+    from .estado_lotes import actualizar_estado_lote
+    if instance.lote_id:
+        actualizar_estado_lote(instance.lote_id)
 
 # --- FIN: SEÑALES PARA ACTUALIZAR ESTADO DEL LOTE BASADO EN VENTA ---
 
+@receiver(post_save, sender=Proyecto)
+@receiver(post_delete, sender=Proyecto)
+def invalidar_cache_proyectos(sender, **kwargs):
+    Proyecto.invalidar_cache()
+
+# Contadores de ActividadDiaria: incrementos F() por los pares (asesor, día) que cambiaron (ver actividad.py)
 @receiver(post_save, sender=Presencia)
 def gestionar_actividad_diaria_por_presencia_guardada(sender, instance, created, **kwargs):
-    if not instance.fecha_hora_presencia: return
-    fecha_actividad = instance.fecha_hora_presencia.date()
-    asesor_ids_actuales = set()
-    if instance.asesor_captacion_opc: asesor_ids_actuales.add(instance.asesor_captacion_opc_id)
-    if instance.asesor_call_agenda: asesor_ids_actuales.add(instance.asesor_call_agenda_id)
-    if instance.asesor_liner: asesor_ids_actuales.add(instance.asesor_liner_id)
-    if instance.asesor_closer: asesor_ids_actuales.add(instance.asesor_closer_id)
-    for asesor_id in filter(None, asesor_ids_actuales):
-        try:
-            asesor_obj = Asesor.objects.get(pk=asesor_id)
-            actividad, _ = ActividadDiaria.objects.get_or_create(asesor=asesor_obj, fecha_actividad=fecha_actividad, defaults={'presencias_generadas': 0})
-            presencias_del_dia_para_asesor = Presencia.objects.filter( (Q(asesor_captacion_opc_id=asesor_id) | Q(asesor_call_agenda_id=asesor_id) | Q(asesor_liner_id=asesor_id) | Q(asesor_closer_id=asesor_id)), fecha_hora_presencia__date=fecha_actividad, status_presencia=Presencia.STATUS_PRESENCIA_REALIZADA ).distinct().count()
-            if actividad.presencias_generadas != presencias_del_dia_para_asesor:
-                actividad.presencias_generadas = presencias_del_dia_para_asesor
-                actividad.save(update_fields=['presencias_generadas'])
-        except Asesor.DoesNotExist: continue
+    from .actividad import aplicar_cambio_presencia
+    aplicar_cambio_presencia(instance)
 
 @receiver(post_delete, sender=Presencia)
 def gestionar_actividad_diaria_por_presencia_eliminada(sender, instance, **kwargs):
-    if not instance.fecha_hora_presencia: return
-    fecha_actividad = instance.fecha_hora_presencia.date()
-    asesor_ids_afectados = set() 
-    if instance.asesor_captacion_opc: asesor_ids_afectados.add(instance.asesor_captacion_opc_id)
-    if instance.asesor_call_agenda: asesor_ids_afectados.add(instance.asesor_call_agenda_id)
-    if instance.asesor_liner: asesor_ids_afectados.add(instance.asesor_liner_id)
-    if instance.asesor_closer: asesor_ids_afectados.add(instance.asesor_closer_id)
-    for asesor_id in filter(None, asesor_ids_afectados):
-        try:
-            asesor_obj = Asesor.objects.get(pk=asesor_id)
-            actividad = ActividadDiaria.objects.filter(asesor=asesor_obj, fecha_actividad=fecha_actividad).first()
-            if actividad:
-                presencias_del_dia_para_asesor = Presencia.objects.filter( (Q(asesor_captacion_opc_id=asesor_id) | Q(asesor_call_agenda_id=asesor_id) | Q(asesor_liner_id=asesor_id) | Q(asesor_closer_id=asesor_id)), fecha_hora_presencia__date=fecha_actividad, status_presencia=Presencia.STATUS_PRESENCIA_REALIZADA ).distinct().count()
-                if actividad.presencias_generadas != presencias_del_dia_para_asesor:
-                    actividad.presencias_generadas = presencias_del_dia_para_asesor
-                    actividad.save(update_fields=['presencias_generadas'])
-        except Asesor.DoesNotExist: continue
+    from .actividad import aplicar_cambio_presencia
+    aplicar_cambio_presencia(instance, eliminada=True)
 
-@receiver(post_save, sender=RegistroPago)
-def procesar_registro_pago_guardado(sender, instance: RegistroPago, created, **kwargs):
+def procesar_pagos_de_venta(venta_id, pago_agregado=None, pago_eliminado=None):
+    """
+    Recalcula monto pagado, status y cuotas del plan de una venta tras cambios en sus pagos.
+    Con pago_agregado o pago_eliminado aplica ese cambio de forma incremental; sin ninguno reconcilia
+    todo el historial. Los montos programados se reajustan en el recálculo final de
+    aplicar_pagos_a_cuotas_del_plan, que ya recibe el total de los pagos cargados aquí, así que el
+    cronograma se recalcula una sola vez también tras una baja.
+    """
     with transaction.atomic():
-        print(f"\n[SEÑAL POST_SAVE RegistroPago ID {instance.id_pago}] Creado: {created}")
         try:
-            venta_obj = Venta.objects.select_for_update().get(pk=instance.venta_id)
+            venta_obj = Venta.objects.select_for_update(of=('self',)).select_related('lote', 'plan_pago_venta').get(pk=venta_id)
         except Venta.DoesNotExist:
-            print(f"  Venta ID {instance.venta_id} no encontrada para RegistroPago ID {instance.id_pago}. No se puede procesar.")
+            print(f"  Venta ID {venta_id} no encontrada (probablemente ya eliminada en cascada). No se procesan sus pagos.")
             return
-        
-        # Primero, actualizar el monto_pagado_actual y status de la Venta basado en todos los pagos
-        venta_obj.actualizar_status_y_monto_pagado(save_instance=True)
+        pagos = list(venta_obj.registros_pago.order_by('fecha_pago', 'id_pago'))
+
+        # 1. monto_pagado_actual y status_venta en un solo UPDATE. Aplicar los pagos a las cuotas no
+        # cambia ninguno de los dos, así que no hace falta volver a evaluarlos después.
+        venta_obj.actualizar_status_y_monto_pagado(save_instance=True, pagos=pagos)
         print(f"  Venta ID {venta_obj.id_venta} actualizada: Monto Pagado Actual = {venta_obj.monto_pagado_actual}, Status = {venta_obj.status_venta}")
 
-        # Si es venta a crédito y tiene plan, reaplicar todos los pagos para asegurar consistencia de cuotas
+        # 2. Si es venta a crédito y tiene plan, aplicar los pagos a las cuotas
         if venta_obj.tipo_venta == Venta.TIPO_VENTA_CREDITO and hasattr(venta_obj, 'plan_pago_venta') and venta_obj.plan_pago_venta:
-            aplicar_pagos_a_cuotas_del_plan(venta_obj.plan_pago_venta, venta_obj)
-            venta_obj.plan_pago_venta.refresh_from_db()  # <-- Asegura cuotas actualizadas
-        
-        # Finalmente, re-evaluar el estado de la venta, ya que la aplicación de pagos pudo completarla
-        # o cambiar su estado de procesable.
-        venta_obj.refresh_from_db() # Asegurar que cualquier cambio en venta_obj desde aplicar_pagos... se refleje
-        venta_obj.actualizar_status_y_monto_pagado(save_instance=True)
-        print(f"  Estado final Venta ID {venta_obj.id_venta} post-save pago y post-aplicación de pagos: {venta_obj.status_venta}")
+            plan = venta_obj.plan_pago_venta
+            aplicar_pagos_a_cuotas_del_plan(plan, venta_obj, pago_agregado=pago_agregado, pago_eliminado=pago_eliminado, pagos=pagos)
+
+@receiver(post_save, sender=RegistroPago)
+def procesar_registro_pago_guardado(sender, instance: RegistroPago, created, **kwargs):
+    from .pagos_agrupados import diferir_pago, CREADO, MODIFICADO
+    print(f"\n[SEÑAL POST_SAVE RegistroPago ID {instance.id_pago}] Creado: {created}")
+    if diferir_pago(instance, CREADO if created else MODIFICADO):
+        return  # Se procesa una vez por venta al cerrar agrupar_pagos()
+    procesar_pagos_de_venta(instance.venta_id, pago_agregado=instance if created else None)
 
 @receiver(post_delete, sender=RegistroPago)
 def procesar_registro_pago_eliminado(sender, instance: RegistroPago, **kwargs):
-    with transaction.atomic():
-        print(f"\n[SEÑAL POST_DELETE RegistroPago ID {instance.pk}] Venta ID asociada: {instance.venta_id}")
-        try:
-            venta_obj = Venta.objects.select_for_update().get(pk=instance.venta_id) 
-        except Venta.DoesNotExist:
-            print(f"  Venta ID {instance.venta_id} no encontrada (probablemente ya eliminada en cascada). La señal de eliminación de pago no realizará más acciones sobre esta Venta.")
-            return
+    from .pagos_agrupados import diferir_pago, ELIMINADO
+    print(f"\n[SEÑAL POST_DELETE RegistroPago ID {instance.pk}] Venta ID asociada: {instance.venta_id}")
+    if diferir_pago(instance, ELIMINADO):
+        return
+    procesar_pagos_de_venta(instance.venta_id, pago_eliminado=instance)
 
-        # 1. Actualizar el monto_pagado_actual y status_venta general de la Venta PRIMERO.
-        venta_obj.actualizar_status_y_monto_pagado(save_instance=True)
-        print(f"  Venta ID {venta_obj.id_venta} actualizada (por eliminación de pago): Monto Pagado Actual = {venta_obj.monto_pagado_actual}, Status = {venta_obj.status_venta}")
+# --- MÉTRICAS DEL DASHBOARD: marcar días a recalcular al confirmar la transacción ---
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+def marcar_metricas_por_venta(sender, instance, **kwargs):
+    from .metricas import marcar_venta
+    marcar_venta(instance, eliminada=kwargs.get('signal') is post_delete)
 
-        # 2. Si la venta es a crédito y tiene un plan:
-        if venta_obj.tipo_venta == Venta.TIPO_VENTA_CREDITO and hasattr(venta_obj, 'plan_pago_venta') and venta_obj.plan_pago_venta:
-            plan = venta_obj.plan_pago_venta
-            # a. REAPLICAR todos los pagos RESTANTES para reajustar monto_pagado y estados de cuotas.
-            print(f"  Re-aplicando pagos restantes a cuotas para Plan ID: {plan.id_plan_pago} de Venta ID {venta_obj.id_venta}")
-            aplicar_pagos_a_cuotas_del_plan(plan, venta_obj)
-            plan.refresh_from_db()  # <-- Asegura cuotas actualizadas
-            # b. RECALCULAR los montos programados de las cuotas pendientes.
-            print(f"  Llamando a recalcular_cuotas_pendientes para Plan ID: {plan.id_plan_pago} para reajustar montos programados.")
-            plan.recalcular_cuotas_pendientes(save_cuotas=True)
-        # 3. Finalmente, re-evaluar el estado de la venta una vez más.
-        venta_obj.refresh_from_db() 
-        venta_obj.actualizar_status_y_monto_pagado(save_instance=True)
-        print(f"  Estado final Venta ID {venta_obj.id_venta} post-delete y post-reapli/recalc: {venta_obj.status_venta}")
+@receiver(post_save, sender=RegistroPago)
+@receiver(post_delete, sender=RegistroPago)
+def marcar_metricas_por_pago(sender, instance, **kwargs):
+    from .metricas import marcar_pago
+    marcar_pago(instance, eliminado=kwargs.get('signal') is post_delete)
+
+@receiver(post_save, sender=Presencia)
+@receiver(post_delete, sender=Presencia)
+def marcar_metricas_por_presencia(sender, instance, **kwargs):
+    from .metricas import marcar_presencia
+    marcar_presencia(instance, eliminada=kwargs.get('signal') is post_delete)
 
 class DefinicionMetaComision(models.Model):
     id_definicion = models.AutoField(primary_key=True)
@@ -1162,6 +1187,41 @@ class ComisionVentaAsesor(models.Model):
         unique_together = ('venta', 'asesor', 'rol')
         ordering = ['venta', 'asesor']
 
+# --- CACHE DE RESPUESTAS: invalidación por ámbito (ver cache_respuestas.py) ---
+@receiver(post_save, sender=ComisionVentaAsesor)
+@receiver(post_delete, sender=ComisionVentaAsesor)
+def invalidar_respuestas_por_comision(sender, instance, **kwargs):
+    invalidar_meses(Venta.objects.filter(pk=instance.venta_id).values_list('fecha_venta', flat=True))
+
+@receiver(post_save, sender=Asesor)
+@receiver(post_delete, sender=Asesor)
+def invalidar_respuestas_por_asesor(sender, instance, **kwargs):
+    invalidar_respuestas(AMBITO_ASESORES)
+
+@receiver(post_save, sender=Lote)
+@receiver(post_delete, sender=Lote)
+def invalidar_respuestas_por_lote(sender, instance, **kwargs):
+    invalidar_respuestas(AMBITO_LOTES)
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Presencia)
+@receiver(post_delete, sender=Presencia)
+def invalidar_totales_de_clientes(sender, instance, **kwargs):
+    # Totales de los desplegables de clientes (con y sin presencia)
+    invalidar_respuestas(AMBITO_CLIENTES)
+
+# --- AUTOCOMPLETADO: índice de prefijos en memoria (ver typeahead.py) ---
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Asesor)
+@receiver(post_delete, sender=Asesor)
+@receiver(post_save, sender=Lote)
+@receiver(post_delete, sender=Lote)
+def actualizar_indice_typeahead(sender, instance, **kwargs):
+    from .typeahead import marcar_cambio
+    marcar_cambio(instance, eliminada=kwargs.get('signal') is post_delete)
+
 class GestionCobranza(models.Model):
     TIPO_CONTACTO = [
         ('LLAMADA', 'Llamada Telefónica'),
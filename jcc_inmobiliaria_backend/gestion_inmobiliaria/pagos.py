@@ -0,0 +1,298 @@
+# gestion_inmobiliaria/pagos.py
+"""
+Cálculos puros (sin acceso a la base de datos) para aplicar pagos a las cuotas de un plan
+y para calcular su cronograma. Los modelos cargan cuotas y pagos, llaman a estas funciones
+y persisten solo lo que cambió.
+
+Regla de asignación: los pagos se aplican en orden (fecha_pago, id_pago), llenando las cuotas
+secuencialmente por numero_cuota. Cada pago queda vinculado a la primera cuota que toca y la
+fecha_pago_efectivo de una cuota es la del pago que terminó de cubrirla.
+Todos los montos están en la moneda del plan (dólares para proyectos en dólares).
+"""
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from dateutil.relativedelta import relativedelta
+from typing import Dict, List, Optional
+
+CERO = Decimal('0.00')
+
+MODO_COMPLETO = 'completo'
+MODO_INCREMENTAL = 'incremental'
+
+
+def calcular_estado_cuota(monto_programado, monto_pagado, fecha_vencimiento, hoy):
+    """Estado de una cuota según lo programado, lo pagado y su vencimiento."""
+    if monto_programado <= CERO or monto_pagado >= monto_programado:
+        return 'pagada'
+    estado = 'parcialmente_pagada' if monto_pagado > CERO else 'pendiente'
+    if fecha_vencimiento and fecha_vencimiento < hoy:
+        estado = 'atrasada' if estado == 'parcialmente_pagada' else 'vencida_no_pagada'
+    return estado
+
+
+@dataclass
+class SaldoCuota:
+    id_cuota: int
+    numero_cuota: int
+    fecha_vencimiento: Optional[date]
+    monto_programado: Decimal
+    monto_pagado: Decimal = CERO
+    fecha_pago_efectivo: Optional[date] = None
+    estado_cuota: str = 'pendiente'
+
+    @property
+    def saldo(self):
+        return self.monto_programado - self.monto_pagado
+
+
+@dataclass(frozen=True)
+class PagoAplicable:
+    id_pago: str
+    fecha_pago: date
+    monto: Decimal
+
+    @property
+    def clave_orden(self):
+        return (self.fecha_pago, self.id_pago)
+
+    @property
+    def monto_aplicable(self):
+        return self.monto if self.monto and self.monto > CERO else CERO
+
+
+@dataclass
+class ResultadoAsignacion:
+    cuotas: List[SaldoCuota]
+    vinculos: Dict[str, Optional[int]]  # id_pago -> id_cuota (solo pagos procesados en esta corrida)
+    excedente: Decimal
+    modo: str
+
+
+def _aplicar_pago(cuotas, pago):
+    """Aplica un pago sobre los saldos actuales. Devuelve (id_cuota vinculada, excedente)."""
+    restante = pago.monto_aplicable
+    id_cuota_vinculada = None
+    for cuota in cuotas:
+        if restante <= CERO:
+            break
+        saldo = cuota.saldo
+        if saldo <= CERO:
+            continue
+        aplicado = min(restante, saldo)
+        cuota.monto_pagado += aplicado
+        restante -= aplicado
+        if id_cuota_vinculada is None:
+            id_cuota_vinculada = cuota.id_cuota
+        if cuota.monto_pagado >= cuota.monto_programado:
+            cuota.fecha_pago_efectivo = pago.fecha_pago
+    return id_cuota_vinculada, restante
+
+
+def _actualizar_estados(cuotas, hoy):
+    for cuota in cuotas:
+        cuota.estado_cuota = calcular_estado_cuota(cuota.monto_programado, cuota.monto_pagado, cuota.fecha_vencimiento, hoy)
+        # Solo una cuota cubierta por pagos conserva la fecha del pago que la completó
+        if cuota.monto_programado <= CERO or cuota.monto_pagado < cuota.monto_programado:
+            cuota.fecha_pago_efectivo = None
+
+
+def _ordenar(cuotas):
+    return sorted((replace(c) for c in cuotas), key=lambda c: c.numero_cuota)
+
+
+def reconstruir_asignacion(cuotas, pagos, hoy):
+    """Modo reconciliación: parte de cero y reaplica todo el historial de pagos."""
+    cuotas = _ordenar(cuotas)
+    for cuota in cuotas:
+        cuota.monto_pagado = CERO
+        cuota.fecha_pago_efectivo = None
+    vinculos = {}
+    excedente = CERO
+    for pago in sorted(pagos, key=lambda p: p.clave_orden):
+        vinculos[pago.id_pago], sobrante = _aplicar_pago(cuotas, pago)
+        excedente += sobrante
+    _actualizar_estados(cuotas, hoy)
+    return ResultadoAsignacion(cuotas=cuotas, vinculos=vinculos, excedente=excedente, modo=MODO_COMPLETO)
+
+
+def asignacion_es_consistente(cuotas, pagos):
+    """
+    True si los montos pagados de las cuotas son exactamente los que dejaría una reconstrucción
+    completa con esos pagos: cuotas llenas en orden, a lo sumo una parcial y el resto en cero.
+    """
+    capacidad = CERO
+    hay_incompleta = False
+    total_asignado = CERO
+    for cuota in sorted(cuotas, key=lambda c: c.numero_cuota):
+        if cuota.monto_programado <= CERO:
+            if cuota.monto_pagado != CERO:
+                return False
+            continue
+        if cuota.monto_pagado < CERO or cuota.monto_pagado > cuota.monto_programado:
+            return False
+        if hay_incompleta and cuota.monto_pagado > CERO:
+            return False
+        if cuota.monto_pagado < cuota.monto_programado:
+            hay_incompleta = True
+        capacidad += cuota.monto_programado
+        total_asignado += cuota.monto_pagado
+    total_pagos = sum((p.monto_aplicable for p in pagos), CERO)
+    return total_asignado == min(total_pagos, capacidad)
+
+
+def _es_ultimo(pago, otros_pagos):
+    return all(p.clave_orden < pago.clave_orden for p in otros_pagos)
+
+
+def agregar_pago(cuotas, pagos_existentes, pago_nuevo, hoy):
+    """
+    Aplica solo el pago nuevo sobre los saldos actuales. Si el pago no es el último en orden
+    o los saldos actuales no son consistentes, cae a la reconstrucción completa.
+    """
+    pagos_existentes = [p for p in pagos_existentes if p.id_pago != pago_nuevo.id_pago]
+    if not _es_ultimo(pago_nuevo, pagos_existentes) or not asignacion_es_consistente(cuotas, pagos_existentes):
+        return reconstruir_asignacion(cuotas, pagos_existentes + [pago_nuevo], hoy)
+    cuotas = _ordenar(cuotas)
+    id_cuota_vinculada, excedente = _aplicar_pago(cuotas, pago_nuevo)
+    _actualizar_estados(cuotas, hoy)
+    return ResultadoAsignacion(cuotas=cuotas, vinculos={pago_nuevo.id_pago: id_cuota_vinculada}, excedente=excedente, modo=MODO_INCREMENTAL)
+
+
+def quitar_pago(cuotas, pagos_restantes, pago_eliminado, hoy):
+    """
+    Revierte solo el pago eliminado, descontando desde la última cuota con pago hacia atrás.
+    Si no era el último pago en orden o los saldos no son consistentes, reconstruye todo.
+    """
+    pagos_restantes = [p for p in pagos_restantes if p.id_pago != pago_eliminado.id_pago]
+    if not _es_ultimo(pago_eliminado, pagos_restantes) or not asignacion_es_consistente(cuotas, pagos_restantes + [pago_eliminado]):
+        return reconstruir_asignacion(cuotas, pagos_restantes, hoy)
+    cuotas = _ordenar(cuotas)
+    capacidad = sum((c.monto_programado for c in cuotas if c.monto_programado > CERO), CERO)
+    asignado = sum((c.monto_pagado for c in cuotas), CERO)
+    objetivo = min(sum((p.monto_aplicable for p in pagos_restantes), CERO), capacidad)
+    por_quitar = asignado - objetivo
+    for cuota in reversed(cuotas):
+        if por_quitar <= CERO:
+            break
+        if cuota.monto_pagado <= CERO:
+            continue
+        quitado = min(cuota.monto_pagado, por_quitar)
+        cuota.monto_pagado -= quitado
+        por_quitar -= quitado
+    excedente = max(sum((p.monto_aplicable for p in pagos_restantes), CERO) - capacidad, CERO)
+    _actualizar_estados(cuotas, hoy)
+    return ResultadoAsignacion(cuotas=cuotas, vinculos={}, excedente=excedente, modo=MODO_INCREMENTAL)
+
+
+# --- CRONOGRAMA DEL PLAN ---
+@dataclass
+class CuotaObjetivo:
+    numero_cuota: int
+    fecha_vencimiento: date
+    monto_programado: Decimal
+    monto_programado_dolares: Optional[Decimal] = None
+    monto_pagado: Decimal = CERO
+    estado_cuota: str = 'pendiente'
+    fecha_pago_efectivo: Optional[date] = None
+
+
+@dataclass
+class CronogramaObjetivo:
+    cuotas: List[CuotaObjetivo]
+    numero_cuotas: int
+    monto_cuota_regular_original: Decimal
+    restaurado: bool  # True si no había pagos y el plan volvió a su estado inicial
+
+
+def calcular_monto_financiado(es_proyecto_dolares, monto_total_credito, precio_dolares=None, cuota_inicial_requerida=None, tipo_cambio=None):
+    """Monto que financia el plan, en la moneda del plan."""
+    if not es_proyecto_dolares:
+        return monto_total_credito
+    cuota_inicial_dolares = CERO
+    if cuota_inicial_requerida and cuota_inicial_requerida > CERO and tipo_cambio and tipo_cambio > CERO:
+        cuota_inicial_dolares = (cuota_inicial_requerida / tipo_cambio).quantize(Decimal('0.01'))
+    return (precio_dolares or CERO) - cuota_inicial_dolares
+
+
+
+def calcular_plan_inicial(monto_a_financiar, numero_cuotas, fecha_venta, es_proyecto_dolares):
+    """
+    Cronograma con el que nace un plan: cuotas mensuales iguales desde el mes siguiente a la venta
+    y la diferencia del redondeo en la última. En proyectos en dólares el monto va en dólares.
+    None si no hay nada que financiar.
+    """
+    if monto_a_financiar <= CERO or not numero_cuotas or numero_cuotas <= 0:
+        return None
+    monto_cuota = max((monto_a_financiar / Decimal(numero_cuotas)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP), CERO)
+    monto_ultima = max(monto_a_financiar - monto_cuota * (numero_cuotas - 1), CERO)
+    fecha_inicio = fecha_venta + relativedelta(months=1)
+    cuotas = []
+    for i in range(1, numero_cuotas + 1):
+        monto = monto_ultima if i == numero_cuotas else monto_cuota
+        cuotas.append(CuotaObjetivo(
+            numero_cuota=i, fecha_vencimiento=fecha_inicio + relativedelta(months=i - 1),
+            monto_programado=CERO if es_proyecto_dolares else monto, monto_programado_dolares=monto if es_proyecto_dolares else None,
+        ))
+    return CronogramaObjetivo(cuotas=cuotas, numero_cuotas=numero_cuotas, monto_cuota_regular_original=monto_cuota, restaurado=False)
+
+def calcular_cronograma_objetivo(cuotas_actuales, monto_financiado, monto_total_pagado, numero_cuotas_plan, plazo_meses_credito, fecha_inicio, es_proyecto_dolares, monto_cuota_regular_actual):
+    """
+    Cronograma completo que debe quedar en la BD para el plan.
+    - Sin pagos: el plan vuelve a su estado inicial (plazo de la venta, o 24 cuotas), con
+      vencimientos mensuales y todas las cuotas pendientes.
+    - Con pagos: se conservan las cuotas existentes (montos pagados incluidos), se completan las
+      que falten y el monto programado se reparte en partes iguales. Las cuotas no pagadas
+      vuelven a 'pendiente'.
+    """
+    divisor = Decimal(numero_cuotas_plan or 1)
+    monto_cuota = (monto_financiado / divisor).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    monto_dolares = monto_cuota if es_proyecto_dolares else None
+
+    if monto_total_pagado <= CERO:
+        numero_cuotas = plazo_meses_credito or 24
+        cuotas = [
+            CuotaObjetivo(numero_cuota=i, fecha_vencimiento=fecha_inicio + relativedelta(months=i - 1), monto_programado=monto_cuota, monto_programado_dolares=monto_dolares)
+            for i in range(1, numero_cuotas + 1)
+        ]
+        return CronogramaObjetivo(cuotas=cuotas, numero_cuotas=numero_cuotas, monto_cuota_regular_original=monto_cuota, restaurado=True)
+
+    cuotas = []
+    for actual in sorted(cuotas_actuales, key=lambda c: c.numero_cuota):
+        cuota = replace(actual)
+        if es_proyecto_dolares:
+            cuota.monto_programado_dolares = monto_cuota
+        else:
+            cuota.monto_programado = monto_cuota
+        if cuota.estado_cuota != 'pagada':
+            cuota.estado_cuota = 'pendiente'
+            cuota.fecha_pago_efectivo = None
+        cuotas.append(cuota)
+    numeros_existentes = {c.numero_cuota for c in cuotas}
+    for i in range(len(cuotas) + 1, (numero_cuotas_plan or 0) + 1):
+        if i in numeros_existentes:
+            continue
+        cuotas.append(CuotaObjetivo(numero_cuota=i, fecha_vencimiento=fecha_inicio + timedelta(days=30 * (i - 1)), monto_programado=monto_cuota, monto_programado_dolares=monto_dolares))
+    return CronogramaObjetivo(cuotas=cuotas, numero_cuotas=numero_cuotas_plan, monto_cuota_regular_original=monto_cuota_regular_actual, restaurado=False)
+
+
+# --- Totales desnormalizados de Venta y PlanPagoVenta (ver totales_pagos.py) ---
+ESTADOS_CUOTA_PAGADA = ('pagada', 'cancelada_con_excedente')
+
+
+def calcular_saldos_venta(valor_lote_venta, monto_pagado, precio_dolares, monto_pagado_dolares, es_proyecto_dolares):
+    """(saldo_soles, saldo_dolares) de una venta; el saldo en dólares solo existe en proyectos en dólares con precio en dólares."""
+    saldo_soles = (valor_lote_venta or CERO) - (monto_pagado or CERO)
+    saldo_dolares = precio_dolares - (monto_pagado_dolares or CERO) if es_proyecto_dolares and precio_dolares else None
+    return saldo_soles, saldo_dolares
+
+
+def resumen_cuotas(cuotas):
+    """(cuotas_pagadas, proxima_cuota_vencimiento) a partir de pares (estado_cuota, fecha_vencimiento)."""
+    pagadas, proxima = 0, None
+    for estado, vencimiento in cuotas:
+        if estado in ESTADOS_CUOTA_PAGADA:
+            pagadas += 1
+        elif vencimiento and (proxima is None or vencimiento < proxima):
+            proxima = vencimiento
+    return pagadas, proxima
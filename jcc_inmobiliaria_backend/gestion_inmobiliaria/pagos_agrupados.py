@@ -0,0 +1,69 @@
+# gestion_inmobiliaria/pagos_agrupados.py
+"""
+Recálculo agrupado de ventas tras ráfagas de pagos.
+
+Cada alta, cambio o baja de un RegistroPago dispara models.procesar_pagos_de_venta: bloquea la
+venta, suma sus pagos, los reaplica a las cuotas del plan y vuelve a evaluar el status. Fuera de
+un bloque agrupar_pagos() eso ocurre en la misma señal, como siempre. Dentro del bloque las señales
+solo anotan la venta afectada y, al terminar el bloque, cada venta se procesa una sola vez: en modo
+incremental si tuvo un único pago nuevo o eliminado, o con la reconciliación completa si tuvo varios.
+
+El procesamiento corre dentro de la transacción del bloque, antes del commit, para que los pagos y
+los saldos de la venta se confirmen (o se reviertan) juntos. Los bloques se pueden anidar; solo el
+más externo procesa.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import transaction
+
+_estado = threading.local()
+
+CREADO, MODIFICADO, ELIMINADO = 'creado', 'modificado', 'eliminado'
+
+
+def agrupando():
+    return getattr(_estado, 'profundidad', 0) > 0
+
+
+@contextmanager
+def agrupar_pagos():
+    """Difiere el recálculo de las ventas cuyos pagos se guardan o eliminan dentro del bloque."""
+    profundidad = getattr(_estado, 'profundidad', 0)
+    if profundidad == 0:
+        _estado.ventas = {}
+    _estado.profundidad = profundidad + 1
+    try:
+        with transaction.atomic():
+            yield
+            if profundidad == 0:
+                procesar_ventas_pendientes()
+    finally:
+        _estado.profundidad = profundidad
+        if profundidad == 0:
+            _estado.ventas = {}
+
+
+def diferir_pago(pago, evento):
+    """Anota el evento del pago si hay un bloque abierto. Devuelve False si hay que procesarlo ya."""
+    if not agrupando():
+        return False
+    _estado.ventas.setdefault(pago.venta_id, []).append((evento, pago))
+    return True
+
+
+def procesar_ventas_pendientes():
+    from .models import procesar_pagos_de_venta
+
+    ventas, _estado.ventas = _estado.ventas, {}
+    print(f"[pagos_agrupados] Procesando {len(ventas)} venta(s) con {sum(map(len, ventas.values()))} cambio(s) de pagos")
+    for venta_id, eventos in ventas.items():
+        if len(eventos) == 1:
+            evento, pago = eventos[0]
+            procesar_pagos_de_venta(
+                venta_id,
+                pago_agregado=pago if evento == CREADO else None,
+                pago_eliminado=pago if evento == ELIMINADO else None,
+            )
+        else:
+            procesar_pagos_de_venta(venta_id)
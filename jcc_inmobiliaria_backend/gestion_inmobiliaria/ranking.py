@@ -0,0 +1,129 @@
+# gestion_inmobiliaria/ranking.py
+"""
+Ranking de asesores del dashboard, calculado en la BD.
+
+Cada venta aporta una tupla (venta, asesor, rol) por cada asesor que participó: los cuatro roles
+de la presencia que la originó, el vendedor principal y las comisiones registradas. Las tuplas se
+unen con UNION ALL y se agrupan por asesor con conteos distintos por status, así que el costo no
+depende de cargar las ventas en Python. El detalle de ventas de un asesor se pide aparte, paginado.
+"""
+from django.db import connection
+from django.db.models import F, Q, Value, CharField
+
+from .models import Venta, Presencia, ComisionVentaAsesor, Asesor
+
+ESTADOS_RANKING = [Venta.STATUS_VENTA_SEPARACION, Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_ANULADO, Venta.STATUS_VENTA_COMPLETADA]
+
+ROLES_PRESENCIA = [
+    ('asesor_captacion_opc', 'captación'),
+    ('asesor_call_agenda', 'llamada'),
+    ('asesor_liner', 'liner'),
+    ('asesor_closer', 'closer'),
+]
+ROL_VENDEDOR_PRINCIPAL = 'vendedor_principal'
+
+
+def filtrar_ventas_dashboard(filters):
+    """Ventas que entran al dashboard según sus filtros (los mismos de GetDashboardDataAPIView)."""
+    ventas = Venta.objects.all()
+    if filters.get('startDate'):
+        ventas = ventas.filter(fecha_venta__gte=filters['startDate'])
+    if filters.get('endDate'):
+        ventas = ventas.filter(fecha_venta__lte=filters['endDate'])
+    if filters.get('asesorId'):
+        ventas = ventas.filter(vendedor_principal_id=filters['asesorId'])
+    if filters.get('tipoVenta'):
+        ventas = ventas.filter(tipo_venta=filters['tipoVenta'])
+    if filters.get('medio_captacion'):
+        ventas = ventas.filter(presencia_que_origino__medio_captacion=filters['medio_captacion'])
+    if filters.get('status_venta'):
+        ventas = ventas.filter(status_venta=filters['status_venta'])
+    return ventas
+
+
+def nombre_rol(rol):
+    return rol.replace('_', ' ').title()
+
+
+def participaciones(ventas):
+    """QuerySet UNION ALL con columnas (venta_ref, asesor_ref, rol_ref, status_ref), una fila por asesor y rol en cada venta."""
+    ventas_ids = ventas.order_by().values('id_venta')
+    presencias = Presencia.objects.filter(venta_asociada__in=ventas_ids).order_by()
+    partes = [
+        presencias.filter(**{f'{campo}__isnull': False}).values(
+            venta_ref=F('venta_asociada_id'), asesor_ref=F(f'{campo}_id'),
+            rol_ref=Value(rol, output_field=CharField()), status_ref=F('venta_asociada__status_venta'),
+        )
+        for campo, rol in ROLES_PRESENCIA
+    ]
+    partes.append(Venta.objects.filter(id_venta__in=ventas_ids, vendedor_principal__isnull=False).order_by().values(
+        venta_ref=F('id_venta'), asesor_ref=F('vendedor_principal_id'),
+        rol_ref=Value(ROL_VENDEDOR_PRINCIPAL, output_field=CharField()), status_ref=F('status_venta'),
+    ))
+    partes.append(ComisionVentaAsesor.objects.filter(venta__in=ventas_ids).order_by().values(
+        venta_ref=F('venta_id'), asesor_ref=F('asesor_id'), rol_ref=F('rol'), status_ref=F('venta__status_venta'),
+    ))
+    return partes[0].union(*partes[1:], all=True)
+
+
+def ranking_asesores(ventas):
+    """
+    Filas del ranking ordenadas por total de ventas (distintas) y nombre:
+    {'id_asesor', 'nombre_asesor', 'roles', 'total_ventas', <status>: cantidad, ...}.
+    """
+    sql_union, params_union = participaciones(ventas).query.sql_with_params()
+    tabla_asesor = connection.ops.quote_name(Asesor._meta.db_table)
+    marcadores = ', '.join(['%s'] * len(ESTADOS_RANKING))
+    conteos = ', '.join(['COUNT(DISTINCT CASE WHEN t.status_ref = %s THEN t.venta_ref END)'] * len(ESTADOS_RANKING))
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT t.asesor_ref, a.nombre_asesor, COUNT(DISTINCT t.venta_ref), {conteos} "
+            f"FROM ({sql_union}) t INNER JOIN {tabla_asesor} a ON a.id_asesor = t.asesor_ref "
+            f"WHERE t.status_ref IN ({marcadores}) "
+            f"GROUP BY t.asesor_ref, a.nombre_asesor "
+            f"ORDER BY COUNT(DISTINCT t.venta_ref) DESC, a.nombre_asesor, t.asesor_ref",
+            [*ESTADOS_RANKING, *params_union, *ESTADOS_RANKING],
+        )
+        filas = cursor.fetchall()
+        cursor.execute(
+            f"SELECT DISTINCT t.asesor_ref, t.rol_ref FROM ({sql_union}) t WHERE t.status_ref IN ({marcadores})",
+            [*params_union, *ESTADOS_RANKING],
+        )
+        roles_por_asesor = {}
+        for asesor_id, rol in cursor.fetchall():
+            roles_por_asesor.setdefault(asesor_id, set()).add(nombre_rol(rol))
+
+    return [
+        {
+            'id_asesor': asesor_id,
+            'nombre_asesor': nombre,
+            'roles': sorted(roles_por_asesor.get(asesor_id, set())),
+            'total_ventas': total,
+            **dict(zip(ESTADOS_RANKING, por_estado)),
+        }
+        for asesor_id, nombre, total, *por_estado in filas
+    ]
+
+
+def ventas_de_asesor(ventas, asesor_id):
+    """Ventas (de las filtradas) en las que el asesor participó con cualquier rol."""
+    participa = Q(vendedor_principal_id=asesor_id) | Q(comisiones_asesores__asesor_id=asesor_id)
+    for campo, _ in ROLES_PRESENCIA:
+        participa |= Q(**{f'presencia_que_origino__{campo}_id': asesor_id})
+    return Venta.objects.filter(
+        id_venta__in=ventas.filter(status_venta__in=ESTADOS_RANKING).filter(participa).order_by().values('id_venta')
+    ).select_related(
+        'lote', 'presencia_que_origino'
+    ).prefetch_related('comisiones_asesores').order_by('-fecha_venta', 'id_venta')
+
+
+def roles_en_venta(venta, asesor_id):
+    roles = set()
+    presencia = getattr(venta, 'presencia_que_origino', None)
+    if presencia:
+        roles.update(nombre_rol(rol) for campo, rol in ROLES_PRESENCIA if getattr(presencia, f'{campo}_id') == asesor_id)
+    if venta.vendedor_principal_id == asesor_id:
+        roles.add(nombre_rol(ROL_VENDEDOR_PRINCIPAL))
+    roles.update(nombre_rol(c.rol) for c in venta.comisiones_asesores.all() if c.asesor_id == asesor_id)
+    return sorted(roles)
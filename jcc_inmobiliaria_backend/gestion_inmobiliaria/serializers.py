@@ -24,7 +24,7 @@ from .models import (
     DefinicionMetaComision, TablaComisionDirecta, ConfigGeneral, LogAuditoriaCambio,
     RegistroPago, Presencia,
     PlanPagoVenta, CuotaPlanPago, ComisionVentaAsesor, GestionCobranza,
-    CierreComisionMensual, DetalleComisionCerrada
+    CierreComisionMensual, DetalleComisionCerrada, Proyecto, CLAVE_LOTE
 )
 from decimal import Decimal
 
@@ -42,13 +42,29 @@ class LoteSerializer(serializers.ModelSerializer):
             'fecha_creacion', 'ultima_modificacion'
         ]
     def validate(self, data):
-        proyecto = (data.get('ubicacion_proyecto') or '').strip().lower()
-        # Permitir cualquier variante que contenga 'aucallama' u 'oasis 2'
-        if not (('aucallama' in proyecto) or ('oasis 2' in proyecto)):
+        # La moneda sale del registro de proyectos (un proyecto nuevo usa la moneda sugerida por su nombre)
+        if Proyecto.moneda_de(nombre=data.get('ubicacion_proyecto')) != Proyecto.MONEDA_DOLARES:
             if data.get('precio_lista_soles') in [None, '']:
                 raise serializers.ValidationError({'precio_lista_soles': 'Este campo es obligatorio para proyectos que no son Aucallama u Oasis 2.'})
+        self._validar_duplicado(data)
         return data
 
+    def _validar_duplicado(self, data):
+        # Misma clave que la restricción lote_ubicacion_unica, para responder 400 en vez de un IntegrityError
+        valor = lambda campo: data[campo] if campo in data else getattr(self.instance, campo, None)
+        manzana, numero = (valor('manzana') or '').strip(), (valor('numero_lote') or '').strip()
+        if not manzana or not numero:
+            return
+        repetidos = Lote.objects.annotate(**CLAVE_LOTE).filter(
+            clave_proyecto=(valor('ubicacion_proyecto') or '').strip().lower(), clave_manzana=manzana.lower(),
+            clave_numero=numero.lower(), clave_etapa=valor('etapa') or 0,
+        )
+        if self.instance is not None:
+            repetidos = repetidos.exclude(pk=self.instance.pk)
+        duplicado = repetidos.values_list('pk', flat=True).first()
+        if duplicado:
+            raise serializers.ValidationError({'numero_lote': f'Ya existe el lote {duplicado} con el mismo proyecto, etapa, manzana y número.'})
+
 class ClienteCreateSerializer(serializers.ModelSerializer):
     telefono_principal = serializers.CharField(required=False, allow_blank=True, max_length=20, allow_null=True)
     direccion = serializers.CharField(required=False, allow_blank=True, max_length=255, allow_null=True)
@@ -174,18 +190,12 @@ class CuotaPlanPagoSerializer(serializers.ModelSerializer):
         }
 
     def get_monto_programado_display(self, obj):
-        if obj.plan_pago_venta and obj.plan_pago_venta.venta and (
-            'aucallama' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower()
-        ):
+        if obj.plan_pago_venta and obj.plan_pago_venta.venta and obj.es_proyecto_dolares:
             return {'dolares': obj.monto_programado_dolares, 'soles': None}
         return {'dolares': None, 'soles': obj.monto_programado}
 
     def get_saldo_cuota_display(self, obj):
-        if obj.plan_pago_venta and obj.plan_pago_venta.venta and (
-            'aucallama' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower()
-        ):
+        if obj.plan_pago_venta and obj.plan_pago_venta.venta and obj.es_proyecto_dolares:
             return {'dolares': obj.saldo_cuota, 'soles': None}
         return {'dolares': None, 'soles': obj.saldo_cuota}
 
@@ -200,9 +210,10 @@ class CuotaPlanPagoSerializer(serializers.ModelSerializer):
         return round(total, 2)
 
     def get_tipo_cambio_pago(self, obj):
-        pagos = obj.pagos_que_la_cubren.filter(monto_pago_dolares__isnull=False, tipo_cambio_pago__isnull=False).order_by('-fecha_pago', '-id_pago')
+        # Se filtra en memoria para aprovechar pagos_que_la_cubren precargado
+        pagos = [p for p in obj.pagos_que_la_cubren.all() if p.monto_pago_dolares is not None and p.tipo_cambio_pago is not None]
         if pagos:
-            ultimo_pago = pagos[0]
+            ultimo_pago = max(pagos, key=lambda p: (p.fecha_pago, p.id_pago))
             return float(ultimo_pago.tipo_cambio_pago)
         return None
 
@@ -212,13 +223,8 @@ class CuotaPlanPagoSerializer(serializers.ModelSerializer):
         return round(total, 2)
 
     def get_saldo_cuota_dolares(self, obj):
-        if obj.plan_pago_venta and obj.plan_pago_venta.venta and (
-            'aucallama' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.plan_pago_venta.venta.lote.ubicacion_proyecto.lower()
-        ):
-            pagado = self.get_monto_pagado_dolares(obj)
-            programado = float(obj.monto_programado_dolares or 0)
-            return round(programado - pagado, 2)
+        if obj.plan_pago_venta and obj.plan_pago_venta.venta and obj.es_proyecto_dolares:
+            return round(float(obj.saldo_cuota), 2)
         return None
 
 class PlanPagoVentaSerializer(serializers.ModelSerializer):
@@ -239,32 +245,25 @@ class PlanPagoVentaSerializer(serializers.ModelSerializer):
             'monto_cuota_regular_original', 'monto_cuota_regular_display',
             'fecha_inicio_pago_cuotas', 'observaciones', 'cuotas',
             'monto_pagado_dolares', 'saldo_total_dolares',
+            'cuotas_pagadas', 'proxima_cuota_vencimiento',
         ]
-        read_only_fields = ('id_plan_pago', 'fecha_creacion', 'ultima_modificacion', 'venta_id_str', 'cuotas', 'venta_cliente_nombre', 'venta_lote_id')
+        read_only_fields = ('id_plan_pago', 'fecha_creacion', 'ultima_modificacion', 'venta_id_str', 'cuotas', 'venta_cliente_nombre', 'venta_lote_id', 'cuotas_pagadas', 'proxima_cuota_vencimiento')
 
     def get_cuotas(self, obj):
         from .serializers import CuotaPlanPagoSerializer
-        cuotas_qs = obj.cuotas.all().order_by('numero_cuota')
-        return CuotaPlanPagoSerializer(cuotas_qs, many=True).data
+        cuotas = sorted(obj.cuotas.all(), key=lambda c: c.numero_cuota)
+        return CuotaPlanPagoSerializer(cuotas, many=True, context=self.context).data
 
     def get_monto_cuota_regular_display(self, obj):
-        if obj.venta and obj.venta.lote and (
-            'aucallama' in obj.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.venta.lote.ubicacion_proyecto.lower()
-        ):
+        if obj.venta and obj.venta.lote and obj.venta.lote.es_proyecto_dolares:
             return {'dolares': obj.monto_cuota_regular_original, 'soles': None}
         return {'dolares': None, 'soles': obj.monto_cuota_regular_original}
 
     def get_monto_pagado_dolares(self, obj):
-        pagos = obj.venta.registros_pago.all()
-        total = sum([float(p.monto_pago_dolares) for p in pagos if p.monto_pago_dolares is not None])
-        return round(total, 2)
+        return round(float(obj.venta.monto_pagado_dolares or 0), 2)
 
     def get_monto_total_credito_dolares(self, obj):
-        if obj.venta and obj.venta.lote and (
-            'aucallama' in obj.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.venta.lote.ubicacion_proyecto.lower()
-        ):
+        if obj.venta and obj.venta.lote and obj.venta.lote.es_proyecto_dolares:
             # Para proyectos en dólares, calcular el monto financiado en dólares
             # basado en el precio_dolares del lote menos la cuota inicial en dólares
             precio_dolares = obj.venta.precio_dolares or Decimal('0.00')
@@ -280,10 +279,7 @@ class PlanPagoVentaSerializer(serializers.ModelSerializer):
         return None
 
     def get_saldo_total_dolares(self, obj):
-        if obj.venta and obj.venta.lote and (
-            'aucallama' in obj.venta.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.venta.lote.ubicacion_proyecto.lower()
-        ):
+        if obj.venta and obj.venta.lote and obj.venta.lote.es_proyecto_dolares:
             # Para proyectos en dólares, calcular el saldo total en dólares
             monto_financiado_dolares = self.get_monto_total_credito_dolares(obj) or Decimal('0.00')
             pagos_en_dolares = Decimal(str(self.get_monto_pagado_dolares(obj) or 0))
@@ -426,8 +422,7 @@ class VentaSerializer(serializers.ModelSerializer):
         if not lote: 
             raise serializers.ValidationError({"lote": "Se requiere un lote para la venta."})
 
-        proyecto = lote.ubicacion_proyecto.strip().lower() if lote and lote.ubicacion_proyecto else ''
-        es_dolares = ('aucallama' in proyecto) or ('oasis 2' in proyecto)
+        es_dolares = lote.es_proyecto_dolares
         if es_dolares:
             if not data.get('precio_dolares') or float(data.get('precio_dolares') or 0) <= 0:
                 raise serializers.ValidationError({"precio_dolares": "Debe ingresar el precio en dólares para este proyecto."})
@@ -494,15 +489,33 @@ class VentaSerializer(serializers.ModelSerializer):
         return venta
 
     def get_saldo_pendiente_dolares(self, obj):
-        if obj.lote and (
-            'aucallama' in obj.lote.ubicacion_proyecto.lower() or
-            'oasis 2' in obj.lote.ubicacion_proyecto.lower()
-        ):
-            if obj.precio_dolares:
-                total = float(obj.precio_dolares)
-                pagado = sum([float(p.monto_pago_dolares) for p in obj.registros_pago.all() if p.monto_pago_dolares is not None])
-                return round(total - pagado, 2)
-        return None
+        # saldo_dolares solo tiene valor en proyectos en dólares con precio en dólares (Venta.calcular_saldos)
+        return round(float(obj.saldo_dolares), 2) if obj.saldo_dolares is not None else None
+
+class VentaListSerializer(serializers.ModelSerializer):
+    # Representación compacta del listado de ventas: sin plan de pagos, pagos ni comisiones anidados.
+    # saldo_pendiente es la columna saldo_soles; liner_nombre viene anotado en el queryset (ver VentaViewSet.get_queryset).
+    lote_info = serializers.CharField(source='lote.__str__', read_only=True, allow_null=True)
+    cliente_info = serializers.CharField(source='cliente.nombres_completos_razon_social', read_only=True, allow_null=True)
+    vendedor_principal_nombre = serializers.CharField(source='vendedor_principal.nombre_asesor', read_only=True, allow_null=True)
+    liner_nombre = serializers.CharField(read_only=True, allow_null=True)
+    status_venta_display = serializers.CharField(source='get_status_venta_display', read_only=True)
+    saldo_pendiente = serializers.DecimalField(source='saldo_soles', max_digits=12, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Venta
+        fields = [
+            'id_venta', 'fecha_venta',
+            'lote', 'lote_info',
+            'cliente', 'cliente_info',
+            'vendedor_principal', 'vendedor_principal_nombre', 'liner_nombre',
+            'valor_lote_venta', 'precio_dolares', 'tipo_cambio',
+            'monto_pagado_actual', 'saldo_pendiente',
+            'tipo_venta', 'plazo_meses_credito',
+            'status_venta', 'status_venta_display',
+            'cliente_firmo_contrato',
+        ]
+        read_only_fields = fields
 
 class ActividadDiariaSerializer(serializers.ModelSerializer):
     asesor_nombre = serializers.CharField(source='asesor.nombre_asesor', read_only=True, allow_null=True)
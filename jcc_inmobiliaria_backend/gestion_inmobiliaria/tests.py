@@ -1,16 +1,44 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from .models import Lote, Asesor, Venta, Cliente, Presencia, RegistroPago, GestionCobranza
+from .models import (
+    Lote, Asesor, Venta, Cliente, Presencia, RegistroPago, GestionCobranza, SecuenciaCorrelativa, reservar_bloque_ids,
+    PlanPagoVenta, CuotaPlanPago, Proyecto, aplicar_pagos_a_cuotas_del_plan, MetricaDashboardDiaria, ComisionVentaAsesor, ActividadDiaria
+)
+from .metricas import reconstruir_metricas, marcar_dias, descartar_dias_pendientes
+from .ranking import ranking_asesores
+from .cobranza import reporte_antiguedad, DimensionInvalida
+from .busqueda import buscar_clientes, normalizar
+from .typeahead import INDICES as INDICES_TYPEAHEAD
+from .duplicados_lotes import depurar_lotes_duplicados, crear_restriccion_unica
+from .importacion import importar_csv
+from .importacion_historica import ImportacionHistorica, importar_historico
+from .pagos_agrupados import agrupar_pagos
+from .totales_pagos import verificar_totales
+from .estado_lotes import recalcular_estado_lotes
+from .actividad import contar_presencias_por_asesor
+from .pagos import (
+    SaldoCuota, PagoAplicable, reconstruir_asignacion, agregar_pago, quitar_pago, MODO_COMPLETO, MODO_INCREMENTAL,
+    CuotaObjetivo, calcular_cronograma_objetivo, calcular_monto_financiado
+)
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import caches
 from django.utils import timezone
 from decimal import Decimal
-from datetime import timedelta
+from datetime import date, datetime, timedelta
+import os
+import random
 import json
+import tempfile
 from django.core.management import call_command
+from django.apps import apps as django_apps
 from django.test import TestCase
 from io import StringIO
+from importlib import import_module
+from unittest import mock
 
 # Tests de integridad de datos existentes
 class IntegridadDatosTestCase(TestCase):
@@ -465,3 +493,1168 @@ class ComandoIntegridadTestCase(TestCase):
         
         # Verificar que detecte lote vendido sin venta completada
         self.assertIn('Lote L0001 marcado como "Vendido" pero sin venta completada', output)
+
+class SecuenciaCorrelativaTestCase(TestCase):
+    def crear_cliente(self, **kwargs):
+        datos = {'tipo_documento': 'DNI', 'nombres_completos_razon_social': 'Cliente Secuencia'}
+        datos.update(kwargs)
+        return Cliente.objects.create(**datos)
+
+    def test_secuencia_se_siembra_desde_datos_existentes(self):
+        SecuenciaCorrelativa.objects.filter(prefijo='CLI').delete()
+        self.crear_cliente(id_cliente='CLI0007')
+        cliente = self.crear_cliente()
+        self.assertEqual(cliente.id_cliente, 'CLI0008')
+        self.assertEqual(SecuenciaCorrelativa.objects.get(prefijo='CLI').ultimo_numero, 8)
+
+    def test_migracion_siembra_con_el_maximo_numerico(self):
+        for id_cliente in ('CLI0007', 'CLI0120', 'CLIX999', 'CLI12A'):
+            self.crear_cliente(id_cliente=id_cliente)
+        migracion = import_module('gestion_inmobiliaria.migrations.0002_secuencia_correlativa')
+        migracion.sembrar_secuencias(django_apps, None)
+        self.assertEqual(SecuenciaCorrelativa.objects.get(prefijo='CLI').ultimo_numero, 120)
+
+    def test_ids_consecutivos_sin_repetir(self):
+        ids = [self.crear_cliente().id_cliente for _ in range(5)]
+        self.assertEqual(len(set(ids)), 5)
+        numeros = [int(i[3:]) for i in ids]
+        self.assertEqual(numeros, list(range(numeros[0], numeros[0] + 5)))
+
+    def test_reservar_bloque_ids(self):
+        primero = self.crear_cliente().id_cliente
+        bloque = reservar_bloque_ids(Cliente, 'CLI', 3, 4)
+        siguiente = self.crear_cliente().id_cliente
+        base = int(primero[3:])
+        self.assertEqual(bloque, [f"CLI{str(base + n).zfill(4)}" for n in range(1, 4)])
+        self.assertEqual(int(siguiente[3:]), base + 4)
+
+    def test_id_asignado_manualmente_no_colisiona(self):
+        actual = SecuenciaCorrelativa.objects.filter(prefijo='CLI').first()
+        siguiente = (actual.ultimo_numero if actual else 0) + 1
+        self.crear_cliente(id_cliente=f"CLI{str(siguiente).zfill(4)}")
+        cliente = self.crear_cliente()
+        self.assertEqual(int(cliente.id_cliente[3:]), siguiente + 1)
+
+class AsignacionPagosPropiedadesTestCase(TestCase):
+    """
+    Pruebas de propiedades con datos aleatorios (semilla fija): el modo incremental
+    debe dejar exactamente el mismo estado que la reconstrucción completa.
+    """
+    HOY = date(2025, 6, 15)
+
+    def generar_cuotas(self, rnd):
+        cuotas = []
+        for n in range(1, rnd.randint(1, 12) + 1):
+            programado = Decimal(rnd.choice([0, 50, 100, 100, 250, 333])) + Decimal(rnd.randint(0, 99)) / 100
+            cuotas.append(SaldoCuota(id_cuota=n * 10, numero_cuota=n, fecha_vencimiento=date(2025, 1, 1) + timedelta(days=30 * n), monto_programado=programado))
+        return cuotas
+
+    def generar_pagos(self, rnd, cantidad):
+        return [
+            PagoAplicable(f"PG-{i:04d}", date(2025, 1, 1) + timedelta(days=rnd.randint(0, 200)), Decimal(rnd.randint(-20, 600)) + Decimal(rnd.randint(0, 99)) / 100)
+            for i in range(cantidad)
+        ]
+
+    def estado(self, resultado):
+        return [(c.id_cuota, c.monto_pagado, c.estado_cuota, c.fecha_pago_efectivo) for c in resultado.cuotas]
+
+    def test_agregar_pago_equivale_a_reconstruir(self):
+        rnd = random.Random(20250615)
+        for _ in range(300):
+            cuotas = self.generar_cuotas(rnd)
+            pagos = self.generar_pagos(rnd, rnd.randint(0, 8))
+            previo = reconstruir_asignacion(cuotas, pagos, self.HOY)
+            nuevo = self.generar_pagos(rnd, 1)[0]
+            nuevo = PagoAplicable('PG-9999', nuevo.fecha_pago, nuevo.monto)
+            incremental = agregar_pago(previo.cuotas, pagos, nuevo, self.HOY)
+            completo = reconstruir_asignacion(cuotas, pagos + [nuevo], self.HOY)
+            self.assertEqual(self.estado(incremental), self.estado(completo))
+            vinculos = dict(previo.vinculos, **incremental.vinculos) if incremental.modo == MODO_INCREMENTAL else incremental.vinculos
+            self.assertEqual(vinculos, completo.vinculos)
+            if all(p.clave_orden < nuevo.clave_orden for p in pagos):
+                self.assertEqual(incremental.modo, MODO_INCREMENTAL)
+
+    def test_quitar_pago_equivale_a_reconstruir(self):
+        rnd = random.Random(1506)
+        for _ in range(300):
+            cuotas = self.generar_cuotas(rnd)
+            pagos = self.generar_pagos(rnd, rnd.randint(1, 8))
+            previo = reconstruir_asignacion(cuotas, pagos, self.HOY)
+            eliminado = rnd.choice(pagos)
+            restantes = [p for p in pagos if p != eliminado]
+            incremental = quitar_pago(previo.cuotas, restantes, eliminado, self.HOY)
+            completo = reconstruir_asignacion(cuotas, restantes, self.HOY)
+            self.assertEqual(self.estado(incremental), self.estado(completo))
+            vinculos = {k: v for k, v in previo.vinculos.items() if k != eliminado.id_pago} if incremental.modo == MODO_INCREMENTAL else incremental.vinculos
+            self.assertEqual(vinculos, completo.vinculos)
+
+    def test_saldos_inconsistentes_usan_reconstruccion(self):
+        cuotas = [SaldoCuota(1, 1, self.HOY, Decimal('100.00'), monto_pagado=Decimal('0.00')), SaldoCuota(2, 2, self.HOY, Decimal('100.00'), monto_pagado=Decimal('100.00'))]
+        pagos = [PagoAplicable('PG-1', self.HOY, Decimal('100.00'))]
+        resultado = agregar_pago(cuotas, pagos, PagoAplicable('PG-2', self.HOY + timedelta(days=1), Decimal('50.00')), self.HOY)
+        self.assertEqual(resultado.modo, MODO_COMPLETO)
+        self.assertEqual([c.monto_pagado for c in resultado.cuotas], [Decimal('100.00'), Decimal('50.00')])
+
+
+class AplicarPagosPlanTestCase(TestCase):
+    def setUp(self):
+        self.lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('120.00'), precio_lista_soles=Decimal('15000.00'), precio_credito_12_meses_soles=Decimal('13000.00'))
+        self.cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='40000001', nombres_completos_razon_social='Cliente Plan')
+        self.venta = Venta.objects.create(fecha_venta=date(2025, 1, 10), lote=self.lote, cliente=self.cliente, valor_lote_venta=Decimal('13000.00'), tipo_venta='credito', plazo_meses_credito=12, cuota_inicial_requerida=Decimal('1000.00'))
+        self.plan = PlanPagoVenta.objects.create(venta=self.venta, monto_total_credito=Decimal('12000.00'), numero_cuotas=12, monto_cuota_regular_original=Decimal('1000.00'), fecha_inicio_pago_cuotas=date(2025, 2, 10))
+        for n in range(1, 13):
+            CuotaPlanPago.objects.create(plan_pago_venta=self.plan, numero_cuota=n, fecha_vencimiento=date(2025, 1, 10) + timedelta(days=30 * n), monto_programado=Decimal('1000.00'))
+
+    def montos_pagados(self):
+        return list(self.plan.cuotas.order_by('numero_cuota').values_list('monto_pagado', flat=True)[:4])
+
+    def test_pagos_sucesivos_y_eliminacion(self):
+        pago1 = RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+        self.assertEqual(self.montos_pagados(), [Decimal('1000.00'), Decimal('1000.00'), Decimal('500.00'), Decimal('0.00')])
+        pago1.refresh_from_db()
+        self.assertEqual(pago1.cuota_plan_pago_cubierta.numero_cuota, 1)
+
+        pago2 = RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 1), monto_pago=Decimal('600.00'))
+        self.assertEqual(self.montos_pagados(), [Decimal('1000.00'), Decimal('1000.00'), Decimal('1000.00'), Decimal('100.00')])
+        pago2.refresh_from_db()
+        self.assertEqual(pago2.cuota_plan_pago_cubierta.numero_cuota, 3)
+        self.assertEqual(self.plan.cuotas.get(numero_cuota=3).fecha_pago_efectivo, date(2025, 3, 1))
+
+        pago2.delete()
+        self.assertEqual(self.montos_pagados(), [Decimal('1000.00'), Decimal('1000.00'), Decimal('500.00'), Decimal('0.00')])
+        self.assertIsNone(self.plan.cuotas.get(numero_cuota=3).fecha_pago_efectivo)
+
+        estado_incremental = list(self.plan.cuotas.order_by('numero_cuota').values_list('monto_pagado', 'estado_cuota', 'fecha_pago_efectivo'))
+        venta = Venta.objects.get(pk=self.venta.pk)
+        aplicar_pagos_a_cuotas_del_plan(venta.plan_pago_venta, venta)
+        self.assertEqual(list(self.plan.cuotas.order_by('numero_cuota').values_list('monto_pagado', 'estado_cuota', 'fecha_pago_efectivo')), estado_incremental)
+
+
+    def test_pago_recalcula_la_venta_en_una_pasada(self):
+        RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+        with CaptureQueriesContext(connection) as consultas:
+            RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 1), monto_pago=Decimal('600.00'))
+        sentencias = [q['sql'] for q in consultas.captured_queries]
+        self.assertEqual(sum(sql.startswith('UPDATE "gestion_inmobiliaria_venta"') for sql in sentencias), 1)
+        self.assertFalse([sql for sql in sentencias if 'SUM(' in sql])
+        venta = Venta.objects.get(pk=self.venta.pk)
+        self.assertEqual((venta.monto_pagado_actual, venta.status_venta), (Decimal('3100.00'), Venta.STATUS_VENTA_PROCESABLE))
+
+    def test_eliminar_pago_recalcula_el_cronograma_una_vez(self):
+        RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+        pago2 = RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 1), monto_pago=Decimal('600.00'))
+        recalcular = PlanPagoVenta.recalcular_cuotas_pendientes
+        with mock.patch.object(PlanPagoVenta, 'recalcular_cuotas_pendientes', autospec=True, side_effect=recalcular) as recalculo:
+            pago2.delete()
+        self.assertEqual(recalculo.call_count, 1)
+        self.assertEqual(recalculo.call_args.kwargs['monto_total_pagado'], Decimal('2500.00'))
+        self.assertEqual(self.montos_pagados(), [Decimal('1000.00'), Decimal('1000.00'), Decimal('500.00'), Decimal('0.00')])
+
+    def test_pagos_agrupados_procesan_la_venta_una_vez(self):
+        import gestion_inmobiliaria.models as modelos
+        with mock.patch.object(modelos, 'procesar_pagos_de_venta', wraps=modelos.procesar_pagos_de_venta) as procesar:
+            with agrupar_pagos():
+                RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+                pago2 = RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 1), monto_pago=Decimal('600.00'))
+                RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 15), monto_pago=Decimal('400.00'))
+                pago2.delete()
+                self.assertEqual(procesar.call_count, 0)
+        self.assertEqual(procesar.call_count, 1)
+        self.assertEqual(Venta.objects.get(pk=self.venta.pk).monto_pagado_actual, Decimal('2900.00'))
+        self.assertEqual(self.montos_pagados(), [Decimal('1000.00'), Decimal('1000.00'), Decimal('900.00'), Decimal('0.00')])
+
+    def test_totales_desnormalizados_y_reparacion(self):
+        RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+        venta = Venta.objects.select_related('plan_pago_venta').get(pk=self.venta.pk)
+        self.assertEqual((venta.monto_pagado_actual, venta.saldo_soles, venta.saldo_dolares), (Decimal('2500.00'), Decimal('10500.00'), None))
+        plan = venta.plan_pago_venta
+        self.assertEqual(plan.cuotas_pagadas, plan.cuotas.filter(estado_cuota='pagada').count())
+        self.assertEqual(plan.proxima_cuota_vencimiento, plan.cuotas.exclude(estado_cuota='pagada').order_by('fecha_vencimiento').values_list('fecha_vencimiento', flat=True).first())
+        self.assertEqual(verificar_totales()['ventas_con_diferencias'], 0)
+
+        Venta.objects.filter(pk=venta.pk).update(saldo_soles=Decimal('0.00'))
+        PlanPagoVenta.objects.filter(pk=plan.pk).update(cuotas_pagadas=0)
+        salida = StringIO()
+        call_command('verificar_totales_pagos', stdout=salida)
+        self.assertIn('con diferencias: 1', salida.getvalue())
+        call_command('verificar_totales_pagos', '--reparar', stdout=StringIO())
+        resultado = verificar_totales()
+        self.assertEqual((resultado['ventas_con_diferencias'], resultado['planes_con_diferencias']), (0, 0))
+        self.assertEqual(Venta.objects.get(pk=venta.pk).saldo_soles, Decimal('10500.00'))
+
+    def test_migracion_llena_las_columnas_nuevas(self):
+        RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 2, 1), monto_pago=Decimal('2500.00'))
+        Venta.objects.update(saldo_soles=Decimal('0.00'), monto_pagado_dolares=Decimal('9.00'))
+        PlanPagoVenta.objects.update(cuotas_pagadas=0, proxima_cuota_vencimiento=None)
+        migracion = import_module('gestion_inmobiliaria.migrations.0010_totales_pagos_desnormalizados')
+        migracion.calcular_totales(django_apps, None)
+        resultado = verificar_totales()
+        self.assertEqual((resultado['ventas_con_diferencias'], resultado['planes_con_diferencias']), (0, 0))
+
+class CronogramaObjetivoTestCase(TestCase):
+    def test_sin_pagos_restaura_plan_inicial(self):
+        actuales = [CuotaObjetivo(1, date(2025, 1, 31), Decimal('10.00'), monto_pagado=Decimal('0.00'), estado_cuota='vencida_no_pagada')]
+        cronograma = calcular_cronograma_objetivo(actuales, Decimal('1200.00'), Decimal('0.00'), 12, 12, date(2025, 1, 31), False, Decimal('10.00'))
+        self.assertTrue(cronograma.restaurado)
+        self.assertEqual(cronograma.numero_cuotas, 12)
+        self.assertEqual(cronograma.monto_cuota_regular_original, Decimal('100.00'))
+        self.assertEqual([c.fecha_vencimiento for c in cronograma.cuotas[:3]], [date(2025, 1, 31), date(2025, 2, 28), date(2025, 3, 31)])
+        self.assertTrue(all(c.estado_cuota == 'pendiente' and c.monto_programado_dolares is None for c in cronograma.cuotas))
+
+    def test_con_pagos_conserva_cuotas_y_completa_faltantes(self):
+        actuales = [
+            CuotaObjetivo(1, date(2025, 1, 10), Decimal('90.00'), Decimal('90.00'), Decimal('90.00'), 'pagada', date(2025, 1, 5)),
+            CuotaObjetivo(2, date(2025, 2, 10), Decimal('90.00'), Decimal('90.00'), Decimal('40.00'), 'atrasada'),
+        ]
+        cronograma = calcular_cronograma_objetivo(actuales, Decimal('300.00'), Decimal('130.00'), 3, 3, date(2025, 1, 10), True, Decimal('90.00'))
+        self.assertFalse(cronograma.restaurado)
+        self.assertEqual([c.monto_programado_dolares for c in cronograma.cuotas], [Decimal('100.00')] * 3)
+        self.assertEqual([c.estado_cuota for c in cronograma.cuotas], ['pagada', 'pendiente', 'pendiente'])
+        self.assertEqual(cronograma.cuotas[0].fecha_pago_efectivo, date(2025, 1, 5))
+        self.assertEqual(cronograma.cuotas[1].monto_pagado, Decimal('40.00'))
+        self.assertEqual(cronograma.cuotas[2].fecha_vencimiento, date(2025, 3, 11))
+        self.assertEqual(calcular_monto_financiado(True, None, Decimal('10000.00'), Decimal('3700.00'), Decimal('3.700')), Decimal('9000.00'))
+
+    def test_recalculo_usa_consultas_constantes(self):
+        lote = Lote.objects.create(ubicacion_proyecto='Oasis 3 (Huacho 2)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('40000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', nombres_completos_razon_social='Cliente Cronograma')
+        lote.es_proyecto_dolares # Carga la cache de proyectos fuera de la medición
+        consultas = []
+        for plazo in (12, 36):
+            venta = Venta.objects.create(fecha_venta=date(2025, 1, 1), lote=lote, cliente=cliente, valor_lote_venta=Decimal('36000.00'), tipo_venta='credito', plazo_meses_credito=plazo)
+            plan = PlanPagoVenta.objects.create(venta=venta, monto_total_credito=Decimal('36000.00'), numero_cuotas=plazo, monto_cuota_regular_original=Decimal('0.00'), fecha_inicio_pago_cuotas=date(2025, 2, 1))
+            plan = PlanPagoVenta.objects.select_related('venta__lote').get(pk=plan.pk)
+            with CaptureQueriesContext(connection) as ctx:
+                plan.recalcular_cuotas_pendientes()
+            self.assertEqual(plan.cuotas.count(), plazo)
+            consultas.append(len(ctx.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertLessEqual(consultas[1], 8)
+
+
+class ActualizarEstadoCuotaTestCase(TestCase):
+    def setUp(self):
+        lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('20000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', nombres_completos_razon_social='Cliente Estados')
+        venta = Venta.objects.create(fecha_venta=date(2025, 1, 1), lote=lote, cliente=cliente, valor_lote_venta=Decimal('20000.00'), tipo_venta='credito', plazo_meses_credito=12)
+        self.plan = PlanPagoVenta.objects.create(venta=venta, monto_total_credito=Decimal('1200.00'), numero_cuotas=3, monto_cuota_regular_original=Decimal('400.00'), fecha_inicio_pago_cuotas=timezone.now().date() + timedelta(days=30))
+        for n in range(1, 4):
+            CuotaPlanPago.objects.create(plan_pago_venta=self.plan, numero_cuota=n, fecha_vencimiento=timezone.now().date() + timedelta(days=30 * n), monto_programado=Decimal('400.00'))
+
+    def test_actualizar_estado_no_vuelve_a_consultar_la_cuota(self):
+        cuota = self.plan.cuotas.get(numero_cuota=1)
+        self.assertEqual(cuota.campos_modificados(CuotaPlanPago.CAMPOS_ESTADO), [])
+        cuota.monto_pagado = Decimal('400.00')
+        with CaptureQueriesContext(connection) as ctx:
+            cuota.actualizar_estado(save_instance=True, es_proyecto_dolares=False)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertTrue(ctx.captured_queries[0]['sql'].startswith('UPDATE'))
+        cuota.refresh_from_db()
+        self.assertEqual(cuota.estado_cuota, 'pagada')
+        self.assertEqual(cuota.campos_modificados(), [])
+
+    def test_actualizar_estados_en_lote(self):
+        cuotas = list(self.plan.cuotas.order_by('numero_cuota'))
+        cuotas[0].monto_pagado = Decimal('400.00')
+        cuotas[1].monto_pagado = Decimal('100.00')
+        with CaptureQueriesContext(connection) as ctx:
+            modificadas = CuotaPlanPago.actualizar_estados(cuotas, es_proyecto_dolares=False)
+        self.assertEqual([c.numero_cuota for c in modificadas], [1, 2])
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]), 0)
+        self.assertEqual(list(self.plan.cuotas.order_by('numero_cuota').values_list('estado_cuota', flat=True)), ['pagada', 'parcialmente_pagada', 'pendiente'])
+
+    def test_barrido_de_vencimientos_por_transicion(self):
+        self.plan.cuotas.filter(numero_cuota=2).update(monto_pagado=Decimal('100.00'), estado_cuota='parcialmente_pagada')
+        dentro_de_65_dias = timezone.now().date() + timedelta(days=65)
+        salida = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('actualizar_cuotas_vencidas', fecha=dentro_de_65_dias.isoformat(), stdout=salida)
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]), len(CuotaPlanPago.TRANSICIONES_VENCIMIENTO))
+        self.assertEqual(len([q for q in ctx.captured_queries if q['sql'].startswith('SELECT')]), 0)
+        self.assertIn('pendiente->vencida_no_pagada: 1', salida.getvalue())
+        self.assertIn('parcialmente_pagada->atrasada: 1', salida.getvalue())
+        self.assertEqual(list(self.plan.cuotas.order_by('numero_cuota').values_list('estado_cuota', flat=True)), ['vencida_no_pagada', 'atrasada', 'pendiente'])
+
+        # Con la fecha de hoy ninguna está vencida: vuelven a su estado sin atraso
+        conteos = CuotaPlanPago.barrer_vencimientos()
+        self.assertEqual(conteos['vencida_no_pagada->pendiente'], 1)
+        self.assertEqual(conteos['atrasada->parcialmente_pagada'], 1)
+        self.assertEqual(list(self.plan.cuotas.order_by('numero_cuota').values_list('estado_cuota', flat=True)), ['pendiente', 'parcialmente_pagada', 'pendiente'])
+
+
+class ProyectoMonedaTestCase(TestCase):
+    def test_lote_registra_proyecto_con_moneda_sugerida(self):
+        lote_dolares = Lote.objects.create(ubicacion_proyecto='OASIS 2 (AUCALLAMA)', area_m2=Decimal('90.00'))
+        lote_soles = Lote.objects.create(ubicacion_proyecto='Oasis 3 (Huacho 2)', area_m2=Decimal('90.00'))
+        otro_dolares = Lote.objects.create(ubicacion_proyecto='  oasis 2 (aucallama) ', area_m2=Decimal('90.00'))
+        self.assertEqual(lote_dolares.proyecto.moneda, Proyecto.MONEDA_DOLARES)
+        self.assertEqual(lote_soles.proyecto.moneda, Proyecto.MONEDA_SOLES)
+        self.assertEqual(otro_dolares.proyecto_id, lote_dolares.proyecto_id)
+        self.assertTrue(lote_dolares.es_proyecto_dolares)
+        self.assertFalse(lote_soles.es_proyecto_dolares)
+
+    def test_moneda_se_resuelve_desde_el_registro_y_la_cache(self):
+        lote = Lote.objects.create(ubicacion_proyecto='Proyecto Nuevo Chancay', area_m2=Decimal('90.00'))
+        self.assertFalse(lote.es_proyecto_dolares)
+        Proyecto.objects.filter(pk=lote.proyecto_id).update(moneda=Proyecto.MONEDA_DOLARES)
+        Proyecto.invalidar_cache()
+        self.assertTrue(Lote.objects.get(pk=lote.pk).es_proyecto_dolares)
+        with self.assertNumQueries(0):
+            lote.es_proyecto_dolares
+        proyecto = lote.proyecto
+        proyecto.moneda = Proyecto.MONEDA_SOLES
+        proyecto.save()
+        self.assertFalse(lote.es_proyecto_dolares)
+
+
+class MetricasDashboardTestCase(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.addCleanup(descartar_dias_pendientes)
+        self.api = APIClient()
+        self.api.force_authenticate(user=User.objects.create_user(username='dashboard', password='x'))
+        self.asesor_a = Asesor.objects.create(nombre_asesor='Asesor A', fecha_ingreso=date(2024, 1, 1))
+        self.asesor_b = Asesor.objects.create(nombre_asesor='Asesor B', fecha_ingreso=date(2024, 1, 1))
+        self.lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('20000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='40000002', nombres_completos_razon_social='Cliente Dashboard')
+        self.venta = Venta.objects.create(fecha_venta=date(2025, 3, 5), lote=self.lote, cliente=cliente, valor_lote_venta=Decimal('20000.00'), vendedor_principal=self.asesor_a, status_venta='procesable')
+        # El asesor A ocupa dos roles en la misma presencia: debe contarse una sola vez
+        Presencia.objects.create(
+            cliente=cliente, fecha_hora_presencia=timezone.make_aware(datetime(2025, 3, 5, 10)), proyecto_interes='Oasis 1', medio_captacion='referido',
+            modalidad='presencial', tipo_tour='tour', status_presencia='realizada', asesor_captacion_opc=self.asesor_a, asesor_liner=self.asesor_a,
+            asesor_closer=self.asesor_b, venta_asociada=self.venta,
+        )
+        Presencia.objects.create(
+            cliente=cliente, fecha_hora_presencia=timezone.make_aware(datetime(2025, 3, 6, 10)), proyecto_interes='Oasis 1', medio_captacion='web',
+            modalidad='presencial', tipo_tour='no_tour', status_presencia='agendada', asesor_captacion_opc=self.asesor_b,
+        )
+        RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 10), monto_pago=Decimal('1000.00'))
+        # TestCase nunca confirma: los días del setUp no entran en los captureOnCommitCallbacks de cada test
+        descartar_dias_pendientes()
+
+    def dashboard(self, **params):
+        response = self.api.get(reverse('get_dashboard_data_api'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_dashboard_responde_desde_metricas(self):
+        reconstruir_metricas()
+        rango = {'startDate': '2025-03-01', 'endDate': '2025-03-31'}
+        data = self.dashboard(**rango)
+        self.assertEqual(Decimal(str(data['tarjetas']['montoTotalRecaudo'])), Decimal('1000.00'))
+        self.assertEqual(data['tarjetas']['nPresenciasRealizadas'], 1)
+        self.assertEqual(data['graficos']['recaudoPorMedioCaptacion'][1], ['Referido', 1000.0])
+        status_venta = Venta.objects.get(pk=self.venta.pk).get_status_venta_display()
+        self.assertEqual(data['graficos']['estadoVentas'][1:], [[status_venta, 1]])
+        self.assertEqual(data['graficos']['historicoVentasPresencias'][1:], [['2025-03', 1, 1]])
+        fila_proyecto = next(f for f in data['graficos']['tablaDisponibilidadLotes'] if f['proyecto'] == 'Oasis 1 (Huacho 1)')
+        self.assertEqual(fila_proyecto['total_lotes'], 1)
+
+        self.assertEqual(self.dashboard(asesorId=self.asesor_a.pk, **rango)['tarjetas']['nPresenciasRealizadas'], 1)
+        self.assertEqual(self.dashboard(asesorId=self.asesor_b.pk, **rango)['tarjetas']['nPresenciasRealizadas'], 1)
+        self.assertEqual(Decimal(str(self.dashboard(asesorId=self.asesor_b.pk, **rango)['tarjetas']['montoTotalRecaudo'])), Decimal('0'))
+        # Sin fecha inicial no se aplica el filtro de TOUR realizadas
+        self.assertEqual(self.dashboard(asesorId=self.asesor_b.pk)['tarjetas']['nPresenciasRealizadas'], 2)
+        self.assertEqual(self.dashboard(medio_captacion='web')['tarjetas']['nPresenciasRealizadas'], 1)
+
+    def test_senales_recalculan_los_dias_tocados(self):
+        reconstruir_metricas()
+        pagos_del_dia = MetricaDashboardDiaria.objects.filter(fuente=MetricaDashboardDiaria.FUENTE_PAGO, fecha=date(2025, 4, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            pago = RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 4, 2), monto_pago=Decimal('500.00'))
+        self.assertEqual(pagos_del_dia.get().monto, Decimal('500.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pago.fecha_pago = date(2025, 4, 3)
+            pago.save()
+        self.assertFalse(pagos_del_dia.exists())
+        self.assertEqual(MetricaDashboardDiaria.objects.get(fuente=MetricaDashboardDiaria.FUENTE_PAGO, fecha=date(2025, 4, 3)).cantidad, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pago.delete()
+        self.assertFalse(MetricaDashboardDiaria.objects.filter(fuente=MetricaDashboardDiaria.FUENTE_PAGO, fecha=date(2025, 4, 3)).exists())
+
+        # Cambiar el status de la venta actualiza también las filas de sus pagos
+        with self.captureOnCommitCallbacks(execute=True):
+            venta = Venta.objects.get(pk=self.venta.pk)
+            venta.status_venta = 'anulado'
+            venta.save()
+        self.assertEqual(MetricaDashboardDiaria.objects.get(fuente=MetricaDashboardDiaria.FUENTE_PAGO, fecha=date(2025, 3, 10)).status, 'anulado')
+
+    def test_dias_marcados_siguen_a_su_transaccion(self):
+        import gestion_inmobiliaria.metricas as metricas
+        with mock.patch.object(metricas, 'reconstruir_metricas') as reconstruir:
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(RuntimeError), transaction.atomic():
+                    marcar_dias(date(2025, 5, 1))
+                    raise RuntimeError('revertir')
+                marcar_dias(date(2025, 5, 2))
+                marcar_dias(date(2025, 5, 3), date(2025, 5, 2))
+        # Lo marcado en el bloque revertido se descarta; lo demás se recalcula una vez
+        reconstruir.assert_called_once_with(fechas=[date(2025, 5, 2), date(2025, 5, 3)])
+
+    def test_comando_reconstruye_rango(self):
+        out = StringIO()
+        call_command('reconstruir_metricas_dashboard', desde='2025-03-05', hasta='2025-03-05', stdout=out)
+        self.assertIn('Métricas reconstruidas', out.getvalue())
+        self.assertEqual(set(MetricaDashboardDiaria.objects.values_list('fecha', flat=True)), {date(2025, 3, 5)})
+
+    def test_ranking_asesores_agregado_en_bd(self):
+        with self.assertNumQueries(2):
+            ranking = ranking_asesores(Venta.objects.all())
+        status_venta = Venta.objects.get(pk=self.venta.pk).status_venta
+        self.assertEqual([(f['id_asesor'], f['total_ventas'], f[status_venta]) for f in ranking], [(self.asesor_a.pk, 1, 1), (self.asesor_b.pk, 1, 1)])
+        self.assertEqual(ranking[0]['roles'], ['Captación', 'Liner', 'Vendedor Principal'])
+        self.assertEqual(ranking[1]['roles'], ['Closer'])
+
+        data = self.dashboard()
+        self.assertEqual(data['graficos']['rankingAsesoresIds'], [self.asesor_a.pk, self.asesor_b.pk])
+        self.assertEqual(data['graficos']['rankingAsesores'][1][:4], [f'Asesor A ({self.asesor_a.pk})', 'N/A', 'Captación, Liner, Vendedor Principal', 1])
+
+        detalle = self.api.get(reverse('dashboard_ranking_ventas_api'), {'asesorRankingId': self.asesor_b.pk}).json()
+        self.assertEqual(detalle['count'], 1)
+        self.assertEqual(detalle['results'][0]['id_venta'], self.venta.pk)
+        self.assertEqual(detalle['results'][0]['roles'], ['Closer'])
+
+
+class CacheRespuestasTestCase(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.api = APIClient()
+        self.api.force_authenticate(user=User.objects.create_user(username='cache', password='x'))
+        self.lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('20000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='40000003', nombres_completos_razon_social='Cliente Cache')
+        self.venta = Venta.objects.create(fecha_venta=date(2025, 3, 5), lote=self.lote, cliente=cliente, valor_lote_venta=Decimal('20000.00'))
+        descartar_dias_pendientes()  # Ver MetricasDashboardTestCase.setUp
+        self.addCleanup(descartar_dias_pendientes)
+
+    def get(self, nombre_url, params):
+        return self.api.get(reverse(nombre_url), params)
+
+    def test_hit_miss_e_invalidacion_por_mes(self):
+        marzo = {'startDate': '2025-03-01', 'endDate': '2025-03-31'}
+        abril = {'endDate': '2025-04-30', 'startDate': '2025-04-01'}
+        self.assertEqual(self.get('get_dashboard_data_api', marzo)['X-Cache'], 'MISS')
+        self.assertEqual(self.get('get_dashboard_data_api', marzo)['X-Cache'], 'HIT')
+        self.assertEqual(self.get('get_dashboard_data_api', abril)['X-Cache'], 'MISS')
+        # Los params se normalizan: mismo filtro en otro orden y con vacíos es la misma clave
+        self.assertEqual(self.get('get_dashboard_data_api', {**dict(reversed(list(abril.items()))), 'asesorId': ''})['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Presencia.objects.create(
+                cliente=self.venta.cliente, fecha_hora_presencia=timezone.make_aware(datetime(2025, 3, 8, 10)), proyecto_interes='Oasis 1',
+                medio_captacion='web', modalidad='presencial', tipo_tour='tour', status_presencia='realizada',
+            )
+        respuesta = self.get('get_dashboard_data_api', marzo)
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertEqual(respuesta.json()['tarjetas']['nPresenciasRealizadas'], 1)
+        self.assertEqual(self.get('get_dashboard_data_api', abril)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RegistroPago.objects.create(venta=self.venta, fecha_pago=date(2025, 3, 20), monto_pago=Decimal('300.00'))
+        respuesta = self.get('get_dashboard_data_api', marzo)
+        self.assertEqual(respuesta['X-Cache'], 'MISS')
+        self.assertEqual(Decimal(str(respuesta.json()['tarjetas']['montoTotalRecaudo'])), Decimal('300.00'))
+        # Sin rango acotado depende de 'global', que se invalida con cualquier cambio
+        self.assertEqual(self.get('get_dashboard_data_api', {})['X-Cache'], 'MISS')
+
+        stats = self.api.get(reverse('cache_respuestas_stats_api')).json()
+        self.assertEqual(stats['dashboard'], {'hits': 3, 'misses': 5, 'hit_ratio': round(3 / 8, 4)})
+
+    def test_resumen_comisiones_se_invalida_por_comision_y_lotes_por_dashboard(self):
+        asesor = Asesor.objects.create(nombre_asesor='Asesor Cache', fecha_ingreso=date(2024, 1, 1))
+        params = {'mes': 3, 'anio': 2025}
+        self.assertEqual(self.get('get_commission_summary_data_api', params)['X-Cache'], 'MISS')
+        self.assertEqual(self.get('get_commission_summary_data_api', params)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            ComisionVentaAsesor.objects.create(venta=self.venta, asesor=asesor, rol='liner', porcentaje_comision=Decimal('3.00'))
+        self.assertEqual(self.get('get_commission_summary_data_api', params)['X-Cache'], 'MISS')
+        self.assertEqual(self.get('get_commission_summary_data_api', {'mes': 4, 'anio': 2025})['X-Cache'], 'MISS')
+        self.assertEqual(self.get('get_commission_summary_data_api', {'mes': 4, 'anio': 2025})['X-Cache'], 'HIT')
+
+        marzo = {'startDate': '2025-03-01', 'endDate': '2025-03-31'}
+        self.get('get_dashboard_data_api', marzo)
+        with self.captureOnCommitCallbacks(execute=True):
+            Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('90.00'))
+        self.assertEqual(self.get('get_dashboard_data_api', marzo)['X-Cache'], 'MISS')
+
+
+
+class VentaListadoConsultasTestCase(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(user=User.objects.create_user(username='listado', password='x'))
+        self.asesor = Asesor.objects.create(nombre_asesor='Asesor Listado', fecha_ingreso=date(2024, 1, 1))
+        self.n = 0
+
+    def crear_venta_credito(self, dolares=False):
+        self.n += 1
+        lote = Lote.objects.create(ubicacion_proyecto='Aucallama' if dolares else 'Oasis 1 (Huacho 1)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('13000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento=f'4100000{self.n}', nombres_completos_razon_social=f'Cliente Listado {self.n}')
+        venta = Venta.objects.create(
+            fecha_venta=date(2025, 1, self.n), lote=lote, cliente=cliente, valor_lote_venta=Decimal('13000.00'), tipo_venta='credito',
+            plazo_meses_credito=12, cuota_inicial_requerida=Decimal('1000.00'), vendedor_principal=self.asesor,
+            precio_dolares=Decimal('3500.00') if dolares else None, tipo_cambio=Decimal('3.700') if dolares else None,
+        )
+        plan = PlanPagoVenta.objects.create(venta=venta, monto_total_credito=Decimal('12000.00'), numero_cuotas=4, monto_cuota_regular_original=Decimal('3000.00'), fecha_inicio_pago_cuotas=date(2025, 2, 1))
+        for numero in range(1, 5):
+            CuotaPlanPago.objects.create(plan_pago_venta=plan, numero_cuota=numero, fecha_vencimiento=date(2025, 1, 1) + timedelta(days=30 * numero), monto_programado=Decimal('3000.00'), monto_programado_dolares=Decimal('800.00') if dolares else None)
+        for dia in (5, 6):
+            RegistroPago.objects.create(
+                venta=venta, fecha_pago=date(2025, 2, dia), monto_pago=Decimal('1850.00'),
+                monto_pago_dolares=Decimal('500.00') if dolares else None, tipo_cambio_pago=Decimal('3.700') if dolares else None,
+            )
+        ComisionVentaAsesor.objects.create(venta=venta, asesor=self.asesor, rol='liner', porcentaje_comision=Decimal('3.00'))
+        Presencia.objects.create(
+            cliente=cliente, fecha_hora_presencia=timezone.make_aware(datetime(2025, 1, self.n, 10)), proyecto_interes='Oasis 1',
+            medio_captacion='web', modalidad='presencial', tipo_tour='tour', status_presencia='realizada', venta_asociada=venta,
+        )
+        return venta
+
+    def consultas_listado(self, params=None):
+        params = {'expand': 'plan'} if params is None else params
+        self.api.get(reverse('venta-list'), params)  # Calienta sesiones, permisos y el registro de proyectos
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.api.get(reverse('venta-list'), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(contexto.captured_queries), respuesta.json()['results']
+
+    def test_consultas_constantes_al_crecer_la_pagina(self):
+        self.crear_venta_credito(dolares=True)
+        consultas_una, resultados = self.consultas_listado()
+        self.assertEqual(len(resultados), 1)
+        for _ in range(3):
+            self.crear_venta_credito()
+        self.crear_venta_credito(dolares=True)
+        consultas_cinco, resultados = self.consultas_listado()
+        self.assertEqual(len(resultados), 5)
+        self.assertEqual(consultas_cinco, consultas_una)
+
+        venta = next(r for r in resultados if r['precio_dolares'] is not None)
+        cuotas = venta['plan_pago_detalle']['cuotas']
+        self.assertEqual([c['numero_cuota'] for c in cuotas], [1, 2, 3, 4])
+        self.assertEqual(cuotas[0]['tipo_cambio_pago'], 3.7)
+        self.assertEqual(len(venta['registros_pago']), 2)
+        self.assertIsNotNone(venta['registros_pago'][0]['cuota_info'])
+        self.assertEqual(venta['comisiones_asesores'][0]['asesor_nombre'], 'Asesor Listado')
+        self.assertIsNotNone(venta['presencia_que_origino_id'])
+
+    def test_listado_compacto_por_defecto(self):
+        self.crear_venta_credito(dolares=True)
+        consultas_una, _ = self.consultas_listado({})
+        for _ in range(3):
+            self.crear_venta_credito()
+        consultas_cuatro, resultados = self.consultas_listado({})
+        self.assertEqual(consultas_cuatro, consultas_una)
+        self.assertLessEqual(consultas_cuatro, 4)
+
+        fila = resultados[0]
+        self.assertNotIn('plan_pago_detalle', fila)
+        self.assertNotIn('registros_pago', fila)
+        venta = Venta.objects.get(pk=fila['id_venta'])
+        self.assertEqual(Decimal(fila['saldo_pendiente']), venta.saldo_pendiente)
+        self.assertEqual(fila['liner_nombre'], 'Asesor Listado')
+        self.assertEqual(fila['cliente_info'], venta.cliente.nombres_completos_razon_social)
+        self.assertEqual(fila['lote_info'], str(venta.lote))
+
+        detalle = self.api.get(reverse('venta-detail', args=[venta.pk])).json()
+        self.assertIn('plan_pago_detalle', detalle)
+        self.assertEqual(detalle['saldo_pendiente'], fila['saldo_pendiente'])
+
+
+class CobranzaListaTrabajoTestCase(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.usuario = User.objects.create_user(username='cobranza', password='x')
+        self.api.force_authenticate(user=self.usuario)
+        self.hoy = timezone.now().date()
+
+    def crear_venta(self, n, dias_primer_vencimiento):
+        lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('13000.00'))
+        cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento=f'4200000{n}', nombres_completos_razon_social=f'Cliente Cobranza {n}')
+        venta = Venta.objects.create(fecha_venta=self.hoy - timedelta(days=400), lote=lote, cliente=cliente, valor_lote_venta=Decimal('13000.00'), tipo_venta='credito', plazo_meses_credito=12, cuota_inicial_requerida=Decimal('1000.00'))
+        plan = PlanPagoVenta.objects.create(venta=venta, monto_total_credito=Decimal('3000.00'), numero_cuotas=3, monto_cuota_regular_original=Decimal('1000.00'), fecha_inicio_pago_cuotas=self.hoy)
+        cuotas = [
+            CuotaPlanPago.objects.create(plan_pago_venta=plan, numero_cuota=i + 1, fecha_vencimiento=self.hoy - timedelta(days=dias_primer_vencimiento - 30 * i), monto_programado=Decimal('1000.00'))
+            for i in range(3)
+        ]
+        return venta, cuotas
+
+    def listar(self, **params):
+        respuesta = self.api.get(reverse('cuotapendientecobranza-list'), params)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return respuesta.json()
+
+    def test_agrupa_por_venta_y_pagina_por_cursor(self):
+        ventas = [self.crear_venta(n, dias) for n, dias in enumerate([90, 60, 60, 10], start=1)]
+        _, cuotas = ventas[0]
+        GestionCobranza.objects.create(cuota=cuotas[0], responsable=self.usuario, tipo_contacto='LLAMADA', resultado='Primera')
+        GestionCobranza.objects.create(cuota=cuotas[0], responsable=self.usuario, tipo_contacto='WHATSAPP', resultado='Segunda')
+
+        self.listar(page_size=2)  # Calienta sesiones y permisos
+        with CaptureQueriesContext(connection) as contexto:
+            pagina = self.listar(page_size=2)
+        consultas_pagina = len(contexto.captured_queries)
+        self.assertEqual(pagina['total_ventas'], 4)
+        self.assertEqual([v['id_venta'] for v in pagina['results']], [ventas[0][0].pk, *sorted([ventas[1][0].pk, ventas[2][0].pk])[:1]])
+        primera = pagina['results'][0]
+        self.assertEqual(primera['cuotas_pendientes'], 3)
+        self.assertEqual(primera['max_dias_vencidos'], 90)
+        self.assertEqual([c['numero_cuota'] for c in primera['cuotas']], [1, 2, 3])
+        self.assertEqual(primera['cuotas'][0]['num_gestiones'], 2)
+        self.assertEqual(primera['cuotas'][0]['ultima_gestion']['resultado'], 'Segunda')
+        self.assertEqual(primera['cuotas'][2]['dias_vencidos'], 30)
+
+        vistas = [v['id_venta'] for v in pagina['results']]
+        while pagina['next_cursor']:
+            with CaptureQueriesContext(connection) as contexto:
+                pagina = self.listar(page_size=2, cursor=pagina['next_cursor'])
+            self.assertEqual(len(contexto.captured_queries), consultas_pagina)
+            vistas += [v['id_venta'] for v in pagina['results']]
+        self.assertEqual(sorted(vistas), sorted(v.pk for v, _ in ventas))
+        self.assertEqual(len(vistas), 4)
+
+        solo_atrasadas = self.listar(dias_vencidos_min=50)
+        self.assertEqual(solo_atrasadas['total_ventas'], 3)
+        self.assertEqual(self.api.get(reverse('cuotapendientecobranza-list'), {'cursor': 'no-es-un-cursor'}).status_code, 400)
+
+    def test_antiguedad_de_cartera_por_tramos_y_moneda(self):
+        asesor = Asesor.objects.create(nombre_asesor='Asesor Cartera', fecha_ingreso=date(2024, 1, 1))
+        venta_soles, cuotas_soles = self.crear_venta(1, 95)  # Vencidas hace 95, 65 y 35 días
+        venta_dolares, cuotas_dolares = self.crear_venta(2, 40)  # Vencidas hace 40 y 10 días; la tercera vence en 20
+        Venta.objects.filter(pk__in=[venta_soles.pk, venta_dolares.pk]).update(vendedor_principal=asesor)
+        lote = venta_dolares.lote
+        lote.ubicacion_proyecto = 'Aucallama'
+        lote.save()
+        CuotaPlanPago.objects.filter(pk__in=[c.pk for c in cuotas_dolares]).update(monto_programado_dolares=Decimal('270.00'))
+        CuotaPlanPago.objects.filter(pk=cuotas_dolares[0].pk).update(monto_pagado=Decimal('70.00'), estado_cuota='atrasada')
+        CuotaPlanPago.objects.filter(pk=cuotas_soles[0].pk).update(monto_pagado=Decimal('250.00'), estado_cuota='atrasada')
+
+        with CaptureQueriesContext(connection) as contexto:
+            reporte = reporte_antiguedad(hoy=self.hoy, agrupar_por=['proyecto'])
+        self.assertEqual(len(contexto.captured_queries), 1)
+        por_proyecto = {f['proyecto']: f for f in reporte['filas']}
+        self.assertEqual(por_proyecto['Aucallama']['dolares'], {'0-30': Decimal('270.00'), '31-60': Decimal('200.00'), '61-90': Decimal('0.00'), '90+': Decimal('0.00')})
+        self.assertEqual(por_proyecto['Aucallama']['soles']['31-60'], Decimal('0.00'))
+        soles = por_proyecto['Oasis 1 (Huacho 1)']
+        self.assertEqual(soles['soles'], {'0-30': Decimal('0.00'), '31-60': Decimal('1000.00'), '61-90': Decimal('1000.00'), '90+': Decimal('750.00')})
+        self.assertEqual(soles['cuotas'], {'0-30': 0, '31-60': 1, '61-90': 1, '90+': 1})
+        self.assertEqual(reporte['totales']['cuotas'], {'0-30': 1, '31-60': 2, '61-90': 1, '90+': 1})
+
+        respuesta = self.api.get(reverse('reporte_antiguedad_cartera_api'), {'asesorId': asesor.pk})
+        self.assertEqual(respuesta.status_code, 200)
+        filas = respuesta.json()['filas']
+        self.assertEqual({f['asesor'] for f in filas}, {'Asesor Cartera'})
+        self.assertEqual(set(filas[0]), {'proyecto', 'asesor', 'mes', 'cuotas', 'soles', 'dolares'})
+        self.assertEqual(self.api.get(reverse('reporte_antiguedad_cartera_api'), {'fecha_corte': 'ayer'}).status_code, 400)
+
+    def test_monto_pendiente_en_moneda_del_plan(self):
+        venta_soles, cuotas_soles = self.crear_venta(1, 95)
+        venta_dolares, cuotas_dolares = self.crear_venta(2, 40)
+        lote = venta_dolares.lote
+        lote.ubicacion_proyecto = 'Aucallama'
+        lote.save()
+        # En proyectos en dólares lo programado va en dólares y monto_pagado también
+        CuotaPlanPago.objects.filter(pk__in=[c.pk for c in cuotas_dolares]).update(monto_programado=Decimal('0.00'), monto_programado_dolares=Decimal('270.00'))
+        CuotaPlanPago.objects.filter(pk=cuotas_dolares[0].pk).update(monto_pagado=Decimal('70.00'), estado_cuota='atrasada')
+        CuotaPlanPago.objects.filter(pk=cuotas_soles[0].pk).update(monto_pagado=Decimal('250.00'), estado_cuota='atrasada')
+        por_venta = {v['id_venta']: v for v in self.listar()['results']}
+        self.assertEqual((por_venta[venta_dolares.pk]['moneda'], Decimal(por_venta[venta_dolares.pk]['monto_pendiente'])), ('USD', Decimal('740.00')))
+        self.assertEqual((por_venta[venta_soles.pk]['moneda'], Decimal(por_venta[venta_soles.pk]['monto_pendiente'])), ('PEN', Decimal('2750.00')))
+
+    def test_antiguedad_rechaza_dimensiones_desconocidas(self):
+        self.crear_venta(1, 95)
+        url = reverse('reporte_antiguedad_cartera_api')
+        for agrupar_por in ('region', 'proyecto,region'):
+            respuesta = self.api.get(url, {'agrupar_por': agrupar_por})
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertIn('region', respuesta.json()['detail'])
+        with self.assertRaises(DimensionInvalida):
+            reporte_antiguedad(hoy=self.hoy, agrupar_por=['cliente'])
+        # Sin dimensiones (o solo separadores) se agrupa por todas: una fila por grupo, no por cuota
+        reporte = self.api.get(url, {'agrupar_por': ','}).json()
+        self.assertEqual((reporte['agrupado_por'], len(reporte['filas'])), (['proyecto', 'asesor', 'mes'], 1))
+
+
+class BusquedaClientesTestCase(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user('buscador', password='x'))
+        self.ana = Cliente.objects.create(tipo_documento='DNI', numero_documento='45879632', nombres_completos_razon_social='Ana María Quispe Rojas', telefono_principal='987654321')
+        self.luis = Cliente.objects.create(tipo_documento='DNI', numero_documento='10458796', nombres_completos_razon_social='Luis Rojas Huamán', telefono_principal='912345678')
+        self.extranjero = Cliente.objects.create(tipo_documento='Pasaporte', numero_documento='AB45879', nombres_completos_razon_social='John Smith')
+
+    def ids(self, termino):
+        return [c.pk for c in buscar_clientes(Cliente.objects.all(), termino)]
+
+    def test_documento_y_telefono_por_prefijo(self):
+        self.assertEqual(self.ids('4587'), [self.ana.pk])  # '10458796' lo contiene pero no empieza así
+        self.assertEqual(self.ids('912 345'), [self.luis.pk])
+        self.assertEqual(self.ids('ab458'), [self.extranjero.pk])
+
+    def test_nombre_con_palabras_en_cualquier_orden(self):
+        self.assertEqual(self.ids('rojas quispe'), [self.ana.pk])
+        self.assertEqual(self.ids('ROJAS'), [self.ana.pk, self.luis.pk])
+        self.assertEqual(normalizar('Huamán'), 'HUAMAN')
+
+    def test_endpoints_usan_la_busqueda(self):
+        respuesta = self.api.get(reverse('cliente-search'), {'q': '9876'})
+        self.assertEqual([c['id_cliente'] for c in respuesta.json()['results']], [self.ana.pk])
+        respuesta = self.api.get(reverse('cliente-list'), {'q': '9123'})
+        resultados = respuesta.json()
+        resultados = resultados.get('results', resultados)
+        self.assertEqual([c['id_cliente'] for c in resultados], [self.luis.pk])
+        respuesta = self.api.get(reverse('cliente-sin-presencia'), {'search': 'smith'})
+        self.assertEqual([c['id_cliente'] for c in respuesta.json()['results']], [self.extranjero.pk])
+
+
+    def test_desplegables_sin_consulta_por_cliente(self):
+        caches['respuestas'].clear()
+        Presencia.objects.create(
+            cliente=self.ana, proyecto_interes='Oasis', fecha_hora_presencia=timezone.now(),
+            medio_captacion='web', modalidad='presencial', tipo_tour='tour', status_presencia='realizada',
+        )
+        for i in range(5):
+            Cliente.objects.create(tipo_documento='DNI', numero_documento=f'7000000{i}', nombres_completos_razon_social=f'Cliente Extra {i}')
+        self.api.get(reverse('cliente-para-ventas'))
+        with CaptureQueriesContext(connection) as contexto:
+            respuesta = self.api.get(reverse('cliente-para-ventas'))
+        self.assertEqual(len(contexto.captured_queries), 1)  # El total sale de la cache
+        datos = respuesta.json()
+        self.assertEqual(datos['total_available'], 8)
+        self.assertEqual({c['id_cliente'] for c in datos['results'] if c['tiene_presencia']}, {self.ana.pk})
+
+        respuesta = self.api.get(reverse('cliente-sin-presencia'))
+        self.assertEqual(respuesta.json()['total_available'], 7)
+        self.assertNotIn(self.ana.pk, [c['id_cliente'] for c in respuesta.json()['results']])
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(tipo_documento='DNI', numero_documento='71111111', nombres_completos_razon_social='Cliente Nuevo')
+        self.assertEqual(self.api.get(reverse('cliente-sin-presencia')).json()['total_available'], 8)
+
+
+class TypeaheadTestCase(TestCase):
+    def setUp(self):
+        for indice in INDICES_TYPEAHEAD.values():
+            indice.invalidar()
+        self.addCleanup(lambda: [indice.invalidar() for indice in INDICES_TYPEAHEAD.values()])
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user('tecleador', password='x'))
+        self.jose = Cliente.objects.create(tipo_documento='DNI', numero_documento='40112233', nombres_completos_razon_social='José Peña Torres', telefono_principal='987 111 222')
+        self.josefina = Cliente.objects.create(tipo_documento='DNI', numero_documento='40998877', nombres_completos_razon_social='Josefina Alva', telefono_principal='955000111')
+        Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', manzana='B', numero_lote='12', area_m2=Decimal('120.00'), estado_lote='Vendido')
+        self.lote = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', manzana='B', numero_lote='13', area_m2=Decimal('120.00'))
+
+    def buscar(self, entidad, **params):
+        respuesta = self.api.get(reverse('typeahead_api', args=[entidad]), params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['results']
+
+    def test_prefijos_sin_consultas_tras_la_carga(self):
+        self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='jose')], [self.jose.pk, self.josefina.pk])
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='pena jos')], [self.jose.pk])
+            self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='987111')], [self.jose.pk])
+            self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='4099')], [self.josefina.pk])
+            lotes = self.buscar('lotes', q='oasis b', estado_lote='Disponible,Reservado')
+        self.assertEqual(len(contexto.captured_queries), 1)  # Solo la carga del índice de lotes
+        self.assertEqual([l['id_lote'] for l in lotes], [self.lote.pk])
+        self.assertEqual(len(self.buscar('clientes', q='jo', limit=1)), 1)
+        for limite in ('-5', '0', 'diez'):
+            self.assertEqual(self.api.get(reverse('typeahead_api', args=['clientes']), {'q': 'jo', 'limit': limite}).status_code, 400)
+        self.assertEqual(self.api.get(reverse('typeahead_api', args=['ventas']), {'q': 'ab'}).status_code, 404)
+
+    def test_altas_cambios_y_bajas_se_aplican_al_confirmar(self):
+        self.buscar('clientes', q='jose')
+        with self.captureOnCommitCallbacks(execute=True):
+            nuevo = Cliente.objects.create(tipo_documento='DNI', numero_documento='41000000', nombres_completos_razon_social='Joselito Ruiz')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.josefina.nombres_completos_razon_social = 'Fina Alva'
+            self.josefina.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jose.delete()
+        with CaptureQueriesContext(connection) as contexto:
+            self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='jose')], [nuevo.pk])
+            self.assertEqual([c['id_cliente'] for c in self.buscar('clientes', q='fina')], [self.josefina.pk])
+        self.assertEqual(len(contexto.captured_queries), 0)
+
+
+class LotesDuplicadosTestCase(TestCase):
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(User.objects.create_user('depurador', password='x'))
+        self.cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='43000000', nombres_completos_razon_social='Cliente Duplicados')
+        # Los duplicados vienen de antes de la restricción: se quita su índice dentro de la transacción del test
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX lote_ubicacion_unica')
+
+    def crear_lote(self, proyecto, manzana, numero, etapa=None, vendido=False):
+        lote = Lote.objects.create(ubicacion_proyecto=proyecto, manzana=manzana, numero_lote=numero, etapa=etapa, area_m2=Decimal('100.00'), precio_lista_soles=Decimal('20000.00'))
+        if vendido:
+            Venta.objects.create(fecha_venta=date(2025, 1, 10), lote=lote, cliente=self.cliente, valor_lote_venta=Decimal('20000.00'), tipo_venta='contado')
+        return lote
+
+    def test_depuracion_por_clave_normalizada(self):
+        vendido = self.crear_lote('Oasis 1 (Huacho 1)', 'A', '1', vendido=True)
+        copia = self.crear_lote(' oasis 1 (huacho 1) ', 'a', '1 ')
+        otra_copia = self.crear_lote('OASIS 1 (HUACHO 1)', 'A', '1')
+        otra_etapa = self.crear_lote('Oasis 1 (Huacho 1)', 'A', '1', etapa=2)
+        vendido_2 = self.crear_lote('Oasis 1 (Huacho 1)', 'B', '7', vendido=True)
+        copia_vendida = self.crear_lote('Oasis 1 (Huacho 1)', 'b', '7', vendido=True)
+        presencia = Presencia.objects.create(
+            cliente=self.cliente, proyecto_interes='Oasis', fecha_hora_presencia=timezone.now(), medio_captacion='web',
+            modalidad='presencial', tipo_tour='tour', status_presencia='realizada', lote_interes_inicial=copia,
+        )
+
+        simulacion = self.api.post(reverse('lote-limpiar-duplicados') + '?dry_run=1').json()
+        self.assertEqual((simulacion['grupos_duplicados'], simulacion['total_eliminados']), (2, 2))
+        self.assertEqual(Lote.objects.count(), 6)
+
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = depurar_lotes_duplicados()
+        self.assertEqual(len(contexto.captured_queries), 1)
+        self.assertEqual(resultado['con_ventas'], [copia_vendida.pk])
+
+        respuesta = self.api.post(reverse('lote-limpiar-duplicados')).json()
+        self.assertEqual(respuesta['total_eliminados'], 2)
+        self.assertEqual(set(Lote.objects.values_list('pk', flat=True)), {vendido.pk, otra_etapa.pk, vendido_2.pk, copia_vendida.pk})
+        presencia.refresh_from_db()
+        self.assertEqual(presencia.lote_interes_inicial_id, vendido.pk)
+        self.assertFalse(Lote.objects.filter(pk__in=[copia.pk, otra_copia.pk]).exists())
+
+    def test_serializer_rechaza_duplicado(self):
+        lote = self.crear_lote('Oasis 1 (Huacho 1)', 'C', '3')
+        datos = {'ubicacion_proyecto': 'oasis 1 (huacho 1)', 'manzana': ' c', 'numero_lote': '3', 'area_m2': '100.00', 'precio_lista_soles': '20000.00'}
+        respuesta = self.api.post(reverse('lote-list'), datos)
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn(lote.pk, respuesta.json()['numero_lote'][0])
+        self.assertEqual(self.api.patch(reverse('lote-detail', args=[lote.pk]), {'manzana': 'C', 'precio_lista_soles': '21000.00'}).status_code, 200)
+        self.assertEqual(self.api.post(reverse('lote-list'), {**datos, 'etapa': 2}).status_code, 201)
+
+
+class RestriccionLotesTestCase(TransactionTestCase):
+    """Crear el índice necesita DDL fuera de la transacción del test."""
+
+    def indice_activo(self):
+        with connection.cursor() as cursor:
+            return 'lote_ubicacion_unica' in connection.introspection.get_constraints(cursor, Lote._meta.db_table)
+
+    def test_restriccion_pendiente_hasta_resolver_duplicados_vendidos(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX lote_ubicacion_unica')
+        self.addCleanup(crear_restriccion_unica)
+        cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='43000001', nombres_completos_razon_social='Cliente Restricción')
+        for proyecto in ('Oasis 1 (Huacho 1)', 'oasis 1 (huacho 1)'):
+            lote = Lote.objects.create(ubicacion_proyecto=proyecto, manzana='D', numero_lote='4', area_m2=Decimal('100.00'), precio_lista_soles=Decimal('20000.00'))
+            venta = Venta.objects.create(fecha_venta=date(2025, 1, 10), lote=lote, cliente=cliente, valor_lote_venta=Decimal('20000.00'), tipo_venta='contado')
+
+        # La migración no falla con duplicados vendidos: avisa y deja el índice para después
+        migracion = import_module('gestion_inmobiliaria.migrations.0008_lote_ubicacion_unica')
+        with self.assertLogs(migracion.logger, 'WARNING'):
+            migracion.crear_restriccion(django_apps, connection.schema_editor())
+        self.assertFalse(self.indice_activo())
+
+        salida = StringIO()
+        call_command('check_integrity', depurar_lotes_duplicados=True, stdout=salida)
+        self.assertIn('pendiente', salida.getvalue())
+        self.assertFalse(self.indice_activo())
+
+        venta.delete()
+        call_command('check_integrity', depurar_lotes_duplicados=True, stdout=salida)
+        self.assertIn('lote_ubicacion_unica activa', salida.getvalue())
+        self.assertTrue(self.indice_activo())
+        self.assertEqual(Lote.objects.filter(manzana='D').count(), 1)
+
+
+class EstadoLoteTestCase(TestCase):
+    def setUp(self):
+        self.lote1 = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', manzana='E', numero_lote='1', area_m2=Decimal('120.00'), precio_lista_soles=Decimal('15000.00'))
+        self.lote2 = Lote.objects.create(ubicacion_proyecto='Oasis 1 (Huacho 1)', manzana='E', numero_lote='2', area_m2=Decimal('120.00'), precio_lista_soles=Decimal('15000.00'))
+        self.cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='40000009', nombres_completos_razon_social='Cliente Estado Lote')
+
+    def estados(self):
+        return [Lote.objects.get(pk=lote.pk).estado_lote for lote in (self.lote1, self.lote2)]
+
+    def test_estado_por_ventas_y_salto_sin_cambios(self):
+        venta = Venta.objects.create(fecha_venta=date(2025, 1, 10), lote=self.lote1, cliente=self.cliente, valor_lote_venta=Decimal('15000.00'), status_venta='procesable')
+        self.assertEqual(self.estados(), ['Reservado', 'Disponible'])
+
+        venta = Venta.objects.get(pk=venta.pk)
+        venta.notas = 'Sin efecto en el lote'
+        with CaptureQueriesContext(connection) as consultas:
+            venta.save()
+        self.assertFalse([q['sql'] for q in consultas.captured_queries if 'COUNT(' in q['sql'] or 'UPDATE "gestion_inmobiliaria_lote"' in q['sql']])
+
+        venta.lote = self.lote2
+        venta.save()
+        self.assertEqual(self.estados(), ['Disponible', 'Reservado'])
+        venta.cliente_firmo_contrato = True
+        venta.save(update_fields=['cliente_firmo_contrato'])
+        self.assertEqual(self.estados(), ['Disponible', 'Vendido'])
+        venta.delete()
+        self.assertEqual(self.estados(), ['Disponible', 'Disponible'])
+
+    def test_recalculo_en_bloque(self):
+        Venta.objects.create(fecha_venta=date(2025, 1, 10), lote=self.lote1, cliente=self.cliente, valor_lote_venta=Decimal('15000.00'), status_venta='procesable', cliente_firmo_contrato=True)
+        Lote.objects.update(estado_lote='Reservado')
+        self.assertEqual(recalcular_estado_lotes(), 2)
+        self.assertEqual(self.estados(), ['Vendido', 'Disponible'])
+        self.assertEqual(recalcular_estado_lotes([self.lote1.pk, self.lote2.pk]), 0)
+
+class ActividadDiariaTestCase(TestCase):
+    def setUp(self):
+        self.asesor_a = Asesor.objects.create(nombre_asesor='Asesor Actividad A', fecha_ingreso=date(2024, 1, 1))
+        self.asesor_b = Asesor.objects.create(nombre_asesor='Asesor Actividad B', fecha_ingreso=date(2024, 1, 1))
+        self.cliente = Cliente.objects.create(tipo_documento='DNI', numero_documento='40000010', nombres_completos_razon_social='Cliente Actividad')
+        self.dia = date(2025, 4, 7)
+        self.addCleanup(descartar_dias_pendientes)
+
+    def presencia(self, **campos):
+        datos = dict(
+            cliente=self.cliente, fecha_hora_presencia=timezone.make_aware(datetime(2025, 4, 7, 10)), proyecto_interes='Oasis 1',
+            medio_captacion='referido', modalidad='presencial', tipo_tour='tour', status_presencia='realizada',
+        )
+        datos.update(campos)
+        return Presencia.objects.create(**datos)
+
+    def contadores(self):
+        return {
+            (fila.asesor_id, fila.fecha_actividad): fila.presencias_generadas
+            for fila in ActividadDiaria.objects.all() if fila.presencias_generadas
+        }
+
+    def test_contadores_incrementales(self):
+        # A ocupa dos roles en la primera presencia: cuenta una vez
+        p1 = self.presencia(asesor_captacion_opc=self.asesor_a, asesor_liner=self.asesor_a)
+        p2 = self.presencia(asesor_closer=self.asesor_a, asesor_call_agenda=self.asesor_b)
+        self.assertEqual(self.contadores(), {(self.asesor_a.pk, self.dia): 2, (self.asesor_b.pk, self.dia): 1})
+
+        p1 = Presencia.objects.get(pk=p1.pk)
+        p1.observaciones = 'Sin efecto en la actividad'
+        with CaptureQueriesContext(connection) as consultas:
+            p1.save()
+        self.assertFalse([q['sql'] for q in consultas.captured_queries if 'actividaddiaria' in q['sql'].lower()])
+
+        # Quitar un rol que el asesor sigue ocupando no cambia nada; pasarle la presencia a B sí
+        p1.asesor_liner = None
+        p1.save()
+        p1.asesor_captacion_opc = self.asesor_b
+        p1.save()
+        self.assertEqual(self.contadores(), {(self.asesor_a.pk, self.dia): 1, (self.asesor_b.pk, self.dia): 2})
+
+        p2.fecha_hora_presencia = timezone.make_aware(datetime(2025, 4, 8, 10))
+        p2.save()
+        self.assertEqual(self.contadores(), {
+            (self.asesor_b.pk, self.dia): 1, (self.asesor_a.pk, date(2025, 4, 8)): 1, (self.asesor_b.pk, date(2025, 4, 8)): 1,
+        })
+        p2.status_presencia = 'agendada'
+        p2.save()
+        p1.delete()
+        self.assertEqual(self.contadores(), {})
+
+    def test_contadores_coinciden_con_reconstruccion(self):
+        self.presencia(asesor_captacion_opc=self.asesor_a, asesor_call_agenda=self.asesor_a, asesor_closer=self.asesor_b)
+        p = self.presencia(asesor_liner=self.asesor_b)
+        p.asesor_liner = self.asesor_a
+        p.save()
+        self.presencia(asesor_closer=self.asesor_a, status_presencia='agendada')
+        with self.assertNumQueries(1):
+            conteo = contar_presencias_por_asesor()
+        self.assertEqual(self.contadores(), conteo)
+
+        ActividadDiaria.objects.update(presencias_generadas=0)
+        salida = StringIO()
+        call_command('reconstruir_actividad_diaria', desde='2025-04-01', hasta='2025-04-30', stdout=salida)
+        self.assertIn('2 filas', salida.getvalue())
+        self.assertEqual(self.contadores(), {(self.asesor_a.pk, self.dia): 2, (self.asesor_b.pk, self.dia): 1})
+
+class ImportacionCSVTestCase(TestCase):
+    LOTES = (
+        'PROYECTO;ETAPA;MANZANA;LOTE;AREA_m2;PRECIO_CONTADO_SOLES;PRECIO_CONTADO_DOLARES;12_MESES_SOLES;24_MESES_SOLES;12_MESES_DOLARES;24_MESES_DOLARES\n'
+        '{filas}'
+    )
+
+    def csv_lotes(self, *filas):
+        return StringIO(self.LOTES.format(filas=''.join(f + '\n' for f in filas)))
+
+    def test_importa_en_bloque_y_actualiza_al_reimportar(self):
+        filas = [f'Oasis 1 (Huacho 1);1;A;{n};120,00;17.000,00;;19.000,00;21.000,00;;' for n in range(1, 31)]
+        with CaptureQueriesContext(connection) as contexto:
+            resultado = importar_csv('lotes', self.csv_lotes(*filas), tamano_lote=10)
+        self.assertEqual((resultado['creados'], resultado['errores']), (30, []))
+        self.assertLess(len(contexto.captured_queries), 30)  # Bloques, no una consulta por fila
+        lote = Lote.objects.get(manzana='A', numero_lote='7')
+        self.assertEqual((lote.precio_lista_soles, lote.precio_lista_dolares), (Decimal('17000.00'), Decimal('0.00')))
+        self.assertIsNotNone(lote.proyecto_id)
+        Lote.objects.filter(pk=lote.pk).update(estado_lote='Vendido')
+
+        resultado = importar_csv('lotes', self.csv_lotes(
+            ' oasis 1 (huacho 1) ;1;a;7;120,00;18.000,00;;19.000,00;21.000,00;;',  # Misma clave normalizada
+            'Oasis 1 (Huacho 1);1;A;8;120,00;17.000,00;;19.000,00;21.000,00;;',
+            'Oasis 1 (Huacho 1);1;A;99;ciento;17.000,00;;;;;',
+        ))
+        self.assertEqual((resultado['creados'], resultado['actualizados'], resultado['sin_cambios']), (0, 1, 1))
+        self.assertEqual(resultado['errores'], [{'fila': 4, 'columna': 'AREA_m2', 'valor': 'ciento', 'mensaje': 'Monto inválido'}])
+        lote.refresh_from_db()
+        self.assertEqual((lote.precio_lista_soles, lote.estado_lote), (Decimal('18000.00'), 'Vendido'))
+        self.assertEqual(Lote.objects.count(), 30)
+
+    def test_etapa_no_numerica_es_error_de_fila(self):
+        resultado = importar_csv('lotes', self.csv_lotes(
+            'Oasis 1 (Huacho 1);II;A;1;120,00;17.000,00;;;;;',
+            'Oasis 1 (Huacho 1);;A;2;120,00;17.000,00;;;;;',
+        ))
+        self.assertEqual(resultado['errores'], [{'fila': 2, 'columna': 'ETAPA', 'valor': 'II', 'mensaje': 'Número entero inválido'}])
+        self.assertEqual(list(Lote.objects.values_list('numero_lote', 'etapa')), [('2', None)])
+
+    def test_clientes_y_asesores(self):
+        Cliente.objects.create(tipo_documento='DNI', numero_documento='44000001', nombres_completos_razon_social='Cliente Existente')
+        clientes = StringIO(
+            'TIPO_DOCUMENTO;NUMERO_DOCUMENTO;NOMBRES;FECHA_NACIMIENTO;TELEFONO_PRINCIPAL;ESTADO_CIVIL\n'
+            ';44000001;Cliente Existente;;987654321;\n'
+            ';20123456789;Empresa SAC;;;\n'
+            ';;Sin Documento;31/12/1990;;\n'
+            ';;sin  documento;;999111222;\n'  # Duplicado dentro del archivo: se fusiona
+            ';;Estado Raro;;;Otro estado\n'
+        )
+        resultado = importar_csv('clientes', clientes)
+        self.assertEqual((resultado['creados'], resultado['actualizados']), (2, 1))
+        self.assertEqual([(e['fila'], e['columna']) for e in resultado['errores']], [(6, 'ESTADO_CIVIL')])
+        self.assertEqual(Cliente.objects.get(numero_documento='44000001').telefono_principal, '987654321')
+        self.assertEqual(Cliente.objects.get(numero_documento='20123456789').tipo_documento, 'RUC')
+        self.assertEqual(Cliente.objects.get(nombres_completos_razon_social='Sin Documento').telefono_principal, '999111222')
+
+        asesores = StringIO(
+            'NOMBRE;DNI;FECHA_NACIMIENTO;NUMERO_HIJOS;FECHA_INGRESO;TIPO\n'
+            'Ana;12345678;15/03/1990;1;01/01/2023;Junior\n'
+            'Ana;87654321;;;2023-02-01;Socio\n'  # Homónimo con otro DNI: es otra persona
+            'Sin Ingreso;11111111;;;;Junior\n'
+        )
+        resultado = importar_csv('asesores', asesores, dry_run=True)
+        self.assertEqual((resultado['creados'], resultado['dry_run']), (2, True))
+        self.assertEqual(resultado['errores'][0]['columna'], 'FECHA_INGRESO')
+        self.assertFalse(Asesor.objects.exists())
+
+    def test_comando_con_reporte(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo, reporte = os.path.join(carpeta, 'lotes.csv'), os.path.join(carpeta, 'reporte.json')
+            with open(archivo, 'w', encoding='utf-8-sig') as f:
+                f.write(self.csv_lotes('Aucallama;;B;1;200,00;;10.000,00;;;11.000,00;12.000,00').getvalue())
+            salida = StringIO()
+            call_command('import_csv', 'lotes', archivo, reporte=reporte, stdout=salida)
+            with open(reporte, encoding='utf-8') as f:
+                self.assertEqual(json.load(f)['creados'], 1)
+        self.assertIn('Creados: 1', salida.getvalue())
+        lote = Lote.objects.get()
+        self.assertEqual((lote.precio_lista_dolares, lote.precio_lista_soles), (Decimal('10000.00'), Decimal('0.00')))
+
+
+class ImportacionHistoricaTestCase(TestCase):
+    CABECERA = ('FECHA;CÓDIGO;ID_LEAD;FECHA.1;TOUR;INVITADO;DNI;CELULAR;VISITA;DISTRITO;FUENTE;OPC;TMK;SUP_TLMK;LINER;CLOSER;COSTO LOTE;'
+                'LOTE;CUOTA;COBRANZA;MZ;STATUS;OBSERVACION;LOTES;RECAUDO;MEDIO PAGO;4%;4,50%;2,00%;PROYECTO;CONTADO/CREDITO')
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.carpeta.cleanup)
+
+    def archivo(self, *filas):
+        ruta = os.path.join(self.carpeta.name, 'presencias.csv')
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write('\n'.join([self.CABECERA, *filas]) + '\n')
+        return ruta
+
+    def fila(self, fecha, lead, nombre, status, cobranza, lote='1', fecha_presencia='04/11/2023', celular='900490075'):
+        return (f'{fecha};;{lead};{fecha_presencia};TOUR;{nombre};;{celular};SALA LINCE;;REDES;;CLARA;;BRIAN;EDUARDO;26000,00;{lote};'
+                f'2600,00;{cobranza};A;{status};{status.lower()};1;2600,00;EFECTIVO;;;;Oasis 1 (Huacho 1);CREDITO')
+
+    def test_fusiona_la_evolucion_de_una_separacion(self):
+        Cliente.objects.create(tipo_documento='Otro', nombres_completos_razon_social='Erika', telefono_principal='900490075')
+        ruta = self.archivo(
+            self.fila('01/11/2023', '6942', 'ERIKA PEREZ', 'SEPARACION', '2600,00'),
+            self.fila('01/12/2023', '6942', 'ERIKA PEREZ', 'PROCESABLE', '5200,00'),
+            '05/11/2023;;;05/11/2023;NO TOUR;JUAN SIN VENTA;12345678;;VIRTUAL;;WEB;ANA;;;;;;;;;;NO INTERESADO;;;;;;;;Oasis 1 (Huacho 1);',
+            '05/11/2023;;;sin fecha;TOUR;FECHA MALA;;;;;;;;;;;;;;;;;;;;;;;;Oasis 1 (Huacho 1);',
+        )
+        resultado = importar_historico(ruta)
+        self.assertEqual((resultado['grupos'], resultado['filas_fusionadas']), (2, 1))
+        self.assertEqual([(e['fila'], e['columna']) for e in resultado['errores']], [(5, 'FECHA.1')])
+        self.assertEqual((resultado['clientes_creados'], resultado['ventas_creadas'], resultado['pagos_creados']), (1, 1, 2))
+
+        venta = Venta.objects.get()
+        self.assertEqual(venta.cliente.id_lead, '6942')  # Cliente existente encontrado por celular y vinculado al CRM
+        self.assertEqual((venta.status_venta, venta.monto_pagado_actual, venta.fecha_venta), ('procesable', Decimal('5200.00'), date(2023, 12, 1)))
+        self.assertEqual(venta.lote.estado_lote, 'Reservado')
+        self.assertEqual(venta.vendedor_principal.nombre_asesor, 'EDUARDO')
+        presencia = Presencia.objects.get(venta_asociada=venta)
+        self.assertEqual((presencia.status_presencia, presencia.asesor_call_agenda.nombre_asesor), ('realizada', 'CLARA'))
+        self.assertEqual(Presencia.objects.get(cliente__numero_documento='12345678').tipo_tour, 'no_tour')
+        self.assertEqual(ActividadDiaria.objects.get(asesor__nombre_asesor='BRIAN', fecha_actividad=date(2023, 11, 4)).presencias_generadas, 1)
+        # Venta a crédito: plan con el plazo por defecto y los pagos aplicados a sus cuotas
+        plan = PlanPagoVenta.objects.get(venta=venta)
+        self.assertEqual((resultado['planes_creados'], plan.numero_cuotas, plan.monto_total_credito, plan.cuotas_pagadas), (1, 12, Decimal('23400.00'), 2))
+        self.assertEqual(plan.cuotas.get(numero_cuota=3).monto_pagado, Decimal('1300.00'))
+        self.assertFalse(RegistroPago.objects.filter(venta=venta, cuota_plan_pago_cubierta__isnull=True).exists())
+        self.assertEqual(verificar_totales(venta_ids=[venta.pk])['planes_con_diferencias'], 0)
+
+        repetido = importar_historico(ruta)
+        self.assertEqual((repetido['ventas_creadas'], repetido['presencias_creadas'], repetido['pagos_creados'], repetido['clientes_creados']), (0, 0, 0, 0))
+        self.assertEqual(RegistroPago.objects.count(), 2)
+        self.assertEqual((repetido['planes_creados'], PlanPagoVenta.objects.count()), (0, 1))
+
+    def test_usa_los_lotes_importados_con_etapa(self):
+        lotes = StringIO(
+            'PROYECTO;ETAPA;MANZANA;LOTE;AREA_m2;PRECIO_CONTADO_SOLES\n'
+            'OASIS 1 (HUACHO 1);1;A;1;96,37;26000,00\n'
+            'OASIS 1 (HUACHO 1);1;A;2;96,37;26000,00\n'
+            'OASIS 1 (HUACHO 1);2;A;2;96,37;26000,00\n'
+        )
+        self.assertEqual(importar_csv('lotes', lotes)['creados'], 3)
+        ruta = self.archivo(
+            self.fila('01/11/2023', '8001', 'CLIENTE ETAPA', 'PROCESABLE', '2600,00', lote='1', celular='900000101'),
+            self.fila('01/11/2023', '8002', 'CLIENTE AMBIGUO', 'SEPARACION', '2600,00', lote='2', celular='900000102'),
+        )
+        resultado = importar_historico(ruta)
+        self.assertEqual((resultado['lotes_creados'], resultado['ventas_creadas']), (0, 1))
+        self.assertEqual(Lote.objects.count(), 3)
+        venta = Venta.objects.get()
+        self.assertEqual((venta.lote.etapa, venta.lote.numero_lote, venta.lote.estado_lote), (1, '1', 'Reservado'))
+        # A-2 existe en las etapas 1 y 2: se informa y la presencia queda sin lote
+        self.assertEqual([(a['fila'], a['columna']) for a in resultado['avisos']], [(3, 'LOTE')])
+        self.assertIsNone(Presencia.objects.get(cliente__id_lead='8002').lote_interes_inicial)
+
+    def test_retoma_desde_el_punto_de_control(self):
+        ruta = self.archivo(*[self.fila('01/11/2023', str(7000 + n), f'CLIENTE {n}', 'SEPARACION', '2600,00', lote=str(n), celular=f'90000000{n}') for n in range(3)])
+        checkpoint = ruta + '.checkpoint.json'
+        original = ImportacionHistorica.escribir_bloque
+        llamadas = []
+
+        def falla_en_el_segundo(importacion, grupos):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise RuntimeError('corte simulado')
+            return original(importacion, grupos)
+
+        with mock.patch.object(ImportacionHistorica, 'escribir_bloque', falla_en_el_segundo):
+            with self.assertRaises(RuntimeError):
+                importar_historico(ruta, checkpoint=checkpoint, grupos_por_bloque=1)
+        with open(checkpoint, encoding='utf-8') as f:
+            self.assertEqual(json.load(f)['grupos_confirmados'], 1)
+        self.assertEqual(Venta.objects.count(), 1)
+
+        resultado = importar_historico(ruta, checkpoint=checkpoint, grupos_por_bloque=1)
+        self.assertEqual((resultado['grupos_reanudados'], resultado['ventas_creadas']), (1, 3))  # Los contadores incluyen el tramo anterior
+        self.assertEqual(Venta.objects.count(), 3)
+        self.assertFalse(os.path.exists(checkpoint))
+
+
+class BenchmarkIndicesTestCase(TestCase):
+    def test_benchmark_revierte_dataset_e_indices(self):
+        salida = StringIO()
+        call_command('benchmark_indices', ventas=50, repeticiones=1, stdout=salida)
+        texto = salida.getvalue()
+        self.assertIn('Sin índices', texto)
+        self.assertIn('Con índices', texto)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(Presencia.objects.exists())
+        with connection.cursor() as cursor:
+            indices = connection.introspection.get_constraints(cursor, Venta._meta.db_table)
+        self.assertIn('venta_fecha_status_idx', indices)
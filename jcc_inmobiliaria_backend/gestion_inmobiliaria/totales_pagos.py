@@ -0,0 +1,106 @@
+# gestion_inmobiliaria/totales_pagos.py
+"""
+Totales de pagos desnormalizados.
+
+Venta guarda monto_pagado_actual, monto_pagado_dolares, saldo_soles y saldo_dolares; PlanPagoVenta
+guarda cuotas_pagadas y proxima_cuota_vencimiento. procesar_pagos_de_venta los mantiene en cada alta
+o baja de pago, así que los serializers los leen como columnas en vez de sumar registros_pago.
+
+verificar_totales los recalcula desde los pagos y las cuotas con una consulta agregada por tabla,
+informa las diferencias y, con reparar=True, las corrige con bulk_update. Lo usan el comando
+verificar_totales_pagos y las importaciones en bloque, donde no corren las señales. apps permite
+usarlo desde una migración con los modelos históricos.
+"""
+from decimal import Decimal
+
+from django.apps import apps as apps_globales
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .pagos import ESTADOS_CUOTA_PAGADA, calcular_saldos_venta
+
+TAMANO_LOTE = 1000
+MAX_DETALLES = 50
+CENTIMOS = Decimal('0.01')
+CAMPOS_VENTA = ['monto_pagado_actual', 'monto_pagado_dolares', 'saldo_soles', 'saldo_dolares']
+CAMPOS_PLAN = ['cuotas_pagadas', 'proxima_cuota_vencimiento']
+
+
+def _modelos(apps):
+    apps = apps or apps_globales
+    return [apps.get_model('gestion_inmobiliaria', nombre) for nombre in ('Venta', 'RegistroPago', 'PlanPagoVenta', 'CuotaPlanPago')]
+
+
+def _es_dolares(moneda, ubicacion_proyecto):
+    from .models import Proyecto  # moneda_sugerida no consulta la BD, sirve también en migraciones
+    return (moneda or Proyecto.moneda_sugerida(ubicacion_proyecto)) == Proyecto.MONEDA_DOLARES
+
+
+def _suma_pagos(RegistroPago, campo):
+    pagos = RegistroPago.objects.filter(venta=OuterRef('pk')).order_by().values('venta').annotate(total=Sum(campo)).values('total')
+    return Coalesce(Subquery(pagos, output_field=DecimalField(max_digits=14, decimal_places=2)), Value(Decimal('0.00')))
+
+
+def _esperado_venta(venta):
+    pagado = Decimal(venta.pagado_soles).quantize(CENTIMOS)
+    pagado_dolares = Decimal(venta.pagado_dolares).quantize(CENTIMOS)
+    saldo_soles, saldo_dolares = calcular_saldos_venta(
+        venta.valor_lote_venta, pagado, venta.precio_dolares, pagado_dolares, _es_dolares(venta.moneda, venta.ubicacion),
+    )
+    return dict(zip(CAMPOS_VENTA, (pagado, pagado_dolares, saldo_soles, saldo_dolares)))
+
+
+def _corregir(modelo, instancia, esperado, por_corregir, detalles):
+    diferencias = {campo: (getattr(instancia, campo), valor) for campo, valor in esperado.items() if getattr(instancia, campo) != valor}
+    if not diferencias:
+        return False
+    for campo, (_, valor) in diferencias.items():
+        setattr(instancia, campo, valor)
+    por_corregir.append(instancia)
+    if len(detalles) < MAX_DETALLES:
+        detalles.append(f"{modelo} {instancia.pk}: " + ', '.join(f"{campo} {antes} -> {despues}" for campo, (antes, despues) in diferencias.items()))
+    return True
+
+
+def verificar_totales(reparar=False, venta_ids=None, apps=None):
+    """
+    Compara los totales guardados con los calculados (venta_ids None: todas las ventas y sus planes).
+    Devuelve {'reparado', 'ventas_revisadas', 'ventas_con_diferencias', 'planes_revisados',
+    'planes_con_diferencias', 'detalles'}.
+    """
+    Venta, RegistroPago, PlanPagoVenta, CuotaPlanPago = _modelos(apps)
+    ventas = Venta.objects.all() if venta_ids is None else Venta.objects.filter(pk__in=list(venta_ids))
+    planes = PlanPagoVenta.objects.all() if venta_ids is None else PlanPagoVenta.objects.filter(venta_id__in=list(venta_ids))
+    estados_pendientes = [estado for estado, _ in CuotaPlanPago._meta.get_field('estado_cuota').choices if estado not in ESTADOS_CUOTA_PAGADA]
+
+    ventas = ventas.order_by().only('pk', 'lote', 'valor_lote_venta', 'precio_dolares', *CAMPOS_VENTA).annotate(
+        pagado_soles=_suma_pagos(RegistroPago, 'monto_pago'), pagado_dolares=_suma_pagos(RegistroPago, 'monto_pago_dolares'),
+        moneda=F('lote__proyecto__moneda'), ubicacion=F('lote__ubicacion_proyecto'),
+    )
+    planes = planes.order_by().only('pk', *CAMPOS_PLAN).annotate(
+        pagadas=Count('cuotas', filter=Q(cuotas__estado_cuota__in=ESTADOS_CUOTA_PAGADA)),
+        proxima=Min('cuotas__fecha_vencimiento', filter=Q(cuotas__estado_cuota__in=estados_pendientes)),
+    )
+
+    ventas_a_corregir, planes_a_corregir, detalles = [], [], []
+    ventas_revisadas = planes_revisados = 0
+    for venta in ventas.iterator(chunk_size=TAMANO_LOTE):
+        ventas_revisadas += 1
+        _corregir('Venta', venta, _esperado_venta(venta), ventas_a_corregir, detalles)
+    for plan in planes.iterator(chunk_size=TAMANO_LOTE):
+        planes_revisados += 1
+        _corregir('Plan', plan, dict(zip(CAMPOS_PLAN, (plan.pagadas, plan.proxima))), planes_a_corregir, detalles)
+
+    if reparar and (ventas_a_corregir or planes_a_corregir):
+        with transaction.atomic():
+            Venta.objects.bulk_update(ventas_a_corregir, CAMPOS_VENTA, batch_size=TAMANO_LOTE)
+            PlanPagoVenta.objects.bulk_update(planes_a_corregir, CAMPOS_PLAN, batch_size=TAMANO_LOTE)
+    return {
+        'reparado': reparar,
+        'ventas_revisadas': ventas_revisadas,
+        'ventas_con_diferencias': len(ventas_a_corregir),
+        'planes_revisados': planes_revisados,
+        'planes_con_diferencias': len(planes_a_corregir),
+        'detalles': detalles,
+    }
@@ -0,0 +1,200 @@
+# gestion_inmobiliaria/typeahead.py
+"""
+Autocompletado de clientes, asesores y lotes desde un índice de prefijos en memoria.
+
+Cada entidad tiene un índice por proceso: una lista ordenada de (token, pk) donde los tokens son
+las palabras normalizadas (mayúsculas, sin tildes) del nombre y los códigos (documento, teléfono,
+ID). Buscar un prefijo es una bisección, así que teclear en un formulario no consulta la BD.
+
+El índice se carga la primera vez que se pide y se actualiza al confirmar cada alta, cambio o
+baja (señales en models.py). Como cada worker tiene su propia copia y los UPDATE masivos no
+disparan señales, se vuelve a cargar completo cuando pasa TTL_INDICE_SEGUNDOS.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.db import transaction
+
+from .busqueda import normalizar
+from .models import Cliente, Asesor, Lote
+
+TTL_INDICE_SEGUNDOS = 5 * 60
+LIMITE_POR_DEFECTO = 10
+LIMITE_MAXIMO = 50
+LARGO_MINIMO = 2
+
+RE_SEPARADORES = re.compile(r'[^0-9A-Z]+')
+
+
+def tokens(*textos):
+    """Palabras normalizadas de los textos; los números se indexan sin espacios ni guiones."""
+    resultado = set()
+    for texto in textos:
+        if texto in (None, ''):
+            continue
+        texto = normalizar(str(texto))
+        resultado.update(t for t in RE_SEPARADORES.split(texto) if t)
+        compacto = re.sub(r'[\s-]', '', texto)
+        if compacto.lstrip('+').isdigit():
+            resultado.add(compacto.lstrip('+'))
+    return resultado
+
+
+def palabras_busqueda(termino):
+    """Prefijos a buscar: el número compacto si el término es numérico, si no sus palabras normalizadas."""
+    texto = normalizar(termino or '').strip()
+    compacto = re.sub(r'[\s-]', '', texto).lstrip('+')
+    if compacto.isdigit():
+        return [compacto]
+    return sorted({t for t in RE_SEPARADORES.split(texto) if t}, key=len, reverse=True)
+
+
+class IndicePrefijos:
+    def __init__(self, modelo, campos, textos, datos, ttl=TTL_INDICE_SEGUNDOS):
+        self.modelo = modelo
+        self.campos = campos  # Campos locales que leen textos() y datos()
+        self.textos = textos
+        self.datos = datos
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._cargado_en = None
+        self._claves = []  # [(token, pk)] ordenada
+        self._entradas = {}  # pk -> (tokens, orden, datos)
+
+    @property
+    def cargado(self):
+        return self._cargado_en is not None and time.monotonic() - self._cargado_en < self.ttl
+
+    def _entrada(self, fila):
+        datos = self.datos(fila)
+        return tokens(*self.textos(fila)), normalizar(datos['display_text']), datos
+
+    def cargar(self):
+        filas = self.modelo.objects.order_by().values(self.modelo._meta.pk.attname, *self.campos)
+        entradas, claves = {}, []
+        for fila in filas:
+            pk = fila[self.modelo._meta.pk.attname]
+            entradas[pk] = self._entrada(fila)
+            claves.extend((t, pk) for t in entradas[pk][0])
+        claves.sort()
+        with self._lock:
+            self._entradas, self._claves = entradas, claves
+            self._cargado_en = time.monotonic()
+
+    def invalidar(self):
+        with self._lock:
+            self._cargado_en = None
+
+    def _quitar(self, pk):
+        entrada = self._entradas.pop(pk, None)
+        for token in (entrada[0] if entrada else ()):
+            i = bisect_left(self._claves, (token, pk))
+            if i < len(self._claves) and self._claves[i] == (token, pk):
+                del self._claves[i]
+
+    def actualizar(self, instancia):
+        if not self.cargado:
+            return  # Se cargará completo en la próxima búsqueda
+        fila = {campo: getattr(instancia, campo) for campo in [self.modelo._meta.pk.attname, *self.campos]}
+        with self._lock:
+            self._quitar(instancia.pk)
+            self._entradas[instancia.pk] = self._entrada(fila)
+            for token in self._entradas[instancia.pk][0]:
+                insort(self._claves, (token, instancia.pk))
+
+    def eliminar(self, pk):
+        if self.cargado:
+            with self._lock:
+                self._quitar(pk)
+
+    def _con_prefijo(self, prefijo):
+        """{pk: True si algún token es exactamente el prefijo}."""
+        encontrados = {}
+        i = bisect_left(self._claves, (prefijo,))
+        while i < len(self._claves) and self._claves[i][0].startswith(prefijo):
+            token, pk = self._claves[i]
+            encontrados[pk] = encontrados.get(pk, False) or token == prefijo
+            i += 1
+        return encontrados
+
+    def buscar(self, termino, limite=LIMITE_POR_DEFECTO, filtro=None):
+        """
+        Hasta `limite` resultados con todas las palabras del término como prefijo de algún token.
+        filtro(datos) opcional descarta resultados antes de aplicar el límite.
+        """
+        palabras = palabras_busqueda(termino)  # Las más largas primero: menos candidatos que intersecar
+        if not palabras or len(''.join(palabras)) < LARGO_MINIMO:
+            return []
+        if not self.cargado:
+            self.cargar()
+        with self._lock:
+            puntajes = None
+            for palabra in palabras:
+                coincidencias = self._con_prefijo(palabra)
+                if puntajes is None:
+                    puntajes = {pk: 2 if exacta else 1 for pk, exacta in coincidencias.items()}
+                else:
+                    puntajes = {pk: p + (2 if coincidencias[pk] else 1) for pk, p in puntajes.items() if pk in coincidencias}
+                if not puntajes:
+                    return []
+            if filtro:
+                puntajes = {pk: p for pk, p in puntajes.items() if filtro(self._entradas[pk][2])}
+            primera = normalizar(termino).split()[0]
+            ordenados = sorted(
+                puntajes.items(),
+                # Coincidencias exactas primero; a igual puntaje, las que empiezan por la primera palabra y luego alfabético
+                key=lambda par: (-par[1], not self._entradas[par[0]][1].startswith(primera), self._entradas[par[0]][1]),
+            )
+            return [self._entradas[pk][2] for pk, _ in ordenados[:limite]]
+
+
+def _datos_cliente(f):
+    return {
+        'id_cliente': f['id_cliente'],
+        'nombres_completos_razon_social': f['nombres_completos_razon_social'],
+        'telefono_principal': f['telefono_principal'] or '',
+        'numero_documento': f['numero_documento'],
+        'display_text': f"{f['nombres_completos_razon_social']} ({f['telefono_principal'] or 'Sin teléfono'})",
+    }
+
+
+def _datos_asesor(f):
+    return {'id_asesor': f['id_asesor'], 'nombre_asesor': f['nombre_asesor'], 'display_text': f"{f['nombre_asesor']} ({f['id_asesor']})"}
+
+
+def _datos_lote(f):
+    return {
+        'id_lote': f['id_lote'], 'ubicacion_proyecto': f['ubicacion_proyecto'], 'etapa': f['etapa'],
+        'manzana': f['manzana'], 'numero_lote': f['numero_lote'], 'area_m2': f['area_m2'],
+        'precio_lista_soles': f['precio_lista_soles'], 'estado_lote': f['estado_lote'],
+        'display_text': f"{f['id_lote']} ({f['ubicacion_proyecto']} Mz:{f['manzana'] or 'S/M'} Lt:{f['numero_lote'] or 'S/N'})",
+    }
+
+
+INDICES = {
+    'clientes': IndicePrefijos(
+        Cliente, ['nombres_completos_razon_social', 'numero_documento', 'telefono_principal'],
+        lambda f: [f['nombres_completos_razon_social'], f['numero_documento'], f['telefono_principal']], _datos_cliente,
+    ),
+    'asesores': IndicePrefijos(
+        Asesor, ['nombre_asesor', 'dni'],
+        lambda f: [f['nombre_asesor'], f['id_asesor'], f['dni']], _datos_asesor,
+    ),
+    'lotes': IndicePrefijos(
+        Lote, ['ubicacion_proyecto', 'etapa', 'manzana', 'numero_lote', 'area_m2', 'precio_lista_soles', 'estado_lote'],
+        lambda f: [f['id_lote'], f['ubicacion_proyecto'], f['manzana'], f['numero_lote']], _datos_lote,
+    ),
+}
+INDICE_POR_MODELO = {indice.modelo: indice for indice in INDICES.values()}
+
+
+def marcar_cambio(instancia, eliminada=False):
+    """Aplica el alta, cambio o baja al índice de su modelo al confirmar la transacción."""
+    indice = INDICE_POR_MODELO[type(instancia)]
+    if eliminada:
+        pk = instancia.pk
+        transaction.on_commit(lambda: indice.eliminar(pk))
+    else:
+        transaction.on_commit(lambda: indice.actualizar(instancia))
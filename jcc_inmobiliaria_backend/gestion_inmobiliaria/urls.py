@@ -30,7 +30,11 @@ urlpatterns = [
     path('', include(router.urls)),
     path('get-advisors-list/', views.GetAdvisorsForFilterAPIView.as_view(), name='get_advisors_for_filter_api'),
     path('dashboard-data/', views.GetDashboardDataAPIView.as_view(), name='get_dashboard_data_api'),
+    path('dashboard-ranking-ventas/', views.DashboardRankingVentasAPIView.as_view(), name='dashboard_ranking_ventas_api'),
     path('commission-summary/', views.GetCommissionSummaryDataAPIView.as_view(), name='get_commission_summary_data_api'),
+    path('cobranzas/antiguedad/', views.ReporteAntiguedadCarteraAPIView.as_view(), name='reporte_antiguedad_cartera_api'),
+    path('typeahead/<str:entidad>/', views.TypeaheadAPIView.as_view(), name='typeahead_api'),
+    path('cache-stats/', views.CacheRespuestasStatsAPIView.as_view(), name='cache_respuestas_stats_api'),
     path('get-default-commission-rate/', views.GetDefaultCommissionRateAPIView.as_view(), name='get_default_commission_rate_api'),
     path('calculate-commission/', views.CalculateCommissionAPIView.as_view(), name='calculate_commission_api'),
     path('commission-structure/', views.GetCommissionStructureAPIView.as_view(), name='get_commission_structure_api'),
@@ -7,8 +7,7 @@ from django.utils.dateparse import parse_date
 from django.db.models import Sum, Count, Value, DecimalField, Q, Case, When, IntegerField, F, ExpressionWrapper
 from django.db.models.functions import Coalesce, TruncMonth, Cast
 from datetime import datetime, date, timedelta
-from decimal import Decimal, ROUND_HALF_UP
-from dateutil.relativedelta import relativedelta
+from decimal import Decimal
 from django.shortcuts import get_object_or_404
 from django.db import transaction
 import traceback
@@ -25,16 +24,28 @@ from django.shortcuts import render
 from rest_framework import viewsets, status, filters
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import fields
+from django.db.models import fields, Prefetch, OuterRef, Subquery, Exists
 from django.db.models.deletion import ProtectedError
 
 from .models import (
     Lote, Cliente, Asesor, Venta, ActividadDiaria,
     DefinicionMetaComision, TablaComisionDirecta, RegistroPago,
     Presencia, PlanPagoVenta, CuotaPlanPago, ComisionVentaAsesor, GestionCobranza,
-    CierreComisionMensual, DetalleComisionCerrada
+    CierreComisionMensual, DetalleComisionCerrada, Proyecto, MetricaDashboardDiaria
+)
+from .cobranza import (
+    cuotas_pendientes, pagina_por_venta, reporte_antiguedad, CursorInvalido, DimensionInvalida,
+    TAMANO_PAGINA as TAMANO_PAGINA_COBRANZA, TAMANO_PAGINA_MAXIMO as TAMANO_PAGINA_MAXIMO_COBRANZA
+)
+from .cache_respuestas import (
+    cachear_respuesta, estadisticas, valor_cacheado, VISTAS_CACHEADAS, ambitos_rango, ambito_mes, AMBITO_GLOBAL, AMBITO_LOTES,
+    AMBITO_ASESORES, AMBITO_CLIENTES
 )
-from collections import defaultdict
+from .ranking import ESTADOS_RANKING, filtrar_ventas_dashboard, ranking_asesores, ventas_de_asesor, roles_en_venta
+from .busqueda import buscar_clientes
+from .pagos import calcular_plan_inicial
+from .duplicados_lotes import depurar_lotes_duplicados
+from .typeahead import INDICES as INDICES_TYPEAHEAD, LIMITE_POR_DEFECTO as LIMITE_TYPEAHEAD, LIMITE_MAXIMO as LIMITE_MAXIMO_TYPEAHEAD
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -42,7 +53,7 @@ from rest_framework import status, permissions, viewsets
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .serializers import (
-    LoteSerializer, ClienteSerializer, AsesorSerializer, VentaSerializer, ActividadDiariaSerializer,
+    LoteSerializer, ClienteSerializer, AsesorSerializer, VentaSerializer, VentaListSerializer, ActividadDiariaSerializer,
     RegistroPagoSerializer, PresenciaSerializer, TablaComisionDirectaSerializer,
     ClienteCreateSerializer,
     PlanPagoVentaSerializer, CuotaPlanPagoSerializer, ComisionVentaAsesorSerializer,
@@ -90,6 +101,29 @@ class AuthStatusView(APIView):
             return Response({'isAuthenticated': True, 'user': {'id': request.user.id, 'username': request.user.username, 'email': request.user.email}})
         return Response({'isAuthenticated': False, 'user': None})
 
+def respuesta_limpieza_duplicados(request):
+    """Respuesta común de los dos endpoints de limpieza de lotes duplicados (ver duplicados_lotes.py)."""
+    dry_run = str(request.query_params.get('dry_run', request.data.get('dry_run', ''))).lower() in ('1', 'true', 'si', 'sí')
+    try:
+        print(f'=== LIMPIEZA DE LOTES DUPLICADOS (dry_run={dry_run}) ===')
+        resultado = depurar_lotes_duplicados(aplicar=not dry_run)
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': f'Error durante la limpieza: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({
+        'success': True,
+        'message': 'Simulación de limpieza de lotes duplicados' if dry_run else 'Limpieza de lotes duplicados completada',
+        'dry_run': dry_run,
+        'grupos_duplicados': resultado['grupos'],
+        'total_duplicados_detectados': resultado['total_duplicados_detectados'],
+        'total_eliminados': resultado['total_eliminados'],
+        'lotes_con_ventas': resultado['con_ventas'],
+        'total_lotes_final': Lote.objects.count(),
+        'detalles': resultado['detalles'],
+    })
+
 # --- ModelViewSets para CRUD (sin cambios aquí, se omiten por brevedad) ---
 class LoteViewSet(viewsets.ModelViewSet):
     queryset = Lote.objects.all().order_by('ubicacion_proyecto', 'etapa', 'manzana', 'numero_lote')
@@ -113,61 +147,9 @@ class LoteViewSet(viewsets.ModelViewSet):
     def limpiar_duplicados(self, request):
         """
         Limpia lotes duplicados desde el ViewSet de Lotes (ya autenticado).
+        Con dry_run=true solo informa lo que se eliminaría.
         """
-        from django.views.decorators.csrf import csrf_exempt
-        from django.utils.decorators import method_decorator
-        
-        # Eximir de CSRF para esta acción específica
-        @method_decorator(csrf_exempt, name='dispatch')
-        class TempView:
-            pass
-        try:
-            print('=== INICIANDO LIMPIEZA DE LOTES DUPLICADOS ===')
-            
-            # Agrupar lotes por combinación única
-            lotes_por_clave = defaultdict(list)
-            for lote in Lote.objects.all():
-                clave = (lote.ubicacion_proyecto.strip().lower(), lote.manzana.strip() if lote.manzana else '', lote.numero_lote.strip() if lote.numero_lote else '', lote.etapa)
-                lotes_por_clave[clave].append(lote)
-            
-            total_duplicados = 0
-            eliminados = 0
-            detalles_eliminados = []
-            
-            for clave, lotes in lotes_por_clave.items():
-                if len(lotes) > 1:
-                    total_duplicados += len(lotes) - 1
-                    # Mantener el primero que NO esté asociado a ventas, si todos tienen ventas, mantener el primero
-                    lotes_ordenados = sorted(lotes, key=lambda l: l.ventas_lote.count())
-                    lote_a_mantener = lotes_ordenados[0]
-                    
-                    for lote in lotes:
-                        if lote == lote_a_mantener:
-                            continue
-                        if lote.ventas_lote.exists():
-                            detalles_eliminados.append(f"No se eliminó {lote.id_lote} porque tiene ventas asociadas.")
-                            continue
-                        
-                        detalles_eliminados.append(f"Eliminado: {lote.id_lote} ({lote.ubicacion_proyecto} Mz:{lote.manzana} Lt:{lote.numero_lote} Etapa:{lote.etapa})")
-                        lote.delete()
-                        eliminados += 1
-            
-            total_lotes_final = Lote.objects.count()
-            
-            return Response({
-                'success': True,
-                'message': 'Limpieza de lotes duplicados completada',
-                'total_duplicados_detectados': total_duplicados,
-                'total_eliminados': eliminados,
-                'total_lotes_final': total_lotes_final,
-                'detalles': detalles_eliminados[:50]  # Limitar a 50 detalles para no sobrecargar la respuesta
-            })
-            
-        except Exception as e:
-            return Response({
-                'success': False,
-                'error': f'Error durante la limpieza: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return respuesta_limpieza_duplicados(request)
 
 class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all().order_by('nombres_completos_razon_social')
@@ -181,22 +163,14 @@ class ClienteViewSet(viewsets.ModelViewSet):
         Útil para evitar duplicados en el formulario de presencias.
         """
         try:
-            # Obtener IDs de clientes que ya tienen presencia
-            clientes_con_presencia = Presencia.objects.values_list('cliente_id', flat=True).distinct()
-            
-            # Filtrar clientes que NO están en esa lista
-            clientes_sin_presencia = Cliente.objects.exclude(
-                id_cliente__in=clientes_con_presencia
-            ).order_by('nombres_completos_razon_social')
+            # Clientes sin ninguna presencia (NOT EXISTS correlacionado, sin materializar la lista de IDs)
+            sin_presencias = Cliente.objects.filter(~Exists(Presencia.objects.filter(cliente=OuterRef('pk'))))
+            clientes_sin_presencia = sin_presencias.order_by('nombres_completos_razon_social')
             
             # Aplicar búsqueda si se proporciona
             search = request.query_params.get('search', '')
             if search:
-                clientes_sin_presencia = clientes_sin_presencia.filter(
-                    Q(nombres_completos_razon_social__icontains=search) |
-                    Q(telefono_principal__icontains=search) |
-                    Q(numero_documento__icontains=search)
-                )
+                clientes_sin_presencia = buscar_clientes(clientes_sin_presencia, search)
             
             # Limitar resultados para evitar desplegables muy largos
             limit = int(request.query_params.get('limit', 50))
@@ -216,7 +190,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
             return Response({
                 'results': data,
                 'count': len(data),
-                'total_available': Cliente.objects.exclude(id_cliente__in=clientes_con_presencia).count()
+                'total_available': valor_cacheado('clientes_sin_presencia', [AMBITO_CLIENTES], sin_presencias.count)
             })
             
         except Exception as e:
@@ -237,11 +211,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
                 return Response({'results': [], 'count': 0})
             
             # Buscar en nombre, teléfono y documento
-            clientes = Cliente.objects.filter(
-                Q(nombres_completos_razon_social__icontains=search) |
-                Q(telefono_principal__icontains=search) |
-                Q(numero_documento__icontains=search)
-            ).order_by('nombres_completos_razon_social')[:20]  # Limitar a 20 resultados
+            clientes = buscar_clientes(Cliente.objects.all(), search)[:20]  # Limitar a 20 resultados
             
             data = []
             for cliente in clientes:
@@ -272,17 +242,15 @@ class ClienteViewSet(viewsets.ModelViewSet):
         PARA VENTAS: 1 cliente puede tener múltiples ventas
         """
         try:
-            # Obtener todos los clientes
-            clientes = Cliente.objects.all().order_by('nombres_completos_razon_social')
+            # Obtener todos los clientes, marcando en la misma consulta si tienen presencia previa
+            clientes = Cliente.objects.annotate(
+                tiene_presencia=Exists(Presencia.objects.filter(cliente=OuterRef('pk')))
+            ).order_by('nombres_completos_razon_social')
             
             # Aplicar búsqueda si se proporciona
             search = request.query_params.get('search', '')
             if search:
-                clientes = clientes.filter(
-                    Q(nombres_completos_razon_social__icontains=search) |
-                    Q(telefono_principal__icontains=search) |
-                    Q(numero_documento__icontains=search)
-                )
+                clientes = buscar_clientes(clientes, search)
             
             # Limitar resultados para evitar desplegables muy largos
             limit = int(request.query_params.get('limit', 50))
@@ -291,9 +259,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
             # Serializar con formato para desplegable
             data = []
             for cliente in clientes:
-                # Verificar si el cliente tiene presencia previa
-                tiene_presencia = Presencia.objects.filter(cliente=cliente).exists()
-                
+                tiene_presencia = cliente.tiene_presencia
                 data.append({
                     'id_cliente': cliente.id_cliente,
                     'nombres_completos_razon_social': cliente.nombres_completos_razon_social,
@@ -306,7 +272,7 @@ class ClienteViewSet(viewsets.ModelViewSet):
             return Response({
                 'results': data,
                 'count': len(data),
-                'total_available': Cliente.objects.count()
+                'total_available': valor_cacheado('clientes_total', [AMBITO_CLIENTES], Cliente.objects.count)
             })
             
         except Exception as e:
@@ -379,18 +345,42 @@ class RegistroPagoViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 class VentaViewSet(viewsets.ModelViewSet):
+    # Todo lo que recorre VentaSerializer (pagos con su cuota, cuotas con sus pagos, comisiones) llega
+    # precargado: la cantidad de consultas de una página no depende de cuántas ventas o cuotas tenga.
     queryset = Venta.objects.all().select_related(
         'lote', 'cliente', 'vendedor_principal', 'id_socio_participante', 
-        'plan_pago_venta'
+        'plan_pago_venta', 'presencia_que_origino'
     ).prefetch_related(
-        'registros_pago', 
-        'plan_pago_venta__cuotas'
+        Prefetch('registros_pago', queryset=RegistroPago.objects.select_related(
+            'cuota_plan_pago_cubierta__plan_pago_venta__venta__lote'
+        ).prefetch_related('cuota_plan_pago_cubierta__pagos_que_la_cubren')),
+        Prefetch('plan_pago_venta__cuotas', queryset=CuotaPlanPago.objects.order_by('numero_cuota').prefetch_related(
+            Prefetch('pagos_que_la_cubren', queryset=RegistroPago.objects.order_by('-fecha_pago', '-id_pago'))
+        )),
+        Prefetch('comisiones_asesores', queryset=ComisionVentaAsesor.objects.select_related('asesor')),
     ).order_by('-fecha_venta')
     serializer_class = VentaSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_class = VentaFilter
     pagination_class = CustomPageNumberPagination
+
+    def _listado_compacto(self):
+        # El listado usa VentaListSerializer salvo que se pida ?expand=plan; retrieve y escrituras usan el completo
+        return self.action == 'list' and self.request.query_params.get('expand') != 'plan'
+
+    def get_serializer_class(self):
+        if self._listado_compacto():
+            return VentaListSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        if not self._listado_compacto():
+            return super().get_queryset()
+        liner = ComisionVentaAsesor.objects.filter(venta=OuterRef('pk'), rol='liner').order_by('id_comision_venta_asesor')
+        return Venta.objects.select_related('lote', 'cliente', 'vendedor_principal').annotate(
+            liner_nombre=Subquery(liner.values('asesor__nombre_asesor')[:1]),
+        ).order_by('-fecha_venta')
     
     def _crear_o_actualizar_plan_pago(self, venta_instance):
         # print(f"[VentaViewSet] Iniciando _crear_o_actualizar_plan_pago para Venta ID: {venta_instance.id_venta}") # DEBUG
@@ -398,64 +388,26 @@ class VentaViewSet(viewsets.ModelViewSet):
         # print(f"[VentaViewSet] Plan de pago existente (si lo hubo) eliminado para Venta ID: {venta_instance.id_venta}") #DEBUG
 
         if venta_instance.tipo_venta == Venta.TIPO_VENTA_CREDITO and venta_instance.plazo_meses_credito and venta_instance.plazo_meses_credito > 0:
-            proyecto = venta_instance.lote.ubicacion_proyecto.strip().lower() if venta_instance.lote and venta_instance.lote.ubicacion_proyecto else ''
-            es_dolares = ('aucallama' in proyecto) or ('oasis 2' in proyecto)
+            es_dolares = bool(venta_instance.lote and venta_instance.lote.es_proyecto_dolares)
             monto_a_financiar = venta_instance.valor_lote_venta - venta_instance.cuota_inicial_requerida
-            if monto_a_financiar <= Decimal('0.00'):
-                # print(f"[VentaViewSet] No hay monto a financiar para Venta ID: {venta_instance.id_venta} (Monto: {monto_a_financiar}). No se crea plan.") # DEBUG
+            cronograma = calcular_plan_inicial(monto_a_financiar, venta_instance.plazo_meses_credito, venta_instance.fecha_venta, es_dolares)
+            if cronograma is None:
                 return None
 
-            numero_cuotas = venta_instance.plazo_meses_credito
-            if numero_cuotas <= 0:
-                 # print(f"[VentaViewSet ERROR] Número de cuotas es {numero_cuotas} para Venta ID: {venta_instance.id_venta}") # DEBUG
-                 return None
-
-            monto_cuota_bruto = monto_a_financiar / Decimal(numero_cuotas)
-            monto_cuota_regular_calculado = monto_cuota_bruto.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-            
-            if monto_cuota_regular_calculado < Decimal('0.00'): monto_cuota_regular_calculado = Decimal('0.00')
-
-            monto_total_cuotas_regulares_menos_una = monto_cuota_regular_calculado * (numero_cuotas - 1)
-            monto_ultima_cuota = monto_a_financiar - monto_total_cuotas_regulares_menos_una
-            if monto_ultima_cuota < Decimal('0.00'): monto_ultima_cuota = Decimal('0.00')
-            
-            fecha_primera_cuota = venta_instance.fecha_venta + relativedelta(months=1)
-            
-            # print(f"[VentaViewSet] Creando PlanPago para Venta ID: {venta_instance.id_venta}. Monto: {monto_a_financiar}, Cuotas: {numero_cuotas}, Cuota Reg: {monto_cuota_regular_calculado}, Última Cuota: {monto_ultima_cuota}, Inicio: {fecha_primera_cuota}") #DEBUG
-
             plan_pago = PlanPagoVenta.objects.create(
                 venta=venta_instance,
                 monto_total_credito=monto_a_financiar,
-                numero_cuotas=numero_cuotas,
-                monto_cuota_regular_original=monto_cuota_regular_calculado,
-                fecha_inicio_pago_cuotas=fecha_primera_cuota
+                numero_cuotas=cronograma.numero_cuotas,
+                monto_cuota_regular_original=cronograma.monto_cuota_regular_original,
+                fecha_inicio_pago_cuotas=cronograma.cuotas[0].fecha_vencimiento
             )
-
-            cuotas_a_crear = []
-            for i in range(1, numero_cuotas + 1):
-                fecha_vencimiento_cuota = fecha_primera_cuota + relativedelta(months=i-1)
-                monto_esta_cuota = monto_ultima_cuota if i == numero_cuotas else monto_cuota_regular_calculado
-                if es_dolares:
-                    cuotas_a_crear.append(
-                        CuotaPlanPago(
-                            plan_pago_venta=plan_pago,
-                            numero_cuota=i,
-                            fecha_vencimiento=fecha_vencimiento_cuota,
-                            monto_programado=Decimal('0.00'),
-                            monto_programado_dolares=monto_esta_cuota
-                        )
-                    )
-                else:
-                    cuotas_a_crear.append(
-                        CuotaPlanPago(
-                            plan_pago_venta=plan_pago,
-                            numero_cuota=i,
-                            fecha_vencimiento=fecha_vencimiento_cuota,
-                            monto_programado=monto_esta_cuota
-                        )
-                    )
-            CuotaPlanPago.objects.bulk_create(cuotas_a_crear)
-            # print(f"[VentaViewSet] {len(cuotas_a_crear)} cuotas creadas para PlanPago ID: {plan_pago.id_plan_pago}") # DEBUG
+            CuotaPlanPago.objects.bulk_create([
+                CuotaPlanPago(
+                    plan_pago_venta=plan_pago, numero_cuota=cuota.numero_cuota, fecha_vencimiento=cuota.fecha_vencimiento,
+                    monto_programado=cuota.monto_programado, monto_programado_dolares=cuota.monto_programado_dolares,
+                )
+                for cuota in cronograma.cuotas
+            ])
             return plan_pago
         return None
 
@@ -772,119 +724,139 @@ class GetAdvisorsForFilterAPIView(APIView):
         formatted_asesores = [{'id': a['id_asesor'], 'name': a['nombre_asesor']} for a in asesores]
         return Response(formatted_asesores)
 
+def _filtros_dashboard(request):
+    """Filtros comunes del dashboard y de su detalle de ranking, leídos de los query params."""
+    raw_start_date = request.GET.get('startDate')
+    raw_end_date = request.GET.get('endDate')
+    parsed_start_date = parse_date(raw_start_date) if raw_start_date else None
+    parsed_end_date = parse_date(raw_end_date) if raw_end_date else None
+
+    filters = {
+        'startDate': parsed_start_date,
+        'endDate': parsed_end_date,
+        'asesorId': request.GET.get('asesorId'),
+        'tipoVenta': request.GET.get('tipoVenta'),
+        'tipoAsesor': request.GET.get('tipoAsesor'), 
+        'medio_captacion': request.GET.get('medio_captacion'),
+        'status_venta': request.GET.get('status_venta'),
+    }
+
+    if filters['endDate'] is not None:
+        filters['endDate'] = datetime.combine(filters['endDate'], datetime.max.time()).date()
+    return filters
+
+def _ambitos_dashboard(request):
+    filters = _filtros_dashboard(request)
+    return ambitos_rango(filters['startDate'], filters['endDate']) + [AMBITO_LOTES, AMBITO_ASESORES]
+
+def _ambitos_resumen_comisiones(request):
+    try:
+        return [ambito_mes(date(int(request.query_params.get('anio')), int(request.query_params.get('mes')), 1)), AMBITO_ASESORES]
+    except (TypeError, ValueError):
+        return [AMBITO_GLOBAL]
+
 class GetDashboardDataAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @cachear_respuesta('dashboard', _ambitos_dashboard)
     def get(self, request, format=None):
         try:
             # print(f"Dashboard Request Query Params: {request.GET}") # DEBUG
 
-            raw_start_date = request.GET.get('startDate')
-            raw_end_date = request.GET.get('endDate')
-            parsed_start_date = parse_date(raw_start_date) if raw_start_date else None
-            parsed_end_date = parse_date(raw_end_date) if raw_end_date else None
-
-            filters = {
-                'startDate': parsed_start_date,
-                'endDate': parsed_end_date,
-                'asesorId': request.GET.get('asesorId'),
-                'tipoVenta': request.GET.get('tipoVenta'),
-                'tipoAsesor': request.GET.get('tipoAsesor'), 
-                'medio_captacion': request.GET.get('medio_captacion'),
-                'status_venta': request.GET.get('status_venta'),
-            }
-
-            if filters['endDate'] is not None:
-                filters['endDate'] = datetime.combine(filters['endDate'], datetime.max.time()).date()
+            filters = _filtros_dashboard(request)
 
-            # Inicializar QuerySets base
-            pagos_filtrados = RegistroPago.objects.all()
-            presencias_filtradas = Presencia.objects.all()
-            ventas_filtradas = Venta.objects.all()
-            # --- AJUSTE: Solo ventas existentes (no eliminadas) ---
-            ventas_filtradas = ventas_filtradas.filter(id_venta__in=Venta.objects.values_list('id_venta', flat=True))
+            # Los KPIs y gráficos se leen de la tabla de hechos diaria (MetricaDashboardDiaria),
+            # que se mantiene al día con señales y con el comando reconstruir_metricas_dashboard.
+            metricas_ventas = MetricaDashboardDiaria.objects.filter(fuente=MetricaDashboardDiaria.FUENTE_VENTA)
+            metricas_pagos = MetricaDashboardDiaria.objects.filter(fuente=MetricaDashboardDiaria.FUENTE_PAGO)
+            # Con filtro de asesor se usan las filas por asesor (cada presencia una vez por asesor participante)
+            metricas_presencias = MetricaDashboardDiaria.objects.filter(
+                fuente=MetricaDashboardDiaria.FUENTE_PRESENCIA_ASESOR if filters.get('asesorId') else MetricaDashboardDiaria.FUENTE_PRESENCIA
+            )
 
-            # --- CORRECCIÓN: APLICAR FILTROS DE FECHA CORRECTAMENTE ---
-            # Para recaudos: usar fecha_pago (fecha_transaccion del CSV)
+            # --- FILTROS DE FECHA ---
+            # Recaudos por fecha_pago, ventas por fecha_venta y presencias por la fecha de la presencia
             if filters.get('startDate'):
-                pagos_filtrados = pagos_filtrados.filter(fecha_pago__gte=filters['startDate'])
-            
-            if filters.get('endDate'):
-                pagos_filtrados = pagos_filtrados.filter(fecha_pago__lte=filters['endDate'])
-            
-            # Para presencias: usar fecha_hora_presencia y considerar solo TOUR realizadas
-            if filters.get('startDate'):
-                presencias_filtradas = presencias_filtradas.filter(
-                    fecha_hora_presencia__date__gte=filters['startDate'],
+                metricas_pagos = metricas_pagos.filter(fecha__gte=filters['startDate'])
+                metricas_ventas = metricas_ventas.filter(fecha__gte=filters['startDate'])
+                # Para presencias: considerar solo TOUR realizadas
+                metricas_presencias = metricas_presencias.filter(
+                    fecha__gte=filters['startDate'],
                     tipo_tour='tour',  # Solo presencias TOUR
-                    status_presencia='realizada'  # Solo realizadas
+                    status=Presencia.STATUS_PRESENCIA_REALIZADA  # Solo realizadas
                 )
-            
-            if filters.get('endDate'):
-                presencias_filtradas = presencias_filtradas.filter(
-                    fecha_hora_presencia__date__lte=filters['endDate']
-                )
-            
-            # Para ventas: usar fecha_venta pero considerar la relación con presencias
-            if filters.get('startDate'):
-                ventas_filtradas = ventas_filtradas.filter(fecha_venta__gte=filters['startDate'])
-            
+
             if filters.get('endDate'):
-                ventas_filtradas = ventas_filtradas.filter(fecha_venta__lte=filters['endDate'])
-            
-            # --- APLICAR OTROS FILTROS A LOS QUERYSETS PRINCIPALES ---
+                metricas_pagos = metricas_pagos.filter(fecha__lte=filters['endDate'])
+                metricas_ventas = metricas_ventas.filter(fecha__lte=filters['endDate'])
+                metricas_presencias = metricas_presencias.filter(fecha__lte=filters['endDate'])
+
+            # --- OTROS FILTROS ---
+            # Ventas y pagos se filtran por las dimensiones de la venta (vendedor principal, tipo, medio de su presencia, status)
             if filters.get('asesorId'):
-                ventas_filtradas = ventas_filtradas.filter(vendedor_principal_id=filters['asesorId'])
-                presencias_filtradas = presencias_filtradas.filter(
-                    Q(asesor_captacion_opc_id=filters['asesorId']) | 
-                    Q(asesor_call_agenda_id=filters['asesorId']) | 
-                    Q(asesor_liner_id=filters['asesorId']) | 
-                    Q(asesor_closer_id=filters['asesorId'])
-                ).distinct()
-                pagos_filtrados = pagos_filtrados.filter(venta__vendedor_principal_id=filters['asesorId'])
+                metricas_ventas = metricas_ventas.filter(asesor_id=filters['asesorId'])
+                metricas_pagos = metricas_pagos.filter(asesor_id=filters['asesorId'])
+                metricas_presencias = metricas_presencias.filter(asesor_id=filters['asesorId'])
 
             if filters.get('tipoVenta'):
-                ventas_filtradas = ventas_filtradas.filter(tipo_venta=filters['tipoVenta'])
-                pagos_filtrados = pagos_filtrados.filter(venta__tipo_venta=filters['tipoVenta'])
+                metricas_ventas = metricas_ventas.filter(tipo_venta=filters['tipoVenta'])
+                metricas_pagos = metricas_pagos.filter(tipo_venta=filters['tipoVenta'])
 
             if filters.get('medio_captacion'):
-                ventas_filtradas = ventas_filtradas.filter(presencia_que_origino__medio_captacion=filters['medio_captacion'])
-                presencias_filtradas = presencias_filtradas.filter(medio_captacion=filters['medio_captacion'])
-                pagos_filtrados = pagos_filtrados.filter(venta__presencia_que_origino__medio_captacion=filters['medio_captacion'])
-            
+                metricas_ventas = metricas_ventas.filter(medio_captacion=filters['medio_captacion'])
+                metricas_pagos = metricas_pagos.filter(medio_captacion=filters['medio_captacion'])
+                metricas_presencias = metricas_presencias.filter(medio_captacion=filters['medio_captacion'])
+
             if filters.get('status_venta'):
-                ventas_filtradas = ventas_filtradas.filter(status_venta=filters['status_venta'])
-                pagos_filtrados = pagos_filtrados.filter(venta__status_venta=filters['status_venta'])
+                metricas_ventas = metricas_ventas.filter(status=filters['status_venta'])
+                metricas_pagos = metricas_pagos.filter(status=filters['status_venta'])
 
-            # --- KPIs CORREGIDOS ---
+            # --- KPIs ---
+            suma_cantidad = Coalesce(Sum('cantidad'), Value(0))
             # MONTO TOTAL RECAUDADO: suma de todos los recaudos según fecha_pago
-            kpi_monto_total_recaudo = pagos_filtrados.aggregate(
-                total=Coalesce(Sum('monto_pago', output_field=DecimalField()), Value(Decimal('0.0')), output_field=DecimalField())
+            kpi_monto_total_recaudo = metricas_pagos.aggregate(
+                total=Coalesce(Sum('monto', output_field=DecimalField()), Value(Decimal('0.0')), output_field=DecimalField())
             )['total']
-            
+
             # NRO PRESENCIAS REALIZADAS: cantidad de presencias "TOUR" realizadas
-            kpi_n_presencias_realizadas = presencias_filtradas.count()
-            
+            kpi_n_presencias_realizadas = metricas_presencias.aggregate(total=suma_cantidad)['total']
+
+            # Conteos de ventas por status en una sola consulta
+            ventas_por_estado = {
+                fila['status']: fila['cantidad']
+                for fila in metricas_ventas.values('status').annotate(cantidad=suma_cantidad).order_by('status')
+            }
+
             # VENTAS PARA TASA DE CONVERSIÓN: solo las que son "Procesable", "Anulado" y "Separación"
-            kpi_n_ventas_para_conversion = ventas_filtradas.filter(
-                status_venta__in=[Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_ANULADO, Venta.STATUS_VENTA_SEPARACION]
-            ).count()
-            
+            kpi_n_ventas_para_conversion = sum(
+                ventas_por_estado.get(s, 0) for s in [Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_ANULADO, Venta.STATUS_VENTA_SEPARACION]
+            )
+
             # TASA CONVERSIÓN VENTAS: división entre ventas y presencias TOUR realizadas
             kpi_tasa_conversion = (kpi_n_ventas_para_conversion / kpi_n_presencias_realizadas * 100) if kpi_n_presencias_realizadas > 0 else Decimal('0.0')
-            
+
             # VENTAS PROCESABLES: cantidad de ventas en status "PROCESABLE"
-            kpi_n_ventas_solo_procesables = ventas_filtradas.filter(status_venta=Venta.STATUS_VENTA_PROCESABLE).count()
+            kpi_n_ventas_solo_procesables = ventas_por_estado.get(Venta.STATUS_VENTA_PROCESABLE, 0)
+
+            # LOTES POR PROYECTO Y ESTADO (global, no filtrado): una sola consulta agrupada
+            estado_disponible, estado_reservado, estado_vendido = [c[0] for c in Lote.ESTADO_LOTE_CHOICES[:3]]
+            lotes_por_proyecto = {
+                nombre: {estado_disponible: 0, estado_reservado: 0, estado_vendido: 0, 'total': 0}
+                for nombre in Proyecto.objects.order_by('nombre').values_list('nombre', flat=True)
+            }
+            for fila in Lote.objects.values('proyecto__nombre', 'ubicacion_proyecto', 'estado_lote').annotate(cantidad=Count('id_lote')).order_by():
+                conteos = lotes_por_proyecto.setdefault(fila['proyecto__nombre'] or fila['ubicacion_proyecto'], {estado_disponible: 0, estado_reservado: 0, estado_vendido: 0, 'total': 0})
+                conteos[fila['estado_lote']] = conteos.get(fila['estado_lote'], 0) + fila['cantidad']
+                conteos['total'] += fila['cantidad']
 
             # LOTES DISPONIBLES Y VENDIDOS (global, no filtrado)
-            kpi_lotes_disponibles = Lote.objects.filter(estado_lote='Disponible').count()
-            kpi_lotes_vendidos = Lote.objects.filter(estado_lote='Vendido').count()
+            kpi_lotes_disponibles = sum(c[estado_disponible] for c in lotes_por_proyecto.values())
+            kpi_lotes_vendidos = sum(c[estado_vendido] for c in lotes_por_proyecto.values())
 
             # Debug: Imprimir información sobre los filtros aplicados
             print(f"[Dashboard Debug] Filtros aplicados: {filters}")
-            print(f"[Dashboard Debug] Ventas filtradas: {ventas_filtradas.count()}")
+            print(f"[Dashboard Debug] Ventas filtradas: {sum(ventas_por_estado.values())}")
             print(f"[Dashboard Debug] Presencias TOUR realizadas filtradas: {kpi_n_presencias_realizadas}")
-            print(f"[Dashboard Debug] Pagos filtrados: {pagos_filtrados.count()}")
             print(f"[Dashboard Debug] KPIs - Recaudo: {kpi_monto_total_recaudo}, Presencias TOUR: {kpi_n_presencias_realizadas}, Ventas: {kpi_n_ventas_para_conversion}")
 
             tarjetas_data = {
@@ -896,32 +868,28 @@ class GetDashboardDataAPIView(APIView):
                 "lotesVendidos": kpi_lotes_vendidos,
             }
 
-            # --- Gráficos CORREGIDOS ---
-            # 1. Histórico Ventas vs Presencias (CORREGIDO)
-            # Para ventas: usar fecha_venta
-            ventas_historico_q = ventas_filtradas.annotate(mes=TruncMonth('fecha_venta')).values('mes').annotate(cantidad=Count('id_venta')).order_by('mes')
-            
-            # Para presencias: usar fecha_hora_presencia y considerar solo TOUR realizadas
-            presencias_historico_q = presencias_filtradas.annotate(mes=TruncMonth('fecha_hora_presencia__date')).values('mes').annotate(cantidad=Count('id_presencia')).order_by('mes')
-            
+            # --- Gráficos ---
+            # 1. Histórico Ventas vs Presencias
+            ventas_historico_q = metricas_ventas.annotate(mes=TruncMonth('fecha')).values('mes').annotate(cantidad=suma_cantidad).order_by('mes')
+            presencias_historico_q = metricas_presencias.annotate(mes=TruncMonth('fecha')).values('mes').annotate(cantidad=suma_cantidad).order_by('mes')
+
             historico_combinado = {}
             for v_hist in ventas_historico_q:
                 if v_hist['mes']: historico_combinado.setdefault(v_hist['mes'].strftime('%Y-%m'), {'ventas': 0, 'presencias': 0})['ventas'] = v_hist['cantidad']
             for p_hist in presencias_historico_q:
                 if p_hist['mes']: historico_combinado.setdefault(p_hist['mes'].strftime('%Y-%m'), {'ventas': 0, 'presencias': 0})['presencias'] = p_hist['cantidad']
-            
+
             grafico_historico_ventas_presencias = [['Mes', 'Ventas', 'Presencias']]
             for mes_str, data_hist in sorted(historico_combinado.items()):
                 grafico_historico_ventas_presencias.append([mes_str, data_hist.get('ventas', 0), data_hist.get('presencias', 0)])
             if len(grafico_historico_ventas_presencias) == 1: grafico_historico_ventas_presencias.append(['Sin datos', 0, 0])
 
-            # 2. Estado de Ventas (Doughnut) - USA ventas_filtradas
-            ventas_por_estado_q = ventas_filtradas.values('status_venta').annotate(cantidad=Count('id_venta')).order_by('status_venta')
+            # 2. Estado de Ventas (Doughnut)
             grafico_estado_ventas = [['Estado', 'Cantidad']]
             status_display_map = dict(Venta.STATUS_VENTA_CHOICES)
-            for item_estado in ventas_por_estado_q:
-                display_name = status_display_map.get(item_estado['status_venta'], item_estado['status_venta'])
-                grafico_estado_ventas.append([display_name, item_estado['cantidad']])
+            for status_clave, cantidad_estado in ventas_por_estado.items():
+                display_name = status_display_map.get(status_clave, status_clave)
+                grafico_estado_ventas.append([display_name, cantidad_estado])
             if len(grafico_estado_ventas) == 1: grafico_estado_ventas.append(['Sin datos', 0])
 
             # 3. Embudo de Ventas - CORREGIDO para usar presencias TOUR realizadas
@@ -947,134 +915,39 @@ class GetDashboardDataAPIView(APIView):
                 ])
 
             # 4. Disponibilidad de Lotes por Proyecto (Tabla Detallada) - NO FILTRADO por dashboard filters
-            proyectos_definidos = ["OASIS 1 (HUACHO 1)", "OASIS 2 (AUCALLAMA)", "OASIS 3 (HUACHO 2)"]
-            tabla_disponibilidad_lotes_data = []
-
-            for proyecto_nombre in proyectos_definidos:
-                lotes_del_proyecto = Lote.objects.filter(ubicacion_proyecto=proyecto_nombre)
-                total_lotes = lotes_del_proyecto.count()
-                
-                disponibles_count = lotes_del_proyecto.filter(estado_lote=Lote.ESTADO_LOTE_CHOICES[0][0]).count() # 'Disponible'
-                reservados_count = lotes_del_proyecto.filter(estado_lote=Lote.ESTADO_LOTE_CHOICES[1][0]).count()  # 'Reservado'
-                vendidos_count = lotes_del_proyecto.filter(estado_lote=Lote.ESTADO_LOTE_CHOICES[2][0]).count()    # 'Vendido'
-                
-                tabla_disponibilidad_lotes_data.append({
+            tabla_disponibilidad_lotes_data = [
+                {
                     "proyecto": proyecto_nombre,
-                    "total_lotes": total_lotes,
-                    "disponibles_cantidad": disponibles_count,
-                    "reservados_cantidad": reservados_count,
-                    "vendidos_cantidad": vendidos_count,
-                })
-
-            # 5. Ranking de Asesores por Estado de Venta (Tabla) - MEJORADA
-            # Nueva lógica que considera todos los roles de asesores en el proceso de venta
-            ranking_asesores_pivot = {}
-            estados_venta_orden_claves = [Venta.STATUS_VENTA_SEPARACION, Venta.STATUS_VENTA_PROCESABLE, Venta.STATUS_VENTA_ANULADO, Venta.STATUS_VENTA_COMPLETADA]
-            estados_venta_orden_display = [dict(Venta.STATUS_VENTA_CHOICES).get(s,s).capitalize() for s in estados_venta_orden_claves]
-
-            # Obtener todas las ventas con sus presencias asociadas y asesores involucrados
-            ventas_con_presencias = ventas_filtradas.select_related(
-                'presencia_que_origino__asesor_captacion_opc',
-                'presencia_que_origino__asesor_call_agenda', 
-                'presencia_que_origino__asesor_liner',
-                'presencia_que_origino__asesor_closer',
-                'vendedor_principal'
-            ).prefetch_related('comisiones_asesores__asesor')
-
-            for venta in ventas_con_presencias:
-                status_venta = venta.status_venta
-                if status_venta not in estados_venta_orden_claves:
-                    continue
-
-                # Recolectar todos los asesores involucrados en esta venta
-                asesores_venta = set()
-                
-                # 1. Asesores de la presencia (roles específicos)
-                if venta.presencia_que_origino:
-                    presencia = venta.presencia_que_origino
-                    if presencia.asesor_captacion_opc:
-                        asesores_venta.add(('captación', presencia.asesor_captacion_opc))
-                    if presencia.asesor_call_agenda:
-                        asesores_venta.add(('llamada', presencia.asesor_call_agenda))
-                    if presencia.asesor_liner:
-                        asesores_venta.add(('liner', presencia.asesor_liner))
-                    if presencia.asesor_closer:
-                        asesores_venta.add(('closer', presencia.asesor_closer))
-
-                # 2. Vendedor principal (liner de la presencia)
-                if venta.vendedor_principal:
-                    asesores_venta.add(('vendedor_principal', venta.vendedor_principal))
-
-                # 3. Asesores con comisiones (roles adicionales)
-                for comision in venta.comisiones_asesores.all():
-                    if comision.asesor:
-                        asesores_venta.add((comision.rol, comision.asesor))
-
-                # Agregar cada asesor al ranking
-                for rol, asesor in asesores_venta:
-                    if not asesor:
-                        continue
-                        
-                    asesor_key = f"{asesor.nombre_asesor} ({asesor.id_asesor})"
-                    rol_display = rol.replace('_', ' ').title()
-                    
-                    if asesor_key not in ranking_asesores_pivot:
-                        ranking_asesores_pivot[asesor_key] = {
-                            'tipo': 'N/A',
-                            'roles': set(),
-                            'total_ventas': 0,
-                            'ventas_detalle': set(),
-                            'ventas_ids': set(),
-                            **{estado: set() for estado in estados_venta_orden_claves}
-                        }
-                    
-                    # Agregar el rol a la lista de roles del asesor
-                    ranking_asesores_pivot[asesor_key]['roles'].add(rol_display)
-                    # Guardar el ID de la venta para contar ventas únicas
-                    ranking_asesores_pivot[asesor_key]['ventas_ids'].add(venta.id_venta)
-                    ranking_asesores_pivot[asesor_key][status_venta].add(venta.id_venta)
-                    # Agregar detalle de la venta
-                    venta_id = venta.id_venta
-                    lote_str = str(venta.lote) if venta.lote else ''
-                    proyecto_str = venta.lote.ubicacion_proyecto if venta.lote and hasattr(venta.lote, 'ubicacion_proyecto') else ''
-                    ranking_asesores_pivot[asesor_key]['ventas_detalle'].add(f"{venta_id} - {lote_str} ({proyecto_str})")
-
-            # Crear la tabla final ordenada por total de ventas y luego por nombre
-            grafico_ranking_asesores = [['Asesor', 'Tipo', 'Roles', 'Total Ventas', 'Ventas'] + estados_venta_orden_display]
-            
-            # Ordenar por total de ventas (descendente) y luego por nombre
-            asesores_ordenados = sorted(
-                ranking_asesores_pivot.items(), 
-                key=lambda x: (-x[1]['total_ventas'], x[0])
-            )
-            
-            for asesor_nombre_rank, data_rank in asesores_ordenados:
-                roles_str = ', '.join(sorted(data_rank['roles']))
-                fila = [
-                    asesor_nombre_rank, 
-                    data_rank.get('tipo', 'N/A'),
-                    roles_str,
-                    len(data_rank.get('ventas_ids', set())),
-                    '\n'.join(sorted(data_rank['ventas_detalle'])),
-                ]
-                for estado_clave_rank in estados_venta_orden_claves:
-                    fila.append(len(data_rank.get(estado_clave_rank, set())))
-                grafico_ranking_asesores.append(fila)
-            
+                    "total_lotes": conteos['total'],
+                    "disponibles_cantidad": conteos[estado_disponible],
+                    "reservados_cantidad": conteos[estado_reservado],
+                    "vendidos_cantidad": conteos[estado_vendido],
+                }
+                for proyecto_nombre, conteos in lotes_por_proyecto.items()
+            ]
+
+            # 5. Ranking de Asesores por Estado de Venta (Tabla): agregado en la BD (ver ranking.py).
+            # El detalle de ventas de cada asesor se pide aparte a DashboardRankingVentasAPIView.
+            estados_venta_orden_display = [dict(Venta.STATUS_VENTA_CHOICES).get(s, s).capitalize() for s in ESTADOS_RANKING]
+            ranking = ranking_asesores(filtrar_ventas_dashboard(filters))
+            grafico_ranking_asesores = [['Asesor', 'Tipo', 'Roles', 'Total Ventas'] + estados_venta_orden_display]
+            for fila_rank in ranking:
+                grafico_ranking_asesores.append(
+                    [f"{fila_rank['nombre_asesor']} ({fila_rank['id_asesor']})", 'N/A', ', '.join(fila_rank['roles']), fila_rank['total_ventas']]
+                    + [fila_rank[estado] for estado in ESTADOS_RANKING]
+                )
             if len(grafico_ranking_asesores) == 1:
                 grafico_ranking_asesores.append(['Sin datos', '-', '-', 0, 0, 0, 0, 0])
 
-            # 6. Recaudo por Medio de Captación (Bar) - USA pagos_filtrados
-            recaudo_por_medio_q = pagos_filtrados.filter(venta__presencia_que_origino__isnull=False).values(
-                'venta__presencia_que_origino__medio_captacion'
-            ).annotate(
-                total_recaudado=Coalesce(Sum('monto_pago', output_field=DecimalField()), Value(Decimal('0.0')), output_field=DecimalField())
+            # 6. Recaudo por Medio de Captación (Bar): pagos de ventas originadas en una presencia
+            recaudo_por_medio_q = metricas_pagos.filter(medio_captacion__isnull=False).values('medio_captacion').annotate(
+                total_recaudado=Coalesce(Sum('monto', output_field=DecimalField()), Value(Decimal('0.0')), output_field=DecimalField())
             ).order_by('-total_recaudado')
 
             grafico_recaudo_medio_captacion = [['Medio de Captación', 'Recaudo Total (S/.)']]
             medio_display_map = dict(Presencia.MEDIO_CAPTACION_CHOICES)
             for item_medio in recaudo_por_medio_q:
-                medio_clave = item_medio['venta__presencia_que_origino__medio_captacion']
+                medio_clave = item_medio['medio_captacion']
                 display_name_medio = medio_display_map.get(medio_clave, medio_clave if medio_clave else "Desconocido")
                 grafico_recaudo_medio_captacion.append([display_name_medio, float(item_medio['total_recaudado'])])
             if len(grafico_recaudo_medio_captacion) == 1: grafico_recaudo_medio_captacion.append(['Sin datos', 0.0])
@@ -1090,6 +963,7 @@ class GetDashboardDataAPIView(APIView):
                     "embudoVentas": grafico_embudo_ventas,
                     "tablaDisponibilidadLotes": tabla_disponibilidad_lotes_data,
                     "rankingAsesores": grafico_ranking_asesores,
+                    "rankingAsesoresIds": [fila_rank['id_asesor'] for fila_rank in ranking],
                     "recaudoPorMedioCaptacion": grafico_recaudo_medio_captacion,
                 }
             }
@@ -1116,13 +990,41 @@ class GetDashboardDataAPIView(APIView):
                     "embudoVentas": fallback_grafico_embudo,
                     "tablaDisponibilidadLotes": fallback_tabla_disponibilidad,
                     "rankingAsesores": fallback_grafico_ranking,
+                    "rankingAsesoresIds": [],
                     "recaudoPorMedioCaptacion": fallback_grafico_simple,
                 }
             }, status=500)
 
 
+class DashboardRankingVentasAPIView(APIView):
+    """Detalle paginado de las ventas de un asesor del ranking, con los mismos filtros del dashboard."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        asesor_ranking_id = request.GET.get('asesorRankingId')
+        if not asesor_ranking_id:
+            return Response({"detail": "Debe indicar asesorRankingId."}, status=status.HTTP_400_BAD_REQUEST)
+        ventas = ventas_de_asesor(filtrar_ventas_dashboard(_filtros_dashboard(request)), asesor_ranking_id)
+        paginator = CustomPageNumberPagination()
+        pagina = paginator.paginate_queryset(ventas, request, view=self)
+        status_display_map = dict(Venta.STATUS_VENTA_CHOICES)
+        return paginator.get_paginated_response([
+            {
+                "id_venta": venta.id_venta,
+                "fecha_venta": venta.fecha_venta,
+                "lote": str(venta.lote) if venta.lote else '',
+                "proyecto": venta.lote.ubicacion_proyecto if venta.lote else '',
+                "status_venta": venta.status_venta,
+                "status_venta_display": status_display_map.get(venta.status_venta, venta.status_venta),
+                "roles": roles_en_venta(venta, asesor_ranking_id),
+            }
+            for venta in pagina
+        ])
+
+
 class GetCommissionSummaryDataAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    @cachear_respuesta('resumen_comisiones', _ambitos_resumen_comisiones)
     def get(self, request, format=None):
         try:
             asesor_id_filter = request.query_params.get('asesor_id')
@@ -1172,6 +1074,41 @@ class GetCommissionSummaryDataAPIView(APIView):
         except Exception as e:
             return Response({"success": False, "message": f"Error al procesar el resumen de comisiones: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class CacheRespuestasStatsAPIView(APIView):
+    """Aciertos y fallos de la cache de respuestas por vista (contadores del proceso o del backend compartido)."""
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request, format=None):
+        return Response(estadisticas(VISTAS_CACHEADAS))
+
+class TypeaheadAPIView(APIView):
+    """
+    Autocompletado de clientes, asesores o lotes desde el índice de prefijos en memoria (typeahead.py).
+    Query params: q (mínimo 2 caracteres), limit (entero positivo, con tope LIMITE_MAXIMO_TYPEAHEAD) y,
+    para lotes, estado_lote separado por comas.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    SEGUNDOS_CACHE_NAVEGADOR = 30
+
+    def get(self, request, entidad, format=None):
+        indice = INDICES_TYPEAHEAD.get(entidad)
+        if indice is None:
+            return Response({'error': f"Entidad no soportada: {entidad}"}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limite = int(request.query_params.get('limit', LIMITE_TYPEAHEAD))
+        except ValueError:
+            limite = 0
+        if limite < 1:
+            return Response({'error': "El parámetro limit debe ser un entero mayor que 0."}, status=status.HTTP_400_BAD_REQUEST)
+        limite = min(limite, LIMITE_MAXIMO_TYPEAHEAD)
+        filtro = None
+        estados = [e for e in request.query_params.get('estado_lote', '').split(',') if e]
+        if entidad == 'lotes' and estados:
+            filtro = lambda datos: datos['estado_lote'] in estados
+        resultados = indice.buscar(request.query_params.get('q', ''), limite, filtro)
+        response = Response({'results': resultados, 'count': len(resultados)})
+        response['Cache-Control'] = f'private, max-age={self.SEGUNDOS_CACHE_NAVEGADOR}'
+        return response
+
 class GetDefaultCommissionRateAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
@@ -1357,66 +1294,45 @@ class GestionCobranzaViewSet(viewsets.ModelViewSet):
         serializer.save(responsable=self.request.user)
 
 class CuotasPendientesCobranzaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Lista de trabajo de cobranzas agrupada por venta y paginada por cursor (ver cobranza.py).
+    Params: proyecto, cliente, fecha_desde, fecha_hasta, dias_vencidos_min, page_size y cursor (next_cursor de la respuesta anterior).
+    """
     serializer_class = None  # Se define en get_serializer_class
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [filters.OrderingFilter, filters.SearchFilter]
-    ordering_fields = ['fecha_vencimiento', 'numero_cuota']
-    ordering = ['fecha_vencimiento']
-    # No usar paginación para obtener todas las cuotas y agrupar por venta en el frontend
 
     def get_queryset(self):
-        hoy = timezone.now().date()
-        qs = CuotaPlanPago.objects.filter(estado_cuota__in=['pendiente', 'atrasada', 'vencida_no_pagada'])
-        # Filtros avanzados
-        proyecto = self.request.query_params.get('proyecto')
-        cliente = self.request.query_params.get('cliente')
-        fecha_desde = self.request.query_params.get('fecha_desde')
-        fecha_hasta = self.request.query_params.get('fecha_hasta')
-        if proyecto:
-            qs = qs.filter(plan_pago_venta__venta__lote__ubicacion_proyecto__icontains=proyecto)
-        if cliente:
-            qs = qs.filter(plan_pago_venta__venta__cliente__nombres_completos_razon_social__icontains=cliente)
-        if fecha_desde:
-            qs = qs.filter(fecha_vencimiento__gte=fecha_desde)
-        if fecha_hasta:
-            qs = qs.filter(fecha_vencimiento__lte=fecha_hasta)
-        # Annotar días vencidos
-        qs = qs.annotate(
-            dias_vencidos=ExpressionWrapper(F('fecha_vencimiento') - hoy, output_field=fields.DurationField())
-        )
-        return qs
+        return cuotas_pendientes(self.request.query_params)
 
     def list(self, request, *args, **kwargs):
-        qs = self.get_queryset()
-        data = []
-        print("[LOG] Iniciando procesamiento de cuotas pendientes para cobranza. Total cuotas en queryset:", qs.count())
-        
-        for cuota in qs:
-            try:
-                print(f"[LOG] Procesando cuota ID {cuota.id_cuota} | Estado: {cuota.estado_cuota}")
-                gestiones = cuota.gestiones_cobranza.order_by('-fecha_gestion')
-                ultima_gestion = gestiones.first()
-                cliente_str = str(cuota.plan_pago_venta.venta.cliente)
-                lote_str = str(cuota.plan_pago_venta.venta.lote)
-                data.append({
-                    'id_cuota': cuota.id_cuota,
-                    'cliente': cliente_str,
-                    'lote': lote_str,
-                    'numero_cuota': cuota.numero_cuota,
-                    'fecha_vencimiento': cuota.fecha_vencimiento,
-                    'monto_programado': cuota.monto_programado,
-                    'dias_vencidos': (timezone.now().date() - cuota.fecha_vencimiento).days if cuota.fecha_vencimiento < timezone.now().date() else 0,
-                    'estado_cuota': cuota.estado_cuota,
-                    'ultima_gestion': {
-                        'fecha_gestion': ultima_gestion.fecha_gestion if ultima_gestion else None,
-                        'tipo_contacto': ultima_gestion.tipo_contacto if ultima_gestion else None,
-                        'resultado': ultima_gestion.resultado if ultima_gestion else None,
-                    } if ultima_gestion else None,
-                    'num_gestiones': gestiones.count(),
-                })
-            except Exception as e:
-                print(f"[ERROR] Fallo procesando cuota ID {cuota.id_cuota}: {e}")
-        print(f"[LOG] Total cuotas procesadas correctamente: {len(data)}")
+        try:
+            tamano = min(int(request.query_params.get('page_size') or TAMANO_PAGINA_COBRANZA), TAMANO_PAGINA_MAXIMO_COBRANZA)
+            data = pagina_por_venta(self.get_queryset(), cursor=request.query_params.get('cursor'), tamano=max(tamano, 1))
+        except (ValueError, CursorInvalido) as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+class ReporteAntiguedadCarteraAPIView(APIView):
+    """
+    Antigüedad de la cartera vencida por tramos (0-30, 31-60, 61-90, 90+ días), en soles y dólares.
+    Params: fecha_corte (YYYY-MM-DD, por defecto hoy), agrupar_por (proyecto,asesor,mes), proyectoId, asesorId.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    def get(self, request, format=None):
+        fecha_corte = request.query_params.get('fecha_corte')
+        hoy = parse_date(fecha_corte) if fecha_corte else None
+        if fecha_corte and hoy is None:
+            return Response({'detail': f'Fecha de corte inválida: {fecha_corte}'}, status=status.HTTP_400_BAD_REQUEST)
+        agrupar_por = request.query_params.get('agrupar_por')
+        try:
+            data = reporte_antiguedad(
+                hoy=hoy,
+                agrupar_por=agrupar_por.split(',') if agrupar_por else None,
+                proyecto_id=request.query_params.get('proyectoId') or None,
+                asesor_id=request.query_params.get('asesorId') or None,
+            )
+        except DimensionInvalida as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(data)
 
 # --- VIEWS DE CIERRE DE COMISIONES ---
@@ -1523,53 +1439,7 @@ class LimpiarLotesDuplicadosAPIView(APIView):
         })
     
     def post(self, request, format=None):
-        try:
-            print('=== INICIANDO LIMPIEZA DE LOTES DUPLICADOS ===')
-            
-            # Agrupar lotes por combinación única
-            lotes_por_clave = defaultdict(list)
-            for lote in Lote.objects.all():
-                clave = (lote.ubicacion_proyecto.strip().lower(), lote.manzana.strip() if lote.manzana else '', lote.numero_lote.strip() if lote.numero_lote else '', lote.etapa)
-                lotes_por_clave[clave].append(lote)
-            
-            total_duplicados = 0
-            eliminados = 0
-            detalles_eliminados = []
-            
-            for clave, lotes in lotes_por_clave.items():
-                if len(lotes) > 1:
-                    total_duplicados += len(lotes) - 1
-                    # Mantener el primero que NO esté asociado a ventas, si todos tienen ventas, mantener el primero
-                    lotes_ordenados = sorted(lotes, key=lambda l: l.ventas_lote.count())
-                    lote_a_mantener = lotes_ordenados[0]
-                    
-                    for lote in lotes:
-                        if lote == lote_a_mantener:
-                            continue
-                        if lote.ventas_lote.exists():
-                            detalles_eliminados.append(f"No se eliminó {lote.id_lote} porque tiene ventas asociadas.")
-                            continue
-                        
-                        detalles_eliminados.append(f"Eliminado: {lote.id_lote} ({lote.ubicacion_proyecto} Mz:{lote.manzana} Lt:{lote.numero_lote} Etapa:{lote.etapa})")
-                        lote.delete()
-                        eliminados += 1
-            
-            total_lotes_final = Lote.objects.count()
-            
-            return Response({
-                'success': True,
-                'message': 'Limpieza de lotes duplicados completada',
-                'total_duplicados_detectados': total_duplicados,
-                'total_eliminados': eliminados,
-                'total_lotes_final': total_lotes_final,
-                'detalles': detalles_eliminados[:50]  # Limitar a 50 detalles para no sobrecargar la respuesta
-            })
-            
-        except Exception as e:
-            return Response({
-                'success': False,
-                'error': f'Error durante la limpieza: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return respuesta_limpieza_duplicados(request)
 
 class TablaComisionDirectaViewSet(viewsets.ModelViewSet):
     queryset = TablaComisionDirecta.objects.all().order_by('rol', 'tipo_venta')
@@ -75,11 +75,11 @@ const AsesorAutocomplete = ({
             }
             setIsLoading(true);
             try {
-                const response = await apiService.searchAsesores(inputValue);
-                const asesores = response.data.results || response.data || [];
+                const response = await apiService.typeahead('asesores', inputValue, { limit: 20 });
+                const asesores = response.data.results || [];
                 return asesores.map(asesor => ({
                     value: asesor.id_asesor,
-                    label: `${asesor.nombre_asesor} (${asesor.id_asesor}) - ${asesor.tipo_asesor_actual}`,
+                    label: asesor.display_text,
                     asesor: asesor
                 }));
             } catch (error) {
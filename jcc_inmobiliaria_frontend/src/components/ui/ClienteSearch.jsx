@@ -1,5 +1,5 @@
 import React, { useState, useEffect, useRef } from 'react';
-import { searchClientes, getClientesSinPresencia, getClientesParaVentas, getClienteById } from '../../services/apiService';
+import { typeahead, getClientesSinPresencia, getClientesParaVentas, getClienteById } from '../../services/apiService';
 import styles from './ClienteSearch.module.css';
 
 const ClienteSearch = ({ 
@@ -83,7 +83,7 @@ const ClienteSearch = ({
             } else if (context === 'ventas') {
                 response = await getClientesParaVentas(searchTerm, 20);
             } else {
-                response = await searchClientes(searchTerm);
+                response = await typeahead('clientes', searchTerm, { limit: 20 });
             }
             
             setResults(response.data.results || []);
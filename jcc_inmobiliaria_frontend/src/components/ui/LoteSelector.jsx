@@ -32,9 +32,13 @@ const LoteSelector = ({ show, onClose, onLoteSelected, currentLoteId = null }) =
             );
             const queryParams = new URLSearchParams(activeFilters).toString();
             
+            // Solo texto libre (y estado): se resuelve con el autocompletado, sin consultar la BD
+            const soloTexto = (activeFilters.q || '').length >= 2 && Object.keys(activeFilters).every(k => k === 'q' || k === 'estado_lote');
             console.log("[LoteSelector] QueryParams enviados:", queryParams);
-            const response = await apiService.getLotes(queryParams);
-            console.log("[LoteSelector] Respuesta de getLotes:", response.data);
+            const response = soloTexto
+                ? await apiService.typeahead('lotes', activeFilters.q, { limit: 50, ...(activeFilters.estado_lote ? { estado_lote: activeFilters.estado_lote } : {}) })
+                : await apiService.getLotes(queryParams);
+            console.log("[LoteSelector] Respuesta de lotes:", response.data);
             
             const fetchedLotes = response.data.results || response.data || [];
             setLotes(fetchedLotes);
@@ -106,13 +110,19 @@ const LoteSelector = ({ show, onClose, onLoteSelected, currentLoteId = null }) =
         setError(null); 
     };
     
-    const handleConfirmSelection = () => {
+    const handleConfirmSelection = async () => {
         if (selectedLoteInModal) {
             if (selectedLoteInModal.estado_lote === 'Vendido' && selectedLoteInModal.id_lote !== currentLoteId) {
                 setError("No se puede confirmar la selección de un lote Vendido.");
                 return;
             }
-            onLoteSelected(selectedLoteInModal);
+            // Las filas del autocompletado traen solo las columnas de la tabla: se pide el lote completo (precios a crédito, etc.)
+            try {
+                const response = await apiService.getLoteById(selectedLoteInModal.id_lote);
+                onLoteSelected(response.data);
+            } catch (err) {
+                setError(`Error al cargar el lote: ${err.response?.data?.detail || err.message}`);
+            }
             // onClose(); // El componente padre se encarga de cerrar el modal
         } else {
             setError("Por favor, seleccione un lote de la lista antes de confirmar.");
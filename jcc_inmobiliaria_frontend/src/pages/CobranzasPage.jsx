@@ -84,20 +84,8 @@ function HistorialModal({ cuota, onClose }) {
   );
 }
 
-function agruparCuotasPorVenta(cuotas) {
-  // Agrupa cuotas por venta (cliente + lote)
-  const ventas = {};
-  cuotas.forEach(cuota => {
-    const key = `${cuota.cliente}||${cuota.lote}`;
-    if (!ventas[key]) ventas[key] = { cliente: cuota.cliente, lote: cuota.lote, cuotas: [] };
-    ventas[key].cuotas.push(cuota);
-  });
-  return Object.values(ventas);
-}
-
 function CobranzasPage() {
-  const [cuotas, setCuotas] = useState([]);
-  const [ventasAgrupadas, setVentasAgrupadas] = useState([]);
+  const [ventasParaMostrar, setVentasParaMostrar] = useState([]);
   const [filtros, setFiltros] = useState({ cliente: '', proyecto: '', diasVencidos: '' });
   const [selectedCuota, setSelectedCuota] = useState(null);
   const [showGestionModal, setShowGestionModal] = useState(false);
@@ -106,137 +94,69 @@ function CobranzasPage() {
   const [loading, setLoading] = useState(false);
   const [expandedVentas, setExpandedVentas] = useState([]); // Para controlar qué ventas están expandidas
 
-  // Estados de paginación
-  const [currentPage, setCurrentPage] = useState(1);
+  // Paginación por cursor: el backend agrupa por venta y devuelve next_cursor.
+  // cursores[i] es el cursor con el que se pidió la página i + 1 (null para la primera).
+  const [cursores, setCursores] = useState([null]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [pageSize, setPageSize] = useState(20);
   const [totalCount, setTotalCount] = useState(0);
-  const [totalPages, setTotalPages] = useState(0);
+  const currentPage = cursores.length;
 
-  const fetchCuotas = useCallback(async (currentFilters) => {
+  const fetchVentas = useCallback(async (currentFilters, cursor, size) => {
     setLoading(true);
     try {
-      const params = {};
+      const params = { page_size: size };
       if (currentFilters.cliente) params.cliente = currentFilters.cliente;
       if (currentFilters.proyecto) params.proyecto = currentFilters.proyecto;
-      
-      // No usar paginación del backend, obtener todas las cuotas
+      if (currentFilters.diasVencidos) params.dias_vencidos_min = currentFilters.diasVencidos;
+      if (cursor) params.cursor = cursor;
+
       const res = await apiService.get('/gestion/cobranzas/cuotas-pendientes/', { params });
-      let data = res.data;
-      
-      // Manejar respuesta paginada del backend (pero no usar la paginación)
-      if (data.results) {
-        data = data.results;
-      }
-      
-      // Aplicar filtro de días vencidos si existe
-      if (currentFilters.diasVencidos) {
-        data = data.filter(c => c.dias_vencidos >= parseInt(currentFilters.diasVencidos, 10));
-      }
-      
-      setCuotas(data);
-      
-      // Agrupar cuotas por venta
-      const ventas = {};
-      data.forEach(cuota => {
-        const key = `${cuota.cliente}||${cuota.lote}`;
-        if (!ventas[key]) ventas[key] = { cliente: cuota.cliente, lote: cuota.lote, cuotas: [] };
-        ventas[key].cuotas.push(cuota);
-      });
-      
-      const ventasArray = Object.values(ventas);
-      setVentasAgrupadas(ventasArray);
-      
-      // Calcular paginación basada en ventas agrupadas
-      setTotalCount(ventasArray.length);
-      setTotalPages(Math.ceil(ventasArray.length / pageSize));
-      
+      setVentasParaMostrar(res.data.results || []);
+      setNextCursor(res.data.next_cursor || null);
+      setTotalCount(res.data.total_ventas || 0);
     } catch (err) {
-      setCuotas([]);
-      setVentasAgrupadas([]);
+      setVentasParaMostrar([]);
+      setNextCursor(null);
       setTotalCount(0);
-      setTotalPages(0);
     }
     setLoading(false);
   }, []);
 
+  const cursorActual = cursores[cursores.length - 1];
   useEffect(() => {
-    fetchCuotas(filtros);
-  }, [filtros, fetchCuotas]);
-
-  // Efecto para recalcular paginación cuando cambie pageSize
-  useEffect(() => {
-    if (ventasAgrupadas.length > 0) {
-      setTotalPages(Math.ceil(ventasAgrupadas.length / pageSize));
-      // Ajustar currentPage si es necesario
-      const maxPage = Math.ceil(ventasAgrupadas.length / pageSize);
-      if (currentPage > maxPage && maxPage > 0) {
-        setCurrentPage(maxPage);
-      }
-    }
-  }, [pageSize, ventasAgrupadas.length, currentPage]);
+    fetchVentas(filtros, cursorActual, pageSize);
+  }, [filtros, cursorActual, pageSize, fetchVentas]);
 
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
     setFiltros(prevFilters => ({ ...prevFilters, [name]: value }));
-    setCurrentPage(1); // Reset a primera página al filtrar
+    setCursores([null]); // Reset a primera página al filtrar
   };
 
   const resetFilters = () => { 
     setFiltros({ cliente: '', proyecto: '', diasVencidos: '' }); 
-    setCurrentPage(1); // Reset a primera página
+    setCursores([null]); // Reset a primera página
   };
 
-  const handlePageChange = (newPage) => {
-    setCurrentPage(newPage);
+  const handleNextPage = () => {
+    if (nextCursor) setCursores(prev => [...prev, nextCursor]);
   };
 
-  const handlePageSizeChange = (newSize) => {
-    setPageSize(newSize);
-    setCurrentPage(1); // Reset a primera página al cambiar tamaño
+  const handlePrevPage = () => {
+    setCursores(prev => prev.length > 1 ? prev.slice(0, -1) : prev);
   };
 
-  const getPageNumbers = () => {
-    const pages = [];
-    const maxVisiblePages = 5;
-    
-    if (totalPages <= maxVisiblePages) {
-      for (let i = 1; i <= totalPages; i++) {
-        pages.push(i);
-      }
-    } else {
-      if (currentPage <= 3) {
-        for (let i = 1; i <= 4; i++) {
-          pages.push(i);
-        }
-        pages.push('...');
-        pages.push(totalPages);
-      } else if (currentPage >= totalPages - 2) {
-        pages.push(1);
-        pages.push('...');
-        for (let i = totalPages - 3; i <= totalPages; i++) {
-          pages.push(i);
-        }
-      } else {
-        pages.push(1);
-        pages.push('...');
-        for (let i = currentPage - 1; i <= currentPage + 1; i++) {
-          pages.push(i);
-        }
-        pages.push('...');
-        pages.push(totalPages);
-      }
-    }
-    return pages;
+  const handleFirstPage = () => {
+    setCursores([null]);
   };
 
-  // Obtener ventas para la página actual
-  const getVentasForCurrentPage = () => {
-    const startIndex = (currentPage - 1) * pageSize;
-    const endIndex = startIndex + pageSize;
-    return ventasAgrupadas.slice(startIndex, endIndex);
+  const handlePageSizeChange = (newSize) => {
+    setPageSize(newSize);
+    setCursores([null]); // Reset a primera página al cambiar tamaño
   };
 
-  const ventasParaMostrar = getVentasForCurrentPage();
+  const inicioPagina = (currentPage - 1) * pageSize;
 
   const handleExpandVenta = (key) => {
     setExpandedVentas(prev => prev.includes(key) ? prev.filter(k => k !== key) : [...prev, key]);
@@ -304,7 +224,7 @@ function CobranzasPage() {
             {/* Información de paginación */}
             <div className={cobranzasStyles.paginationInfo}>
               <span>
-                Mostrando {((currentPage - 1) * pageSize) + 1} a {Math.min(currentPage * pageSize, totalCount)} de {totalCount} ventas
+                Mostrando {inicioPagina + 1} a {inicioPagina + ventasParaMostrar.length} de {totalCount} ventas
               </span>
               <div className={cobranzasStyles.pageSizeSelector}>
                 <label htmlFor="pageSize">Ventas por página:</label>
@@ -329,24 +249,26 @@ function CobranzasPage() {
                     <th>Cliente</th>
                     <th>Lote</th>
                     <th>N° Cuotas Pendientes</th>
+                    <th>Máx. Días Vencidos</th>
                     <th>Acciones</th>
                   </tr>
                 </thead>
                 <tbody>
                   {ventasParaMostrar.map(venta => {
-                    const key = `${venta.cliente}||${venta.lote}`;
+                    const key = venta.id_venta;
                     const expanded = expandedVentas.includes(key);
                     return (
                       <React.Fragment key={key}>
                         <tr style={{ cursor: 'pointer', background: expanded ? '#ddebf7' : undefined }} onClick={() => handleExpandVenta(key)}>
                           <td>{venta.cliente}</td>
                           <td>{venta.lote}</td>
-                          <td>{venta.cuotas.length}</td>
+                          <td>{venta.cuotas_pendientes}</td>
+                          <td style={{ color: venta.max_dias_vencidos > 0 ? 'red' : undefined }}>{venta.max_dias_vencidos}</td>
                           <td>{expanded ? '▲ Ocultar' : '▼ Ver cuotas'}</td>
                         </tr>
                         {expanded && venta.cuotas.map(cuota => (
                           <tr key={cuota.id_cuota} style={{ background: '#f7fbff' }}>
-                            <td colSpan={2} style={{ paddingLeft: 32 }}>
+                            <td colSpan={3} style={{ paddingLeft: 32 }}>
                               <b>Cuota #{cuota.numero_cuota}</b> - Vence: {cuota.fecha_vencimiento} - Monto: S/. {Number(cuota.monto_programado).toLocaleString('es-PE', { style: 'currency', currency: 'PEN' })}
                             </td>
                             <td style={{ color: cuota.dias_vencidos > 0 ? 'red' : undefined }}>
@@ -366,47 +288,31 @@ function CobranzasPage() {
             </div>
 
             {/* Controles de paginación */}
-            {totalPages > 1 && (
+            {(currentPage > 1 || nextCursor) && (
               <div className={cobranzasStyles.paginationControls}>
                 <button 
-                  onClick={() => handlePageChange(1)} 
+                  onClick={handleFirstPage} 
                   disabled={currentPage === 1}
                   className={cobranzasStyles.paginationButton}
                 >
                   « Primera
                 </button>
                 <button 
-                  onClick={() => handlePageChange(currentPage - 1)} 
+                  onClick={handlePrevPage} 
                   disabled={currentPage === 1}
                   className={cobranzasStyles.paginationButton}
                 >
                   ‹ Anterior
                 </button>
-                
-                {getPageNumbers().map((page, index) => (
-                  <button
-                    key={index}
-                    onClick={() => typeof page === 'number' ? handlePageChange(page) : null}
-                    disabled={page === '...'}
-                    className={`${cobranzasStyles.paginationButton} ${page === currentPage ? cobranzasStyles.activePage : ''} ${page === '...' ? cobranzasStyles.ellipsis : ''}`}
-                  >
-                    {page}
-                  </button>
-                ))}
-                
-                <button 
-                  onClick={() => handlePageChange(currentPage + 1)} 
-                  disabled={currentPage === totalPages}
-                  className={cobranzasStyles.paginationButton}
-                >
-                  Siguiente ›
+                <button className={`${cobranzasStyles.paginationButton} ${cobranzasStyles.activePage}`} disabled>
+                  {currentPage}
                 </button>
                 <button 
-                  onClick={() => handlePageChange(totalPages)} 
-                  disabled={currentPage === totalPages}
+                  onClick={handleNextPage} 
+                  disabled={!nextCursor}
                   className={cobranzasStyles.paginationButton}
                 >
-                  Última »
+                  Siguiente ›
                 </button>
               </div>
             )}
@@ -418,7 +324,7 @@ function CobranzasPage() {
             cuota={selectedCuota} 
             onClose={closeGestionModal}
             onGestionGuardada={() => {
-              fetchCuotas(filtros); // Refresca la lista y el contador
+              fetchVentas(filtros, cursorActual, pageSize); // Refresca la página y el contador
               if (showHistorialModal && historialCuota && selectedCuota && historialCuota.id_cuota === selectedCuota.id_cuota) {
                 // Si el historial de la misma cuota está abierto, lo refrescamos
                 setHistorialCuota({ ...historialCuota }); // Forzar re-render
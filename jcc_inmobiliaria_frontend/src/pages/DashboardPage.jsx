@@ -2,6 +2,7 @@
 import React, { useState, useEffect, useCallback } from 'react';
 import {
     getDashboardDataFromApi,
+    getDashboardRankingVentas,
     getAdvisorsForFilter
 } from '../services/apiService';
 import styles from './DashboardPage.module.css';
@@ -57,6 +58,11 @@ function DashboardPage() {
     const [dashboardData, setDashboardData] = useState(null);
     const [loadingDashboard, setLoadingDashboard] = useState(true);
     const [dashboardError, setDashboardError] = useState(null);
+    // Detalle de ventas del asesor seleccionado en el ranking (se pide al seleccionar una fila)
+    const [rankingSeleccionado, setRankingSeleccionado] = useState(null);
+    const [rankingVentas, setRankingVentas] = useState(null);
+    const [rankingVentasPage, setRankingVentasPage] = useState(1);
+    const [loadingRankingVentas, setLoadingRankingVentas] = useState(false);
     const [chartsApiReady, setChartsApiReady] = useState(
         // Comprobar si ya está cargado al inicio (útil para HMR o navegación rápida)
         !!(window.google && window.google.visualization)
@@ -135,8 +141,29 @@ function DashboardPage() {
         );
         console.log("[DashboardPage] Filtros activos para enviar a API:", activeFilters);
         fetchDashboardDataInternal(activeFilters);
+        setRankingSeleccionado(null);
     }, [filters, fetchDashboardDataInternal]);
 
+    useEffect(() => {
+        if (!rankingSeleccionado) {
+            setRankingVentas(null);
+            return;
+        }
+        const loadRankingVentas = async () => {
+            setLoadingRankingVentas(true);
+            try {
+                const response = await getDashboardRankingVentas({ ...filters, asesorRankingId: rankingSeleccionado.id, page: rankingVentasPage });
+                setRankingVentas(response.data);
+            } catch (error) {
+                console.error("[DashboardPage] Error cargando ventas del ranking:", error);
+                setRankingVentas(null);
+            } finally {
+                setLoadingRankingVentas(false);
+            }
+        };
+        loadRankingVentas();
+    }, [rankingSeleccionado, rankingVentasPage, filters]);
+
     useEffect(() => {
         // ... (log dashboardData - sin cambios)
         console.log("[DashboardPage] Estado actualizado GENERAL - chartsApiReady:", chartsApiReady, "- dashboardData disponible:", !!dashboardData);
@@ -414,11 +441,24 @@ function DashboardPage() {
                 },
                 sort: 'disable', 
             }, 'Table');
+            // Al seleccionar una fila se carga el detalle paginado de ventas de ese asesor
+            const rankingChart = document.getElementById('rankingAsesoresChart')?.chart;
+            if (rankingChart) {
+                window.google.visualization.events.addListener(rankingChart, 'select', () => {
+                    const seleccion = rankingChart.getSelection();
+                    const fila = seleccion.length ? seleccion[0].row : null;
+                    const asesorId = fila !== null ? dashboardData.graficos.rankingAsesoresIds?.[fila] : null;
+                    if (asesorId) {
+                        setRankingSeleccionado({ id: asesorId, nombre: dashboardData.graficos.rankingAsesores[fila + 1][0] });
+                        setRankingVentasPage(1);
+                    }
+                });
+            }
         } else if (chartsApiReady && dashboardData) {
              console.warn("[useEffect rankingAsesoresChart] No hay datos específicos, dibujando 'Sin datos'.");
              drawChart('rankingAsesoresChart', [['Asesor', 'Tipo', 'Roles', 'Total Ventas', 'Separación', 'Procesable', 'Anulada', 'Completada'],['Sin datos', '-', '-', 0, 0,0,0,0]], {title: 'Ranking de Asesores', height: chartHeight + 80, colors: [DIRECT_CHART_COLORS_PALETTE[11]]}, 'Table');
         }
-    }, [chartsApiReady, dashboardData?.graficos?.rankingAsesores, drawChart, styles]);
+    }, [chartsApiReady, dashboardData?.graficos?.rankingAsesores, dashboardData?.graficos?.rankingAsesoresIds, drawChart, styles]);
 
     useEffect(() => {
         // ... (useEffect para recaudoMedioCaptacionChart - sin cambios) ...
@@ -493,6 +533,27 @@ function DashboardPage() {
                             {/* Fila 4 de Gráficos - Tabla de Ranking de Asesores (Ocupa 2 módulos) */}
                             <div className={`${styles.chartContainer} ${styles.rankingAsesoresContainer}`}>
                                 <div id="rankingAsesoresChart" className={styles.chart}></div>
+                                {rankingSeleccionado && (
+                                    <div className={styles.rankingVentasDetalle}>
+                                        <h4>Ventas de {rankingSeleccionado.nombre}</h4>
+                                        {loadingRankingVentas ? (
+                                            <p className={styles.noDataMessage}>Cargando ventas...</p>
+                                        ) : (
+                                            <ul>
+                                                {(rankingVentas?.results || []).map(venta => (
+                                                    <li key={venta.id_venta}>
+                                                        {venta.id_venta} - {venta.lote} ({venta.proyecto}) · {venta.status_venta_display} · {venta.roles.join(', ')}
+                                                    </li>
+                                                ))}
+                                            </ul>
+                                        )}
+                                        <div className={styles.rankingVentasPaginacion}>
+                                            <button type="button" disabled={!rankingVentas?.previous || loadingRankingVentas} onClick={() => setRankingVentasPage(p => p - 1)}>Anterior</button>
+                                            <span>Página {rankingVentasPage} · {rankingVentas?.count ?? 0} ventas</span>
+                                            <button type="button" disabled={!rankingVentas?.next || loadingRankingVentas} onClick={() => setRankingVentasPage(p => p + 1)}>Siguiente</button>
+                                        </div>
+                                    </div>
+                                )}
                             </div> 
                         </div>
                     )}
@@ -215,7 +215,15 @@ function VentasPage() {
 
     const handleOpenModalForCreate = () => { setEditingVenta(null); setIsModalOpen(true); };
     
-    const handleOpenModalForEdit = (venta) => {
+    const handleOpenModalForEdit = async (ventaListado) => {
+        // El listado trae una representación compacta: se pide la venta completa (comisiones, plan) para editarla
+        let venta = ventaListado;
+        try {
+            const response = await apiService.getVentaById(ventaListado.id_venta);
+            venta = response.data;
+        } catch (err) {
+            console.error(`Error cargando la venta ${ventaListado.id_venta} para editar:`, err);
+        }
         // Asegurarse de que los IDs de las relaciones ForeignKey se pasen correctamente
         const ventaDataForForm = {
             ...venta,
@@ -454,12 +462,15 @@ function VentasPage() {
                                             <td>
                                                 {venta.cliente_detalle ? 
                                                     <Link to={`/clientes/${venta.cliente_detalle.id_cliente}`}>{venta.cliente_detalle.nombres_completos_razon_social}</Link> 
-                                                    : (venta.cliente_info || venta.cliente || '-')}
+                                                    : (venta.cliente && venta.cliente_info ?
+                                                        <Link to={`/clientes/${venta.cliente}`}>{venta.cliente_info}</Link>
+                                                        : (venta.cliente || '-'))}
                                             </td>
                                             <td>{
-                                                (Array.isArray(venta.comisiones_asesores) && venta.comisiones_asesores.length > 0) ?
+                                                venta.liner_nombre ||
+                                                ((Array.isArray(venta.comisiones_asesores) && venta.comisiones_asesores.length > 0) ?
                                                     (venta.comisiones_asesores.find(a => a.rol === 'liner')?.asesor_nombre || '-')
-                                                    : '-'
+                                                    : '-')
                                             }</td>
                                             <td className={styles.textAlignRight}>{displayCurrency(venta.valor_lote_venta)}</td>
                                             <td className={styles.textAlignRight}>{mostrarDolares && venta.precio_dolares ? `$${Number(venta.precio_dolares).toLocaleString('en-US', {minimumFractionDigits:2, maximumFractionDigits:2})}` : '-'}</td>
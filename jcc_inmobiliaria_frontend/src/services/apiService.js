@@ -154,6 +154,12 @@ export const getClientesParaVentas = (search = '', limit = 50) => {
     return apiClient.get(`/gestion/clientes/para_ventas/?${params.toString()}`);
 };
 
+// --- Autocompletado (índice de prefijos en memoria del backend) ---
+export const typeahead = (entidad, query, extraParams = {}) => {
+    const params = new URLSearchParams({ q: query, ...extraParams });
+    return apiClient.get(`/gestion/typeahead/${entidad}/?${params.toString()}`);
+};
+
 export const searchClientes = (query) => {
     const params = new URLSearchParams();
     if (query) params.append('q', query);
@@ -204,6 +210,13 @@ export const getDashboardDataFromApi = (filters = {}) => {
     console.log("[apiService] GET Dashboard URL:", url);
     return apiClient.get(url);
 };
+export const getDashboardRankingVentas = (filters = {}) => {
+    const activeFilters = Object.entries(filters).filter(([_, value]) => value !== '' && value !== null && value !== undefined).reduce((obj, [key, value]) => { obj[key] = value; return obj; }, {});
+    const queryParams = new URLSearchParams(activeFilters).toString();
+    const url = `/gestion/dashboard-ranking-ventas/${queryParams ? `?${queryParams}` : ''}`;
+    console.log("[apiService] GET Dashboard Ranking Ventas URL:", url);
+    return apiClient.get(url);
+};
 export const getCommissionSummary = (filters = {}) => {
     const activeFilters = Object.entries(filters).filter(([_, value]) => value !== '' && value !== null).reduce((obj, [key, value]) => { obj[key] = value; return obj; }, {});
     const queryParams = new URLSearchParams(activeFilters).toString();